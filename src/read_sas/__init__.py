@@ -1,4 +1,66 @@
-from read_sas.src import Config, n_gb_in_file, n_rows_in_sas7bdat
-from read_sas._read_sas import ReadSas
+"""Read SAS files into polars and pandas.
 
-__all__ = ["Config", "n_gb_in_file", "n_rows_in_sas7bdat", "ReadSas"]
+Importing the package is cheap: polars, pandas, pyarrow and pyreadstat are
+only imported when an attribute that needs them is first used.
+"""
+
+from __future__ import annotations
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from read_sas.src import (
+        Config,
+        n_gb_in_file,
+        n_rows_in_sas7bdat,
+        plan_shards,
+        run_worker,
+        merge_shards,
+        lookup,
+        stream_arrow,
+        aggregate,
+        sort_to_parquet,
+    )
+    from read_sas._read_sas import ReadSas
+
+_LAZY_ATTRIBUTES = {
+    "Config": "read_sas.src",
+    "n_gb_in_file": "read_sas.src",
+    "n_rows_in_sas7bdat": "read_sas.src",
+    "ReadSas": "read_sas._read_sas",
+    "plan_shards": "read_sas.src",
+    "run_worker": "read_sas.src",
+    "merge_shards": "read_sas.src",
+    "lookup": "read_sas.src",
+    "stream_arrow": "read_sas.src",
+    "aggregate": "read_sas.src",
+    "sort_to_parquet": "read_sas.src",
+}
+
+
+def __getattr__(name: str) -> Any:  # noqa: ANN401
+    """Import the module defining `name` the first time it is used."""
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(_LAZY_ATTRIBUTES[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted([*globals(), *_LAZY_ATTRIBUTES])
+
+
+__all__ = [
+    "Config",
+    "ReadSas",
+    "aggregate",
+    "lookup",
+    "merge_shards",
+    "n_gb_in_file",
+    "n_rows_in_sas7bdat",
+    "plan_shards",
+    "run_worker",
+    "sort_to_parquet",
+    "stream_arrow",
+]
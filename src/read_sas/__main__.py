@@ -0,0 +1,6 @@
+"""Run the read_sas command line interface with `python -m read_sas`."""
+
+import sys
+from read_sas._cli import main
+
+sys.exit(main())
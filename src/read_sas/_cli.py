@@ -0,0 +1,170 @@
+"""Command line interface for read_sas."""
+
+from __future__ import annotations
+import argparse
+import json
+from datetime import datetime
+from typing import Sequence
+
+
+def _columns(value: str) -> list[str]:
+    return [column.strip() for column in value.split(",") if column.strip()]
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="read_sas", description="Convert SAS files to Parquet."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    plan = commands.add_parser(
+        "plan", help="Split a SAS file into row-range shards and write a manifest."
+    )
+    plan.add_argument("filepath", help="The sas7bdat file to convert.")
+    plan.add_argument("output_dir", help="Shared directory for the manifest and parts.")
+    size = plan.add_mutually_exclusive_group()
+    size.add_argument("--shards", type=int, help="Number of shards to plan.")
+    size.add_argument("--rows-per-shard", type=int, help="Rows in each shard.")
+    plan.add_argument("--columns", type=_columns, help="Comma separated column list.")
+    plan.add_argument(
+        "--formatter", help="A `module:function` formatter every worker applies."
+    )
+
+    worker = commands.add_parser(
+        "worker", help="Convert unclaimed shards of a manifest to Parquet parts."
+    )
+    worker.add_argument("manifest", help="The manifest written by `plan`.")
+    worker.add_argument("--shard", type=int, help="Convert only this shard id.")
+    worker.add_argument(
+        "--max-shards", type=int, help="Stop after converting this many shards."
+    )
+
+    merge = commands.add_parser(
+        "merge", help="Validate the converted parts and publish the dataset."
+    )
+    merge.add_argument("manifest", help="The manifest written by `plan`.")
+    merge.add_argument(
+        "--overwrite", action="store_true", help="Replace an existing dataset."
+    )
+
+    tune = commands.add_parser(
+        "tune", help="Benchmark a SAS file and store the fastest read settings."
+    )
+    tune.add_argument("filepath", help="The sas7bdat file to benchmark.")
+    tune.add_argument("--columns", type=_columns, help="Comma separated column list.")
+    tune.add_argument("--sample-rows", type=int, help="Rows in the benchmark sample.")
+    tune.add_argument(
+        "--store", help="The tuning store. Defaults to ~/.cache/read_sas/tuning.json."
+    )
+
+    cache = commands.add_parser(
+        "cache", help="Inspect and evict converted files under the temp folder."
+    )
+    cache.add_argument(
+        "--root", help="The cache folder. Defaults to `Config.temp_dir_parent`."
+    )
+    cache.add_argument("--max-size-gb", type=float, help="Maximum total cache size.")
+    cache.add_argument(
+        "--ttl-days", type=float, help="Evict entries unused for this many days."
+    )
+    cache_commands = cache.add_subparsers(dest="cache_command", required=True)
+    cache_commands.add_parser("ls", help="List entries, least recently used first.")
+    prune = cache_commands.add_parser("prune", help="Evict expired and LRU entries.")
+    prune.add_argument(
+        "--dry-run", action="store_true", help="Only list what would be evicted."
+    )
+    cache_commands.add_parser("stats", help="Summarize the cache.")
+    for name, help_text in (
+        ("pin", "Protect an entry from eviction."),
+        ("unpin", "Allow a pinned entry to be evicted."),
+    ):
+        pin = cache_commands.add_parser(name, help=help_text)
+        pin.add_argument("entry", help="The entry folder or SAS file stem.")
+    return parser
+
+
+def _run_cache_command(args: argparse.Namespace) -> None:
+    from read_sas.src._cache import CacheManager  # noqa: PLC0415
+    from read_sas.src._config import Config  # noqa: PLC0415
+
+    cache = CacheManager(
+        args.root or Config().temp_dir_parent,
+        max_size_in_gb=args.max_size_gb,
+        ttl_in_days=args.ttl_days,
+    )
+    if args.cache_command == "ls":
+        for entry in cache.entries():
+            accessed = datetime.fromtimestamp(entry.last_access).isoformat(
+                timespec="seconds"
+            )
+            pinned = "pinned" if entry.pinned else ""
+            print(  # noqa: T201
+                f"{entry.name}\t{entry.size_bytes}\t{accessed}\t{pinned}".rstrip()
+            )
+    elif args.cache_command == "prune":
+        action = "would evict" if args.dry_run else "evicted"
+        for entry in cache.prune(dry_run=args.dry_run):
+            print(f"{action}\t{entry.name}")  # noqa: T201
+    elif args.cache_command == "stats":
+        print(json.dumps(cache.stats(), indent=2))  # noqa: T201
+    elif args.cache_command == "pin":
+        print(cache.pin(args.entry))  # noqa: T201
+    elif args.cache_command == "unpin":
+        print(cache.unpin(args.entry))  # noqa: T201
+
+
+def _run_tune_command(args: argparse.Namespace) -> None:
+    from dataclasses import asdict  # noqa: PLC0415
+    from read_sas.src._auto_tuner import (  # noqa: PLC0415
+        DEFAULT_TUNING_STORE,
+        TuningStore,
+        file_shape,
+        tune,
+    )
+    from read_sas.src._config import Config  # noqa: PLC0415
+    from read_sas.src._n_rows_in_sas7bdat import n_rows_in_sas7bdat  # noqa: PLC0415
+
+    config = Config()
+    n_rows = n_rows_in_sas7bdat(args.filepath, args.columns)
+    settings = tune(args.filepath, config, n_rows, args.columns, args.sample_rows)
+    shape, _ = file_shape(args.filepath, n_rows, args.columns)
+    TuningStore(args.store or DEFAULT_TUNING_STORE).put(shape, settings)
+    print(json.dumps({"shape": shape.key, **asdict(settings)}, indent=2))  # noqa: T201
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """Run the `read_sas` command line interface."""
+    args = _build_parser().parse_args(argv)
+    if args.command == "cache":
+        _run_cache_command(args)
+        return 0
+    if args.command == "tune":
+        _run_tune_command(args)
+        return 0
+
+    from read_sas.src._shards import (  # noqa: PLC0415
+        merge_shards,
+        plan_shards,
+        run_shard,
+        run_worker,
+    )
+
+    if args.command == "plan":
+        manifest = plan_shards(
+            args.filepath,
+            args.output_dir,
+            n_shards=args.shards,
+            rows_per_shard=args.rows_per_shard,
+            column_list=args.columns,
+            formatter=args.formatter,
+        )
+        print(manifest)  # noqa: T201
+    elif args.command == "worker":
+        if args.shard is not None:
+            print(run_shard(args.manifest, args.shard))  # noqa: T201
+        else:
+            converted = run_worker(args.manifest, max_shards=args.max_shards)
+            print(f"Converted shards: {converted}")  # noqa: T201
+    elif args.command == "merge":
+        print(merge_shards(args.manifest, overwrite=args.overwrite))  # noqa: T201
+    return 0
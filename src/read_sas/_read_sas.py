@@ -1,9 +1,30 @@
 from __future__ import annotations
 import time
-from typing import Callable
+from typing import Any, Callable
 from read_sas.src import Config, timer, sas_reader, _format_filepath
+from read_sas.src._formatter_pool import check_picklable, formatter_digest
+from read_sas.src._column_profile import DataProfiler, read_profile, write_profile
+from read_sas.src._key_index import (
+    build_key_index,
+    index_path_for,
+    lookup,
+    write_key_index,
+)
+from read_sas.src._cache import CacheManager
+from read_sas.src._file_lock import FileLock, atomic_write
+from read_sas.src._logger import install_event_stream, install_file_handler
+from read_sas.src._chunk_transforms import output_options
+from read_sas.src._sas_strings import QUARANTINE
+from read_sas.src._arrow_stream import stream_arrow
+from read_sas.src._memory import MemoryMonitor, monitor_memory, sample_memory
+from read_sas.src._row_diff import RowDiff, diff_to_parquet
+from read_sas.src._external_sort import sort_to_parquet
+from read_sas.src._shared_registry import SharedRegistry, SharedTable
+import json
+import uuid
 import pandas as pd
 import polars as pl
+import pyarrow as pa
 from pathlib import Path
 
 
@@ -19,21 +40,68 @@ class ReadSas:
     ) -> None:
         self._filename = _format_filepath(filename)
         self._config = Config(**(config_kwargs or {}))
+        if self._config.log_file is not None:
+            install_file_handler(self._config.log_file)
+        if self._config.chunk_events_path is not None:
+            install_event_stream(self._config.chunk_events_path)
         self._formatter = formatter
         self._column_list = column_list
+        self._stats: dict[str, Any] = {}
+        if self._config.formatter_processes and self._formatter is not None:
+            check_picklable(self._formatter)
+        if (
+            self._config.invalid_bytes == QUARANTINE
+            and self._config.quarantine_dir is None
+        ):
+            self._config.quarantine_dir = (
+                self.output_folder / f"{self.filename.stem}.quarantine"
+            )
+
+        if (
+            self._config.spill_budget_gb is not None or self._config.sort_by
+        ) and self._config.spill_dir is None:
+            self._config.spill_dir = self.output_folder / f"{self.filename.stem}.spill"
+        self._memory = MemoryMonitor.from_config(self._config)
+        self._reader: pl.LazyFrame | None = None
+        self._shared: list[SharedTable] = []
+
+    def __enter__(self) -> ReadSas:  # noqa: PYI034
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Remove the chunks spilled while reading, release shared tables and forget the reader.
 
+        A later use of `reader` reads the file again.
+        """
+        spiller = self._stats.pop("spiller", None)
+        if spiller is not None:
+            spiller.close()
+        for shared in self._shared:
+            shared.release()
+        self._shared = []
+        self._reader = None
+
+    def _read(self) -> pl.LazyFrame:
         start = time.time()
         self._config.logger.info(
             f"Started reading the file: {self._filename} at {start}."
         )
-        self._reader: pl.LazyFrame = sas_reader(
-            self._filename, self._config, self._formatter, self._column_list
+        reader = sas_reader(
+            self._filename,
+            self._config,
+            self._formatter,
+            self._column_list,
+            self._stats,
         )
         end = time.time()
         self._config.logger.info(
             f"Finished reading the file: {self._filename} at {end}."
         )
         self._config.logger.info(f"Time taken to read the file: {end - start} seconds.")
+        return reader
 
     @property
     def filename(self) -> Path:
@@ -45,6 +113,9 @@ class ReadSas:
 
     @property
     def reader(self) -> pl.LazyFrame:
+        """Return the decoded file, reading it on first use."""
+        if self._reader is None:
+            self._reader = self._read()
         return self._reader
 
     @property
@@ -52,23 +123,211 @@ class ReadSas:
         """Return the list of columns to read from the file."""
         return self._column_list
 
+    @property
+    def stats(self) -> dict[str, Any]:
+        """Return the statistics recorded while reading the file."""
+        return self._stats
+
     @property
     def formatter(self) -> Callable[[pl.LazyFrame], pl.LazyFrame] | None:
         """Return the formatter function."""
         return self._formatter if self._formatter is not None else (lambda df: df)
 
-    @timer
-    def run(self) -> pd.DataFrame:
-        """Run the reader and return the collected DataFrame."""
-        filename = self.filename.stem
-        folder = self.config.temp_dir_parent / f"temp__{filename}"
-        folder.mkdir(parents=True, exist_ok=True)
+    @property
+    def output_folder(self) -> Path:
+        """Return the folder the converted file and its sidecars are written to."""
+        return self.config.temp_dir_parent / f"temp__{self.filename.stem}"
+
+    @property
+    def parquet_path(self) -> Path:
+        """Return the path `run` writes the parquet file to."""
+        return self.output_folder / f"{self.filename.stem}.parquet"
+
+    @property
+    def profile_path(self) -> Path:
+        """Return the path of the column statistics sidecar."""
+        return self.output_folder / f"{self.filename.stem}.profile.json"
+
+    @property
+    def lock_path(self) -> Path:
+        """Return the lock file that serializes conversions of this file."""
+        return self.output_folder / f"{self.filename.stem}.lock"
+
+    @property
+    def diff_folder(self) -> Path:
+        """Return the folder `diff` writes the inserted, updated and deleted rows to."""
+        return self.output_folder / f"{self.filename.stem}.diff"
+
+    @property
+    def source_path(self) -> Path:
+        """Return the sidecar recording which source the parquet file was built from."""
+        return self.output_folder / f"{self.filename.stem}.source.json"
+
+    def _fingerprint(
+        self, cluster_by: list[str] | str | None = None
+    ) -> dict[str, Any] | None:
+        """Describe the source file and options the conversion depends on.
+
+        `cluster_by` is the index the output rows were sorted by, if any.
+        """
+        if not self.filename.exists():
+            return None
+        stat = self.filename.stat()
+        formatter = self._formatter
+        fingerprint = {
+            "source": str(self.filename.resolve()),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "column_list": self.column_list,
+            "formatter": (
+                None
+                if formatter is None
+                else f"{getattr(formatter, '__module__', '')}."
+                f"{getattr(formatter, '__qualname__', repr(formatter))}"
+            ),
+            "transforms": output_options(self.config),
+            # only recorded when set, so unsorted conversions keep their fingerprint
+            **(
+                {
+                    "sort_by": self.config.sort_by,
+                    "sort_descending": self.config.sort_descending,
+                }
+                if self.config.sort_by
+                else {}
+            ),
+        }
+        if formatter is not None:
+            digest = formatter_digest(formatter)
+            if digest is None:
+                # a formatter without a stable digest can't be told apart from
+                # an edited one, so its conversions are never reused
+                self.config.logger.warning(
+                    f"The formatter {fingerprint['formatter']} has no stable "
+                    "digest, so its conversions will not be reused."
+                )
+                digest = f"unstable-{uuid.uuid4().hex}"
+            fingerprint["formatter_digest"] = digest
+        if self.config.parquet_row_group_size is not None:
+            fingerprint["parquet_row_group_size"] = self.config.parquet_row_group_size
+        if cluster_by is not None:
+            fingerprint["cluster_by"] = cluster_by
+        return fingerprint
+
+    def _cluster_by(
+        self, index_columns: list[str] | str | None, cluster_by_index: bool
+    ) -> list[str] | str | None:
+        """Return the columns `run` sorts the output by, if any."""
+        if cluster_by_index and index_columns is not None and not self.config.sort_by:
+            return index_columns
+        return None
+
+    def is_published(self, cluster_by: list[str] | str | None = None) -> bool:
+        """Return True if the parquet file was published from the current source.
+
+        `cluster_by` is the index the published rows must be sorted by, if any.
+        """
+        fingerprint = self._fingerprint(cluster_by)
+        if fingerprint is None or not self.parquet_path.exists():
+            return False
+        try:
+            published = json.loads(self.source_path.read_text())
+        except (FileNotFoundError, ValueError):
+            return False
+        return bool(published == fingerprint)
+
+    @property
+    def cache(self) -> CacheManager:
+        """Return the cache manager for `config.temp_dir_parent`."""
+        return CacheManager.from_config(self.config)
+
+    def profile(self) -> dict[str, Any]:
+        """Return per-column statistics for the file.
+
+        Uses the statistics gathered while reading when `profile_columns` is set,
+        then a sidecar at least as new as the SAS file, and otherwise profiles
+        the collected reader.
+        """
+        profile: dict[str, Any] | None = self._stats.get("profile")
+        if profile is not None:
+            return profile
+        if (
+            self.profile_path.exists()
+            and self.profile_path.stat().st_mtime >= self.filename.stat().st_mtime
+        ):
+            self.cache.touch(self.output_folder)
+            return read_profile(self.profile_path)
+
+        profiler = DataProfiler()
+        profiler.update(self.reader.collect())
+        profile = self._stats["profile"] = profiler.to_dict()
+        return profile
+
+    def _write_index(self, df: pl.DataFrame, index_columns: list[str] | str) -> None:
+        index_path = write_key_index(
+            build_key_index(df, index_columns, self.parquet_path), self.parquet_path
+        )
+        self.config.logger.info(f"Key index written to {index_path}.")
+
+    def _convert(
+        self, index_columns: list[str] | str | None, cluster_by_index: bool
+    ) -> pl.DataFrame:
+        """Decode the file and publish the parquet file and its sidecars."""
+        self.source_path.unlink(missing_ok=True)
+        if self.config.sort_by:
+            df = self._write_sorted(self.config.sort_by)
+        else:
+            df = self._write_collected(index_columns, cluster_by_index)
+
+        if index_columns is not None:
+            self._write_index(df, index_columns)
 
+        if "profile" in self._stats:
+            with atomic_write(self.profile_path) as tmp:
+                write_profile(self._stats["profile"], tmp)
+            self.config.logger.info(
+                f"Column statistics written to {self.profile_path}."
+            )
+
+        fingerprint = self._fingerprint(
+            self._cluster_by(index_columns, cluster_by_index)
+        )
+        if fingerprint is not None:
+            with atomic_write(self.source_path) as tmp:
+                tmp.write_text(json.dumps(fingerprint, indent=2))
+        return df
+
+    def _write_sorted(self, sort_by: list[str]) -> pl.DataFrame:
+        """Sort the file by `sort_by` in bounded memory and write the parquet file."""
+        start = time.time()
+        with atomic_write(self.parquet_path) as tmp:
+            sort_to_parquet(
+                self.filename,
+                tmp,
+                sort_by,
+                self._formatter,
+                self.column_list,
+                self.config,
+                descending=self.config.sort_descending,
+                stats=self._stats,
+            )
+        self.config.logger.info(
+            f"Time taken to sort the file into a parquet file: "
+            f"{time.time() - start} seconds."
+        )
+        df = pl.read_parquet(self.parquet_path)
+        sample_memory("read_parquet")
+        return df
+
+    def _write_collected(
+        self, index_columns: list[str] | str | None, cluster_by_index: bool
+    ) -> pl.DataFrame:
+        """Collect the reader and write it to the parquet file."""
         start = time.time()
         self.config.logger.info(
             f"Collecting the DataFrame from the reader started at {start}."
         )
         df = self.reader.collect()
+        sample_memory("collect_output")
         end = time.time()
         self.config.logger.info(
             f"Collecting the DataFrame from the reader finished at {end}."
@@ -81,7 +340,11 @@ class ReadSas:
         self.config.logger.info(
             f"Writing the DataFrame to a parquet file started at {start}."
         )
-        df.write_parquet(folder / f"{filename}.parquet")
+        if index_columns is not None and cluster_by_index:
+            df = df.sort(index_columns)
+        with atomic_write(self.parquet_path) as tmp:
+            df.write_parquet(tmp, row_group_size=self.config.parquet_row_group_size)
+        sample_memory("write_parquet")
         end = time.time()
         self.config.logger.info(
             f"Writing the DataFrame to a parquet file finished at {end}."
@@ -89,20 +352,194 @@ class ReadSas:
         self.config.logger.info(
             f"Time taken to write the DataFrame to a parquet file: {end - start} seconds."
         )
+        return df
+
+    def to_arrow_batches(self, schema: pa.Schema | None = None) -> pa.RecordBatchReader:
+        """Stream the formatted chunks as Arrow record batches.
+
+        Nothing is written to the output folder and the file is never
+        collected as a whole, so DuckDB, Polars and pyarrow dataset writers
+        can consume it in bounded memory. See `read_sas.stream_arrow`.
+        """
+        return stream_arrow(
+            self.filename,
+            self._formatter,
+            self.column_list,
+            self.config,
+            schema=schema,
+            stats=self._stats,
+        )
+
+    def diff(self, key_columns: list[str] | str | None = None) -> RowDiff:
+        """Diff the file against its previous conversion and publish it as the new one.
+
+        The inserted, updated and deleted rows are written to `diff_folder`,
+        and the row hashes of the new conversion are stored next to it for
+        the next diff. With no previous conversion every row is inserted.
+
+        Parameters
+        ----------
+        key_columns : list[str] | str | None
+            The columns identifying a row. Without them rows are matched by
+            content, so a changed row is reported as deleted and inserted.
+        """
+        folder = self.output_folder
+        folder.mkdir(parents=True, exist_ok=True)
+        with FileLock(
+            self.lock_path,
+            timeout=self.config.lock_timeout_seconds,
+            stale_after=self.config.lock_stale_seconds,
+            logger=self.config.logger,
+        ), monitor_memory(self._memory, self._stats):
+            self.source_path.unlink(missing_ok=True)
+            # the key index and profile describe the previous conversion
+            index_path_for(self.parquet_path).unlink(missing_ok=True)
+            self.profile_path.unlink(missing_ok=True)
+            result = diff_to_parquet(
+                self.filename,
+                self.parquet_path,
+                self.diff_folder,
+                self.config,
+                self._formatter,
+                self.column_list,
+                key_columns,
+                self._stats,
+            )
+            fingerprint = self._fingerprint()
+            if fingerprint is not None:
+                with atomic_write(self.source_path) as tmp:
+                    tmp.write_text(json.dumps(fingerprint, indent=2))
+            self.cache.touch(folder)
+        self._stats["diff"] = result.to_dict()
+        return result
+
+    def attach(self) -> SharedTable:
+        """Attach the decoded file from the host's shared registry.
+
+        The first process to attach the file converts it, or reads its
+        published parquet file, and writes it to the registry as an
+        uncompressed Arrow IPC file. Every later attachment on the host, from
+        any process, memory-maps that file instead of holding its own copy.
+        The table stays registered until it is released, by `release` or
+        `close`, and the registry passes `shared_registry_max_gb`.
+
+        Returns
+        -------
+        SharedTable
+            The attached table. `frame` is a polars frame over the mapped file.
+        """
+        fingerprint = self._fingerprint()
+        if fingerprint is None:
+            raise FileNotFoundError(f"Cannot share {self.filename}: it does not exist.")
+        with monitor_memory(self._memory, self._stats):
+            shared = SharedRegistry.from_config(self.config).attach(
+                fingerprint, lambda: self._published_frame(None, False)
+            )
+        self._shared.append(shared)
+        return shared
+
+    def lookup(self, keys: Any) -> pl.DataFrame:  # noqa: ANN401
+        """Return the rows of the converted file matching `keys`.
+
+        Requires a previous `run(index_columns=...)`. `keys` is a single key, a
+        list of keys (tuples for compound keys) or a frame of key columns.
+        """
+        rows = lookup(self.parquet_path, keys)
+        self.cache.touch(self.output_folder)
+        return rows
+
+    @timer
+    def run(
+        self,
+        index_columns: list[str] | str | None = None,
+        cluster_by_index: bool = False,
+    ) -> pd.DataFrame:
+        """Run the reader and return the collected DataFrame.
+
+        Conversions of the same file are serialized with a lock in the output
+        folder, so when several processes ask for a file at once the first one
+        converts it and the rest read what it published. The parquet file and
+        its sidecars are written to temporary files and renamed into place.
+
+        When `track_memory` or `memory_limit_gb` is set, the peak memory of
+        each stage is recorded in `stats["memory"]`, and a read about to pass
+        the limit raises `MemoryLimitError` with the peaks so far.
+
+        Parameters
+        ----------
+        index_columns : list[str] | str | None
+            Key columns to build a lookup index on. The index is written next
+            to the parquet file and used by `lookup`.
+        cluster_by_index : bool
+            Sort the output by the index columns before writing it, so rows
+            sharing a key prefix land in the same row groups. Ignored when
+            `sort_by` is set.
+
+        With `sort_by` set, the file is sorted in bounded memory instead of
+        being collected: sorted runs of at most `sort_budget_gb` are spilled
+        under `spill_dir` and merged into the parquet file. See
+        `read_sas.sort_to_parquet`.
+        """
+        with monitor_memory(self._memory, self._stats):
+            return self._run(index_columns, cluster_by_index)
+
+    def _published_frame(
+        self, index_columns: list[str] | str | None, cluster_by_index: bool
+    ) -> pl.DataFrame:
+        """Return the converted file, converting it unless it is already published."""
+        folder = self.output_folder
+        self.cache.prune(
+            reserve_bytes=(
+                self.filename.stat().st_size if self.filename.exists() else 0
+            ),
+            exclude=folder,
+        )
+        folder.mkdir(parents=True, exist_ok=True)
+
+        with FileLock(
+            self.lock_path,
+            timeout=self.config.lock_timeout_seconds,
+            stale_after=self.config.lock_stale_seconds,
+            logger=self.config.logger,
+        ):
+            if self.config.reuse_published and self.is_published(
+                self._cluster_by(index_columns, cluster_by_index)
+            ):
+                self.config.logger.info(
+                    f"Reusing {self.parquet_path}, already converted from "
+                    f"{self.filename}."
+                )
+                df = pl.read_parquet(self.parquet_path)
+                sample_memory("read_parquet")
+                if index_columns is not None:
+                    self._write_index(df, index_columns)
+            else:
+                df = self._convert(index_columns, cluster_by_index)
+            self.cache.touch(folder)
+        return df
+
+    def _run(
+        self, index_columns: list[str] | str | None, cluster_by_index: bool
+    ) -> pd.DataFrame:
+        df = self._published_frame(index_columns, cluster_by_index)
 
+        # pandas copies every column, so stop now if the copy cannot fit
+        sample_memory("to_pandas", upcoming_bytes=int(df.estimated_size()))
         try:
             self.config.logger.info(
                 "Trying to convert the DataFrame to pandas to return."
             )
-            return df.to_pandas()
+            output = df.to_pandas()
         except Exception as e1:
             self.config.logger.error(
                 f"Failed to convert the DataFrame to pandas. Error: {e1}."
             )
             try:
-                return pl.read_parquet(folder / f"{filename}.parquet").to_pandas()
+                return pl.read_parquet(self.parquet_path).to_pandas()
             except Exception as e:
                 self.config.logger.error(
                     f"Failed to read the parquet file. Error: {e}."
                 )
                 raise e
+        sample_memory("to_pandas")
+        return output
@@ -1,18 +1,97 @@
-from read_sas.src._config import Config
-from read_sas.src._n_gb_in_file import n_gb_in_file
-from read_sas.src._n_rows_in_sas7bdat import n_rows_in_sas7bdat
-from read_sas.src._sas_reader import sas_reader
-from read_sas.src.__format_filepath import _format_filepath
-from read_sas.src._was_file_created_in_last_week import was_file_created_in_last_week
-from read_sas.src._timer import timer
+"""Public functions of read_sas. Modules are imported on first attribute access."""
+
+from __future__ import annotations
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from read_sas.src._config import Config
+    from read_sas.src._n_gb_in_file import n_gb_in_file
+    from read_sas.src._n_rows_in_sas7bdat import n_rows_in_sas7bdat
+    from read_sas.src._sas_reader import sas_reader
+    from read_sas.src._arrow_stream import stream_arrow
+    from read_sas.src._aggregate import aggregate
+    from read_sas.src._external_sort import sort_to_parquet
+    from read_sas.src.__format_filepath import _format_filepath
+    from read_sas.src._was_file_created_in_last_week import (
+        was_file_created_in_last_week,
+    )
+    from read_sas.src._timer import timer
+    from read_sas.src._sas7bdat_metadata import sas7bdat_metadata
+    from read_sas.src._key_index import lookup
+    from read_sas.src._sas7bdat_header import sas7bdat_header
+    from read_sas.src._read_planner import plan_read
+    from read_sas.src._auto_tuner import tune
+    from read_sas.src._worker_pool import available_cpus, shutdown_worker_pool
+    from read_sas.src._cache import CacheManager
+    from read_sas.src._shared_registry import SharedRegistry
+    from read_sas.src._memory import MemoryLimitError
+    from read_sas.src._shards import plan_shards, run_shard, run_worker, merge_shards
+
+_LAZY_ATTRIBUTES = {
+    "Config": "read_sas.src._config",
+    "n_gb_in_file": "read_sas.src._n_gb_in_file",
+    "n_rows_in_sas7bdat": "read_sas.src._n_rows_in_sas7bdat",
+    "sas_reader": "read_sas.src._sas_reader",
+    "stream_arrow": "read_sas.src._arrow_stream",
+    "aggregate": "read_sas.src._aggregate",
+    "sort_to_parquet": "read_sas.src._external_sort",
+    "_format_filepath": "read_sas.src.__format_filepath",
+    "was_file_created_in_last_week": "read_sas.src._was_file_created_in_last_week",
+    "timer": "read_sas.src._timer",
+    "sas7bdat_metadata": "read_sas.src._sas7bdat_metadata",
+    "plan_shards": "read_sas.src._shards",
+    "run_shard": "read_sas.src._shards",
+    "run_worker": "read_sas.src._shards",
+    "merge_shards": "read_sas.src._shards",
+    "lookup": "read_sas.src._key_index",
+    "sas7bdat_header": "read_sas.src._sas7bdat_header",
+    "plan_read": "read_sas.src._read_planner",
+    "tune": "read_sas.src._auto_tuner",
+    "available_cpus": "read_sas.src._worker_pool",
+    "shutdown_worker_pool": "read_sas.src._worker_pool",
+    "CacheManager": "read_sas.src._cache",
+    "SharedRegistry": "read_sas.src._shared_registry",
+    "MemoryLimitError": "read_sas.src._memory",
+}
+
+
+def __getattr__(name: str) -> Any:  # noqa: ANN401
+    """Import the module defining `name` the first time it is used."""
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(_LAZY_ATTRIBUTES[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted([*globals(), *_LAZY_ATTRIBUTES])
 
 
 __all__ = [
+    "CacheManager",
     "Config",
+    "MemoryLimitError",
+    "SharedRegistry",
+    "_format_filepath",
+    "aggregate",
+    "available_cpus",
+    "lookup",
+    "merge_shards",
     "n_gb_in_file",
     "n_rows_in_sas7bdat",
+    "plan_read",
+    "plan_shards",
+    "run_shard",
+    "run_worker",
+    "sas7bdat_header",
+    "sas7bdat_metadata",
     "sas_reader",
-    "_format_filepath",
-    "was_file_created_in_last_week",
+    "shutdown_worker_pool",
+    "sort_to_parquet",
+    "stream_arrow",
     "timer",
+    "tune",
+    "was_file_created_in_last_week",
 ]
@@ -1,10 +1,340 @@
 from __future__ import annotations
+import dataclasses
+import pandas as pd
 import polars as pl
 import pyreadstat  # type: ignore
 from read_sas.src._timer import timer
 from read_sas.src._config import Config
-from typing import Generator, Callable
-from multiprocessing import cpu_count
+from read_sas.src._file_lock import atomic_write
+from read_sas.src._logger import logger
+from read_sas.src._worker_pool import WorkerPool, available_cpus, worker_pool
+from read_sas.src._read_ahead import ReadAhead, check_read_ahead_mode
+from read_sas.src._column_groups import wide_column_groups
+from read_sas.src._memory import sample_memory
+from read_sas.src._sas7bdat_header import sas7bdat_header
+from read_sas.src._sas7bdat_metadata import sas7bdat_metadata
+from read_sas.src._special_missing import SasSpecialMissingSplitter
+from read_sas.src._sas_strings import (
+    BYTE_TRANSPARENT_ENCODING,
+    DEFAULT_ENCODING,
+    ERROR,
+    QUARANTINE,
+    check_invalid_bytes_policy,
+    is_encoding_error,
+    normalize_encoding,
+    quarantine_frame,
+    repair_invalid_bytes,
+    sas7bdat_encoding,
+)
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Generator, Iterator, cast
+from contextlib import contextmanager
+from multiprocessing import get_context
+from pathlib import Path
+
+
+def _encoding_kwargs(config: Config) -> dict[str, Any]:
+    """Return the `encoding` argument for pyreadstat when `config` overrides it."""
+    return {"encoding": normalize_encoding(config.encoding)} if config.encoding else {}
+
+
+def _missing_kwargs(config: Config) -> dict[str, Any]:
+    """Return the `user_missing` argument for pyreadstat when special missings are kept."""
+    return {"user_missing": True} if config.special_missing else {}
+
+
+def _read_chunks(
+    filepath: str,
+    chunk_size: int,
+    column_list: list[str] | None,
+    config: Config,
+    offset: int = 0,
+    limit: int = 0,
+) -> Generator[pd.DataFrame, None, None]:
+    """Decode a SAS file in chunks of `chunk_size` rows, yielding pandas frames.
+
+    Reading starts at row `offset` and stops after `limit` rows (0 reads to the end).
+    With `config.special_missing`, the special missing values of numeric
+    columns are moved to UInt8 companion columns before the chunk is yielded.
+    """
+    chunks = _decode_chunks(filepath, chunk_size, column_list, config, offset, limit)
+    if not config.special_missing:
+        yield from chunks
+        return
+    columns = [column_list] if isinstance(column_list, str) else column_list
+    splitter = SasSpecialMissingSplitter.from_metadata(
+        sas7bdat_metadata(filepath, columns), config.special_missing_columns
+    )
+    for df in chunks:
+        yield splitter(df)
+
+
+def _decode_chunks(
+    filepath: str,
+    chunk_size: int,
+    column_list: list[str] | None,
+    config: Config,
+    offset: int = 0,
+    limit: int = 0,
+) -> Generator[pd.DataFrame, None, None]:
+    """Decode a SAS file in chunks, choosing how the rows are split across processes."""
+    check_invalid_bytes_policy(config.invalid_bytes)
+    check_read_ahead_mode(config.read_ahead)
+    if config.invalid_bytes == QUARANTINE and config.quarantine_dir is None:
+        raise ValueError("Quarantining invalid bytes requires `quarantine_dir`.")
+
+    if config.decode_across_chunks and (config.num_processes or 1) > 1:
+        yield from _read_chunks_across_processes(
+            filepath, chunk_size, column_list, config, offset, limit
+        )
+        return
+
+    multiprocess = config.use_multiprocessing and _processes(config) > 1
+    if (
+        config.invalid_bytes != ERROR
+        or config.read_ahead is not None
+        or (multiprocess and config.reuse_worker_pool)
+    ):
+        # each chunk is decoded on its own so a bad chunk can be decoded again,
+        # the shared worker pool can decode it, and it can come from a staged copy
+        ranges = _chunk_ranges(filepath, chunk_size, offset, limit)
+        column_groups = (
+            wide_column_groups(filepath, column_list, config)
+            if multiprocess and config.reuse_worker_pool
+            else None
+        )
+        with _chunk_paths(filepath, config, ranges) as paths:
+            for (row_offset, row_end), path in zip(ranges, paths):
+                yield _decode_rows(
+                    path,
+                    row_offset,
+                    row_end - row_offset,
+                    column_list,
+                    config,
+                    multiprocess=multiprocess,
+                    column_groups=column_groups,
+                )
+        return
+
+    reader = pyreadstat.read_file_in_chunks(
+        pyreadstat.read_sas7bdat,
+        filepath,
+        chunksize=chunk_size,
+        offset=offset,
+        limit=limit,
+        usecols=column_list,
+        disable_datetime_conversion=config.disable_datetime_conversion,
+        multiprocess=config.use_multiprocessing,
+        num_processes=_processes(config),
+        **_encoding_kwargs(config),
+        **_missing_kwargs(config),
+    )
+
+    for df, _ in reader:
+        yield df
+
+
+def _processes(config: Config) -> int:
+    """Return the number of decode processes, defaulting to the CPUs available."""
+    return config.num_processes or available_cpus()
+
+
+@contextmanager
+def _chunk_executor(
+    config: Config, processes: int
+) -> Generator[ProcessPoolExecutor | WorkerPool, None, None]:
+    """Yield the shared worker pool, or a pool private to this read."""
+    if config.reuse_worker_pool:
+        yield worker_pool(processes)
+        return
+    with ProcessPoolExecutor(
+        max_workers=processes, mp_context=get_context("spawn")
+    ) as executor:
+        yield executor
+
+
+def _chunk_ranges(
+    filepath: str, chunk_size: int, offset: int, limit: int
+) -> list[tuple[int, int]]:
+    """Return the `(first_row, end_row)` of each chunk to read."""
+    _, meta = pyreadstat.read_sas7bdat(filepath, metadataonly=True)
+    # a sas7bdat header always records its number of rows
+    n_rows = cast(int, meta.number_rows)
+    end = n_rows if limit == 0 else min(offset + limit, n_rows)
+    return [
+        (row_offset, min(row_offset + chunk_size, end))
+        for row_offset in range(offset, end, chunk_size)
+    ]
+
+
+@contextmanager
+def _chunk_paths(
+    filepath: str, config: Config, ranges: list[tuple[int, int]]
+) -> Generator[Iterator[str], None, None]:
+    """Yield the file to decode each chunk from, reading ahead if `config.read_ahead` is set."""
+    if config.read_ahead is None or not ranges:
+        yield (filepath for _ in ranges)
+        return
+    with ReadAhead(
+        filepath,
+        config.read_ahead,
+        n_rows=ranges[-1][1],
+        header_length=sas7bdat_header(filepath).header_length,
+        chunks_ahead=config.read_ahead_chunks,
+        block_size=config.io_block_size_mb * 1024 * 1024,
+        threads=config.io_threads,
+        staging_dir=config.staging_dir,
+        logger=config.logger,
+    ) as read_ahead:
+        yield read_ahead.paths(ranges)
+
+
+def _decode_rows(
+    filepath: str,
+    row_offset: int,
+    row_limit: int,
+    column_list: list[str] | None,
+    config: Config,
+    multiprocess: bool = False,
+    column_groups: list[list[str]] | None = None,
+) -> pd.DataFrame:
+    """Decode a range of rows, handling undecodable strings as `config.invalid_bytes` says.
+
+    With `column_groups`, each group of columns is decoded in its own worker of
+    the shared pool instead of splitting the rows across the workers.
+    """
+    kwargs: dict[str, Any] = {
+        "usecols": column_list,
+        "disable_datetime_conversion": config.disable_datetime_conversion,
+        **_missing_kwargs(config),
+    }
+    processes = _processes(config)
+
+    def read(encoding: dict[str, Any]) -> pd.DataFrame:
+        options = {**kwargs, **encoding}
+        if multiprocess and config.reuse_worker_pool and column_groups:
+            return worker_pool(processes).decode_columns(
+                filepath, row_offset, row_limit, column_groups, **options
+            )
+        if multiprocess and config.reuse_worker_pool:
+            return worker_pool(processes).decode_rows(
+                filepath, row_offset, row_limit, processes, **options
+            )
+        if multiprocess:
+            df, _ = pyreadstat.read_file_multiprocessing(
+                pyreadstat.read_sas7bdat,
+                filepath,
+                num_processes=processes,
+                row_offset=row_offset,
+                row_limit=row_limit,
+                **options,
+            )
+        else:
+            df, _ = pyreadstat.read_sas7bdat(
+                filepath, row_offset=row_offset, row_limit=row_limit, **options
+            )
+        return df
+
+    try:
+        return read(_encoding_kwargs(config))
+    except pyreadstat.ReadstatError as e:
+        if config.invalid_bytes == ERROR or not is_encoding_error(e):
+            raise
+        config.logger.warning(
+            f"Could not decode the strings in rows {row_offset} to "
+            f"{row_offset + row_limit} of {filepath}: {e}. Decoding them again."
+        )
+    return _repair_rows(
+        read({"encoding": BYTE_TRANSPARENT_ENCODING}), filepath, row_offset, config
+    )
+
+
+def _repair_rows(
+    df: pd.DataFrame, filepath: str, row_offset: int, config: Config
+) -> pd.DataFrame:
+    """Replace the invalid bytes of a chunk decoded as Latin-1, quarantining rows if asked."""
+    encoding = normalize_encoding(
+        config.encoding or sas7bdat_encoding(filepath) or DEFAULT_ENCODING
+    )
+    repaired, invalid = repair_invalid_bytes(df, encoding)
+    n_invalid = int(invalid.sum())
+    if config.invalid_bytes == QUARANTINE and n_invalid:
+        quarantine_dir = Path(config.quarantine_dir)  # type: ignore[arg-type]
+        quarantine_dir.mkdir(parents=True, exist_ok=True)
+        path = quarantine_dir / f"rows_{row_offset:012d}.parquet"
+        with atomic_write(path) as tmp:
+            quarantine_frame(df, invalid, row_offset).write_parquet(tmp)
+        config.logger.warning(
+            f"Quarantined {n_invalid} rows with invalid {encoding} bytes in {path}."
+        )
+        return repaired[~invalid].reset_index(drop=True)
+    config.logger.warning(
+        f"Replaced invalid {encoding} bytes in {n_invalid} rows starting at row "
+        f"{row_offset}."
+    )
+    return repaired
+
+
+def _read_chunks_across_processes(
+    filepath: str,
+    chunk_size: int,
+    column_list: list[str] | None,
+    config: Config,
+    offset: int = 0,
+    limit: int = 0,
+) -> Generator[pd.DataFrame, None, None]:
+    """Decode whole chunks in `config.num_processes` worker processes, in order.
+
+    At most one chunk per process is in flight, so memory stays bounded by
+    `num_processes` chunks.
+    """
+    ranges = _chunk_ranges(filepath, chunk_size, offset, limit)
+    processes = _processes(config)
+    # the configured logger may not be picklable, so workers use the package logger
+    worker_config = dataclasses.replace(config, logger=logger)
+
+    with _chunk_executor(config, processes) as executor, _chunk_paths(
+        filepath, config, ranges
+    ) as paths:
+        chunks = zip(ranges, paths)
+        in_flight: deque[Future[pd.DataFrame]] = deque()
+
+        def submit_next() -> None:
+            chunk = next(chunks, None)
+            if chunk is not None:
+                (row_offset, row_end), path = chunk
+                in_flight.append(
+                    executor.submit(
+                        _decode_rows,
+                        path,
+                        row_offset,
+                        row_end - row_offset,
+                        column_list,
+                        worker_config,
+                    )
+                )
+
+        for _ in range(processes):
+            submit_next()
+        try:
+            while in_flight:
+                df = in_flight.popleft().result()
+                submit_next()
+                yield df
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+
+def _format_chunk(
+    df: pd.DataFrame, formatter: Callable[[pl.LazyFrame], pl.LazyFrame] | None
+) -> pl.LazyFrame:
+    """Convert a decoded chunk to polars and apply the optional formatter."""
+    sample_memory("decode")
+    lf = pl.from_pandas(df).lazy()
+    sample_memory("from_pandas")
+    return formatter(lf) if formatter is not None else lf
 
 
 @timer
@@ -35,19 +365,5 @@ def _read_file(
     tuple[int, pl.DataFrame]
         A tuple containing the index of the chunk and the chunk itself.
     """
-
-    def cleaner(df: pl.LazyFrame) -> pl.LazyFrame:
-        return formatter(df) if formatter is not None else df
-
-    reader = pyreadstat.read_file_in_chunks(
-        pyreadstat.read_sas7bdat,
-        filepath,
-        chunksize=chunk_size,
-        usecols=column_list,
-        disable_datetime_conversion=config.disable_datetime_conversion,
-        multiprocess=config.use_multiprocessing,
-        num_processes=config.num_processes or cpu_count(),
-    )
-
-    for i, (df, _) in enumerate(reader):
-        yield i, cleaner(pl.from_pandas(df).lazy())
+    for i, df in enumerate(_read_chunks(filepath, chunk_size, column_list, config)):
+        yield i, _format_chunk(df, formatter)
@@ -0,0 +1,316 @@
+"""Group and aggregate a SAS file chunk by chunk, without building the table.
+
+Each chunk is reduced to partial aggregates as it is decoded, and the partials
+are merged into a running state keyed by the group columns. Every partial is
+mergeable: sums, counts, minimums and maximums merge with themselves, means
+carry their count and sum, variances carry their count, mean and sum of
+squared deviations (merged with Chan's parallel formula), and approximate
+distinct counts carry HyperLogLog registers. Memory is bounded by the number of
+groups rather than the number of rows.
+"""
+
+from __future__ import annotations
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Mapping
+import polars as pl
+from read_sas.src._config import Config
+from read_sas.src.__format_filepath import _format_filepath
+from read_sas.src._pipeline import Pipeline, Stage
+from read_sas.src._sas_reader import decoded_chunks
+
+AGGREGATIONS = (
+    "sum",
+    "count",
+    "len",
+    "min",
+    "max",
+    "mean",
+    "var",
+    "std",
+    "approx_n_unique",
+)
+HLL_PRECISION = 12
+_REGISTER = "__register"
+_RANK = "__rank"
+
+
+@dataclass(frozen=True)
+class Aggregation:
+    """An output column computed by applying `func` to `column` in each group."""
+
+    name: str
+    column: str
+    func: str
+
+    def __post_init__(self) -> None:
+        if self.func not in AGGREGATIONS:
+            raise ValueError(
+                f"Aggregation `{self.name}` must be one of {AGGREGATIONS}. "
+                f"Got {self.func!r}."
+            )
+
+    def state(self, suffix: str) -> str:
+        """Return the name of one of this aggregation's partial state columns."""
+        return f"{self.name}__{suffix}"
+
+
+def _group(df: pl.DataFrame, by: list[str], exprs: list[pl.Expr]) -> pl.DataFrame:
+    if not by:
+        return df.select(exprs)
+    return df.group_by(by, maintain_order=True).agg(exprs)
+
+
+class StreamingAggregator:
+    """Merge per-chunk partial aggregates into a state bounded by the group count.
+
+    Parameters
+    ----------
+    by : list[str]
+        The group columns. Empty aggregates the whole file into one row.
+    aggs : list[Aggregation]
+        The output columns.
+    precision : int
+        The HyperLogLog precision of approximate distinct counts. Each group
+        keeps up to `2**precision` registers, and the relative error is about
+        `1.04 / sqrt(2**precision)`.
+    """
+
+    def __init__(
+        self, by: list[str], aggs: list[Aggregation], precision: int = HLL_PRECISION
+    ) -> None:
+        if not aggs:
+            raise ValueError("At least one aggregation is required.")
+        if not 4 <= precision <= 18:
+            raise ValueError(f"Precision must be between 4 and 18. Got {precision}.")
+        self.by = list(by)
+        self.aggs = list(aggs)
+        self.precision = precision
+        self._scalar_aggs = [a for a in aggs if a.func != "approx_n_unique"]
+        self._sketch_aggs = [a for a in aggs if a.func == "approx_n_unique"]
+        self._state: pl.DataFrame | None = None
+        self._sketches: dict[str, pl.DataFrame] = {}
+
+    def _partial_exprs(self, agg: Aggregation) -> list[pl.Expr]:
+        col = pl.col(agg.column)
+        if agg.func in ("sum", "min", "max"):
+            return [getattr(col, agg.func)().alias(agg.state(agg.func))]
+        if agg.func == "count":
+            return [col.count().alias(agg.state("count"))]
+        if agg.func == "len":
+            return [pl.len().alias(agg.state("len"))]
+        if agg.func == "mean":
+            return [
+                col.count().alias(agg.state("n")),
+                col.sum().cast(pl.Float64).alias(agg.state("sum")),
+            ]
+        # var and std
+        return [
+            col.count().alias(agg.state("n")),
+            col.mean().alias(agg.state("mean")),
+            ((col - col.mean()) ** 2).sum().alias(agg.state("m2")),
+        ]
+
+    def _merge_exprs(self, agg: Aggregation) -> list[pl.Expr]:
+        if agg.func in ("min", "max"):
+            state = pl.col(agg.state(agg.func))
+            return [getattr(state, agg.func)().alias(agg.state(agg.func))]
+        if agg.func in ("sum", "count", "len"):
+            return [pl.col(agg.state(agg.func)).sum().alias(agg.state(agg.func))]
+        if agg.func == "mean":
+            return [
+                pl.col(agg.state("n")).sum().alias(agg.state("n")),
+                pl.col(agg.state("sum")).sum().alias(agg.state("sum")),
+            ]
+        # Chan et al.: the squared deviations of each partial from its own mean,
+        # plus the spread of the partial means around the merged mean
+        n, mean, m2 = (pl.col(agg.state(s)) for s in ("n", "mean", "m2"))
+        # groups without values in any partial keep a null mean rather than 0/0
+        merged_mean = pl.when(n.sum() > 0).then((n * mean).sum() / n.sum())
+        return [
+            n.sum().alias(agg.state("n")),
+            merged_mean.alias(agg.state("mean")),
+            (m2.sum() + (n * (mean - merged_mean) ** 2).sum()).alias(agg.state("m2")),
+        ]
+
+    def _final_expr(self, agg: Aggregation) -> pl.Expr:
+        if agg.func in ("sum", "count", "len", "min", "max"):
+            return pl.col(agg.state(agg.func)).alias(agg.name)
+        n = pl.col(agg.state("n"))
+        if agg.func == "mean":
+            return pl.when(n > 0).then(pl.col(agg.state("sum")) / n).alias(agg.name)
+        var = pl.when(n > 1).then(pl.col(agg.state("m2")) / (n - 1))
+        return (var.sqrt() if agg.func == "std" else var).alias(agg.name)
+
+    def _sketch(self, df: pl.DataFrame, agg: Aggregation) -> pl.DataFrame:
+        """Return the HyperLogLog registers of each group in a chunk."""
+        low_bits = 64 - self.precision
+        hashed = pl.col(agg.column).hash(seed=0)
+        low = hashed % (2**low_bits)
+        return (
+            df.filter(pl.col(agg.column).is_not_null())
+            .with_columns(
+                (hashed // (2**low_bits)).cast(pl.UInt32).alias(_REGISTER),
+                # the position of the first set bit among the low bits
+                (low.bitwise_leading_zeros() - self.precision + 1)
+                .cast(pl.UInt8)
+                .alias(_RANK),
+            )
+            .group_by([*self.by, _REGISTER])
+            .agg(pl.col(_RANK).max())
+        )
+
+    def partial(self, df: pl.DataFrame) -> tuple[pl.DataFrame, dict[str, pl.DataFrame]]:
+        """Reduce a chunk to its partial aggregates. Safe to call from several threads."""
+        exprs = [e for agg in self._scalar_aggs for e in self._partial_exprs(agg)]
+        if not exprs:
+            exprs = [pl.len().alias("__len")]
+        state = _group(df, self.by, exprs)
+        sketches = {agg.name: self._sketch(df, agg) for agg in self._sketch_aggs}
+        return state, sketches
+
+    def merge(self, partial: tuple[pl.DataFrame, dict[str, pl.DataFrame]]) -> None:
+        """Merge a chunk's partial aggregates into the running state."""
+        state, sketches = partial
+        if self._state is None:
+            self._state = state
+        else:
+            exprs = [e for agg in self._scalar_aggs for e in self._merge_exprs(agg)]
+            self._state = _group(
+                pl.concat([self._state, state]),
+                self.by,
+                exprs or [pl.col("__len").sum()],
+            )
+        for name, sketch in sketches.items():
+            previous = self._sketches.get(name)
+            self._sketches[name] = (
+                sketch
+                if previous is None
+                else pl.concat([previous, sketch])
+                .group_by([*self.by, _REGISTER])
+                .agg(pl.col(_RANK).max())
+            )
+
+    def _estimate(self, sketch: pl.DataFrame, name: str) -> pl.DataFrame:
+        """Estimate each group's distinct count from its registers."""
+        m = 2**self.precision
+        alpha = 0.7213 / (1 + 1.079 / m)
+        empty = m - pl.len()
+        # registers never set have rank 0, and 2 ** -0 == 1
+        harmonic = (2.0 ** (-pl.col(_RANK).cast(pl.Float64))).sum() + empty
+        raw = alpha * m * m / harmonic
+        # linear counting is more accurate while many registers are empty
+        small = m * (m / empty.cast(pl.Float64)).log()
+        estimate = pl.when((raw <= 2.5 * m) & (empty > 0)).then(small).otherwise(raw)
+        return _group(sketch, self.by, [estimate.round().cast(pl.Int64).alias(name)])
+
+    def result(self) -> pl.DataFrame:
+        """Return one row per group with the aggregations as columns."""
+        if self._state is None:
+            return pl.DataFrame(schema=[*self.by, *(agg.name for agg in self.aggs)])
+        output = self._state.select(
+            *self.by, *(self._final_expr(agg) for agg in self._scalar_aggs)
+        )
+        for agg in self._sketch_aggs:
+            estimates = self._estimate(self._sketches[agg.name], agg.name)
+            if self.by:
+                output = output.join(
+                    estimates, on=self.by, how="left", nulls_equal=True
+                ).with_columns(pl.col(agg.name).fill_null(0))
+            else:
+                value = estimates[agg.name][0] if estimates.height else 0
+                output = output.with_columns(pl.lit(value, pl.Int64).alias(agg.name))
+        return output.select(*self.by, *(agg.name for agg in self.aggs))
+
+
+def _aggregations(aggs: Mapping[str, tuple[str, str]]) -> list[Aggregation]:
+    return [Aggregation(name, column, func) for name, (column, func) in aggs.items()]
+
+
+def aggregate(
+    filepath: str | Path,
+    by: list[str] | str | None,
+    aggs: Mapping[str, tuple[str, str]],
+    formatter: Callable[[pl.LazyFrame], pl.LazyFrame] | None = None,
+    column_list: list[str] | None = None,
+    config: Config | None = None,
+    workers: int = 1,
+    precision: int = HLL_PRECISION,
+    stats: dict[str, Any] | None = None,
+) -> pl.DataFrame:
+    """Group a sas7bdat file and aggregate each group, one chunk at a time.
+
+    Parameters
+    ----------
+    filepath : str | Path
+        The path to the sas7bdat file.
+    by : list[str] | str | None
+        The group columns. None aggregates the whole file into one row.
+    aggs : Mapping[str, tuple[str, str]]
+        The output columns, as `{name: (column, func)}`. `func` is one of
+        `sum`, `count` (non-null values), `len` (rows), `min`, `max`, `mean`,
+        `var`, `std` (both with one degree of freedom) or `approx_n_unique`.
+    formatter : Callable[[pl.LazyFrame], pl.LazyFrame] | None
+        A function applied to every chunk before it is aggregated.
+    column_list : list[str] | None
+        The columns to decode. Defaults to the group and aggregated columns
+        when there is no formatter, and to all columns otherwise.
+    config : Config | None
+        The ReadSas configuration. Defaults to `Config()`.
+    workers : int
+        The threads computing partial aggregates while later chunks decode.
+    precision : int
+        The HyperLogLog precision of `approx_n_unique`.
+    stats : dict[str, Any] | None
+        Filled with the read plan, and the pipeline statistics under
+        `aggregate_pipeline`.
+
+    Returns
+    -------
+    pl.DataFrame
+        One row per group, in the order groups were first seen.
+    """
+    config = config or Config()
+    filepath = _format_filepath(filepath)
+    group_columns = [by] if isinstance(by, str) else list(by or [])
+    aggregations = _aggregations(aggs)
+    aggregator = StreamingAggregator(group_columns, aggregations, precision)
+    if column_list is None and formatter is None:
+        column_list = list(
+            dict.fromkeys([*group_columns, *(a.column for a in aggregations)])
+        )
+
+    _, _, chunks = decoded_chunks(filepath, config, formatter, column_list, stats)
+
+    def partial(
+        item: tuple[int, pl.DataFrame | None],
+    ) -> tuple[pl.DataFrame, dict[str, pl.DataFrame]]:
+        i, df = item
+        if df is None:
+            # a skipped chunk would silently change every aggregate
+            raise ValueError(
+                f"Chunk {i} of {filepath} could not be read, so it cannot be "
+                "aggregated. See the log for the failing columns."
+            )
+        return aggregator.partial(df)
+
+    pipeline = Pipeline(
+        chunks,
+        [Stage("aggregate", partial, workers)],
+        queue_size=config.pipeline_queue_size,
+        source_name="decode",
+    )
+    started = time.perf_counter()
+    n_chunks = 0
+    for result in pipeline:
+        aggregator.merge(result)
+        n_chunks += 1
+    output = aggregator.result()
+    config.logger.info(
+        f"Aggregated {n_chunks} chunks of {filepath.name} into {output.height} "
+        f"groups in {time.perf_counter() - started:.2f}s."
+    )
+    if stats is not None:
+        stats["aggregate_pipeline"] = pipeline.stats
+    return output
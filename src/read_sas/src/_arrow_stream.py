@@ -0,0 +1,74 @@
+"""Stream a SAS file to Arrow consumers one chunk at a time.
+
+DuckDB, Polars and pyarrow dataset writers all read a `pyarrow.RecordBatchReader`
+without copying it, so the decoded chunks go straight to them and the file is
+never held in memory as a whole.
+"""
+
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, Callable, Iterator
+import polars as pl
+import pyarrow as pa
+from read_sas.src._arrow_tables import conform_table
+from read_sas.src._config import Config
+from read_sas.src.__format_filepath import _format_filepath
+from read_sas.src._sas_reader import decoded_chunks
+
+
+def stream_arrow(
+    filepath: str | Path,
+    formatter: Callable[[pl.LazyFrame], pl.LazyFrame] | None = None,
+    column_list: list[str] | str | None = None,
+    config: Config | None = None,
+    schema: pa.Schema | None = None,
+    stats: dict[str, Any] | None = None,
+) -> pa.RecordBatchReader:
+    """Return a reader of the record batches of a sas7bdat file.
+
+    Chunks are decoded and formatted only as the reader is consumed, so at
+    most a chunk (or, with `use_pipeline`, the pipeline's queues) is held in
+    memory at once. Chunks that fail to decode or format are skipped and
+    logged, as in `sas_reader`.
+
+    Parameters
+    ----------
+    filepath : str | Path
+        The path to the sas7bdat file.
+    formatter : Callable[[pl.LazyFrame], pl.LazyFrame] | None
+        A function applied to every chunk.
+    column_list : list[str] | str | None
+        The columns to read, if not all of them.
+    config : Config | None
+        The ReadSas configuration. Defaults to `Config()`.
+    schema : pa.Schema | None
+        The schema of the batches. Defaults to the schema of the first chunk,
+        which the first chunk is decoded to find. Later chunks are cast to it.
+    stats : dict[str, Any] | None
+        Filled with the read plan and pipeline statistics, as in `sas_reader`.
+
+    Returns
+    -------
+    pa.RecordBatchReader
+        A reader DuckDB, Polars and pyarrow can consume without copying.
+    """
+    config = config or Config()
+    filepath = _format_filepath(filepath)
+    _, chunk_size, chunks = decoded_chunks(
+        filepath, config, formatter, column_list, stats
+    )
+    tables = ((i, df.to_arrow()) for i, df in chunks if df is not None and df.width > 0)
+    first = next(tables, None)
+    if schema is None:
+        schema = first[1].schema if first is not None else pa.schema([])
+    config.logger.info(
+        f"Streaming {filepath.name} as Arrow record batches of up to {chunk_size} rows."
+    )
+
+    def batches() -> Iterator[pa.RecordBatch]:
+        if first is not None:
+            yield from conform_table(first[1], schema, first[0]).to_batches()
+        for i, table in tables:
+            yield from conform_table(table, schema, i).to_batches()
+
+    return pa.RecordBatchReader.from_batches(schema, batches())
@@ -0,0 +1,60 @@
+"""Keep the chunks of one output in a single Arrow schema.
+
+The first chunk decides the schema of a stream or a Parquet file, and every
+later chunk is cast to it, so a chunk whose columns came out narrower (all
+null, or integers where the first had floats) still fits.
+"""
+
+from __future__ import annotations
+from pathlib import Path
+import polars as pl
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+def conform_table(table: pa.Table, schema: pa.Schema, chunk: int) -> pa.Table:
+    """Cast a chunk to the stream schema, so every batch has the same schema."""
+    if table.schema.equals(schema):
+        return table
+    if table.schema.names != schema.names:
+        raise ValueError(
+            f"Chunk {chunk} has columns {table.schema.names}, "
+            f"but the stream has columns {schema.names}."
+        )
+    try:
+        return table.cast(schema)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+        raise ValueError(
+            f"Chunk {chunk} cannot be cast to the stream schema: {e}. Pass an "
+            "explicit `schema` if the first chunk's types are too narrow."
+        ) from e
+
+
+class ParquetSink:
+    """Write chunks to one parquet file as they arrive, with the first chunk's schema."""
+
+    def __init__(self, path: Path, row_group_size: int | None = None) -> None:
+        self.path = path
+        self.row_group_size = row_group_size
+        self.rows = 0
+        self._writer: pq.ParquetWriter | None = None
+        self.schema: pa.Schema | None = None
+        self._chunks = 0
+
+    def write(self, df: pl.DataFrame) -> None:
+        """Append a chunk, cast to the schema of the first one."""
+        table = df.to_arrow()
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.path, table.schema)
+            self.schema = table.schema
+        table = conform_table(table, self.schema, self._chunks)
+        self._writer.write_table(table, row_group_size=self.row_group_size)
+        self.rows += df.height
+        self._chunks += 1
+
+    def close(self) -> None:
+        """Finish the file, writing an empty one if no chunk arrived."""
+        if self._writer is None:
+            pl.DataFrame().write_parquet(self.path)
+        else:
+            self._writer.close()
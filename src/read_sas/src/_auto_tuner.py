@@ -0,0 +1,300 @@
+"""Benchmark chunk sizes and process counts on a sample of a file and remember the fastest.
+
+Settings are stored per file shape (columns read, decoded row length and
+compression), so a file is tuned once and later files of a similar shape reuse
+its settings without benchmarking.
+"""
+
+from __future__ import annotations
+import dataclasses
+import json
+import math
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+from read_sas.src._config import Config
+from read_sas.src._worker_pool import available_cpus
+from read_sas.src._file_lock import FileLock, atomic_write
+from read_sas.src._read_planner import SERIAL, WITHIN_CHUNK, ReadPlan, _row_length
+from read_sas.src._sas7bdat_header import sas7bdat_header
+from read_sas.src.__format_filepath import _format_filepath
+from read_sas.src.__read_file import _read_chunks
+
+DEFAULT_TUNING_STORE = Path.home() / ".cache" / "read_sas" / "tuning.json"
+CHUNK_FRACTIONS = (1, 4, 16)
+
+
+def _bucket(n: float) -> int:
+    """Round up to a power of two, so similar files share a store entry."""
+    return int(2 ** math.ceil(math.log2(max(n, 1))))
+
+
+@dataclass(frozen=True)
+class FileShape:
+    """The layout features that decide how fast a file decodes."""
+
+    column_count: int
+    row_length: int
+    compression: str | None
+
+    @property
+    def key(self) -> str:
+        """Return the store key shared by files of a similar shape."""
+        return (
+            f"columns<={_bucket(self.column_count)}"
+            f"|row_bytes<={_bucket(self.row_length)}"
+            f"|{self.compression or 'uncompressed'}"
+        )
+
+
+@dataclass
+class TuningTrial:
+    """The throughput and memory of one chunk size and process count."""
+
+    chunk_rows: int
+    processes: int
+    rows_per_second: float
+    peak_memory_bytes: int
+
+
+@dataclass
+class TunedSettings:
+    """The winning trial, with its chunk size in decoded bytes."""
+
+    chunk_bytes: int
+    processes: int
+    rows_per_second: float
+    peak_memory_bytes: int
+    tuned_at: float
+    source: str
+
+    def to_plan(self, n_rows: int, row_length: float, shape: FileShape) -> ReadPlan:
+        """Return the read plan these settings give for a file of `n_rows` rows."""
+        chunk_size = max(min(int(self.chunk_bytes / row_length), n_rows), 1)
+        return ReadPlan(
+            chunk_size=chunk_size,
+            processes=self.processes,
+            parallelism=WITHIN_CHUNK if self.processes > 1 else SERIAL,
+            compression=shape.compression,
+            reasons=[
+                (
+                    f"Using settings tuned on {self.source} for files shaped "
+                    f"{shape.key}: {self.chunk_bytes / 1e6:.1f} MB chunks in "
+                    f"{self.processes} process(es) at "
+                    f"{self.rows_per_second:,.0f} rows/s."
+                )
+            ],
+        )
+
+
+class TuningStore:
+    """A JSON file of tuned settings keyed by file shape, shared between processes."""
+
+    def __init__(self, path: str | Path = DEFAULT_TUNING_STORE) -> None:
+        self.path = Path(path)
+
+    def load(self) -> dict[str, dict[str, Any]]:
+        """Return every stored entry."""
+        try:
+            entries: dict[str, dict[str, Any]] = json.loads(self.path.read_text())
+        except (FileNotFoundError, ValueError):
+            return {}
+        return entries
+
+    def get(self, shape: FileShape) -> TunedSettings | None:
+        """Return the settings tuned for files shaped like `shape`, if any."""
+        entry = self.load().get(shape.key)
+        return TunedSettings(**entry) if entry is not None else None
+
+    def put(self, shape: FileShape, settings: TunedSettings) -> None:
+        """Store the settings for `shape`, keeping entries written by other processes."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with FileLock(self.path.with_name(f"{self.path.name}.lock")):
+            entries = self.load()
+            entries[shape.key] = asdict(settings)
+            with atomic_write(self.path) as tmp:
+                tmp.write_text(json.dumps(entries, indent=2))
+
+
+def file_shape(
+    filepath: str | Path, n_rows: int, column_list: list[str] | str | None = None
+) -> tuple[FileShape, float]:
+    """Return the shape of the columns being read and their decoded bytes per row."""
+    filepath = _format_filepath(filepath)
+    header = sas7bdat_header(filepath)
+    row_length = _row_length(header, filepath, n_rows, column_list)
+    if column_list is None:
+        column_count = header.column_count or 1
+    else:
+        column_count = 1 if isinstance(column_list, str) else len(column_list)
+    shape = FileShape(column_count, math.ceil(row_length), header.compression)
+    return shape, row_length
+
+
+def _candidates(sample_rows: int, cpus: int) -> list[tuple[int, int]]:
+    chunk_rows = sorted({max(sample_rows // f, 1) for f in CHUNK_FRACTIONS})
+    processes = sorted({1, max(cpus // 2, 1), cpus})
+    return [(rows, p) for rows in chunk_rows for p in processes]
+
+
+def _extrapolate(
+    trial: TuningTrial, sample_rows: int, n_rows: int, budget: float
+) -> TuningTrial:
+    """Grow a trial that read the whole sample in one chunk up to the memory budget.
+
+    The sample caps the measured chunk sizes, so when reading it whole was the
+    fastest the chunk size is scaled up to the largest that fits the budget,
+    at most the file's row count. Peak memory is assumed to grow linearly
+    with the chunk size, and throughput to stay as measured.
+    """
+    if trial.chunk_rows < sample_rows or sample_rows >= n_rows:
+        return trial
+    bytes_per_row = max(trial.peak_memory_bytes, 1) / trial.chunk_rows
+    chunk_rows = min(int(budget / bytes_per_row), n_rows)
+    if chunk_rows <= trial.chunk_rows:
+        return trial
+    return dataclasses.replace(
+        trial, chunk_rows=chunk_rows, peak_memory_bytes=int(chunk_rows * bytes_per_row)
+    )
+
+
+def _run_trial(
+    filepath: Path,
+    config: Config,
+    column_list: list[str] | None,
+    offset: int,
+    limit: int,
+    chunk_rows: int,
+    processes: int,
+) -> TuningTrial:
+    """Decode the sample once, measuring throughput and peak traced memory.
+
+    Memory is traced in this process only, where each decoded chunk is
+    assembled, so it is comparable between trials rather than a total.
+    """
+    trial_config = dataclasses.replace(
+        config,
+        use_multiprocessing=processes > 1,
+        num_processes=processes,
+        decode_across_chunks=False,
+    )
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    elif hasattr(tracemalloc, "reset_peak"):
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    try:
+        rows = sum(
+            len(df)
+            for df in _read_chunks(
+                str(filepath), chunk_rows, column_list, trial_config, offset, limit
+            )
+        )
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
+    return TuningTrial(
+        chunk_rows=chunk_rows,
+        processes=processes,
+        rows_per_second=rows / max(elapsed, 1e-9),
+        peak_memory_bytes=peak,
+    )
+
+
+def tune(
+    filepath: str | Path,
+    config: Config,
+    n_rows: int,
+    column_list: list[str] | str | None = None,
+    sample_rows: int | None = None,
+) -> TunedSettings:
+    """Benchmark chunk sizes and process counts on a sample of a sas7bdat file.
+
+    The sample is taken from the middle of the file, so trials also pay the
+    cost of seeking to a row offset. It is read once before the trials so the
+    first trial does not pay for a cold page cache.
+
+    Parameters
+    ----------
+    filepath : str | Path
+        The path to the sas7bdat file.
+    config : Config
+        The ReadSas configuration. `chunk_size_in_gb` caps the peak memory of
+        the winning trial and `num_processes` the processes tried.
+        When reading the whole sample in one chunk wins, its chunk size is
+        extrapolated up to this budget, at most the whole file.
+    n_rows : int
+        The number of rows in the file.
+    column_list : list[str] | str | None
+        The columns being read, if not all of them.
+    sample_rows : int | None
+        The rows in the sample. Defaults to `config.tuning_sample_rows`.
+
+    Returns
+    -------
+    TunedSettings
+        The fastest trial that stayed within the memory budget, extrapolated
+        past the sample when the whole sample was fastest.
+    """
+    if n_rows <= 0:
+        raise ValueError(
+            f"Number of rows in file must be a positive number. Got {n_rows}."
+        )
+    filepath = _format_filepath(filepath)
+    columns = [column_list] if isinstance(column_list, str) else column_list
+    _, row_length = file_shape(filepath, n_rows, columns)
+    sample = min(sample_rows or config.tuning_sample_rows, n_rows)
+    offset = (n_rows - sample) // 2
+    cpus = config.num_processes or available_cpus()
+
+    _run_trial(filepath, config, columns, offset, sample, sample, 1)
+    trials = [
+        _run_trial(filepath, config, columns, offset, sample, chunk_rows, processes)
+        for chunk_rows, processes in _candidates(sample, cpus)
+    ]
+    for trial in trials:
+        config.logger.info(
+            f"Tuning {filepath.name}: {trial.chunk_rows} rows per chunk in "
+            f"{trial.processes} process(es) read {trial.rows_per_second:,.0f} rows/s "
+            f"with a peak of {trial.peak_memory_bytes / 1e6:.1f} MB."
+        )
+
+    budget = config.chunk_size_in_gb * 1_000_000_000
+    within_budget = [t for t in trials if t.peak_memory_bytes <= budget] or trials
+    best = _extrapolate(
+        max(within_budget, key=lambda t: t.rows_per_second), sample, n_rows, budget
+    )
+    return TunedSettings(
+        chunk_bytes=int(best.chunk_rows * row_length),
+        processes=best.processes,
+        rows_per_second=best.rows_per_second,
+        peak_memory_bytes=best.peak_memory_bytes,
+        tuned_at=time.time(),
+        source=str(filepath),
+    )
+
+
+def auto_tuned_plan(
+    filepath: str | Path,
+    config: Config,
+    n_rows: int,
+    column_list: list[str] | str | None = None,
+) -> ReadPlan:
+    """Plan a read from the settings stored for the file's shape, tuning it first if needed."""
+    filepath = _format_filepath(filepath)
+    store = TuningStore(config.tuning_store or DEFAULT_TUNING_STORE)
+    shape, row_length = file_shape(filepath, n_rows, column_list)
+    settings = store.get(shape)
+    if settings is None:
+        config.logger.info(f"No tuned settings for files shaped {shape.key}. Tuning.")
+        settings = tune(filepath, config, n_rows, column_list)
+        store.put(shape, settings)
+    plan = settings.to_plan(n_rows, row_length, shape)
+    for reason in plan.reasons:
+        config.logger.info(f"Read plan for {filepath.name}: {reason}")
+    return plan
@@ -0,0 +1,235 @@
+"""Bound the `temp__{stem}` folders kept under `Config.temp_dir_parent`.
+
+Entries are evicted when they have not been used for longer than the TTL and
+then, least recently used first, until the cache fits its maximum size. Pinned
+entries are never evicted.
+"""
+
+from __future__ import annotations
+import logging
+import shutil
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+from read_sas.src._config import Config
+from read_sas.src._file_lock import is_lock_stale
+
+ENTRY_PREFIX = "temp__"
+ACCESS_MARKER = ".last_access"
+PIN_MARKER = ".pinned"
+
+
+@dataclass
+class CacheEntry:
+    """A cached conversion folder."""
+
+    path: Path
+    size_bytes: int
+    last_access: float
+    pinned: bool
+
+    @property
+    def name(self) -> str:
+        return self.path.name
+
+    def age_seconds(self, now: float | None = None) -> float:
+        """Return the time since the entry was last used."""
+        return (now if now is not None else time.time()) - self.last_access
+
+
+def _folder_size(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+def _last_access(path: Path) -> float:
+    """Return when an entry was last used, falling back to its newest file."""
+    marker = path / ACCESS_MARKER
+    if marker.exists():
+        return marker.stat().st_mtime
+    times = [f.stat().st_mtime for f in path.rglob("*") if f.is_file()]
+    return max(times, default=path.stat().st_mtime)
+
+
+class CacheManager:
+    """Size-, age- and LRU-bounded eviction for converted files.
+
+    Parameters
+    ----------
+    root : str | Path
+        The folder holding the `temp__{stem}` entries.
+    max_size_in_gb : float | None
+        The maximum total size of the entries. None leaves the size unbounded.
+    ttl_in_days : float | None
+        Evict entries unused for longer than this. None keeps entries forever.
+    logger : logging.Logger | None
+        Where evictions are logged.
+    lock_stale_seconds : float
+        Entries holding a lock refreshed more recently than this are in use
+        and never evicted.
+    """
+
+    def __init__(
+        self,
+        root: str | Path,
+        max_size_in_gb: float | None = None,
+        ttl_in_days: float | None = None,
+        logger: logging.Logger | None = None,
+        lock_stale_seconds: float = 300.0,
+    ) -> None:
+        if max_size_in_gb is not None and max_size_in_gb < 0:
+            raise ValueError(
+                f"Maximum cache size must not be negative. Got {max_size_in_gb}."
+            )
+        if ttl_in_days is not None and ttl_in_days < 0:
+            raise ValueError(f"Cache TTL must not be negative. Got {ttl_in_days}.")
+        self.root = Path(root)
+        self.max_size_bytes = (
+            int(max_size_in_gb * 1_000_000_000) if max_size_in_gb is not None else None
+        )
+        self.ttl_seconds = ttl_in_days * 86_400 if ttl_in_days is not None else None
+        self.logger = logger or logging.getLogger(__name__)
+        self.lock_stale_seconds = lock_stale_seconds
+
+    @classmethod
+    def from_config(cls, config: Config) -> CacheManager:
+        """Build the cache manager described by a ReadSas configuration."""
+        return cls(
+            config.temp_dir_parent,
+            max_size_in_gb=config.cache_max_size_in_gb,
+            ttl_in_days=config.cache_ttl_in_days,
+            logger=config.logger,
+            lock_stale_seconds=config.lock_stale_seconds,
+        )
+
+    def _entry_path(self, name: str) -> Path:
+        path = self.root / (
+            name if name.startswith(ENTRY_PREFIX) else ENTRY_PREFIX + name
+        )
+        if not path.is_dir():
+            raise ValueError(f"No cache entry named {name} in {self.root}.")
+        return path
+
+    def entries(self) -> list[CacheEntry]:
+        """Return the cache entries, least recently used first."""
+        if not self.root.is_dir():
+            return []
+        entries = [
+            CacheEntry(
+                path=path,
+                size_bytes=_folder_size(path),
+                last_access=_last_access(path),
+                pinned=(path / PIN_MARKER).exists(),
+            )
+            for path in self.root.iterdir()
+            if path.is_dir() and path.name.startswith(ENTRY_PREFIX)
+        ]
+        return sorted(entries, key=lambda e: e.last_access)
+
+    def is_in_use(self, path: Path) -> bool:
+        """Return True if another process holds a live lock inside the entry."""
+        return any(
+            is_lock_stale(lock, self.lock_stale_seconds) is None
+            for lock in path.glob("*.lock")
+        )
+
+    def touch(self, path: str | Path) -> None:
+        """Record that an entry folder was just used."""
+        path = Path(path)
+        if path.is_dir():
+            (path / ACCESS_MARKER).touch()
+
+    def pin(self, name: str) -> Path:
+        """Protect an entry from eviction."""
+        path = self._entry_path(name)
+        (path / PIN_MARKER).touch()
+        return path
+
+    def unpin(self, name: str) -> Path:
+        """Allow an entry to be evicted again."""
+        path = self._entry_path(name)
+        (path / PIN_MARKER).unlink(missing_ok=True)
+        return path
+
+    def prune(
+        self,
+        reserve_bytes: int = 0,
+        exclude: str | Path | None = None,
+        dry_run: bool = False,
+    ) -> list[CacheEntry]:
+        """Evict expired entries, then the least recently used until the cache fits.
+
+        Parameters
+        ----------
+        reserve_bytes : int
+            Space to leave free under the maximum size for a write about to happen.
+        exclude : str | Path | None
+            An entry folder that must not be evicted, such as the one being written.
+        dry_run : bool
+            Return the entries that would be evicted without removing them.
+
+        Returns
+        -------
+        list[CacheEntry]
+            The evicted entries.
+        """
+        now = time.time()
+        excluded = Path(exclude).resolve() if exclude is not None else None
+        entries = self.entries()
+        candidates = [
+            e
+            for e in entries
+            if not e.pinned
+            and (excluded is None or e.path.resolve() != excluded)
+            and not self.is_in_use(e.path)
+        ]
+        total = sum(e.size_bytes for e in entries)
+
+        evicted = []
+        if self.ttl_seconds is not None:
+            expired = [e for e in candidates if e.age_seconds(now) > self.ttl_seconds]
+            for entry in expired:
+                self.logger.info(
+                    f"Evicting {entry.path}: unused for "
+                    f"{entry.age_seconds(now) / 86_400:.1f} days."
+                )
+                evicted.append(entry)
+                total -= entry.size_bytes
+            candidates = [e for e in candidates if e not in expired]
+
+        if self.max_size_bytes is not None:
+            for entry in candidates:
+                if total + reserve_bytes <= self.max_size_bytes:
+                    break
+                self.logger.info(
+                    f"Evicting {entry.path}: cache holds {total / 1e9:.2f} GB, "
+                    f"above the {self.max_size_bytes / 1e9:.2f} GB limit."
+                )
+                evicted.append(entry)
+                total -= entry.size_bytes
+            if total + reserve_bytes > self.max_size_bytes:
+                self.logger.warning(
+                    f"Cache still holds {total / 1e9:.2f} GB after eviction; the "
+                    "rest is pinned or in use."
+                )
+
+        if not dry_run:
+            for entry in evicted:
+                shutil.rmtree(entry.path, ignore_errors=True)
+        return evicted
+
+    def stats(self) -> dict[str, Any]:
+        """Return a summary of the cache."""
+        entries = self.entries()
+        now = time.time()
+        return {
+            "root": str(self.root),
+            "entries": len(entries),
+            "pinned": sum(e.pinned for e in entries),
+            "total_bytes": sum(e.size_bytes for e in entries),
+            "max_size_bytes": self.max_size_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "oldest_access_age_seconds": entries[0].age_seconds(now)
+            if entries
+            else None,
+        }
@@ -0,0 +1,128 @@
+"""Built-in chunk transforms applied before the user's formatter."""
+
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, Callable
+import polars as pl
+from read_sas.src._config import Config
+from read_sas.src._sas7bdat_metadata import sas7bdat_metadata
+from read_sas.src._sas_dates import SasDateConverter
+from read_sas.src._sas_strings import SasStringCleaner
+from read_sas.src._value_labels import SasValueLabeler, read_format_catalog
+
+ChunkTransform = Callable[[pl.LazyFrame], pl.LazyFrame]
+
+
+class ChunkTransforms:
+    """Apply built-in transforms to a chunk, then the user's formatter.
+
+    Instances are picklable when every step and the formatter are, so they can
+    be passed anywhere a formatter is accepted, including the formatter pool.
+
+    Parameters
+    ----------
+    steps : list[ChunkTransform]
+        The built-in transforms, applied in order.
+    formatter : ChunkTransform | None
+        The user's formatter, applied last.
+    """
+
+    def __init__(
+        self, steps: list[ChunkTransform], formatter: ChunkTransform | None = None
+    ) -> None:
+        self.steps = list(steps)
+        self.formatter = formatter
+
+    def __call__(self, lf: pl.LazyFrame) -> pl.LazyFrame:
+        for step in self.steps:
+            lf = step(lf)
+        return self.formatter(lf) if self.formatter is not None else lf
+
+    def __repr__(self) -> str:
+        return f"ChunkTransforms({self.steps!r}, formatter={self.formatter!r})"
+
+
+def output_options(config: Config) -> dict[str, Any]:
+    """Return the options of `config` that change the values read from a file."""
+    options: dict[str, Any] = {
+        "convert_dates": config.convert_dates,
+        "trim_strings": config.trim_strings,
+        "empty_strings_as_null": config.empty_strings_as_null,
+        "encoding": config.encoding,
+        "invalid_bytes": config.invalid_bytes,
+    }
+    if config.special_missing:
+        options["special_missing"] = config.special_missing_columns or True
+    if config.format_catalog is not None:
+        # editing the catalog changes the labels
+        catalog = Path(config.format_catalog)
+        options["format_catalog"] = [
+            str(catalog),
+            catalog.stat().st_mtime_ns if catalog.exists() else None,
+        ]
+    return options
+
+
+def _date_steps(meta: Any, config: Config) -> list[ChunkTransform]:  # noqa: ANN401
+    if not config.convert_dates:
+        return []
+    converter = SasDateConverter.from_metadata(meta)
+    if not converter.columns:
+        return []
+    config.logger.info(
+        f"Converting {len(converter.columns)} SAS date, datetime and time columns."
+    )
+    return [converter]
+
+
+def _string_steps(meta: Any, config: Config) -> list[ChunkTransform]:  # noqa: ANN401
+    if not (config.trim_strings or config.empty_strings_as_null):
+        return []
+    cleaner = SasStringCleaner.from_metadata(
+        meta, trim=config.trim_strings, empty_as_null=config.empty_strings_as_null
+    )
+    return [cleaner] if cleaner.columns else []
+
+
+def _label_steps(meta: Any, config: Config) -> list[ChunkTransform]:  # noqa: ANN401
+    if config.format_catalog is None:
+        return []
+    labeler = SasValueLabeler.from_metadata(
+        meta, read_format_catalog(config.format_catalog)
+    )
+    if not labeler.columns:
+        return []
+    config.logger.info(
+        f"Labelling {len(labeler.columns)} columns from {config.format_catalog}."
+    )
+    return [labeler]
+
+
+def build_chunk_transforms(
+    filepath: str | Path,
+    config: Config,
+    column_list: list[str] | str | None = None,
+    formatter: ChunkTransform | None = None,
+) -> ChunkTransform | None:
+    """Compose the built-in transforms enabled in `config` with `formatter`.
+
+    The file's metadata is read only when a transform is enabled, and
+    `formatter` is returned unchanged when no transform applies.
+    """
+    if not (
+        config.convert_dates
+        or config.trim_strings
+        or config.empty_strings_as_null
+        or config.format_catalog is not None
+    ):
+        return formatter
+    columns = [column_list] if isinstance(column_list, str) else column_list
+    meta = sas7bdat_metadata(filepath, columns)
+    steps = (
+        _date_steps(meta, config)
+        + _string_steps(meta, config)
+        + _label_steps(meta, config)
+    )
+    if not steps:
+        return formatter
+    return ChunkTransforms(steps, formatter)
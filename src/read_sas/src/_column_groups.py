@@ -0,0 +1,90 @@
+"""Split the columns of very wide tables into groups decoded in parallel.
+
+For a table with thousands of columns, decoding a chunk is dominated by
+converting every column of every row, and splitting the rows across workers
+still leaves each worker converting every column. Splitting the columns
+instead gives each worker a group of columns to convert over all the chunk's
+rows, and the groups are joined side by side once every worker has finished.
+"""
+
+from __future__ import annotations
+from pathlib import Path
+import pyreadstat
+from read_sas.src._config import Config
+from read_sas.src._worker_pool import available_cpus
+
+
+def split_columns(widths: dict[str, int], n_groups: int) -> list[list[str]]:
+    """Split columns, in order, into up to `n_groups` groups of about equal width.
+
+    Parameters
+    ----------
+    widths : dict[str, int]
+        The stored bytes of each column, in file order.
+    n_groups : int
+        The number of groups to split the columns into.
+
+    Returns
+    -------
+    list[list[str]]
+        Contiguous, non-empty groups covering every column, one per group
+        unless there are fewer columns than groups.
+    """
+    if n_groups <= 0:
+        raise ValueError(
+            f"Number of column groups must be a positive number. Got {n_groups}."
+        )
+    n_groups = min(n_groups, len(widths))
+    total = sum(max(width, 1) for width in widths.values())
+    groups: list[list[str]] = [[]]
+    cumulative = 0
+    for i, (column, stored) in enumerate(widths.items()):
+        width = max(stored, 1)
+        groups_left = n_groups - len(groups)
+        past_boundary = cumulative + width / 2 > total * len(groups) / n_groups
+        # start a new group at the boundary, or when every column left needs one
+        if (
+            groups[-1]
+            and groups_left
+            and (past_boundary or len(widths) - i <= groups_left)
+        ):
+            groups.append([])
+        groups[-1].append(column)
+        cumulative += width
+    return [group for group in groups if group]
+
+
+def wide_column_groups(
+    filepath: str | Path, column_list: list[str] | str | None, config: Config
+) -> list[list[str]] | None:
+    """Return the column groups to decode in parallel if the table is wide enough.
+
+    A table is wide when its column count times its stored row width reaches
+    `config.wide_table_threshold`. Narrow tables, single-process reads and
+    a threshold of None return None, and rows are split across workers instead.
+    """
+    processes = config.num_processes or available_cpus()
+    if config.wide_table_threshold is None or processes <= 1:
+        return None
+    _, meta = pyreadstat.read_sas7bdat(str(filepath), metadataonly=True)
+    selected = (
+        None
+        if column_list is None
+        else {column_list}
+        if isinstance(column_list, str)
+        else set(column_list)
+    )
+    widths = {
+        column: int(meta.variable_storage_width.get(column) or 8)
+        for column in meta.column_names
+        if selected is None or column in selected
+    }
+    row_width = sum(widths.values())
+    if len(widths) < 2 or len(widths) * row_width < config.wide_table_threshold:
+        return None
+    groups = split_columns(widths, processes)
+    config.logger.info(
+        f"{Path(filepath).name} has {len(widths)} columns of {row_width} bytes per "
+        f"row, so each chunk is decoded as {len(groups)} column groups in parallel."
+    )
+    return groups
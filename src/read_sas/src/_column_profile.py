@@ -0,0 +1,331 @@
+"""Incremental per-column statistics built from mergeable sketches.
+
+Every sketch here can be updated one chunk at a time and merged with a sketch
+built from other chunks, so a profile costs one extra vectorized pass over each
+chunk while it is already in memory.
+"""
+
+from __future__ import annotations
+import json
+import math
+from pathlib import Path
+from typing import Any
+import numpy as np
+import polars as pl
+
+PROFILE_QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+HASH_SEED = 0x5EED
+
+
+def _bit_length(values: np.ndarray) -> np.ndarray:
+    """Return the exact bit length of each unsigned 64-bit integer."""
+    high = (values >> np.uint64(32)).astype(np.float64)
+    low = (values & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    # frexp is exact for 32-bit values, where a direct uint64 -> float64 cast is not
+    _, high_exp = np.frexp(high)
+    _, low_exp = np.frexp(low)
+    return np.where(high > 0, 32 + high_exp, low_exp)
+
+
+class HyperLogLog:
+    """Approximate distinct counter with a relative error of about 1.04 / sqrt(2**precision)."""
+
+    def __init__(self, precision: int = 12) -> None:
+        if not 4 <= precision <= 18:
+            raise ValueError(f"Precision must be between 4 and 18. Got {precision}.")
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def update(self, values: pl.Series) -> None:
+        """Add the non-null values of a series."""
+        values = values.drop_nulls()
+        if values.len() == 0:
+            return
+        self.update_hashes(values.hash(seed=HASH_SEED).to_numpy())
+
+    def update_hashes(self, hashes: np.ndarray) -> None:
+        """Add values that have already been hashed to unsigned 64-bit integers."""
+        p = np.uint64(self.precision)
+        hashes = hashes.astype(np.uint64, copy=False)
+        index = (hashes >> (np.uint64(64) - p)).astype(np.intp)
+        remainder = hashes << p
+        rank = np.where(
+            remainder == 0, 64 - self.precision + 1, 64 - _bit_length(remainder) + 1
+        ).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other: HyperLogLog) -> HyperLogLog:
+        """Fold another sketch of the same precision into this one."""
+        if other.precision != self.precision:
+            raise ValueError(
+                f"Cannot merge sketches of precision {self.precision} and {other.precision}."
+            )
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self) -> int:
+        """Return the estimated number of distinct values."""
+        m = float(self.registers.size)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros > 0:
+            return round(m * math.log(m / zeros))
+        return round(float(raw))
+
+
+class TDigest:
+    """Approximate quantiles from a compressed set of weighted centroids.
+
+    Compression uses the k1 scale function, which keeps centroids small near
+    the tails so extreme quantiles stay accurate. Both updates and merges are
+    vectorized: centroids are sorted, assigned to integer buckets of the scale
+    function and reduced with `np.bincount`.
+    """
+
+    def __init__(self, compression: float = 200.0) -> None:
+        self.compression = compression
+        self.means = np.empty(0, dtype=np.float64)
+        self.weights = np.empty(0, dtype=np.float64)
+        self.min = math.inf
+        self.max = -math.inf
+
+    @property
+    def count(self) -> float:
+        """Return the total weight added to the digest."""
+        return float(self.weights.sum())
+
+    def update(self, values: np.ndarray) -> None:
+        """Add a batch of values, ignoring NaNs."""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self._compress(
+            np.concatenate([self.means, values]),
+            np.concatenate([self.weights, np.ones(values.size)]),
+        )
+
+    def merge(self, other: TDigest) -> TDigest:
+        """Fold another digest into this one."""
+        if other.weights.size == 0:
+            return self
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress(
+            np.concatenate([self.means, other.means]),
+            np.concatenate([self.weights, other.weights]),
+        )
+        return self
+
+    def _compress(self, means: np.ndarray, weights: np.ndarray) -> None:
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order], weights[order]
+        total = weights.sum()
+        q_left = (np.cumsum(weights) - weights) / total
+        scale = self.compression / (2 * math.pi)
+        k = scale * np.arcsin(2 * q_left - 1)
+        bucket = np.floor(k - k[0]).astype(np.intp)
+        bucket_weights = np.bincount(bucket, weights=weights)
+        bucket_sums = np.bincount(bucket, weights=means * weights)
+        keep = bucket_weights > 0
+        self.means = bucket_sums[keep] / bucket_weights[keep]
+        self.weights = bucket_weights[keep]
+
+    def quantile(self, q: float) -> float | None:
+        """Return the estimated value at quantile `q`."""
+        if self.weights.size == 0:
+            return None
+        if not 0.0 <= q <= 1.0:
+            raise ValueError(f"Quantile must be between 0 and 1. Got {q}.")
+        total = self.weights.sum()
+        centers = np.cumsum(self.weights) - self.weights / 2
+        positions = np.concatenate([[0.0], centers, [total]])
+        values = np.concatenate([[self.min], self.means, [self.max]])
+        return float(np.interp(q * total, positions, values))
+
+
+class ColumnProfile:
+    """Running statistics for a single column."""
+
+    def __init__(self, name: str, dtype: pl.DataType) -> None:
+        self.name = name
+        self.dtype = dtype
+        self.count = 0
+        self.null_count = 0
+        self.min: Any = None
+        self.max: Any = None
+        self.sum = 0.0
+        self.sum_of_squares = 0.0
+        self.distinct = HyperLogLog()
+        self.digest: TDigest | None = TDigest() if dtype.is_numeric() else None
+        self.is_string = dtype == pl.String
+        self.length_min: int | None = None
+        self.length_max: int | None = None
+        self.length_sum = 0
+
+    @property
+    def has_order(self) -> bool:
+        """Return True if min and max are meaningful for the column's type."""
+        return (
+            self.dtype.is_numeric()
+            or self.dtype.is_temporal()
+            or self.dtype in (pl.String, pl.Boolean)
+        )
+
+    def update(self, series: pl.Series, summary: dict[str, Any]) -> None:
+        """Add a chunk of the column, using aggregates already computed for it."""
+        self.count += series.len()
+        self.null_count += summary["null_count"]
+        if self.has_order:
+            self.min = _fold(min, self.min, summary["min"])
+            self.max = _fold(max, self.max, summary["max"])
+        if self.digest is not None:
+            values = series.drop_nulls().cast(pl.Float64).to_numpy()
+            values = values[np.isfinite(values)]
+            self.digest.update(values)
+            self.sum += float(values.sum())
+            self.sum_of_squares += float(np.square(values).sum())
+        if self.is_string and summary["length_max"] is not None:
+            self.length_min = _fold(min, self.length_min, summary["length_min"])
+            self.length_max = _fold(max, self.length_max, summary["length_max"])
+            self.length_sum += summary["length_sum"]
+        self.distinct.update(series)
+
+    def merge(self, other: ColumnProfile) -> ColumnProfile:
+        """Fold the statistics of the same column from other chunks into this one."""
+        self.count += other.count
+        self.null_count += other.null_count
+        self.min = _fold(min, self.min, other.min)
+        self.max = _fold(max, self.max, other.max)
+        self.sum += other.sum
+        self.sum_of_squares += other.sum_of_squares
+        self.distinct.merge(other.distinct)
+        if self.digest is not None and other.digest is not None:
+            self.digest.merge(other.digest)
+        self.length_min = _fold(min, self.length_min, other.length_min)
+        self.length_max = _fold(max, self.length_max, other.length_max)
+        self.length_sum += other.length_sum
+        return self
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the column statistics as plain values."""
+        non_null = self.count - self.null_count
+        out: dict[str, Any] = {
+            "dtype": str(self.dtype),
+            "count": self.count,
+            "null_count": self.null_count,
+            "distinct_count": self.distinct.estimate(),
+        }
+        if self.has_order:
+            out["min"] = self.min
+            out["max"] = self.max
+        if self.digest is not None and self.digest.count > 0:
+            n = self.digest.count
+            mean = self.sum / n
+            variance = max(self.sum_of_squares / n - mean * mean, 0.0)
+            out["mean"] = mean
+            out["std"] = math.sqrt(variance * n / (n - 1)) if n > 1 else 0.0
+            out["quantiles"] = {
+                str(q): self.digest.quantile(q) for q in PROFILE_QUANTILES
+            }
+        if self.is_string:
+            out["length"] = {
+                "min": self.length_min,
+                "max": self.length_max,
+                "mean": self.length_sum / non_null if non_null else None,
+            }
+        return out
+
+
+def _fold(func: Any, current: Any, new: Any) -> Any:  # noqa: ANN401
+    if new is None:
+        return current
+    if current is None:
+        return new
+    return func(current, new)
+
+
+class DataProfiler:
+    """Accumulate a profile of every column as chunks flow through the reader."""
+
+    def __init__(self) -> None:
+        self.n_rows = 0
+        self.n_chunks = 0
+        self.columns: dict[str, ColumnProfile] = {}
+
+    def update(self, df: pl.DataFrame) -> None:
+        """Add a chunk to the profile."""
+        for name, dtype in df.schema.items():
+            if name not in self.columns:
+                self.columns[name] = ColumnProfile(name, dtype)
+
+        summaries = df.select(self._summary_expressions(df)).row(0, named=True)
+        for name in df.columns:
+            self.columns[name].update(
+                df.get_column(name),
+                {
+                    key: summaries.get(f"{name}\x00{key}")
+                    for key in (
+                        "null_count",
+                        "min",
+                        "max",
+                        "length_min",
+                        "length_max",
+                        "length_sum",
+                    )
+                },
+            )
+        self.n_rows += df.height
+        self.n_chunks += 1
+
+    def _summary_expressions(self, df: pl.DataFrame) -> list[pl.Expr]:
+        """Build one select that computes every per-chunk aggregate at once."""
+        exprs = []
+        for name in df.columns:
+            column = self.columns[name]
+            col = pl.col(name)
+            exprs.append(col.null_count().alias(f"{name}\x00null_count"))
+            if column.has_order:
+                exprs.append(col.min().alias(f"{name}\x00min"))
+                exprs.append(col.max().alias(f"{name}\x00max"))
+            if column.is_string:
+                length = col.str.len_chars()
+                exprs.append(length.min().alias(f"{name}\x00length_min"))
+                exprs.append(length.max().alias(f"{name}\x00length_max"))
+                exprs.append(length.sum().alias(f"{name}\x00length_sum"))
+        return exprs
+
+    def merge(self, other: DataProfiler) -> DataProfiler:
+        """Fold a profile of other chunks of the same table into this one."""
+        for name, column in other.columns.items():
+            if name in self.columns:
+                self.columns[name].merge(column)
+            else:
+                self.columns[name] = column
+        self.n_rows += other.n_rows
+        self.n_chunks += other.n_chunks
+        return self
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the profile as plain values."""
+        return {
+            "n_rows": self.n_rows,
+            "n_chunks": self.n_chunks,
+            "columns": {name: c.to_dict() for name, c in self.columns.items()},
+        }
+
+
+def write_profile(profile: dict[str, Any], filepath: str | Path) -> Path:
+    """Write a profile to a JSON sidecar, stringifying dates and other non-JSON values."""
+    filepath = Path(filepath)
+    filepath.write_text(json.dumps(profile, indent=2, default=str))
+    return filepath
+
+
+def read_profile(filepath: str | Path) -> dict[str, Any]:
+    """Read a profile written by `write_profile`."""
+    profile: dict[str, Any] = json.loads(Path(filepath).read_text())
+    return profile
@@ -1,5 +1,5 @@
 from __future__ import annotations
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
 import logging
 from read_sas.src._logger import logger
@@ -17,3 +17,46 @@ class Config:
     disable_datetime_conversion: bool = True
     use_multiprocessing: bool = True
     num_processes: int | None = None
+    use_pipeline: bool = False
+    pipeline_queue_size: int = 2
+    pipeline_workers: dict[str, int] = field(default_factory=dict)
+    formatter_processes: int | None = None
+    profile_columns: bool = False
+    parquet_row_group_size: int | None = None
+    plan_reads: bool = False
+    decode_across_chunks: bool = False
+    cache_max_size_in_gb: float | None = None
+    cache_ttl_in_days: float | None = None
+    reuse_published: bool = True
+    lock_timeout_seconds: float | None = None
+    lock_stale_seconds: float = 300.0
+    log_file: Path | None = Path("read_sas.log")
+    chunk_events_path: Path | None = None
+    convert_dates: bool = False
+    trim_strings: bool = False
+    empty_strings_as_null: bool = False
+    encoding: str | None = None
+    invalid_bytes: str = "error"
+    quarantine_dir: Path | None = None
+    auto_tune: bool = False
+    tuning_store: Path | None = None
+    tuning_sample_rows: int = 100_000
+    reuse_worker_pool: bool = True
+    read_ahead: str | None = None
+    read_ahead_chunks: int = 2
+    io_block_size_mb: int = 64
+    io_threads: int = 4
+    staging_dir: Path | None = None
+    track_memory: bool = False
+    memory_limit_gb: float | None = None
+    spill_budget_gb: float | None = None
+    spill_dir: Path | None = None
+    sort_by: list[str] | None = None
+    sort_descending: bool = False
+    sort_budget_gb: float = 1.0
+    wide_table_threshold: int | None = 10_000_000
+    shared_registry_dir: Path | None = None
+    shared_registry_max_gb: float | None = None
+    format_catalog: Path | None = None
+    special_missing: bool = False
+    special_missing_columns: list[str] | None = None
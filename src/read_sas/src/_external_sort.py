@@ -0,0 +1,323 @@
+"""Sort a SAS file by key columns in bounded memory, into a sorted Parquet file.
+
+Decoded chunks are gathered until they pass half the sort budget, sorted
+together and written as a run: an uncompressed Arrow IPC file. The runs are
+then merged k ways. Each run contributes a slice at a time, the slices are
+sorted together, and the rows up to the smallest last key among the slices are
+written, since no row still to be read from any run can sort before it. Memory
+is bounded by the budget rather than by the table, and each row group of the
+output covers a contiguous key range, so its min/max statistics prune well.
+"""
+
+from __future__ import annotations
+import logging
+import shutil
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable
+import polars as pl
+from read_sas.src._arrow_tables import ParquetSink
+from read_sas.src._config import Config
+from read_sas.src.__format_filepath import _format_filepath
+from read_sas.src._memory import GB, sample_memory
+from read_sas.src._sas_reader import decoded_chunks
+
+ROW_GROUP_BYTES = 128 * 1024**2
+MIN_MERGE_ROWS = 1_024
+_RUN = "__run"
+_LAST = "__last"
+
+
+@dataclass
+class _Run:
+    """A sorted run on disk and the slice of it waiting to be merged."""
+
+    path: Path
+    rows: int
+    offset: int = 0
+    buffer: pl.DataFrame | None = None
+
+    @property
+    def exhausted(self) -> bool:
+        return (self.buffer is None or self.buffer.is_empty()) and (
+            self.offset >= self.rows
+        )
+
+    def refill(self, n_rows: int) -> pl.DataFrame:
+        """Read the next slice of the run once the previous one is merged, and return it."""
+        if (self.buffer is None or self.buffer.is_empty()) and self.offset < self.rows:
+            # uncompressed IPC is memory-mapped, so only the slice is read
+            self.buffer = pl.scan_ipc(self.path).slice(self.offset, n_rows).collect()
+            self.offset += self.buffer.height
+        return self.buffer if self.buffer is not None else pl.DataFrame()
+
+
+class ExternalSorter:
+    """Sort chunks by key columns, spilling sorted runs to disk past a budget.
+
+    Parameters
+    ----------
+    by : list[str]
+        The sort key columns.
+    budget_bytes : int
+        The bytes of rows held in memory while sorting and merging.
+    descending : bool
+        Sort every key column in descending order.
+    run_dir : str | Path | None
+        The folder the run folder is made in. Defaults to the system temp
+        folder.
+    logger : logging.Logger | None
+        Where runs and merges are logged.
+    """
+
+    def __init__(
+        self,
+        by: list[str],
+        budget_bytes: int,
+        descending: bool = False,
+        run_dir: str | Path | None = None,
+        logger: logging.Logger | None = None,
+    ) -> None:
+        if not by:
+            raise ValueError("At least one sort column is required.")
+        if budget_bytes <= 0:
+            raise ValueError(
+                f"Sort budget must be a positive number. Got {budget_bytes}."
+            )
+        self.by = list(by)
+        self.budget_bytes = budget_bytes
+        self.descending = descending
+        self.run_dir = Path(run_dir) if run_dir is not None else None
+        self.logger = logger or logging.getLogger(__name__)
+        self.folder: Path | None = None
+        self.runs: list[_Run] = []
+        self._pending: list[pl.DataFrame] = []
+        self._pending_bytes = 0
+        self.rows = 0
+        self.run_bytes = 0
+        self.merge_rows: int | None = None
+
+    def _sort(self, df: pl.DataFrame) -> pl.DataFrame:
+        return df.sort(self.by, descending=self.descending, maintain_order=True)
+
+    def add(self, df: pl.DataFrame) -> None:
+        """Keep a chunk, writing the chunks kept as a sorted run past half the budget.
+
+        Sorting a run copies it, so a run is at most half the budget.
+        """
+        self._pending.append(df)
+        self._pending_bytes += int(df.estimated_size())
+        self.rows += df.height
+        if self._pending_bytes >= self.budget_bytes // 2:
+            self._spill()
+
+    def _take_pending(self) -> pl.DataFrame:
+        df = self._sort(pl.concat(self._pending, how="vertical_relaxed"))
+        self._pending = []
+        self._pending_bytes = 0
+        sample_memory("sort_run")
+        return df
+
+    def _spill(self) -> None:
+        if not self._pending:
+            return
+        if self.folder is None:
+            if self.run_dir is not None:
+                self.run_dir.mkdir(parents=True, exist_ok=True)
+            self.folder = Path(tempfile.mkdtemp(prefix="sort_", dir=self.run_dir))
+        df = self._take_pending()
+        path = self.folder / f"run_{len(self.runs):06d}.arrow"
+        # uncompressed so the merge can memory-map slices of the run
+        df.write_ipc(path, compression="uncompressed")
+        self.runs.append(_Run(path, df.height))
+        self.run_bytes += int(df.estimated_size())
+        self.logger.debug(f"Wrote sorted run of {df.height} rows to {path}.")
+
+    def _row_bytes(self) -> int:
+        return max(1, self.run_bytes // max(1, sum(run.rows for run in self.runs)))
+
+    def write(self, path: str | Path, row_group_size: int | None = None) -> int:
+        """Write every row kept, sorted, to a Parquet file and return the row count.
+
+        Parameters
+        ----------
+        path : str | Path
+            The Parquet file to write.
+        row_group_size : int | None
+            The rows per row group. Defaults to about 128 MB of rows, capped
+            at a quarter of the budget.
+        """
+        path = Path(path)
+        if not self.runs:
+            # everything fit in one run, so there is nothing to merge
+            df = self._take_pending() if self._pending else pl.DataFrame()
+            df.write_parquet(path, row_group_size=row_group_size)
+            return df.height
+
+        self._spill()
+        row_bytes = self._row_bytes()
+        if row_group_size is None:
+            row_group_size = max(
+                MIN_MERGE_ROWS,
+                min(ROW_GROUP_BYTES, self.budget_bytes // 4) // row_bytes,
+            )
+        # the slices and their sorted copy share the other half of the budget
+        self.merge_rows = max(
+            MIN_MERGE_ROWS, self.budget_bytes // (4 * len(self.runs) * row_bytes)
+        )
+        sink = ParquetSink(path, row_group_size)
+        try:
+            self._merge(sink, row_group_size)
+        finally:
+            sink.close()
+        return sink.rows
+
+    def _merge(self, sink: ParquetSink, row_group_size: int) -> None:
+        pending: list[pl.DataFrame] = []
+        pending_rows = 0
+
+        def emit(df: pl.DataFrame, final: bool = False) -> None:
+            nonlocal pending, pending_rows
+            if not df.is_empty():
+                pending.append(df)
+                pending_rows += df.height
+            if pending_rows < row_group_size and not (final and pending_rows):
+                return
+            rows = pl.concat(pending, how="vertical_relaxed")
+            full = (
+                rows.height if final else rows.height // row_group_size * row_group_size
+            )
+            sink.write(rows.head(full))
+            pending = [rows.slice(full)] if full < rows.height else []
+            pending_rows = rows.height - full
+            sample_memory("sort_merge")
+
+        merge_rows = self.merge_rows or MIN_MERGE_ROWS
+        while True:
+            live = [run for run in self.runs if not run.exhausted]
+            if not live:
+                break
+            buffers = [run.refill(merge_rows) for run in live]
+            if len(live) == 1:
+                emit(buffers[0])
+                live[0].buffer = None
+                continue
+            frame = pl.concat(
+                [
+                    buffer.with_columns(
+                        pl.lit(k, pl.UInt32).alias(_RUN),
+                        (pl.int_range(pl.len()) == pl.len() - 1).alias(_LAST),
+                    )
+                    for k, buffer in enumerate(buffers)
+                ],
+                how="vertical_relaxed",
+            )
+            # the run whose slice ends first bounds what can be written now
+            frontier = self._sort(frame.filter(pl.col(_LAST)))[_RUN][0]
+            merged = self._sort(frame)
+            cutoff = (
+                merged.select((pl.col(_RUN) == frontier) & pl.col(_LAST))
+                .to_series()
+                .arg_true()[0]
+            )
+            emit(merged.head(cutoff + 1).drop(_RUN, _LAST))
+            rest = merged.slice(cutoff + 1)
+            parts = rest.partition_by(_RUN, as_dict=True, include_key=False)
+            for k, run in enumerate(live):
+                part = parts.get((k,))
+                run.buffer = part.drop(_LAST) if part is not None else None
+        emit(pl.DataFrame(), final=True)
+
+    def stats(self) -> dict[str, Any]:
+        """Return how the sort was split into runs and merged."""
+        return {
+            "rows": self.rows,
+            "runs": len(self.runs),
+            "run_bytes": self.run_bytes,
+            "merge_rows": self.merge_rows,
+            "folder": str(self.folder) if self.folder is not None else None,
+        }
+
+    def close(self) -> None:
+        """Remove the runs."""
+        self._pending = []
+        if self.folder is not None:
+            shutil.rmtree(self.folder, ignore_errors=True)
+            self.folder = None
+
+    def __enter__(self) -> ExternalSorter:  # noqa: PYI034
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.close()
+
+
+def sort_to_parquet(
+    filepath: str | Path,
+    parquet_path: str | Path,
+    by: list[str] | str,
+    formatter: Callable[[pl.LazyFrame], pl.LazyFrame] | None = None,
+    column_list: list[str] | str | None = None,
+    config: Config | None = None,
+    descending: bool = False,
+    stats: dict[str, Any] | None = None,
+) -> int:
+    """Sort a sas7bdat file by key columns into a Parquet file, in bounded memory.
+
+    Parameters
+    ----------
+    filepath : str | Path
+        The path to the sas7bdat file.
+    parquet_path : str | Path
+        The sorted Parquet file to write.
+    by : list[str] | str
+        The sort key columns.
+    formatter : Callable[[pl.LazyFrame], pl.LazyFrame] | None
+        A function applied to every chunk before it is sorted.
+    column_list : list[str] | str | None
+        The columns to decode. Defaults to all columns.
+    config : Config | None
+        The ReadSas configuration. Defaults to `Config()`. `sort_budget_gb`
+        bounds the rows held in memory, runs are written under `spill_dir`,
+        and `parquet_row_group_size` sets the output row groups.
+    descending : bool
+        Sort every key column in descending order.
+    stats : dict[str, Any] | None
+        Filled with the read plan, and the sort statistics under `sort`.
+
+    Returns
+    -------
+    int
+        The number of rows written.
+    """
+    config = config or Config()
+    filepath = _format_filepath(filepath)
+    sort_columns = [by] if isinstance(by, str) else list(by)
+    _, _, chunks = decoded_chunks(filepath, config, formatter, column_list, stats)
+
+    started = time.perf_counter()
+    with ExternalSorter(
+        sort_columns,
+        int(config.sort_budget_gb * GB),
+        descending,
+        config.spill_dir,
+        config.logger,
+    ) as sorter:
+        for i, df in chunks:
+            if df is None:
+                # a skipped chunk would silently drop rows from the sorted output
+                raise ValueError(
+                    f"Chunk {i} of {filepath} could not be read, so it cannot be "
+                    "sorted. See the log for the failing columns."
+                )
+            sorter.add(df)
+        rows = sorter.write(parquet_path, config.parquet_row_group_size)
+        config.logger.info(
+            f"Sorted {rows} rows of {filepath.name} by {sort_columns} in "
+            f"{len(sorter.runs)} runs in {time.perf_counter() - started:.2f}s."
+        )
+        if stats is not None:
+            stats["sort"] = sorter.stats()
+    return rows
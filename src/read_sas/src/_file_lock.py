@@ -0,0 +1,240 @@
+"""Cross-process file locks and atomic publishing for shared cache folders."""
+
+from __future__ import annotations
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager, suppress
+from pathlib import Path
+from typing import Any, Generator
+
+
+def _owner_is_dead(owner: dict[str, Any]) -> bool:
+    """Return True if the lock owner is a process on this host that has exited."""
+    if owner.get("host") != socket.gethostname():
+        return False
+    try:
+        os.kill(int(owner["pid"]), 0)
+    except ProcessLookupError:
+        return True
+    except (PermissionError, KeyError, ValueError):
+        return False
+    return False
+
+
+def read_lock_owner(path: str | Path) -> dict[str, Any] | None:
+    """Return the owner recorded in a lock file, or None if it is not held."""
+    try:
+        owner: dict[str, Any] = json.loads(Path(path).read_text())
+    except FileNotFoundError:
+        return None
+    except ValueError:
+        # the owner is between creating the file and writing to it
+        return {}
+    return owner
+
+
+def is_lock_stale(path: str | Path, stale_after: float) -> dict[str, Any] | None:
+    """Return the owner of a lock whose owner has died or stopped refreshing it.
+
+    A held lock is refreshed by its owner every `stale_after / 4` seconds, so a
+    lock older than `stale_after` belongs to a process that is gone or hung,
+    even on another host sharing the folder. Returns None if the lock is free
+    or its owner is alive. The owner returned is empty if the lock file was
+    never written, which tells it apart from a lock taken since.
+    """
+    path = Path(path)
+    owner = read_lock_owner(path)
+    if owner is None:
+        return None
+    if owner and _owner_is_dead(owner):
+        return owner
+    try:
+        return owner if time.time() - path.stat().st_mtime > stale_after else None
+    except FileNotFoundError:
+        return None
+
+
+class FileLock:
+    """An exclusive lock shared by every process that can see the lock file.
+
+    The lock is a file created with `O_CREAT | O_EXCL`, recording the owner's
+    host, pid and a unique token. While held, a background thread refreshes
+    its modification time so other processes can tell a slow owner from a
+    dead one. Waiters break a stale lock one at a time, and only while the
+    lock file is still the one they judged stale, so a lock taken again in
+    the meantime is never broken.
+
+    Parameters
+    ----------
+    path : str | Path
+        The lock file.
+    timeout : float | None
+        Seconds to wait for the lock before raising TimeoutError. None waits
+        forever.
+    stale_after : float
+        Seconds without a refresh after which a lock is considered abandoned.
+    poll_interval : float
+        Seconds between attempts while waiting.
+    logger : logging.Logger | None
+        Where waits and broken locks are logged.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        timeout: float | None = None,
+        stale_after: float = 300.0,
+        poll_interval: float = 0.1,
+        logger: logging.Logger | None = None,
+    ) -> None:
+        if stale_after <= 0:
+            raise ValueError(
+                f"Stale lock age must be a positive number. Got {stale_after}."
+            )
+        self.path = Path(path)
+        self.timeout = timeout
+        self.stale_after = stale_after
+        self.poll_interval = poll_interval
+        self.logger = logger or logging.getLogger(__name__)
+        self._token: str | None = None
+        self._stop_heartbeat = threading.Event()
+        self._heartbeat: threading.Thread | None = None
+
+    @property
+    def is_held(self) -> bool:
+        """Return True if this object currently holds the lock."""
+        return self._token is not None
+
+    def _try_create(self) -> bool:
+        token = uuid.uuid4().hex
+        try:
+            fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, "w") as f:
+            json.dump(
+                {
+                    "host": socket.gethostname(),
+                    "pid": os.getpid(),
+                    "token": token,
+                    "created": time.time(),
+                },
+                f,
+            )
+        self._token = token
+        return True
+
+    def _break_stale(self, stale: dict[str, Any]) -> bool:
+        """Move the lock aside if it is still the stale lock owned by `stale`.
+
+        Waiters take turns through a marker file, so none of them can move a
+        lock another waiter has just taken after breaking the stale one.
+        Returns True if the stale lock is gone.
+        """
+        marker = self.path.with_name(f".{self.path.name}.break")
+        try:
+            os.close(os.open(marker, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            # a waiter holds the marker only for a moment, unless it died
+            if is_lock_stale(marker, self.stale_after) is not None:
+                marker.unlink(missing_ok=True)
+            return False
+        try:
+            current = read_lock_owner(self.path)
+            if current is None:
+                return True
+            if current.get("token") != stale.get("token"):
+                return False
+            aside = self.path.with_name(f".{self.path.name}.{uuid.uuid4().hex}.stale")
+            try:
+                self.path.rename(aside)
+            except FileNotFoundError:
+                return True
+            moved = read_lock_owner(aside)
+            if moved is not None and moved.get("token") != stale.get("token"):
+                # the owner released it and another process took it meanwhile
+                with suppress(FileExistsError):
+                    os.link(aside, self.path)
+                aside.unlink(missing_ok=True)
+                return False
+            self.logger.warning(f"Broke stale lock {self.path} held by {stale}.")
+            aside.unlink(missing_ok=True)
+            return True
+        finally:
+            marker.unlink(missing_ok=True)
+
+    def acquire(self) -> None:
+        """Wait for the lock, breaking it if its owner is dead."""
+        if self.is_held:
+            raise RuntimeError(f"Lock {self.path} is already held by this object.")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        started = time.monotonic()
+        logged = False
+        while not self._try_create():
+            stale = is_lock_stale(self.path, self.stale_after)
+            if stale is not None and self._break_stale(stale):
+                continue
+            if self.timeout is not None and time.monotonic() - started > self.timeout:
+                raise TimeoutError(
+                    f"Timed out after {self.timeout} seconds waiting for {self.path} "
+                    f"held by {read_lock_owner(self.path)}."
+                )
+            if not logged:
+                self.logger.info(
+                    f"Waiting for {self.path} held by {read_lock_owner(self.path)}."
+                )
+                logged = True
+            time.sleep(self.poll_interval)
+
+        self._stop_heartbeat.clear()
+        self._heartbeat = threading.Thread(
+            target=self._refresh, name="read_sas-lock-heartbeat", daemon=True
+        )
+        self._heartbeat.start()
+
+    def _refresh(self) -> None:
+        while not self._stop_heartbeat.wait(self.stale_after / 4):
+            try:
+                os.utime(self.path)
+            except FileNotFoundError:  # noqa: PERF203
+                return
+
+    def release(self) -> None:
+        """Release the lock if this object holds it."""
+        if not self.is_held:
+            return
+        self._stop_heartbeat.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+        owner = read_lock_owner(self.path)
+        if owner and owner.get("token") == self._token:
+            self.path.unlink(missing_ok=True)
+        self._token = None
+
+    def __enter__(self) -> FileLock:  # noqa: PYI034
+        self.acquire()
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.release()
+
+
+@contextmanager
+def atomic_write(path: str | Path) -> Generator[Path, None, None]:
+    """Yield a temporary path next to `path` and rename it into place on success.
+
+    Readers of `path` see either the previous file or the complete new one,
+    never a partial write.
+    """
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp")
+    try:
+        yield tmp
+        tmp.replace(path)
+    finally:
+        tmp.unlink(missing_ok=True)
@@ -0,0 +1,232 @@
+"""Run a chunk formatter in worker processes, shipping chunks as Arrow IPC in shared memory."""
+
+from __future__ import annotations
+import functools
+import hashlib
+import io
+import pickle
+import types
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Generator, Iterable, TypeVar, cast
+import polars as pl
+import pyarrow as pa
+
+K = TypeVar("K")
+
+_worker_formatter: Callable[[pl.LazyFrame], pl.LazyFrame] | None = None
+
+
+def check_picklable(formatter: Callable[[pl.LazyFrame], pl.LazyFrame]) -> None:
+    """Raise a ValueError if the formatter cannot be sent to a worker process."""
+    try:
+        pickle.dumps(formatter)
+    except Exception as e:
+        raise ValueError(
+            "The formatter must be picklable to run in a process pool (define it "
+            f"at module level rather than as a lambda or closure). Got: {formatter!r}"
+        ) from e
+
+
+def _hash_code(code: types.CodeType, digest: Any) -> None:  # noqa: ANN401
+    """Feed the bytecode, names and constants of `code` and its nested functions."""
+    digest.update(code.co_code)
+    digest.update(repr(code.co_names).encode())
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            _hash_code(const, digest)
+        else:
+            digest.update(repr(const).encode())
+
+
+def formatter_digest(formatter: Callable[[pl.LazyFrame], pl.LazyFrame]) -> str | None:
+    """Return a digest of what a formatter does, or None if it has no stable one.
+
+    Functions are identified by their code, defaults and closure values, so
+    lambdas sharing the name `<lambda>` and an edited function body get
+    different digests. Other callables are identified by their pickled state
+    and the code of their `__call__`. Values that cannot be pickled have no
+    stable digest.
+    """
+    digest = hashlib.sha256()
+    target: Any = formatter
+    try:
+        while isinstance(target, functools.partial):
+            digest.update(_pickled(target.args, target.keywords))
+            target = target.func
+        if isinstance(target, types.FunctionType):
+            _hash_code(target.__code__, digest)
+            closure = [cell.cell_contents for cell in target.__closure__ or ()]
+            digest.update(_pickled(target.__defaults__, target.__kwdefaults__, closure))
+        else:
+            digest.update(_pickled(target))
+            call = type(target).__call__
+            if isinstance(call, types.FunctionType):
+                _hash_code(call.__code__, digest)
+    except (pickle.PicklingError, TypeError, AttributeError, ValueError):
+        return None
+    return digest.hexdigest()
+
+
+def _pickled(*values: object) -> bytes:
+    return pickle.dumps(values, protocol=4)
+
+
+def _to_shared_memory(df: pl.DataFrame) -> tuple[str, int]:
+    """Write a frame into a new shared memory block as an Arrow IPC stream."""
+    table = df.to_arrow()
+    sink = pa.MockOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    size = sink.size()
+
+    shm = SharedMemory(create=True, size=max(size, 1))
+    try:
+        # every view of `shm.buf` has to be released before the block can close
+        buffer = pa.py_buffer(shm.buf)
+        target = pa.FixedSizeBufferWriter(buffer)
+        with pa.ipc.new_stream(target, table.schema) as writer:
+            writer.write_table(table)
+        target.close()
+        del writer, target, buffer
+    finally:
+        shm.close()
+    return shm.name, size
+
+
+def _from_shared_memory(name: str, size: int) -> pl.DataFrame:
+    """Read a frame back out of a shared memory block and release the block."""
+    shm = SharedMemory(name=name)
+    try:
+        data = bytes(cast(memoryview, shm.buf)[:size])
+    finally:
+        shm.close()
+        shm.unlink()
+    return pl.read_ipc_stream(io.BytesIO(data))
+
+
+def _release_shared_memory(name: str) -> None:
+    """Unlink a shared memory block that will never be read."""
+    try:
+        shm = SharedMemory(name=name)
+    except FileNotFoundError:
+        return
+    shm.close()
+    shm.unlink()
+
+
+def _init_worker(formatter: Callable[[pl.LazyFrame], pl.LazyFrame]) -> None:
+    global _worker_formatter  # noqa: PLW0603
+    _worker_formatter = formatter
+
+
+def _format_in_worker(name: str, size: int) -> tuple[str, int]:
+    df = _from_shared_memory(name, size)
+    if _worker_formatter is None:
+        raise RuntimeError("Formatter pool worker was not initialized.")
+    return _to_shared_memory(_worker_formatter(df.lazy()).collect())
+
+
+class FormatterPool:
+    """Apply a formatter to collected chunks in a pool of worker processes.
+
+    Parameters
+    ----------
+    formatter : Callable[[pl.LazyFrame], pl.LazyFrame]
+        The formatter to run. It must be picklable.
+    processes : int
+        The number of worker processes.
+    max_in_flight : int | None
+        The number of chunks `imap` keeps submitted at once. Defaults to twice
+        the number of processes.
+    """
+
+    def __init__(
+        self,
+        formatter: Callable[[pl.LazyFrame], pl.LazyFrame],
+        processes: int,
+        max_in_flight: int | None = None,
+    ) -> None:
+        if processes < 1:
+            raise ValueError(
+                f"Number of formatter processes must be a positive number. Got {processes}."
+            )
+        check_picklable(formatter)
+        self._max_in_flight = max_in_flight or 2 * processes
+        self._executor = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(formatter,),
+        )
+        self._inputs: dict[Future, str] = {}
+
+    def submit(self, df: pl.DataFrame) -> Future[pl.DataFrame]:
+        """Send a chunk to the pool, returning a future for the formatted chunk."""
+        name, size = _to_shared_memory(df)
+        try:
+            raw = self._executor.submit(_format_in_worker, name, size)
+        except Exception:
+            _release_shared_memory(name)
+            raise
+        self._inputs[raw] = name
+
+        result: Future[pl.DataFrame] = Future()
+
+        def _done(f: Future) -> None:
+            self._inputs.pop(f, None)
+            if f.cancelled():
+                _release_shared_memory(name)
+                result.cancel()
+            elif f.exception() is not None:
+                _release_shared_memory(name)
+                result.set_exception(f.exception())
+            else:
+                try:
+                    result.set_result(_from_shared_memory(*f.result()))
+                except Exception as e:  # noqa: BLE001
+                    result.set_exception(e)
+
+        raw.add_done_callback(_done)
+        return result
+
+    def apply(self, df: pl.DataFrame) -> pl.DataFrame:
+        """Format a single chunk in the pool and wait for the result."""
+        return self.submit(df).result()
+
+    def imap(
+        self, frames: Iterable[tuple[K, pl.DataFrame | None]]
+    ) -> Generator[
+        tuple[K, pl.DataFrame | None, Future[pl.DataFrame] | None], None, None
+    ]:
+        """Submit keyed chunks ahead of the consumer, yielding them with their futures in order.
+
+        A None chunk, one that failed before reaching the pool, is yielded in
+        its place with no future.
+        """
+        in_flight: deque[tuple[K, pl.DataFrame | None, Future[pl.DataFrame] | None]] = (
+            deque()
+        )
+        for key, df in frames:
+            in_flight.append((key, df, self.submit(df) if df is not None else None))
+            if len(in_flight) >= self._max_in_flight:
+                yield in_flight.popleft()
+        while in_flight:
+            yield in_flight.popleft()
+
+    def close(self) -> None:
+        """Cancel pending work, release its shared memory and stop the workers."""
+        for future in list(self._inputs):
+            future.cancel()
+        self._executor.shutdown(wait=True)
+        for name in list(self._inputs.values()):
+            _release_shared_memory(name)
+        self._inputs.clear()
+
+    def __enter__(self) -> FormatterPool:  # noqa: PYI034
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.close()
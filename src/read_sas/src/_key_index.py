@@ -0,0 +1,146 @@
+"""Sorted key index sidecar for point lookups into converted parquet files.
+
+The index maps every key to the part file, row group and offset within the row
+group that holds its row, so a lookup only decodes the row groups that contain
+a requested key instead of scanning the whole file.
+"""
+
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, Sequence
+import numpy as np
+import polars as pl
+import pyarrow.parquet as pq
+from read_sas.src.__format_filepath import _format_filepath
+from read_sas.src._file_lock import atomic_write
+
+PART_COLUMN = "__part"
+ROW_GROUP_COLUMN = "__row_group"
+ROW_OFFSET_COLUMN = "__row_offset"
+LOCATION_COLUMNS = (PART_COLUMN, ROW_GROUP_COLUMN, ROW_OFFSET_COLUMN)
+
+_index_cache: dict[tuple[str, int], pl.DataFrame] = {}
+
+
+def index_path_for(parquet_path: str | Path) -> Path:
+    """Return the index sidecar path for a parquet file."""
+    parquet_path = _format_filepath(parquet_path)
+    return parquet_path.with_name(f"{parquet_path.stem}.index.parquet")
+
+
+def _key_list(key_columns: str | Sequence[str]) -> list[str]:
+    keys = [key_columns] if isinstance(key_columns, str) else list(key_columns)
+    if not keys:
+        raise ValueError("At least one key column is required to build an index.")
+    return keys
+
+
+def build_key_index(
+    df: pl.DataFrame, key_columns: str | Sequence[str], parquet_path: str | Path
+) -> pl.DataFrame:
+    """Locate every row of `df` in the parquet file it was written to.
+
+    Row group boundaries are read from the file's footer, so the index is
+    correct whatever row group size the writer chose.
+    """
+    keys = _key_list(key_columns)
+    parquet_path = _format_filepath(parquet_path)
+    metadata = pq.read_metadata(parquet_path)
+    if metadata.num_rows != df.height:
+        raise ValueError(
+            f"{parquet_path} has {metadata.num_rows} rows but the frame has {df.height}."
+        )
+
+    group_rows = np.array(
+        [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)],
+        dtype=np.int64,
+    )
+    group_starts = np.concatenate([[0], np.cumsum(group_rows)[:-1]])
+    rows = np.arange(df.height, dtype=np.int64)
+    groups = np.searchsorted(group_starts, rows, side="right") - 1
+
+    return (
+        df.select(keys)
+        .with_columns(
+            pl.lit(parquet_path.name).alias(PART_COLUMN),
+            pl.Series(ROW_GROUP_COLUMN, groups, dtype=pl.UInt32),
+            pl.Series(ROW_OFFSET_COLUMN, rows - group_starts[groups], dtype=pl.UInt32),
+        )
+        .sort(keys)
+    )
+
+
+def write_key_index(index: pl.DataFrame, parquet_path: str | Path) -> Path:
+    """Write an index next to the parquet file it describes."""
+    path = index_path_for(parquet_path)
+    with atomic_write(path) as tmp:
+        index.write_parquet(tmp, statistics=True)
+    for stale in [k for k in _index_cache if k[0] == str(path)]:
+        del _index_cache[stale]
+    return path
+
+
+def load_key_index(parquet_path: str | Path) -> pl.DataFrame:
+    """Load the index of a parquet file, reusing it while the file is unchanged."""
+    path = index_path_for(parquet_path)
+    if not path.exists():
+        raise ValueError(
+            f"No key index found for {parquet_path}. Build one with `run(index_columns=...)`."
+        )
+    cache_key = (str(path), path.stat().st_mtime_ns)
+    if cache_key not in _index_cache:
+        for stale in [k for k in _index_cache if k[0] == cache_key[0]]:
+            del _index_cache[stale]
+        _index_cache[cache_key] = pl.read_parquet(path)
+    return _index_cache[cache_key]
+
+
+def _keys_frame(keys: Any, index: pl.DataFrame) -> pl.DataFrame:  # noqa: ANN401
+    """Normalize the requested keys to a frame with the index's key columns."""
+    key_columns = [c for c in index.columns if c not in LOCATION_COLUMNS]
+    if isinstance(keys, pl.DataFrame):
+        frame = keys.select(key_columns)
+    elif len(key_columns) == 1:
+        values = [keys] if isinstance(keys, (str, int, float)) else list(keys)
+        frame = pl.DataFrame({key_columns[0]: values})
+    else:
+        rows = [keys] if isinstance(keys, tuple) else list(keys)
+        frame = pl.DataFrame(rows, schema=key_columns, orient="row")
+    return frame.cast(index.select(key_columns).schema).unique()
+
+
+def lookup(parquet_path: str | Path, keys: Any) -> pl.DataFrame:  # noqa: ANN401
+    """Return the rows of a parquet file whose key matches one of `keys`.
+
+    Parameters
+    ----------
+    parquet_path : str | Path
+        The parquet file written with a key index.
+    keys : Any
+        A single key, a list of keys (tuples for compound keys) or a frame
+        holding the key columns.
+
+    Returns
+    -------
+    pl.DataFrame
+        The matching rows, in file order.
+    """
+    parquet_path = _format_filepath(parquet_path)
+    index = load_key_index(parquet_path)
+    key_columns = [c for c in index.columns if c not in LOCATION_COLUMNS]
+    matches = index.join(_keys_frame(keys, index), on=key_columns, how="semi").sort(
+        list(LOCATION_COLUMNS)
+    )
+
+    frames: list[pl.DataFrame] = []
+    for (part, row_group), located in matches.group_by(
+        [PART_COLUMN, ROW_GROUP_COLUMN], maintain_order=True
+    ):
+        table = pq.ParquetFile(parquet_path.parent / str(part)).read_row_group(
+            int(row_group)
+        )
+        frames.append(pl.DataFrame(table).gather(located[ROW_OFFSET_COLUMN]))
+
+    if not frames:
+        return pl.DataFrame(schema=pl.scan_parquet(parquet_path).collect_schema())
+    return pl.concat(frames, how="vertical")
@@ -1,11 +1,178 @@
+"""The package logger. Handlers are installed on demand, never at import.
+
+Installed handlers run on a background `QueueListener` thread, so a slow log
+file (for example on network storage) never blocks the thread reading chunks.
+"""
+
+from __future__ import annotations
+import atexit
+import json
 import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from pathlib import Path
+from typing import Any
 
 LOGGING_LEVEL = logging.INFO
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 
 logger = logging.getLogger(__name__)
 logger.setLevel(LOGGING_LEVEL)
-file_handler = logging.FileHandler("read_sas.log")
-file_handler.setLevel(LOGGING_LEVEL)
-formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-file_handler.setFormatter(formatter)
-logger.addHandler(file_handler)
+logger.addHandler(logging.NullHandler())
+
+event_logger = logging.getLogger("read_sas.events")
+event_logger.setLevel(logging.INFO)
+event_logger.propagate = False
+event_logger.addHandler(logging.NullHandler())
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Format an event record as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(
+            {
+                "time": record.created,
+                "event": record.getMessage(),
+                **getattr(record, "fields", {}),
+            },
+            default=str,
+        )
+
+
+class _BackgroundHandlers:
+    """Handlers of one logger, run on a listener thread fed through a queue."""
+
+    def __init__(self, target: logging.Logger) -> None:
+        self._target = target
+        self._queue: queue.Queue = queue.Queue()
+        self._queue_handler: QueueHandler | None = None
+        self._listener: QueueListener | None = None
+        self.handlers: list[logging.Handler] = []
+
+    def find(self, filepath: Path) -> logging.FileHandler | None:
+        for handler in self.handlers:
+            if (
+                isinstance(handler, logging.FileHandler)
+                and Path(handler.baseFilename) == filepath
+            ):
+                return handler
+        return None
+
+    def _restart(self, handlers: list[logging.Handler]) -> None:
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+        self.handlers = handlers
+        if handlers:
+            self._listener = QueueListener(
+                self._queue, *handlers, respect_handler_level=True
+            )
+            self._listener.start()
+            if self._queue_handler is None:
+                self._queue_handler = QueueHandler(self._queue)
+                self._target.addHandler(self._queue_handler)
+        elif self._queue_handler is not None:
+            self._target.removeHandler(self._queue_handler)
+            self._queue_handler = None
+
+    def add(self, handler: logging.Handler) -> None:
+        """Start dispatching records to `handler` on the listener thread."""
+        self._restart([*self.handlers, handler])
+
+    def remove(self, handler: logging.Handler) -> bool:
+        """Stop dispatching records to `handler`, returning False if it was not added."""
+        if handler not in self.handlers:
+            return False
+        self._restart([h for h in self.handlers if h is not handler])
+        handler.close()
+        return True
+
+    def flush(self) -> None:
+        """Block until every queued record has been handled."""
+        if self._listener is not None:
+            self._queue.join()
+
+    def stop(self) -> None:
+        """Flush the queue and stop the listener thread."""
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+        for handler in self.handlers:
+            handler.flush()
+
+
+_log_handlers = _BackgroundHandlers(logger)
+_event_handlers = _BackgroundHandlers(event_logger)
+
+
+def _open(filepath: Path, formatter: logging.Formatter) -> logging.FileHandler | None:
+    try:
+        handler = logging.FileHandler(filepath)
+    except OSError as e:
+        logger.warning(f"Could not open the log file {filepath}: {e}")
+        return None
+    handler.setFormatter(formatter)
+    return handler
+
+
+def install_file_handler(
+    filepath: str | Path = "read_sas.log", level: int = LOGGING_LEVEL
+) -> logging.FileHandler | None:
+    """Log to `filepath` from a background thread, adding the handler only once per file.
+
+    Returns the handler, or None if the file cannot be opened (for example in
+    a read-only working directory), in which case logging carries on without it.
+    """
+    filepath = Path(filepath).resolve()
+    existing = _log_handlers.find(filepath)
+    if existing is not None:
+        return existing
+    handler = _open(filepath, logging.Formatter(LOG_FORMAT))
+    if handler is not None:
+        handler.setLevel(level)
+        _log_handlers.add(handler)
+    return handler
+
+
+def install_event_stream(filepath: str | Path) -> logging.FileHandler | None:
+    """Write structured chunk events to `filepath` as JSON lines."""
+    filepath = Path(filepath).resolve()
+    existing = _event_handlers.find(filepath)
+    if existing is not None:
+        return existing
+    handler = _open(filepath, JsonLinesFormatter())
+    if handler is not None:
+        _event_handlers.add(handler)
+    return handler
+
+
+def events_enabled() -> bool:
+    """Return True if an event stream is installed, so events are worth building."""
+    return bool(_event_handlers.handlers) and event_logger.isEnabledFor(logging.INFO)
+
+
+def log_event(event: str, **fields: Any) -> None:  # noqa: ANN401
+    """Emit a structured event to the installed event streams."""
+    if events_enabled():
+        event_logger.info(event, extra={"fields": fields})
+
+
+def remove_handler(handler: logging.Handler) -> None:
+    """Flush and close a handler added by `install_file_handler` or `install_event_stream`."""
+    if not _log_handlers.remove(handler):
+        _event_handlers.remove(handler)
+
+
+def flush_logging() -> None:
+    """Wait until the background threads have handled every queued record."""
+    _log_handlers.flush()
+    _event_handlers.flush()
+
+
+def _shutdown() -> None:
+    _log_handlers.stop()
+    _event_handlers.stop()
+
+
+atexit.register(_shutdown)
@@ -0,0 +1,204 @@
+"""Sample process memory around each stage of a read and stop before the limit.
+
+Memory is sampled in this process only, as the resident set size and the bytes
+held by the Arrow allocator (which backs polars and pyarrow buffers). Decode
+worker processes are not included. A monitor is installed for the duration of
+a read with `monitor_memory`, so the stages that sample it do not need it
+passed in.
+"""
+
+from __future__ import annotations
+import logging
+import os
+import sys
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Generator
+from read_sas.src._config import Config
+
+GB = 1_000_000_000
+
+# a chunk is held decoded by pandas, converted by polars and formatted at once
+COPIES_PER_CHUNK = 3
+
+
+def rss_bytes() -> int:
+    """Return the resident set size of this process, or its peak where that is all there is."""
+    try:
+        resident_pages = int(Path("/proc/self/statm").read_text().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource  # noqa: PLC0415
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def arrow_bytes() -> int:
+    """Return the bytes currently allocated by the Arrow memory pool."""
+    import pyarrow as pa  # noqa: PLC0415
+
+    return int(pa.total_allocated_bytes())
+
+
+class MemoryLimitError(MemoryError):
+    """Raised when a read is about to use more memory than `Config.memory_limit_gb`."""
+
+
+@dataclass
+class StagePeak:
+    """The highest memory sampled in one stage."""
+
+    peak_rss_bytes: int = 0
+    peak_arrow_bytes: int = 0
+    samples: int = 0
+
+
+class MemoryMonitor:
+    """Record peak memory per stage and enforce a memory ceiling.
+
+    Parameters
+    ----------
+    limit_bytes : int | None
+        Raise `MemoryLimitError` once the resident set size passes this.
+    logger : logging.Logger | None
+        Where the peaks are logged.
+    """
+
+    def __init__(
+        self, limit_bytes: int | None = None, logger: logging.Logger | None = None
+    ) -> None:
+        if limit_bytes is not None and limit_bytes <= 0:
+            raise ValueError(
+                f"Memory limit must be a positive number. Got {limit_bytes}."
+            )
+        self.limit_bytes = limit_bytes
+        self.logger = logger or logging.getLogger(__name__)
+        self.stages: dict[str, StagePeak] = {}
+
+    @classmethod
+    def from_config(cls, config: Config) -> MemoryMonitor | None:
+        """Return a monitor if `config` tracks or limits memory, otherwise None."""
+        if config.memory_limit_gb is None and not config.track_memory:
+            return None
+        limit = (
+            int(config.memory_limit_gb * GB)
+            if config.memory_limit_gb is not None
+            else None
+        )
+        return cls(limit, config.logger)
+
+    def sample(self, stage: str, upcoming_bytes: int = 0) -> int:
+        """Record the memory in use at the end of `stage` and check it against the limit.
+
+        `upcoming_bytes` is memory the stage is about to allocate, so the read
+        can stop before it rather than be killed part way through.
+        """
+        rss, arrow = rss_bytes(), arrow_bytes()
+        peak = self.stages.setdefault(stage, StagePeak())
+        peak.peak_rss_bytes = max(peak.peak_rss_bytes, rss)
+        peak.peak_arrow_bytes = max(peak.peak_arrow_bytes, arrow)
+        peak.samples += 1
+        limit = self.limit_bytes
+        if limit is not None and rss + upcoming_bytes > limit:
+            raise MemoryLimitError(self._diagnostic(stage, rss, upcoming_bytes, limit))
+        return rss
+
+    def headroom(self) -> int | None:
+        """Return the bytes left under the limit, or None if there is no limit."""
+        if self.limit_bytes is None:
+            return None
+        return self.limit_bytes - rss_bytes()
+
+    def peaks(self) -> dict[str, dict[str, int]]:
+        """Return the peaks recorded for each stage."""
+        return {name: asdict(peak) for name, peak in self.stages.items()}
+
+    def report(self) -> str:
+        """Return a line per stage with its peak memory."""
+        return "\n".join(
+            f"{name}: peak RSS {peak.peak_rss_bytes / GB:.2f} GB, "
+            f"peak Arrow {peak.peak_arrow_bytes / GB:.2f} GB "
+            f"over {peak.samples} sample(s)"
+            for name, peak in self.stages.items()
+        )
+
+    def _diagnostic(self, stage: str, rss: int, upcoming_bytes: int, limit: int) -> str:
+        about = (
+            f" and is about to allocate {upcoming_bytes / GB:.2f} GB more"
+            if upcoming_bytes
+            else ""
+        )
+        return (
+            f"Stopping the read before it exceeds the memory limit of "
+            f"{limit / GB:.2f} GB: stage {stage!r} is using "
+            f"{rss / GB:.2f} GB{about}. Peaks so far:\n{self.report()}\n"
+            "Lower `chunk_size_in_gb`, read fewer columns, or stream the file "
+            "with `ReadSas.to_arrow_batches` instead of collecting it."
+        )
+
+
+_active: ContextVar[MemoryMonitor | None] = ContextVar("_active", default=None)
+
+
+@contextmanager
+def monitor_memory(
+    monitor: MemoryMonitor | None, stats: dict[str, Any] | None = None
+) -> Generator[MemoryMonitor | None, None, None]:
+    """Make `monitor` the one stages sample until the block ends.
+
+    The peaks are stored in `stats["memory"]` when the block ends, even if it
+    raised. A None monitor leaves whichever monitor is active in place.
+    """
+    if monitor is None:
+        yield _active.get()
+        return
+    token = _active.set(monitor)
+    try:
+        yield monitor
+    finally:
+        _active.reset(token)
+        if stats is not None:
+            stats["memory"] = monitor.peaks()
+        if monitor.stages:
+            monitor.logger.info(f"Peak memory per stage:\n{monitor.report()}")
+
+
+def active_monitor() -> MemoryMonitor | None:
+    """Return the monitor installed by `monitor_memory`, if any."""
+    return _active.get()
+
+
+def sample_memory(stage: str, upcoming_bytes: int = 0) -> None:
+    """Sample the active monitor at the end of `stage`, if one is installed."""
+    monitor = _active.get()
+    if monitor is not None:
+        monitor.sample(stage, upcoming_bytes)
+
+
+def fit_chunk_size(chunk_size: int, row_length: float, monitor: MemoryMonitor) -> int:
+    """Shrink `chunk_size` until a chunk fits in the memory left under the limit.
+
+    A chunk is counted `COPIES_PER_CHUNK` times, for its pandas, polars and
+    formatted copies.
+    """
+    limit, headroom = monitor.limit_bytes, monitor.headroom()
+    if limit is None or headroom is None:
+        return chunk_size
+    if headroom <= 0:
+        # already over the limit, so this raises with the peaks so far
+        monitor.sample("plan")
+    fitting = max(int(headroom / (row_length * COPIES_PER_CHUNK)), 1)
+    if fitting < chunk_size:
+        monitor.logger.warning(
+            f"Shrinking chunks from {chunk_size} to {fitting} rows to stay under "
+            f"the memory limit of {limit / GB:.2f} GB."
+        )
+        return fitting
+    return chunk_size
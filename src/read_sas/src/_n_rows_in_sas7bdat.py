@@ -1,7 +1,6 @@
 from __future__ import annotations
-from read_sas.src.__format_filepath import _format_filepath
 from pathlib import Path
-import pyreadstat  # type: ignore
+from read_sas.src._sas7bdat_metadata import sas7bdat_metadata
 from read_sas.src._timer import timer
 
 
@@ -10,11 +9,6 @@ def n_rows_in_sas7bdat(
     filepath: str | Path, column_list: list[str] | None = None
 ) -> int:
     """Return the number of rows in a SAS file."""
-    _, meta = pyreadstat.read_sas7bdat(
-        _format_filepath(filepath),
-        disable_datetime_conversion=True,
-        usecols=column_list,
-        metadataonly=True,
-    )
+    meta = sas7bdat_metadata(filepath, column_list)
 
     return meta.number_rows  # type: ignore # this definitely returns an integer, but it isn't recognized as such by the type checker
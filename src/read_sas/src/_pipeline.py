@@ -0,0 +1,256 @@
+"""Run chunk processing as threaded stages connected by bounded queues."""
+
+from __future__ import annotations
+import contextvars
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Generator, Iterable
+
+_DONE = object()
+_POLL_SECONDS = 0.05
+
+
+@dataclass
+class Stage:
+    """A named processing step and the number of threads that run it."""
+
+    name: str
+    func: Callable[[Any], Any]
+    workers: int = 1
+
+    def __post_init__(self) -> None:
+        if self.workers < 1:
+            raise ValueError(
+                f"Stage `{self.name}` needs at least one worker. Got {self.workers}."
+            )
+
+
+@dataclass
+class StageStats:
+    """Busy and wall-clock time recorded for one pipeline stage."""
+
+    name: str
+    workers: int
+    items: int = 0
+    busy_seconds: float = 0.0
+    wall_seconds: float = 0.0
+
+    @property
+    def utilization(self) -> float:
+        """Return the fraction of the stage's thread capacity spent working."""
+        capacity = self.wall_seconds * self.workers
+        return self.busy_seconds / capacity if capacity > 0 else 0.0
+
+
+class Pipeline:
+    """Overlap a chunk source with downstream stages running on background threads.
+
+    The source runs on its own thread as the first stage, so chunk N+1 is being
+    produced while chunk N moves through the later stages. Stages are joined by
+    bounded queues, which block fast producers once `queue_size` items are
+    waiting. Results are yielded in source order regardless of how many workers
+    a stage has.
+
+    Parameters
+    ----------
+    source : Iterable[Any]
+        The iterable feeding the pipeline.
+    stages : list[Stage]
+        The stages each item passes through, in order.
+    queue_size : int
+        The maximum number of items waiting between two stages.
+    source_name : str
+        The name the source stage is reported under.
+    """
+
+    def __init__(
+        self,
+        source: Iterable[Any],
+        stages: list[Stage],
+        queue_size: int = 2,
+        source_name: str = "decode",
+    ) -> None:
+        if queue_size < 1:
+            raise ValueError(f"Queue size must be a positive number. Got {queue_size}.")
+        self._source = source
+        self._stages = stages
+        self._queue_size = queue_size
+        self._stats = [StageStats(source_name, 1)] + [
+            StageStats(stage.name, stage.workers) for stage in stages
+        ]
+
+    @property
+    def stats(self) -> list[StageStats]:
+        """Return the per-stage statistics, source first."""
+        return self._stats
+
+    def report(self) -> str:
+        """Return a one-line-per-stage utilization summary."""
+        return "\n".join(
+            f"{s.name:<12} workers={s.workers:<3} items={s.items:<6} "
+            f"busy={s.busy_seconds:.2f}s wall={s.wall_seconds:.2f}s "
+            f"utilization={s.utilization:.0%}"
+            for s in self._stats
+        )
+
+    def bottleneck(self) -> str | None:
+        """Return the name of the most utilized stage."""
+        if not self._stats:
+            return None
+        return max(self._stats, key=lambda s: s.utilization).name
+
+    def __iter__(self) -> Generator[Any, None, None]:
+        """Start the stage threads and yield results in source order."""
+        stop = threading.Event()
+        errors: list[BaseException] = []
+        queues: list[queue.Queue] = [
+            queue.Queue(maxsize=self._queue_size) for _ in range(len(self._stages) + 1)
+        ]
+        started = time.perf_counter()
+        # each thread runs in a copy of the caller's context, so it sees the
+        # memory monitor and any other context variable the caller has set
+        threads = [
+            threading.Thread(
+                target=contextvars.copy_context().run,
+                args=(self._produce, queues[0], stop, errors, started),
+                name="read_sas-pipeline-source",
+                daemon=True,
+            )
+        ]
+        for n, stage in enumerate(self._stages):
+            remaining = [stage.workers]
+            lock = threading.Lock()
+            threads.extend(
+                threading.Thread(
+                    target=contextvars.copy_context().run,
+                    args=(
+                        self._work,
+                        stage,
+                        self._stats[n + 1],
+                        queues[n],
+                        queues[n + 1],
+                        stop,
+                        errors,
+                        started,
+                        remaining,
+                        lock,
+                    ),
+                    name=f"read_sas-pipeline-{stage.name}-{w}",
+                    daemon=True,
+                )
+                for w in range(stage.workers)
+            )
+
+        for thread in threads:
+            thread.start()
+
+        pending: dict[int, Any] = {}
+        next_seq = 0
+        try:
+            while True:
+                item = _get(queues[-1], stop)
+                if item is _DONE:
+                    break
+                seq, value = item
+                pending[seq] = value
+                while next_seq in pending:
+                    yield pending.pop(next_seq)
+                    next_seq += 1
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+        if errors:
+            raise errors[0]
+
+    def _produce(
+        self,
+        out_q: queue.Queue,
+        stop: threading.Event,
+        errors: list[BaseException],
+        started: float,
+    ) -> None:
+        stats = self._stats[0]
+        try:
+            iterator = iter(self._source)
+            seq = 0
+            while not stop.is_set():
+                begin = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                stats.busy_seconds += time.perf_counter() - begin
+                stats.items += 1
+                if not _put(out_q, (seq, item), stop):
+                    return
+                seq += 1
+        except BaseException as e:  # noqa: BLE001
+            errors.append(e)
+            stop.set()
+        finally:
+            stats.wall_seconds = time.perf_counter() - started
+            _put(out_q, _DONE, stop)
+
+    def _work(
+        self,
+        stage: Stage,
+        stats: StageStats,
+        in_q: queue.Queue,
+        out_q: queue.Queue,
+        stop: threading.Event,
+        errors: list[BaseException],
+        started: float,
+        remaining: list[int],
+        lock: threading.Lock,
+    ) -> None:
+        try:
+            while True:
+                item = _get(in_q, stop)
+                if item is _DONE:
+                    # Hand the sentinel on to the sibling workers of this stage.
+                    _put(in_q, _DONE, stop)
+                    break
+                seq, value = item
+                begin = time.perf_counter()
+                result = stage.func(value)
+                elapsed = time.perf_counter() - begin
+                with lock:
+                    stats.busy_seconds += elapsed
+                    stats.items += 1
+                if not _put(out_q, (seq, result), stop):
+                    break
+        except BaseException as e:  # noqa: BLE001
+            errors.append(e)
+            stop.set()
+        finally:
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                stats.wall_seconds = time.perf_counter() - started
+                _put(out_q, _DONE, stop)
+
+
+def _put(q: queue.Queue, item: Any, stop: threading.Event) -> bool:  # noqa: ANN401
+    """Put an item on a bounded queue, giving up once the pipeline is stopped."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=_POLL_SECONDS)
+        except queue.Full:
+            continue
+        return True
+    return False
+
+
+def _get(q: queue.Queue, stop: threading.Event) -> Any:  # noqa: ANN401
+    """Take an item from a queue, returning the sentinel once the pipeline is stopped."""
+    while not stop.is_set():
+        try:
+            return q.get(timeout=_POLL_SECONDS)
+        except queue.Empty:  # noqa: PERF203
+            continue
+    return _DONE
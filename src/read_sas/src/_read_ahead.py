@@ -0,0 +1,317 @@
+"""Overlap reading a SAS file from slow storage with decoding it.
+
+readstat reads a file with small sequential reads, which are latency bound on
+network storage such as NFS. Two modes hide that latency behind decoding:
+
+- `prefetch` reads the bytes of the next chunks ahead of the decoder with
+  large aligned reads (after a `posix_fadvise` hint), so the decoder finds
+  them in the page cache.
+- `stage` copies the whole file to local scratch with parallel block reads in
+  the background. Chunks are decoded from the source until the copy is
+  complete and from the local copy after that. The copy is removed when the
+  read ends.
+"""
+
+from __future__ import annotations
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterator, Protocol
+
+PREFETCH = "prefetch"
+STAGE = "stage"
+READ_AHEAD_MODES = (PREFETCH, STAGE)
+
+
+def check_read_ahead_mode(mode: str | None) -> None:
+    """Raise a ValueError if `mode` is not None or a known read-ahead mode."""
+    if mode is not None and mode not in READ_AHEAD_MODES:
+        raise ValueError(
+            f"Read-ahead mode must be one of {READ_AHEAD_MODES} or None. Got {mode!r}."
+        )
+
+
+class BlockSource(Protocol):
+    """Random access reads of a file, so they can be made from several threads."""
+
+    size: int
+
+    def read_block(self, offset: int, size: int) -> bytes: ...
+
+    def advise(self, offset: int, size: int) -> None: ...
+
+    def close(self) -> None: ...
+
+
+class FileBlockSource:
+    """Read blocks of a local or network file with `os.pread`."""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self._fd = os.open(self.path, os.O_RDONLY)
+        self.size = os.fstat(self._fd).st_size
+
+    def read_block(self, offset: int, size: int) -> bytes:
+        """Read up to `size` bytes at `offset`."""
+        return os.pread(self._fd, size, offset)
+
+    def advise(self, offset: int, size: int) -> None:
+        """Hint to the kernel that a byte range will be read soon."""
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(self._fd, offset, size, os.POSIX_FADV_WILLNEED)
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+def _blocks(start: int, end: int, block_size: int) -> Iterator[tuple[int, int]]:
+    """Yield block-aligned `(offset, size)` reads covering `[start, end)`."""
+    offset = start - start % block_size
+    while offset < end:
+        yield offset, block_size
+        offset += block_size
+
+
+class StagedCopy:
+    """Copy a file to a local folder with parallel block reads, in the background.
+
+    Parameters
+    ----------
+    source : BlockSource
+        The file to copy.
+    name : str
+        The file name of the copy.
+    staging_dir : str | Path | None
+        The local folder to copy into. Defaults to the system temp folder.
+    block_size : int
+        The bytes read by each request.
+    threads : int
+        The number of reads in flight at once.
+    """
+
+    def __init__(
+        self,
+        source: BlockSource,
+        name: str,
+        staging_dir: str | Path | None = None,
+        block_size: int = 64 * 1024 * 1024,
+        threads: int = 4,
+    ) -> None:
+        self.source = source
+        self.folder = Path(tempfile.mkdtemp(prefix="read_sas_stage_", dir=staging_dir))
+        self.path = self.folder / name
+        self.block_size = block_size
+        self.threads = threads
+        self.seconds: float | None = None
+        self.error: BaseException | None = None
+        self._done = threading.Event()
+        self._cancelled = threading.Event()
+        self._thread = threading.Thread(
+            target=self._copy, name="read_sas-stage", daemon=True
+        )
+        self._thread.start()
+
+    def _copy(self) -> None:
+        started = time.perf_counter()
+        try:
+            fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            try:
+                os.ftruncate(fd, self.source.size)
+
+                def copy_block(offset: int, size: int) -> None:
+                    if not self._cancelled.is_set():
+                        os.pwrite(fd, self.source.read_block(offset, size), offset)
+
+                with ThreadPoolExecutor(
+                    self.threads, thread_name_prefix="read_sas-stage"
+                ) as executor:
+                    for future in [
+                        executor.submit(copy_block, offset, size)
+                        for offset, size in _blocks(
+                            0, self.source.size, self.block_size
+                        )
+                    ]:
+                        future.result()
+            finally:
+                os.close(fd)
+            if self._cancelled.is_set():
+                raise RuntimeError("Staging was cancelled.")
+            self.seconds = time.perf_counter() - started
+        except BaseException as e:  # noqa: BLE001
+            self.error = e
+        finally:
+            self._done.set()
+
+    @property
+    def is_ready(self) -> bool:
+        """Return True once the copy is complete and can be read."""
+        return self._done.is_set() and self.error is None
+
+    def wait(self, timeout: float | None = None) -> Path:
+        """Wait for the copy to finish, raising the error that stopped it."""
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"Staging {self.path} did not finish in {timeout}s.")
+        if self.error is not None:
+            raise self.error
+        return self.path
+
+    def cleanup(self) -> None:
+        """Stop copying and remove the copy."""
+        self._cancelled.set()
+        self._thread.join()
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+
+class Prefetcher:
+    """Read byte ranges ahead of the decoder so they are in the page cache when needed."""
+
+    def __init__(
+        self, source: BlockSource, block_size: int = 64 * 1024 * 1024, threads: int = 4
+    ) -> None:
+        self.source = source
+        self.block_size = block_size
+        self._executor = ThreadPoolExecutor(
+            threads, thread_name_prefix="read_sas-prefetch"
+        )
+        self._requested: set[int] = set()
+        self.futures: list[Future] = []
+
+    def prefetch(self, start: int, end: int) -> None:
+        """Start reading the blocks covering `[start, end)` that were not read yet."""
+        start, end = max(start, 0), min(end, self.source.size)
+        if end <= start:
+            return
+        self.source.advise(start, end - start)
+        for offset, size in _blocks(start, end, self.block_size):
+            if offset not in self._requested:
+                self._requested.add(offset)
+                self.futures.append(self._executor.submit(self._warm, offset, size))
+        self.futures = [f for f in self.futures if not f.done()]
+
+    def _warm(self, offset: int, size: int) -> int:
+        # only the page cache keeps the bytes, so memory stays flat
+        return len(self.source.read_block(offset, size))
+
+    def close(self) -> None:
+        for future in self.futures:
+            future.cancel()
+        self._executor.shutdown(wait=True)
+
+
+class ReadAhead:
+    """Choose the file each chunk is decoded from, reading ahead of the decoder.
+
+    Parameters
+    ----------
+    filepath : str | Path
+        The SAS file.
+    mode : str
+        `prefetch` or `stage`.
+    n_rows : int
+        The number of rows in the file, used to estimate where rows are stored.
+    header_length : int
+        The bytes before the first page.
+    chunks_ahead : int
+        In `prefetch` mode, the chunks read ahead of the one being decoded.
+    block_size : int
+        The bytes read by each request.
+    threads : int
+        The number of reads in flight at once.
+    staging_dir : str | Path | None
+        In `stage` mode, the local folder the file is copied to.
+    logger : logging.Logger | None
+        Where staging is logged.
+    source : BlockSource | None
+        The reader of the file. Defaults to a `FileBlockSource`.
+    """
+
+    def __init__(
+        self,
+        filepath: str | Path,
+        mode: str,
+        n_rows: int,
+        header_length: int = 0,
+        chunks_ahead: int = 2,
+        block_size: int = 64 * 1024 * 1024,
+        threads: int = 4,
+        staging_dir: str | Path | None = None,
+        logger: logging.Logger | None = None,
+        source: BlockSource | None = None,
+    ) -> None:
+        check_read_ahead_mode(mode)
+        self.filepath = Path(filepath)
+        self.mode = mode
+        self.n_rows = max(n_rows, 1)
+        self.header_length = header_length
+        self.chunks_ahead = chunks_ahead
+        self.logger = logger or logging.getLogger(__name__)
+        self.source = source or FileBlockSource(self.filepath)
+        self.prefetcher = (
+            Prefetcher(self.source, block_size, threads) if mode == PREFETCH else None
+        )
+        self.staged = (
+            StagedCopy(
+                self.source, self.filepath.name, staging_dir, block_size, threads
+            )
+            if mode == STAGE
+            else None
+        )
+        self._switched = False
+
+    def byte_range(self, first_row: int, end_row: int) -> tuple[int, int]:
+        """Estimate the bytes holding rows `[first_row, end_row)`, assuming rows are spread evenly."""
+        data = self.source.size - self.header_length
+        return (
+            self.header_length + data * first_row // self.n_rows,
+            self.header_length + -(-data * end_row // self.n_rows),
+        )
+
+    def paths(self, row_ranges: list[tuple[int, int]]) -> Iterator[str]:
+        """Yield the file to decode each `(first_row, end_row)` range from, in order."""
+        if self.prefetcher is not None and row_ranges:
+            # the header and the first chunk are needed straight away
+            self.prefetcher.prefetch(0, self.byte_range(*row_ranges[0])[1])
+        for i, _ in enumerate(row_ranges):
+            if self.prefetcher is not None:
+                for ahead in row_ranges[i + 1 : i + 1 + self.chunks_ahead]:
+                    self.prefetcher.prefetch(*self.byte_range(*ahead))
+            yield self.path()
+
+    def path(self) -> str:
+        """Return the staged copy once it is complete, and the source until then."""
+        if self.staged is None:
+            return str(self.filepath)
+        if self.staged.is_ready:
+            if not self._switched:
+                self._switched = True
+                self.logger.info(
+                    f"Staged {self.filepath} to {self.staged.path} in "
+                    f"{self.staged.seconds:.1f}s. Decoding from the local copy."
+                )
+            return str(self.staged.path)
+        if self.staged.error is not None and not self._switched:
+            self._switched = True
+            self.logger.warning(
+                f"Could not stage {self.filepath}: {self.staged.error}. "
+                "Decoding from the source."
+            )
+        return str(self.filepath)
+
+    def close(self) -> None:
+        """Stop reading ahead and remove the staged copy."""
+        if self.prefetcher is not None:
+            self.prefetcher.close()
+        if self.staged is not None:
+            self.staged.cleanup()
+        self.source.close()
+
+    def __enter__(self) -> ReadAhead:  # noqa: PYI034
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.close()
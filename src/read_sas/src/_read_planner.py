@@ -0,0 +1,155 @@
+"""Choose the chunk size and decode parallelism for a file from its storage layout."""
+
+from __future__ import annotations
+import dataclasses
+import math
+from dataclasses import dataclass, field
+from pathlib import Path
+from read_sas.src._config import Config
+from read_sas.src._worker_pool import available_cpus
+from read_sas.src._sas7bdat_header import Sas7bdatHeader, sas7bdat_header
+from read_sas.src.__format_filepath import _format_filepath
+
+SMALL_FILE_BYTES = 64 * 1024 * 1024
+WITHIN_CHUNK = "within_chunk"
+ACROSS_CHUNKS = "across_chunks"
+SERIAL = "serial"
+
+
+@dataclass
+class ReadPlan:
+    """How a file is decoded: rows per chunk, processes and where they split the work."""
+
+    chunk_size: int
+    processes: int
+    parallelism: str
+    compression: str | None = None
+    reasons: list[str] = field(default_factory=list)
+
+    def apply(self, config: Config) -> Config:
+        """Return a copy of `config` that decodes the file the way this plan says."""
+        return dataclasses.replace(
+            config,
+            use_multiprocessing=self.parallelism == WITHIN_CHUNK,
+            num_processes=self.processes,
+            decode_across_chunks=self.parallelism == ACROSS_CHUNKS,
+        )
+
+
+def _row_length(
+    header: Sas7bdatHeader,
+    filepath: Path,
+    n_rows: int,
+    column_list: list[str] | str | None,
+) -> float:
+    """Estimate the decoded bytes per row of the columns being read."""
+    if header.row_length:
+        row_length = float(header.row_length)
+    else:
+        row_length = filepath.stat().st_size / max(n_rows, 1)
+    if column_list is not None and header.column_count:
+        n_columns = 1 if isinstance(column_list, str) else len(column_list)
+        row_length *= min(n_columns / header.column_count, 1.0)
+    return max(row_length, 1.0)
+
+
+def plan_read(
+    filepath: str | Path,
+    config: Config,
+    n_rows: int,
+    column_list: list[str] | str | None = None,
+) -> ReadPlan:
+    """Plan how to decode a sas7bdat file.
+
+    Chunk sizes are computed from the decoded row length in the file header
+    rather than the on-disk size, which understates the decoded size of RLE
+    and RDC compressed files. Uncompressed files are split within each chunk
+    because every worker can seek straight to its rows. Compressed pages hold a
+    variable number of rows, so each worker decodes whole chunks instead and
+    the chunks shrink to keep the same memory budget across all workers.
+
+    Parameters
+    ----------
+    filepath : str | Path
+        The path to the sas7bdat file.
+    config : Config
+        The ReadSas configuration. `chunk_size_in_gb` is the memory budget and
+        `num_processes` caps the processes used.
+    n_rows : int
+        The number of rows in the file.
+    column_list : list[str] | str | None
+        The columns being read, if not all of them.
+
+    Returns
+    -------
+    ReadPlan
+        The plan. Each decision is logged with its reason.
+    """
+    if n_rows <= 0:
+        raise ValueError(
+            f"Number of rows in file must be a positive number. Got {n_rows}."
+        )
+
+    filepath = _format_filepath(filepath)
+    header = sas7bdat_header(filepath)
+    cpus = config.num_processes or available_cpus()
+    row_length = _row_length(header, filepath, n_rows, column_list)
+    decoded_bytes = row_length * n_rows
+    budget_bytes = config.chunk_size_in_gb * 1_000_000_000
+    reasons = []
+
+    if header.compression is not None:
+        ratio = decoded_bytes / max(filepath.stat().st_size, 1)
+        reasons.append(
+            f"File is {header.compression.upper()} compressed ({ratio:.1f}x its size "
+            "on disk once decoded), so chunks are sized from the decoded row length."
+        )
+
+    if decoded_bytes < SMALL_FILE_BYTES or cpus == 1 or n_rows == 1:
+        processes, parallelism = 1, SERIAL
+        chunk_size = int(budget_bytes / row_length)
+        reasons.append(
+            f"Decoding serially: {decoded_bytes / 1e6:.1f} MB decoded on {cpus} "
+            "available CPU(s) does not repay the cost of starting worker processes."
+        )
+    elif header.is_compressed:
+        parallelism = ACROSS_CHUNKS
+        processes = min(cpus, n_rows)
+        chunk_size = int(budget_bytes / (row_length * processes))
+        reasons.append(
+            f"Decoding whole chunks in {processes} processes: compressed pages hold "
+            "a variable number of rows, so splitting one chunk would make every "
+            "worker walk the pages before its first row."
+        )
+        reasons.append(
+            f"Chunk budget of {config.chunk_size_in_gb} GB is shared by the "
+            f"{processes} chunks decoded at once."
+        )
+    else:
+        parallelism = WITHIN_CHUNK
+        processes = cpus
+        chunk_size = int(budget_bytes / row_length)
+        reasons.append(
+            f"Splitting each chunk across {processes} processes: uncompressed rows "
+            "sit at fixed page offsets, so every worker seeks straight to its rows."
+        )
+
+    if parallelism == ACROSS_CHUNKS:
+        # leave at least one chunk for every process
+        chunk_size = min(chunk_size, math.ceil(n_rows / processes))
+    chunk_size = max(min(chunk_size, n_rows), 1)
+    reasons.append(
+        f"Reading {chunk_size} rows per chunk at about {row_length:.0f} decoded "
+        f"bytes per row ({math.ceil(n_rows / chunk_size)} chunks)."
+    )
+
+    plan = ReadPlan(
+        chunk_size=chunk_size,
+        processes=processes,
+        parallelism=parallelism,
+        compression=header.compression,
+        reasons=reasons,
+    )
+    for reason in reasons:
+        config.logger.info(f"Read plan for {filepath.name}: {reason}")
+    return plan
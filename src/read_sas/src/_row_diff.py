@@ -0,0 +1,349 @@
+"""Diff a new SAS extract against the previous conversion by row hash.
+
+Every row is hashed with a vectorized Polars expression as the new file is
+decoded, and compared with the hash index stored next to the previous Parquet
+output. With key columns a row is inserted, updated or unchanged by key;
+without them rows are matched by content, so a changed row is a delete plus an
+insert. The inserted, updated and deleted rows are written as Parquet, and the
+new conversion and its hash index replace the previous ones for the next diff.
+
+Polars row hashes are only stable within a Polars version, so the index
+records the version it was built with and is rebuilt from the previous Parquet
+output when it differs.
+"""
+
+from __future__ import annotations
+import json
+from contextlib import ExitStack
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable
+import polars as pl
+import pyarrow.parquet as pq
+from read_sas.src._arrow_tables import ParquetSink
+from read_sas.src._config import Config
+from read_sas.src._file_lock import atomic_write
+from read_sas.src._sas_reader import decoded_chunks
+from read_sas.src.__format_filepath import _format_filepath
+
+ROW_HASH = "__row_hash"
+OCCURRENCE = "__occurrence"
+HASH_SEED = 0x5A5_D1FF
+_PREVIOUS_HASH = "__previous_hash"
+_SEEN = "__seen"
+_METADATA_VERSION = b"read_sas.polars_version"
+_METADATA_KEYS = b"read_sas.key_columns"
+
+
+def hash_index_path_for(parquet_path: str | Path) -> Path:
+    """Return the path of the row hash index stored next to a parquet file."""
+    parquet_path = _format_filepath(parquet_path)
+    return parquet_path.with_name(f"{parquet_path.stem}.row_hashes.parquet")
+
+
+def row_hash(columns: list[str]) -> pl.Expr:
+    """Return an expression hashing the values of `columns` in each row."""
+    return pl.struct(columns).hash(seed=HASH_SEED).alias(ROW_HASH)
+
+
+def _index_columns(key_columns: list[str] | None) -> list[str]:
+    return [*key_columns, ROW_HASH] if key_columns else [ROW_HASH, OCCURRENCE]
+
+
+def hash_index_of_parquet(
+    parquet_path: str | Path, key_columns: list[str] | None = None
+) -> pl.DataFrame:
+    """Hash the rows of a parquet file, numbering repeats of a row when there is no key."""
+    lf = pl.scan_parquet(parquet_path)
+    columns = lf.collect_schema().names()
+    lf = lf.with_columns(row_hash(columns))
+    if not key_columns:
+        lf = lf.with_columns(
+            pl.int_range(pl.len(), dtype=pl.UInt32).over(ROW_HASH).alias(OCCURRENCE)
+        )
+    return lf.select(_index_columns(key_columns)).collect()
+
+
+def write_hash_index(
+    index: pl.DataFrame, path: str | Path, key_columns: list[str] | None = None
+) -> None:
+    """Write a hash index, recording the Polars version and keys it was built with."""
+    index.write_parquet(
+        path,
+        metadata={
+            _METADATA_VERSION.decode(): pl.__version__,
+            _METADATA_KEYS.decode(): json.dumps(key_columns or []),
+        },
+    )
+
+
+def read_hash_index(
+    path: str | Path, key_columns: list[str] | None = None
+) -> pl.DataFrame | None:
+    """Return a stored hash index, or None if it is missing or was built differently."""
+    try:
+        metadata = pq.read_metadata(path).metadata or {}
+    except (FileNotFoundError, OSError):
+        return None
+    if metadata.get(_METADATA_VERSION) != pl.__version__.encode() or json.loads(
+        metadata.get(_METADATA_KEYS, b"null")
+    ) != (key_columns or []):
+        return None
+    return pl.read_parquet(path)
+
+
+class RowDiffer:
+    """Classify the rows of each new chunk against the previous hash index.
+
+    Parameters
+    ----------
+    previous : pl.DataFrame | None
+        The hash index of the previous conversion, or None if there is none.
+    key_columns : list[str] | None
+        The columns identifying a row. Without them rows are matched by
+        content, and repeated rows by how many times they occur.
+    """
+
+    def __init__(
+        self, previous: pl.DataFrame | None, key_columns: list[str] | None = None
+    ) -> None:
+        self.key_columns = list(key_columns or [])
+        self.on = _index_columns(self.key_columns)
+        self.previous = previous
+        if (
+            previous is not None
+            and self.key_columns
+            and previous.select(self.key_columns).is_duplicated().any()
+        ):
+            raise ValueError(
+                f"The previous conversion has repeated keys {self.key_columns}."
+            )
+        self._parts: list[pl.DataFrame] = []
+        self._seen = pl.DataFrame(schema={ROW_HASH: pl.UInt64, _SEEN: pl.UInt32})
+
+    def _hash(self, df: pl.DataFrame) -> pl.DataFrame:
+        hashed = df.with_columns(row_hash(df.columns))
+        if self.key_columns:
+            return hashed
+        # number repeats of a row across chunks, in file order
+        hashed = hashed.with_columns(
+            pl.int_range(pl.len(), dtype=pl.UInt32).over(ROW_HASH).alias(OCCURRENCE)
+        )
+        hashed = hashed.join(self._seen, on=ROW_HASH, how="left").with_columns(
+            (pl.col(OCCURRENCE) + pl.col(_SEEN).fill_null(0)).alias(OCCURRENCE)
+        )
+        self._seen = (
+            pl.concat(
+                [
+                    self._seen,
+                    hashed.group_by(ROW_HASH).agg(
+                        pl.len().cast(pl.UInt32).alias(_SEEN)
+                    ),
+                ]
+            )
+            .group_by(ROW_HASH)
+            .agg(pl.col(_SEEN).sum())
+        )
+        return hashed.drop(_SEEN)
+
+    def add(self, df: pl.DataFrame) -> tuple[pl.DataFrame, pl.DataFrame]:
+        """Return the inserted and updated rows of a chunk."""
+        hashed = self._hash(df)
+        self._parts.append(hashed.select(self.on))
+        if self.previous is None:
+            return df, df.clear()
+        if not self.key_columns:
+            inserted = hashed.join(self.previous, on=self.on, how="anti")
+            return inserted.select(df.columns), df.clear()
+        matched = hashed.join(
+            self.previous.rename({ROW_HASH: _PREVIOUS_HASH}),
+            on=self.key_columns,
+            how="left",
+            nulls_equal=True,
+        )
+        previous_hash = pl.col(_PREVIOUS_HASH)
+        inserted = matched.filter(previous_hash.is_null())
+        updated = matched.filter(
+            previous_hash.is_not_null() & (previous_hash != pl.col(ROW_HASH))
+        )
+        return inserted.select(df.columns), updated.select(df.columns)
+
+    def index(self) -> pl.DataFrame:
+        """Return the hash index of every row added so far."""
+        if not self._parts:
+            if self.previous is not None:
+                return self.previous.clear()
+            return pl.DataFrame(schema={ROW_HASH: pl.UInt64, OCCURRENCE: pl.UInt32})
+        index = pl.concat(self._parts)
+        if self.key_columns and index.select(self.key_columns).is_duplicated().any():
+            raise ValueError(f"The new file has repeated keys {self.key_columns}.")
+        return index
+
+    def deleted(self, index: pl.DataFrame) -> pl.DataFrame:
+        """Return the previous index entries missing from the new `index`."""
+        if self.previous is None:
+            return index.clear()
+        if self.previous.height and not index.height:
+            return self.previous
+        on = self.key_columns or self.on
+        return self.previous.join(index, on=on, how="anti", nulls_equal=True)
+
+
+def _deleted_rows(
+    previous_parquet: Path, deleted: pl.DataFrame, key_columns: list[str]
+) -> pl.LazyFrame:
+    lf = pl.scan_parquet(previous_parquet)
+    columns = lf.collect_schema().names()
+    if key_columns:
+        return lf.join(
+            deleted.lazy().select(key_columns),
+            on=key_columns,
+            how="semi",
+            nulls_equal=True,
+        )
+    return (
+        lf.with_columns(row_hash(columns))
+        .with_columns(
+            pl.int_range(pl.len(), dtype=pl.UInt32).over(ROW_HASH).alias(OCCURRENCE)
+        )
+        .join(deleted.lazy(), on=[ROW_HASH, OCCURRENCE], how="semi")
+        .select(columns)
+    )
+
+
+@dataclass
+class RowDiff:
+    """The Parquet files of rows inserted, updated and deleted since the previous conversion."""
+
+    inserted_path: Path
+    updated_path: Path
+    deleted_path: Path
+    inserted_rows: int
+    updated_rows: int
+    deleted_rows: int
+    unchanged_rows: int
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the diff as JSON-serializable values."""
+        return {
+            k: str(v) if isinstance(v, Path) else v for k, v in self.__dict__.items()
+        }
+
+
+def diff_to_parquet(
+    filepath: str | Path,
+    parquet_path: str | Path,
+    diff_dir: str | Path,
+    config: Config,
+    formatter: Callable[[pl.LazyFrame], pl.LazyFrame] | None = None,
+    column_list: list[str] | str | None = None,
+    key_columns: list[str] | str | None = None,
+    stats: dict[str, Any] | None = None,
+) -> RowDiff:
+    """Diff a sas7bdat file against its previous conversion and publish the new one.
+
+    The file is streamed chunk by chunk: each chunk's rows are hashed, the
+    inserted and updated rows are written to `diff_dir`, and the chunk is
+    appended to the new conversion. Nothing is replaced until every file has
+    been written, so a failed diff leaves the previous conversion in place.
+
+    Parameters
+    ----------
+    filepath : str | Path
+        The new sas7bdat file.
+    parquet_path : str | Path
+        The previous conversion, which the new one replaces. Its hash index is
+        stored next to it.
+    diff_dir : str | Path
+        The folder `inserted.parquet`, `updated.parquet` and `deleted.parquet`
+        are written to.
+    config : Config
+        The ReadSas configuration.
+    formatter : Callable[[pl.LazyFrame], pl.LazyFrame] | None
+        A function applied to every chunk, as in `sas_reader`.
+    column_list : list[str] | str | None
+        The columns to read, if not all of them.
+    key_columns : list[str] | str | None
+        The columns identifying a row. Without them there are no updates: a
+        changed row is deleted and inserted.
+    stats : dict[str, Any] | None
+        Filled with the read plan, as in `sas_reader`.
+
+    Returns
+    -------
+    RowDiff
+        The paths and row counts of the diff.
+    """
+    filepath = _format_filepath(filepath)
+    parquet_path = Path(parquet_path)
+    diff_dir = Path(diff_dir)
+    keys = [key_columns] if isinstance(key_columns, str) else list(key_columns or [])
+    index_path = hash_index_path_for(parquet_path)
+
+    previous_index = None
+    if parquet_path.exists():
+        previous_index = read_hash_index(index_path, keys)
+        if previous_index is None:
+            config.logger.info(f"Hashing the rows of the previous {parquet_path}.")
+            previous_index = hash_index_of_parquet(parquet_path, keys)
+    differ = RowDiffer(previous_index, keys)
+
+    diff_dir.mkdir(parents=True, exist_ok=True)
+    _, _, chunks = decoded_chunks(filepath, config, formatter, column_list, stats)
+    with ExitStack() as stack:
+        tmp = {
+            name: stack.enter_context(atomic_write(path))
+            for name, path in (
+                ("output", parquet_path),
+                ("index", index_path),
+                ("inserted", diff_dir / "inserted.parquet"),
+                ("updated", diff_dir / "updated.parquet"),
+                ("deleted", diff_dir / "deleted.parquet"),
+            )
+        }
+        sinks = {
+            name: ParquetSink(tmp[name], config.parquet_row_group_size)
+            for name in ("output", "inserted", "updated")
+        }
+        template: pl.DataFrame | None = None
+        for i, df in chunks:
+            if df is None:
+                raise ValueError(
+                    f"Chunk {i} of {filepath} could not be read, so the diff would "
+                    "be incomplete. See the log for the failing columns."
+                )
+            inserted, updated = differ.add(df)
+            sinks["output"].write(df)
+            sinks["inserted"].write(inserted)
+            sinks["updated"].write(updated)
+            template = df.clear() if template is None else template
+        for sink in sinks.values():
+            sink.close()
+
+        index = differ.index()
+        write_hash_index(index, tmp["index"], keys)
+        deleted = differ.deleted(index)
+        if previous_index is not None and deleted.height:
+            _deleted_rows(parquet_path, deleted, keys).sink_parquet(tmp["deleted"])
+        else:
+            (template if template is not None else pl.DataFrame()).write_parquet(
+                tmp["deleted"]
+            )
+
+    result = RowDiff(
+        inserted_path=diff_dir / "inserted.parquet",
+        updated_path=diff_dir / "updated.parquet",
+        deleted_path=diff_dir / "deleted.parquet",
+        inserted_rows=sinks["inserted"].rows,
+        updated_rows=sinks["updated"].rows,
+        deleted_rows=deleted.height,
+        unchanged_rows=sinks["output"].rows
+        - sinks["inserted"].rows
+        - sinks["updated"].rows,
+    )
+    config.logger.info(
+        f"Diffed {filepath.name} against {parquet_path.name}: "
+        f"{result.inserted_rows} inserted, {result.updated_rows} updated, "
+        f"{result.deleted_rows} deleted, {result.unchanged_rows} unchanged."
+    )
+    return result
@@ -0,0 +1,113 @@
+"""Read the layout of a sas7bdat file from its header and first metadata page."""
+
+from __future__ import annotations
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+from read_sas.src.__format_filepath import _format_filepath
+
+SAS7BDAT_MAGIC = bytes(12) + bytes.fromhex("c2ea8160b31411cfbd92080009c7318c181f1011")
+COMPRESSION_SIGNATURES = {b"SASYZCRL": "rle", b"SASYZCR2": "rdc"}
+_ROW_SIZE_SIGNATURE = b"\xf7\xf7\xf7\xf7"
+_COLUMN_SIZE_SIGNATURE = b"\xf6\xf6\xf6\xf6"
+_METADATA_PAGES_SCANNED = 4
+
+
+@dataclass(frozen=True)
+class Sas7bdatHeader:
+    """Storage layout of a sas7bdat file."""
+
+    header_length: int
+    page_size: int
+    page_count: int
+    row_length: int | None
+    row_count: int | None
+    column_count: int | None
+    compression: str | None
+    is_64bit: bool
+    little_endian: bool
+
+    @property
+    def is_compressed(self) -> bool:
+        """Return True if rows are stored RLE (CHAR) or RDC (BINARY) compressed."""
+        return self.compression is not None
+
+    @property
+    def decoded_bytes(self) -> int | None:
+        """Return the size of the rows once decompressed, if the layout is known."""
+        if self.row_length is None or self.row_count is None:
+            return None
+        return self.row_length * self.row_count
+
+
+def _unpack(fmt: str, buffer: bytes, offset: int) -> int:
+    value: int = struct.unpack_from(fmt, buffer, offset)[0]
+    return value
+
+
+def _find_subheader(page: bytes, signature: bytes, is_64bit: bool, endian: str) -> int:
+    """Return the offset of a subheader in a metadata page, or -1 if it is absent."""
+    padding = b"\x00\x00\x00\x00" if is_64bit else b""
+    full = signature + padding if endian == "<" else padding + signature
+    return page.find(full)
+
+
+def sas7bdat_header(filepath: str | Path) -> Sas7bdatHeader:
+    """Parse the page layout, row length and compression of a sas7bdat file.
+
+    Only the file header and the first few metadata pages are read, so this is
+    cheap even for very large files.
+
+    Parameters
+    ----------
+    filepath : str | Path
+        The path to the sas7bdat file.
+
+    Returns
+    -------
+    Sas7bdatHeader
+        The parsed layout. Fields that could not be found on the scanned
+        metadata pages are None.
+    """
+    filepath = _format_filepath(filepath)
+    with filepath.open("rb") as f:
+        head = f.read(288)
+        if len(head) < 288 or head[: len(SAS7BDAT_MAGIC)] != SAS7BDAT_MAGIC:
+            raise ValueError(f"{filepath} is not a sas7bdat file.")
+
+        is_64bit = head[32] == 0x33
+        align = 4 if head[35] == 0x33 else 0
+        endian = "<" if head[37] == 0x01 else ">"
+        int_fmt, int_len = (f"{endian}q", 8) if is_64bit else (f"{endian}i", 4)
+
+        header_length = _unpack(f"{endian}i", head, 196 + align)
+        page_size = _unpack(f"{endian}i", head, 200 + align)
+        page_count = _unpack(int_fmt, head, 204 + align)
+
+        f.seek(header_length)
+        pages = f.read(page_size * min(page_count, _METADATA_PAGES_SCANNED))
+
+    compression = next(
+        (name for sig, name in COMPRESSION_SIGNATURES.items() if sig in pages), None
+    )
+
+    row_length = row_count = column_count = None
+    at = _find_subheader(pages, _ROW_SIZE_SIGNATURE, is_64bit, endian)
+    if at >= 0:
+        row_length = _unpack(int_fmt, pages, at + 5 * int_len)
+        row_count = _unpack(int_fmt, pages, at + 6 * int_len)
+    at = _find_subheader(pages, _COLUMN_SIZE_SIGNATURE, is_64bit, endian)
+    if at >= 0:
+        column_count = _unpack(int_fmt, pages, at + int_len)
+
+    return Sas7bdatHeader(
+        header_length=header_length,
+        page_size=page_size,
+        page_count=page_count,
+        row_length=row_length,
+        row_count=row_count,
+        column_count=column_count,
+        compression=compression,
+        is_64bit=is_64bit,
+        little_endian=endian == "<",
+    )
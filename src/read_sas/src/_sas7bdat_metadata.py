@@ -0,0 +1,18 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Any
+import pyreadstat
+from read_sas.src.__format_filepath import _format_filepath
+
+
+def sas7bdat_metadata(
+    filepath: str | Path, column_list: list[str] | None = None
+) -> Any:  # noqa: ANN401
+    """Return the pyreadstat metadata of a SAS file without reading any rows."""
+    _, meta = pyreadstat.read_sas7bdat(
+        _format_filepath(filepath),
+        disable_datetime_conversion=True,
+        usecols=column_list,
+        metadataonly=True,
+    )
+    return meta
@@ -1,5 +1,8 @@
 from __future__ import annotations
-from typing import Callable
+import logging
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Iterator
 from pathlib import Path
 import polars as pl
 from read_sas.src._config import Config
@@ -8,40 +11,279 @@ from read_sas.src._n_rows_in_sas7bdat import n_rows_in_sas7bdat
 from read_sas.src._n_gb_in_file import n_gb_in_file
 from read_sas.src.__calculate_chunk_size import _calculate_chunk_size
 from read_sas.src._timer import timer
-from read_sas.src.__read_file import _read_file
+from read_sas.src.__read_file import _read_file, _read_chunks, _format_chunk
+from read_sas.src._pipeline import Pipeline, Stage
+from read_sas.src._formatter_pool import FormatterPool
+from read_sas.src._column_profile import DataProfiler
+from read_sas.src._read_planner import ReadPlan, plan_read
+from read_sas.src._auto_tuner import auto_tuned_plan
+from read_sas.src._logger import events_enabled, log_event
+from read_sas.src._chunk_transforms import build_chunk_transforms
+from read_sas.src._memory import (
+    MemoryMonitor,
+    active_monitor,
+    fit_chunk_size,
+    monitor_memory,
+    sample_memory,
+)
+from read_sas.src._read_planner import _row_length
+from read_sas.src._sas7bdat_header import sas7bdat_header
+from read_sas.src._spill import ChunkSpiller
 
 
-@timer
-def sas_reader(
-    filepath: str | Path,
+def _collect_chunk(i: int, lf: pl.LazyFrame, config: Config) -> pl.DataFrame | None:
+    """Materialize a chunk, logging the failing columns if it cannot be collected."""
+    try:
+        # this will raise an exception if there is an error in the chunk
+        df = lf.collect()
+        if config.logger.isEnabledFor(logging.DEBUG):
+            config.logger.debug(f"Able to process chunk: {i}")
+    # any error raised while collecting sends the chunk to the column search
+    except Exception as _:  # noqa: BLE001
+        config.logger.debug(
+            f"Was not able to process chunk: {i}. Searching for column errors."
+        )
+        for col in lf.collect_schema().names():
+            try:
+                lf.select(col).collect()
+                config.logger.debug(f"Able to process column: {col}")
+            except Exception as e:  # noqa: PERF203, BLE001
+                config.logger.error(f"Error collecting column: {col} -- {e}")
+                continue
+        return None
+    sample_memory("collect")
+    return df
+
+
+def _collect_pooled_chunk(
+    i: int,
+    df: pl.DataFrame,
+    result: Future[pl.DataFrame],
     config: Config,
     formatter: Callable[[pl.LazyFrame], pl.LazyFrame],
+) -> pl.DataFrame | None:
+    """Wait for a chunk formatted in the pool, re-running failures in-process."""
+    try:
+        output = result.result()
+        if config.logger.isEnabledFor(logging.DEBUG):
+            config.logger.debug(f"Able to process chunk: {i}")
+    # whatever failed in the pool is run again in-process, where it can be traced
+    except Exception as e:  # noqa: BLE001
+        config.logger.debug(
+            f"Formatter failed in the process pool for chunk: {i} -- {e}. "
+            "Re-running it in-process."
+        )
+        return _collect_chunk(i, formatter(df.lazy()), config)
+    return output
+
+
+def _pooled_chunks(
+    filepath: Path,
+    chunk_size: int,
+    column_list: list[str] | None,
+    config: Config,
+    formatter: Callable[[pl.LazyFrame], pl.LazyFrame],
+    processes: int,
+) -> Iterator[tuple[int, pl.DataFrame | None]]:
+    """Decode chunks in order while the formatter runs on them in `processes` workers."""
+    with FormatterPool(formatter, processes) as pool:
+        decoded = (
+            (i, _collect_chunk(i, lf, config))
+            for i, lf in _read_file(filepath, chunk_size, column_list, config, None)
+        )
+        for i, df, result in pool.imap(decoded):
+            if df is None or result is None:
+                yield i, None
+            else:
+                yield i, _collect_pooled_chunk(i, df, result, config, formatter)
+
+
+def _pipelined_chunks(
+    filepath: Path,
+    chunk_size: int,
+    column_list: list[str] | None,
+    config: Config,
+    formatter: Callable[[pl.LazyFrame], pl.LazyFrame] | None,
+    stats: dict[str, Any] | None,
+) -> Iterator[tuple[int, pl.DataFrame | None]]:
+    """Decode, convert and validate chunks on separate threads.
+
+    When `config.formatter_processes` is set the formatter runs in a process
+    pool from the validate stage, which then gets one thread per process.
+    """
+    workers = config.pipeline_workers
+    pool: FormatterPool | None = None
+    validate_workers = workers.get("validate", 1)
+    if config.formatter_processes and formatter is not None:
+        pool = FormatterPool(formatter, config.formatter_processes)
+        validate_workers = max(validate_workers, config.formatter_processes)
+
+    def validate(item: tuple[int, pl.LazyFrame]) -> tuple[int, pl.DataFrame | None]:
+        i, lf = item
+        if pool is None or formatter is None:
+            return i, _collect_chunk(i, lf, config)
+        df = _collect_chunk(i, lf, config)
+        if df is None:
+            return i, None
+        return i, _collect_pooled_chunk(i, df, pool.submit(df), config, formatter)
+
+    pipeline = Pipeline(
+        enumerate(_read_chunks(str(filepath), chunk_size, column_list, config)),
+        [
+            Stage(
+                "convert",
+                lambda item: (
+                    item[0],
+                    _format_chunk(item[1], None if pool is not None else formatter),
+                ),
+                workers.get("convert", 1),
+            ),
+            Stage("validate", validate, validate_workers),
+        ],
+        queue_size=config.pipeline_queue_size,
+        source_name="decode",
+    )
+    try:
+        yield from pipeline
+    finally:
+        if pool is not None:
+            pool.close()
+
+    if config.logger.isEnabledFor(logging.INFO):
+        config.logger.info(f"Pipeline stage utilization:\n{pipeline.report()}")
+        config.logger.info(f"Pipeline bottleneck stage: {pipeline.bottleneck()}")
+    if stats is not None:
+        stats["pipeline"] = pipeline.stats
+
+
+def _read_plan(
+    filepath: Path, config: Config, n_rows: int, column_list: list[str] | str | None
+) -> ReadPlan | None:
+    """Return the tuned or planned read settings, or None to size chunks from the file size."""
+    if config.auto_tune:
+        return auto_tuned_plan(filepath, config, n_rows, column_list)
+    if config.plan_reads:
+        return plan_read(filepath, config, n_rows, column_list)
+    return None
+
+
+def decoded_chunks(
+    filepath: Path,
+    config: Config,
+    formatter: Callable[[pl.LazyFrame], pl.LazyFrame] | None,
     column_list: list[str] | str | None = None,
-) -> pl.LazyFrame:
-    """Read a SAS file in chunks and apply a formatter function to each chunk."""
-    filepath = _format_filepath(filepath)
+    stats: dict[str, Any] | None = None,
+) -> tuple[int, int, Iterator[tuple[int, pl.DataFrame | None]]]:
+    """Plan a read and return the row count, the chunk size and the formatted chunks.
+
+    Chunks are decoded as the iterator is consumed, and failed chunks are None.
+    """
+    if isinstance(column_list, str):
+        column_list = [column_list]
     n_rows_in_file = n_rows_in_sas7bdat(filepath, column_list)
-    file_size_in_gb = n_gb_in_file(filepath)
-    chunk_size = _calculate_chunk_size(config, n_rows_in_file, file_size_in_gb)
+    plan = _read_plan(filepath, config, n_rows_in_file, column_list)
+    if plan is not None:
+        config = plan.apply(config)
+        chunk_size = plan.chunk_size
+        if stats is not None:
+            stats["read_plan"] = plan
+    else:
+        file_size_in_gb = n_gb_in_file(filepath)
+        chunk_size = _calculate_chunk_size(config, n_rows_in_file, file_size_in_gb)
+    monitor = active_monitor()
+    if monitor is not None and monitor.limit_bytes is not None:
+        row_length = _row_length(
+            sas7bdat_header(filepath), filepath, n_rows_in_file, column_list
+        )
+        chunk_size = fit_chunk_size(chunk_size, row_length, monitor)
+    formatter = build_chunk_transforms(filepath, config, column_list, formatter)
 
     config.logger.info(f"Number of chunks to process: {n_rows_in_file // chunk_size}")
-    frames: list[pl.LazyFrame] = []
-    for i, lf in _read_file(filepath, chunk_size, column_list, config, formatter):
-        try:
-            lf.collect()  # this will raise an exception if there is an error in the chunk
-            frames.append(lf)
-            config.logger.debug(f"Able to process chunk: {i}")
-        except Exception as _:  # noqa: PERF203
-            config.logger.debug(
-                f"Was not able to process chunk: {i}. Searching for column errors."
+    chunks: Iterator[tuple[int, pl.DataFrame | None]]
+    if config.use_pipeline:
+        chunks = _pipelined_chunks(
+            filepath, chunk_size, column_list, config, formatter, stats
+        )
+    elif config.formatter_processes and formatter is not None:
+        chunks = _pooled_chunks(
+            filepath,
+            chunk_size,
+            column_list,
+            config,
+            formatter,
+            config.formatter_processes,
+        )
+    else:
+        chunks = (
+            (i, _collect_chunk(i, lf, config))
+            for i, lf in _read_file(
+                filepath, chunk_size, column_list, config, formatter
             )
-            for col in lf.collect_schema().names():
-                try:
-                    lf.select(col).collect()
-                    config.logger.debug(f"Able to process column: {col}")
-                except Exception as e:  # noqa: PERF203
-                    config.logger.error(f"Error collecting column: {col} -- {e}")
-                    continue
+        )
+    return n_rows_in_file, chunk_size, chunks
+
+
+def _collect_frames(
+    filepath: Path,
+    config: Config,
+    formatter: Callable[[pl.LazyFrame], pl.LazyFrame],
+    column_list: list[str] | str | None,
+    stats: dict[str, Any] | None,
+) -> pl.LazyFrame:
+    """Decode, profile and accumulate the chunks of a file into one frame."""
+    n_rows_in_file, chunk_size, chunks = decoded_chunks(
+        filepath, config, formatter, column_list, stats
+    )
+
+    profiler = DataProfiler() if config.profile_columns else None
+    spiller = ChunkSpiller.from_config(config)
+    # the spiller swaps its oldest frames for scans of their spill files in place
+    frames: list[pl.LazyFrame] = spiller.frames if spiller is not None else []
+    if spiller is not None and stats is not None:
+        stats["spiller"] = spiller
+    emit_events = events_enabled()
+    if emit_events:
+        log_event(
+            "read_start", file=str(filepath), rows=n_rows_in_file, chunk_size=chunk_size
+        )
+    started = last = time.perf_counter()
+    for i, df in chunks:
+        if emit_events:
+            now = time.perf_counter()
+            log_event(
+                "chunk" if df is not None else "chunk_failed",
+                file=str(filepath),
+                chunk=i,
+                rows=df.height if df is not None else None,
+                columns=df.width if df is not None else None,
+                bytes=df.estimated_size() if df is not None else None,
+                seconds=now - last,
+            )
+            last = now
+        if df is None:
+            continue
+        if profiler is not None:
+            profiler.update(df)
+        if spiller is not None:
+            spiller.add(df)
+        else:
+            frames.append(df.lazy())
+        sample_memory("accumulate")
+    if emit_events:
+        log_event(
+            "read_end",
+            file=str(filepath),
+            chunks=len(frames),
+            seconds=time.perf_counter() - started,
+        )
+
+    if spiller is not None:
+        config.logger.info(f"Spilled chunks: {spiller.stats()}")
+        if stats is None:
+            # nothing is left to close the spiller, but the frame still scans its files
+            spiller.keep_files_until_exit()
+    if profiler is not None and stats is not None:
+        stats["profile"] = profiler.to_dict()
 
     config.logger.debug(f"Number of chunks processed: {len(frames)}")
     config.logger.info("All chunks processed. Concatenating frames.")
@@ -51,7 +293,29 @@ def sas_reader(
         return pl.LazyFrame()
 
     output: pl.LazyFrame = pl.concat(frames, how="vertical")
-    config.logger.info(
-        f"Frames concatenated. Returning output:\n{output.collect().head()}"
-    )
+    config.logger.info("Frames concatenated.")
+    if config.logger.isEnabledFor(logging.DEBUG):
+        # only the preview rows are materialized, and only when they will be logged
+        config.logger.debug(f"Returning output:\n{output.head().collect()}")
     return output
+
+
+@timer
+def sas_reader(
+    filepath: str | Path,
+    config: Config,
+    formatter: Callable[[pl.LazyFrame], pl.LazyFrame],
+    column_list: list[str] | str | None = None,
+    stats: dict[str, Any] | None = None,
+) -> pl.LazyFrame:
+    """Read a SAS file in chunks and apply a formatter function to each chunk.
+
+    With `config.spill_budget_gb` set, chunks past the budget are spilled to
+    memory-mapped IPC files. The spiller is stored in `stats["spiller"]` and
+    its files are removed when it is closed or collected. Without `stats`, the
+    files are kept until the interpreter exits.
+    """
+    filepath = _format_filepath(filepath)
+    monitor = MemoryMonitor.from_config(config) if active_monitor() is None else None
+    with monitor_memory(monitor, stats):
+        return _collect_frames(filepath, config, formatter, column_list, stats)
@@ -0,0 +1,188 @@
+"""Clean SAS character columns and recover from mis-declared encodings.
+
+SAS stores character values in fixed-width fields padded with blanks, and the
+encoding recorded in the file header is not always the one the data was
+written in. Padding is removed with vectorized Polars expressions. Chunks that
+readstat cannot decode in the declared encoding are decoded byte-for-byte as
+Latin-1 instead, which never fails, and their strings are then re-decoded in
+the declared encoding with the invalid bytes replaced.
+"""
+
+from __future__ import annotations
+import codecs
+from pathlib import Path
+from typing import Any
+import pandas as pd
+import polars as pl
+from read_sas.src._sas7bdat_metadata import sas7bdat_metadata
+
+ERROR = "error"
+REPLACE = "replace"
+QUARANTINE = "quarantine"
+INVALID_BYTES_POLICIES = (ERROR, REPLACE, QUARANTINE)
+
+# decodes every byte to the code point of the same value, so it cannot fail
+BYTE_TRANSPARENT_ENCODING = "ISO-8859-1"
+DEFAULT_ENCODING = "UTF-8"
+
+# SAS session encoding names and the iconv names readstat understands
+SAS_ENCODINGS = {
+    "UTF8": "UTF-8",
+    "UTF-8": "UTF-8",
+    "LATIN1": "ISO-8859-1",
+    "LATIN9": "ISO-8859-15",
+    "WLATIN1": "WINDOWS-1252",
+    "WLATIN2": "WINDOWS-1250",
+    "WCYRILLIC": "WINDOWS-1251",
+    "US-ASCII": "US-ASCII",
+    "ASCII": "US-ASCII",
+}
+
+
+def normalize_encoding(encoding: str) -> str:
+    """Return the iconv name of a SAS or iconv encoding name, such as WLATIN1."""
+    name = SAS_ENCODINGS.get(encoding.strip().upper(), encoding.strip())
+    try:
+        codecs.lookup(name)
+    except LookupError as e:
+        raise ValueError(f"Unknown encoding: {encoding}.") from e
+    return name
+
+
+def sas7bdat_encoding(filepath: str | Path) -> str | None:
+    """Return the encoding declared in a sas7bdat file's header, if any."""
+    return getattr(sas7bdat_metadata(filepath), "file_encoding", None) or None
+
+
+def check_invalid_bytes_policy(policy: str) -> None:
+    """Raise a ValueError if `policy` is not a known invalid-bytes policy."""
+    if policy not in INVALID_BYTES_POLICIES:
+        raise ValueError(
+            f"Invalid bytes policy must be one of {INVALID_BYTES_POLICIES}. "
+            f"Got {policy!r}."
+        )
+
+
+def is_encoding_error(error: Exception) -> bool:
+    """Return True if readstat failed because a string did not decode."""
+    return "requested encoding" in str(error)
+
+
+def repair_invalid_bytes(
+    df: pd.DataFrame, encoding: str
+) -> tuple[pd.DataFrame, pd.Series]:
+    """Re-decode the strings of a chunk read as Latin-1 in `encoding`.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        A chunk decoded with `BYTE_TRANSPARENT_ENCODING`, so every string
+        holds the original bytes as code points.
+    encoding : str
+        The encoding the strings were written in.
+
+    Returns
+    -------
+    tuple[pd.DataFrame, pd.Series]
+        The chunk with invalid bytes replaced by U+FFFD, and a boolean mask of
+        the rows that held invalid bytes.
+    """
+    repaired = df.copy()
+    invalid = pd.Series(False, index=df.index)
+    for column in df.columns:
+        if not pd.api.types.is_string_dtype(df[column]):
+            continue
+        raw = df[column].str.encode(BYTE_TRANSPARENT_ENCODING)
+        replaced = raw.str.decode(encoding, errors="replace")
+        # replacing and dropping invalid bytes give the same text only if there are none
+        ignored = raw.str.decode(encoding, errors="ignore")
+        invalid |= df[column].notna() & (replaced != ignored)
+        repaired[column] = replaced.where(df[column].notna(), df[column])
+    return repaired, invalid
+
+
+def quarantine_frame(
+    df: pd.DataFrame, invalid: pd.Series, first_row: int
+) -> pl.DataFrame:
+    """Return the rows holding invalid bytes, with their strings as raw bytes.
+
+    The `row_number` column is the row's position in the file.
+    """
+    rows = df[invalid]
+    columns: dict[str, Any] = {
+        "row_number": [first_row + i for i, flag in enumerate(invalid) if flag]
+    }
+    for column in rows.columns:
+        if pd.api.types.is_string_dtype(rows[column]):
+            columns[column] = pl.Series(
+                column,
+                rows[column].str.encode(BYTE_TRANSPARENT_ENCODING).tolist(),
+                dtype=pl.Binary,
+            )
+        else:
+            columns[column] = pl.from_pandas(rows[column])
+    return pl.DataFrame(columns)
+
+
+class SasStringCleaner:
+    """Trim the blank padding of character columns and turn empty strings to null.
+
+    Instances are picklable, so the cleanup can run in formatter worker
+    processes.
+
+    Parameters
+    ----------
+    columns : list[str]
+        The character columns to clean.
+    trim : bool
+        Remove trailing blanks. Leading blanks are kept, since SAS does not pad
+        on the left.
+    empty_as_null : bool
+        Replace empty strings (after trimming) with null, the way SAS treats a
+        blank character value as missing.
+    """
+
+    def __init__(
+        self, columns: list[str], trim: bool = True, empty_as_null: bool = True
+    ) -> None:
+        self.columns = list(columns)
+        self.trim = trim
+        self.empty_as_null = empty_as_null
+
+    @classmethod
+    def from_metadata(
+        cls,
+        meta: Any,  # noqa: ANN401
+        trim: bool = True,
+        empty_as_null: bool = True,
+    ) -> SasStringCleaner:
+        """Plan the cleanup of the character columns in pyreadstat metadata."""
+        types = getattr(meta, "readstat_variable_types", None) or {}
+        columns = [column for column, kind in types.items() if kind == "string"]
+        return cls(columns, trim=trim, empty_as_null=empty_as_null)
+
+    def _expr(self, column: str) -> pl.Expr:
+        value = pl.col(column)
+        if self.trim:
+            value = value.str.strip_chars_end(" ")
+        if self.empty_as_null:
+            value = pl.when(value.str.len_bytes() == 0).then(None).otherwise(value)
+        return value.alias(column)
+
+    def __call__(self, lf: pl.LazyFrame) -> pl.LazyFrame:
+        """Clean the chunk's character columns."""
+        if not (self.trim or self.empty_as_null):
+            return lf
+        schema = lf.collect_schema()
+        exprs = [
+            self._expr(column)
+            for column in self.columns
+            if column in schema and schema[column] == pl.String
+        ]
+        return lf.with_columns(exprs) if exprs else lf
+
+    def __repr__(self) -> str:
+        return (
+            f"SasStringCleaner({self.columns!r}, trim={self.trim}, "
+            f"empty_as_null={self.empty_as_null})"
+        )
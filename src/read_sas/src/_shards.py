@@ -0,0 +1,400 @@
+"""Convert a SAS file as independent row-range shards that any machine can pick up.
+
+The layout under the output directory is::
+
+    manifest.json           written by `plan_shards`
+    claims/part-NNNNN       a lock held by the worker converting a shard
+    parts/part-NNNNN.parquet and part-NNNNN.json
+                            written by `run_shard`, the JSON records the checksum
+    dataset/                published by `merge_shards`
+
+Workers only coordinate through the filesystem, so the output directory has to
+live on storage every worker can see.
+"""
+
+from __future__ import annotations
+import hashlib
+import importlib
+import json
+import os
+import shutil
+import socket
+from pathlib import Path
+from typing import Any, Callable
+import polars as pl
+import pyarrow as pa
+import pyarrow.parquet as pq
+from read_sas.src._config import Config
+from read_sas.src._file_lock import FileLock, atomic_write
+from read_sas.src.__format_filepath import _format_filepath
+from read_sas.src._sas7bdat_metadata import sas7bdat_metadata
+from read_sas.src._chunk_transforms import build_chunk_transforms
+from read_sas.src._n_gb_in_file import n_gb_in_file
+from read_sas.src.__calculate_chunk_size import _calculate_chunk_size
+from read_sas.src.__read_file import _read_chunks, _format_chunk
+
+MANIFEST_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+DATASET_NAME = "dataset"
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _part_name(shard_id: int) -> str:
+    return f"part-{shard_id:05d}"
+
+
+def load_formatter(spec: str | None) -> Callable[[pl.LazyFrame], pl.LazyFrame] | None:
+    """Import a formatter from a `module:function` string."""
+    if not spec:
+        return None
+    module_name, _, attribute = spec.partition(":")
+    if not module_name or not attribute:
+        raise ValueError(
+            f"Expected a formatter of the form `module:function`, got: {spec}"
+        )
+    formatter: Callable[[pl.LazyFrame], pl.LazyFrame] = getattr(
+        importlib.import_module(module_name), attribute
+    )
+    if not callable(formatter):
+        raise TypeError(f"Formatter `{spec}` is not callable.")
+    return formatter
+
+
+def load_manifest(manifest_path: str | Path) -> dict[str, Any]:
+    """Read a shard manifest, checking its version."""
+    manifest: dict[str, Any] = json.loads(_format_filepath(manifest_path).read_text())
+    if manifest.get("version") != MANIFEST_VERSION:
+        raise ValueError(
+            f"Unsupported manifest version: {manifest.get('version')}. "
+            f"Expected {MANIFEST_VERSION}."
+        )
+    return manifest
+
+
+def plan_shards(
+    filepath: str | Path,
+    output_dir: str | Path,
+    n_shards: int | None = None,
+    rows_per_shard: int | None = None,
+    column_list: list[str] | None = None,
+    formatter: str | None = None,
+    config: Config | None = None,
+) -> Path:
+    """Split a SAS file into row-range shards and write the manifest.
+
+    Parameters
+    ----------
+    filepath : str | Path
+        The SAS file to convert.
+    output_dir : str | Path
+        The shared directory the manifest, parts and dataset are written to.
+    n_shards : int | None
+        The number of shards to split the rows into.
+    rows_per_shard : int | None
+        The number of rows in each shard. Ignored if `n_shards` is given. If
+        neither is given, each shard is one chunk of `config.chunk_size_in_gb`.
+    column_list : list[str] | None
+        The columns to convert. If None, all columns are converted.
+    formatter : str | None
+        An optional `module:function` formatter every worker will apply.
+    config : Config | None
+        The configuration used to size the decode chunks.
+
+    Returns
+    -------
+    Path
+        The path to the written manifest.
+    """
+    config = config or Config()
+    filepath = _format_filepath(filepath).resolve()
+    output_dir = _format_filepath(output_dir)
+    load_formatter(formatter)  # fail at planning time rather than on every worker
+
+    n_rows = int(sas7bdat_metadata(filepath, column_list).number_rows)
+    if n_rows <= 0:
+        raise ValueError(
+            f"Number of rows in file must be a positive number. Got {n_rows}."
+        )
+    chunk_size = max(_calculate_chunk_size(config, n_rows, n_gb_in_file(filepath)), 1)
+
+    if n_shards is not None:
+        if n_shards <= 0:
+            raise ValueError(
+                f"Number of shards must be a positive number. Got {n_shards}."
+            )
+        rows_per_shard = -(-n_rows // n_shards)
+    elif rows_per_shard is None:
+        rows_per_shard = chunk_size
+    if rows_per_shard <= 0:
+        raise ValueError(
+            f"Rows per shard must be a positive number. Got {rows_per_shard}."
+        )
+
+    stat = filepath.stat()
+    manifest: dict[str, Any] = {
+        "version": MANIFEST_VERSION,
+        "source": str(filepath),
+        "source_size": stat.st_size,
+        "source_mtime_ns": stat.st_mtime_ns,
+        "n_rows": n_rows,
+        "column_list": column_list,
+        "formatter": formatter,
+        "chunk_size": min(chunk_size, rows_per_shard),
+        "shards": [
+            {
+                "id": shard_id,
+                "row_offset": row_offset,
+                "row_limit": min(rows_per_shard, n_rows - row_offset),
+            }
+            for shard_id, row_offset in enumerate(range(0, n_rows, rows_per_shard))
+        ],
+    }
+
+    for sub in ("claims", "parts"):
+        (output_dir / sub).mkdir(parents=True, exist_ok=True)
+    manifest_path = output_dir / MANIFEST_NAME
+    with atomic_write(manifest_path) as tmp:
+        tmp.write_text(json.dumps(manifest, indent=2))
+    config.logger.info(
+        f"Planned {len(manifest['shards'])} shards of up to {rows_per_shard} rows "
+        f"for {filepath} in {manifest_path}."
+    )
+    return manifest_path
+
+
+def _check_source(manifest: dict[str, Any]) -> Path:
+    source = Path(manifest["source"])
+    stat = source.stat()
+    if (stat.st_size, stat.st_mtime_ns) != (
+        manifest["source_size"],
+        manifest["source_mtime_ns"],
+    ):
+        raise ValueError(
+            f"Source file {source} changed since the manifest was planned. Re-run `plan`."
+        )
+    return source
+
+
+def run_shard(
+    manifest_path: str | Path, shard_id: int, config: Config | None = None
+) -> Path:
+    """Convert one shard to a Parquet part and record its checksum.
+
+    The part is written under a temporary name and renamed into place, so a
+    crashed worker never leaves a partial part behind.
+    """
+    config = config or Config()
+    manifest_path = _format_filepath(manifest_path)
+    manifest = load_manifest(manifest_path)
+    shards = {shard["id"]: shard for shard in manifest["shards"]}
+    if shard_id not in shards:
+        raise ValueError(f"Shard {shard_id} is not in the manifest {manifest_path}.")
+    shard = shards[shard_id]
+    source = _check_source(manifest)
+    formatter = build_chunk_transforms(
+        source, config, manifest["column_list"], load_formatter(manifest["formatter"])
+    )
+
+    parts = manifest_path.parent / "parts"
+    part = parts / f"{_part_name(shard_id)}.parquet"
+    tmp = parts / f".{part.name}.{socket.gethostname()}.{os.getpid()}.tmp"
+
+    rows_read = 0
+    rows_written = 0
+    writer: pq.ParquetWriter | None = None
+    try:
+        for df in _read_chunks(
+            str(source),
+            manifest["chunk_size"],
+            manifest["column_list"],
+            config,
+            offset=shard["row_offset"],
+            limit=shard["row_limit"],
+        ):
+            rows_read += len(df)
+            table = _format_chunk(df, formatter).collect().to_arrow()
+            if writer is None:
+                writer = pq.ParquetWriter(tmp, table.schema)
+            writer.write_table(table.cast(writer.schema))
+            rows_written += table.num_rows
+        if writer is None:
+            raise ValueError(f"Shard {shard_id} did not return any rows.")
+        writer.close()
+        writer = None
+        tmp.replace(part)
+    finally:
+        if writer is not None:
+            writer.close()
+        tmp.unlink(missing_ok=True)
+
+    record = {
+        "id": shard_id,
+        "row_offset": shard["row_offset"],
+        "row_limit": shard["row_limit"],
+        "rows_read": rows_read,
+        "rows_written": rows_written,
+        "sha256": _sha256(part),
+        "host": socket.gethostname(),
+    }
+    with atomic_write(parts / f"{_part_name(shard_id)}.json") as record_tmp:
+        record_tmp.write_text(json.dumps(record, indent=2))
+    config.logger.info(
+        f"Shard {shard_id} converted: {rows_read} rows read, {rows_written} written to {part}."
+    )
+    return part
+
+
+def _claim(manifest_path: Path, shard_id: int, config: Config) -> FileLock | None:
+    """Claim a shard, returning None if a live worker already has it.
+
+    The claim is a `FileLock`, refreshed while the shard converts. The claim of
+    a worker that was killed, or whose host stopped refreshing it for
+    `lock_stale_seconds`, is broken so the shard can be retried.
+    """
+    claim = FileLock(
+        manifest_path.parent / "claims" / _part_name(shard_id),
+        timeout=0,
+        stale_after=config.lock_stale_seconds,
+        logger=config.logger,
+    )
+    try:
+        claim.acquire()
+    except TimeoutError:
+        return None
+    return claim
+
+
+def run_worker(
+    manifest_path: str | Path,
+    config: Config | None = None,
+    max_shards: int | None = None,
+) -> list[int]:
+    """Claim and convert shards until none are left, returning the ids converted."""
+    config = config or Config()
+    manifest_path = _format_filepath(manifest_path)
+    manifest = load_manifest(manifest_path)
+    parts = manifest_path.parent / "parts"
+
+    converted: list[int] = []
+    for shard in manifest["shards"]:
+        if max_shards is not None and len(converted) >= max_shards:
+            break
+        shard_id = shard["id"]
+        record = parts / f"{_part_name(shard_id)}.json"
+        if record.exists():
+            continue
+        claim = _claim(manifest_path, shard_id, config)
+        if claim is None:
+            continue
+        try:
+            # another worker may have finished the shard before it was claimed
+            if record.exists():
+                continue
+            run_shard(manifest_path, shard_id, config)
+        finally:
+            # a failed shard's claim is released so another worker can retry it
+            claim.release()
+        converted.append(shard_id)
+    return converted
+
+
+def _validate_parts(manifest: dict[str, Any], parts: Path) -> list[dict[str, Any]]:
+    """Check the converted parts against the manifest, returning their records."""
+    records = []
+    missing = []
+    for shard in manifest["shards"]:
+        record_path = parts / f"{_part_name(shard['id'])}.json"
+        if not record_path.exists():
+            missing.append(shard["id"])
+            continue
+        records.append(json.loads(record_path.read_text()))
+    if missing:
+        raise ValueError(f"Shards not converted yet: {missing}.")
+
+    expected_offset = 0
+    for record in sorted(records, key=lambda r: r["row_offset"]):
+        if record["row_offset"] != expected_offset:
+            raise ValueError(
+                f"Shard {record['id']} starts at row {record['row_offset']}, "
+                f"expected {expected_offset}."
+            )
+        if record["rows_read"] != record["row_limit"]:
+            raise ValueError(
+                f"Shard {record['id']} read {record['rows_read']} rows, "
+                f"expected {record['row_limit']}."
+            )
+        expected_offset += record["row_limit"]
+    if expected_offset != manifest["n_rows"]:
+        raise ValueError(
+            f"Shards cover {expected_offset} rows, expected {manifest['n_rows']}."
+        )
+
+    schema: pa.Schema | None = None
+    for record in records:
+        part = parts / f"{_part_name(record['id'])}.parquet"
+        if _sha256(part) != record["sha256"]:
+            raise ValueError(f"Checksum mismatch for {part}.")
+        part_schema = pq.read_schema(part)
+        if schema is None:
+            schema = part_schema
+        elif not part_schema.equals(schema):
+            raise ValueError(f"Schema of {part} differs from the other parts.")
+    return records
+
+
+def merge_shards(
+    manifest_path: str | Path, overwrite: bool = False, config: Config | None = None
+) -> Path:
+    """Validate every part against the manifest and publish the dataset.
+
+    Checks that the shards cover every row exactly once, that each part still
+    matches its recorded checksum and that all parts share one schema. The
+    dataset directory is assembled under a temporary name and renamed into
+    place, so readers never see a partial dataset.
+    """
+    config = config or Config()
+    manifest_path = _format_filepath(manifest_path)
+    manifest = load_manifest(manifest_path)
+    root = manifest_path.parent
+    parts = root / "parts"
+
+    records = _validate_parts(manifest, parts)
+
+    dataset = root / DATASET_NAME
+    if dataset.exists():
+        if not overwrite:
+            raise ValueError(f"Dataset {dataset} already exists.")
+        shutil.rmtree(dataset)
+
+    staging = root / f".{DATASET_NAME}.{os.getpid()}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir()
+    try:
+        for record in records:
+            part = parts / f"{_part_name(record['id'])}.parquet"
+            try:
+                os.link(part, staging / part.name)
+            except OSError:
+                shutil.copy2(part, staging / part.name)
+        dataset_manifest = {
+            "source": manifest["source"],
+            "n_rows": manifest["n_rows"],
+            "rows_written": sum(r["rows_written"] for r in records),
+            "parts": {f"{_part_name(r['id'])}.parquet": r["sha256"] for r in records},
+        }
+        with atomic_write(staging / "_manifest.json") as tmp:
+            tmp.write_text(json.dumps(dataset_manifest, indent=2))
+        (staging / "_SUCCESS").touch()
+        staging.replace(dataset)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+    config.logger.info(f"Published {len(records)} parts to {dataset}.")
+    return dataset
@@ -0,0 +1,318 @@
+"""Share one decoded copy of a table between the processes on a host.
+
+The first process to attach a table writes it as an uncompressed Arrow IPC
+file in the registry folder, which defaults to `/dev/shm` so the file lives in
+shared memory. Every process attaching the same fingerprint memory-maps that
+file, so they all read the same pages instead of each holding its own copy.
+Each attachment leaves a reference file named after its process. Entries with
+no live references are evicted least recently used first once the registry
+passes its size limit.
+"""
+
+from __future__ import annotations
+import atexit
+import hashlib
+import json
+import logging
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable
+import polars as pl
+import pyarrow as pa
+from read_sas.src._config import Config
+from read_sas.src._file_lock import FileLock, _owner_is_dead, atomic_write
+from read_sas.src._memory import GB
+
+# tmpfs, so registered tables are held in shared memory rather than on disk
+SHM_DIR = Path("/dev/shm")  # noqa: S108
+REGISTRY_NAME = "read_sas"
+
+_attached: set[SharedTable] = set()
+_attached_lock = threading.Lock()
+
+
+def default_registry_dir() -> Path:
+    """Return the registry folder in shared memory, or in the temp folder without it."""
+    parent = SHM_DIR if SHM_DIR.is_dir() else Path(tempfile.gettempdir())
+    return parent / REGISTRY_NAME
+
+
+def fingerprint_key(fingerprint: dict[str, Any]) -> str:
+    """Return the registry key of a conversion fingerprint."""
+    encoded = json.dumps(fingerprint, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()[:32]
+
+
+def _memory_map(path: Path) -> pa.Table:
+    """Return a table whose buffers point into the memory-mapped file."""
+    return pa.ipc.open_file(pa.memory_map(str(path))).read_all()
+
+
+class SharedTable:
+    """A table attached from the registry, held until `release` is called.
+
+    Parameters
+    ----------
+    key : str
+        The registry key of the table.
+    table : pa.Table
+        The memory-mapped table.
+    reference : Path
+        The reference file keeping the entry from being evicted.
+    """
+
+    def __init__(self, key: str, table: pa.Table, reference: Path) -> None:
+        self.key = key
+        self.table = table
+        self.reference = reference
+        self._frame: pl.DataFrame | None = None
+        with _attached_lock:
+            _attached.add(self)
+
+    @property
+    def frame(self) -> pl.DataFrame:
+        """Return the table as a polars frame sharing the mapped buffers."""
+        if self._frame is None:
+            self._frame = pl.from_arrow(self.table, rechunk=False)  # type: ignore[assignment]
+        return self._frame  # type: ignore[return-value]
+
+    @property
+    def is_attached(self) -> bool:
+        return self.reference.exists()
+
+    def release(self) -> None:
+        """Drop this process's reference so the entry can be evicted.
+
+        Frames already taken stay readable, as the mapping outlives the file.
+        """
+        with _attached_lock:
+            _attached.discard(self)
+        self.reference.unlink(missing_ok=True)
+
+    def __enter__(self) -> SharedTable:  # noqa: PYI034
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.release()
+
+
+@dataclass
+class SharedEntry:
+    """A table in the registry."""
+
+    key: str
+    path: Path
+    size_bytes: int
+    last_access: float
+    references: int
+
+
+class SharedRegistry:
+    """Memory-mapped Arrow IPC copies of decoded tables, shared by local processes.
+
+    Parameters
+    ----------
+    folder : str | Path | None
+        The registry folder. Defaults to `default_registry_dir()`.
+    max_size_in_gb : float | None
+        The total size past which unreferenced entries are evicted. None
+        keeps every entry until it is evicted explicitly.
+    logger : logging.Logger | None
+        Where attachments and evictions are logged.
+    lock_timeout_seconds : float | None
+        Seconds to wait for another process building the same entry.
+    lock_stale_seconds : float
+        Seconds without a refresh after which an entry lock is abandoned.
+    """
+
+    def __init__(
+        self,
+        folder: str | Path | None = None,
+        max_size_in_gb: float | None = None,
+        logger: logging.Logger | None = None,
+        lock_timeout_seconds: float | None = None,
+        lock_stale_seconds: float = 300.0,
+    ) -> None:
+        if max_size_in_gb is not None and max_size_in_gb < 0:
+            raise ValueError(
+                f"Maximum registry size must not be negative. Got {max_size_in_gb}."
+            )
+        self.folder = Path(folder) if folder is not None else default_registry_dir()
+        self.max_size_bytes = (
+            int(max_size_in_gb * GB) if max_size_in_gb is not None else None
+        )
+        self.logger = logger or logging.getLogger(__name__)
+        self.lock_timeout_seconds = lock_timeout_seconds
+        self.lock_stale_seconds = lock_stale_seconds
+
+    @classmethod
+    def from_config(cls, config: Config) -> SharedRegistry:
+        """Build the registry described by a ReadSas configuration."""
+        return cls(
+            config.shared_registry_dir,
+            max_size_in_gb=config.shared_registry_max_gb,
+            logger=config.logger,
+            lock_timeout_seconds=config.lock_timeout_seconds,
+            lock_stale_seconds=config.lock_stale_seconds,
+        )
+
+    def _data_path(self, key: str) -> Path:
+        return self.folder / f"{key}.arrow"
+
+    def _meta_path(self, key: str) -> Path:
+        return self.folder / f"{key}.json"
+
+    def _refs_path(self, key: str) -> Path:
+        return self.folder / f"{key}.refs"
+
+    def _lock(self, key: str, timeout: float | None) -> FileLock:
+        return FileLock(
+            self.folder / f"{key}.lock",
+            timeout=timeout,
+            stale_after=self.lock_stale_seconds,
+            logger=self.logger,
+        )
+
+    def _is_current(self, key: str, fingerprint: dict[str, Any]) -> bool:
+        try:
+            recorded = json.loads(self._meta_path(key).read_text())
+        except (FileNotFoundError, ValueError):
+            return False
+        return recorded == json.loads(json.dumps(fingerprint, default=str)) and (
+            self._data_path(key).exists()
+        )
+
+    def references(self, key: str) -> int:
+        """Return the live references to an entry, removing those of dead processes."""
+        refs = self._refs_path(key)
+        if not refs.is_dir():
+            return 0
+        host = socket.gethostname()
+        live = 0
+        for ref in refs.iterdir():
+            pid = ref.name.split(".", 1)[0]
+            if _owner_is_dead({"host": host, "pid": pid}):
+                ref.unlink(missing_ok=True)
+            else:
+                live += 1
+        return live
+
+    def attach(
+        self, fingerprint: dict[str, Any], build: Callable[[], pl.DataFrame]
+    ) -> SharedTable:
+        """Attach the table with `fingerprint`, building it with `build` if it is missing.
+
+        Processes attaching the same fingerprint at once wait for the first to
+        build it, then all map the same file.
+        """
+        key = fingerprint_key(fingerprint)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        data = self._data_path(key)
+        built = False
+        with self._lock(key, self.lock_timeout_seconds):
+            if not self._is_current(key, fingerprint):
+                started = time.perf_counter()
+                df = build()
+                with atomic_write(data) as tmp:
+                    # uncompressed so every process can map the buffers directly
+                    df.write_ipc(tmp, compression="uncompressed")
+                with atomic_write(self._meta_path(key)) as tmp:
+                    tmp.write_text(json.dumps(fingerprint, indent=2, default=str))
+                del df
+                built = True
+                self.logger.info(
+                    f"Shared {data.stat().st_size / 1e6:.1f} MB as {data} in "
+                    f"{time.perf_counter() - started:.2f}s."
+                )
+            refs = self._refs_path(key)
+            refs.mkdir(exist_ok=True)
+            reference = refs / f"{os.getpid()}.{uuid.uuid4().hex[:8]}"
+            reference.touch()
+            self._meta_path(key).touch()
+        if not built:
+            self.logger.info(f"Attached {data}, shared by {self.references(key)}.")
+        shared = SharedTable(key, _memory_map(data), reference)
+        if built:
+            self.evict()
+        return shared
+
+    def entries(self) -> list[SharedEntry]:
+        """Return the registry entries, least recently used first."""
+        if not self.folder.is_dir():
+            return []
+        entries = []
+        for data in self.folder.glob("*.arrow"):
+            key = data.stem
+            meta = self._meta_path(key)
+            try:
+                entries.append(
+                    SharedEntry(
+                        key=key,
+                        path=data,
+                        size_bytes=data.stat().st_size,
+                        last_access=(meta if meta.exists() else data).stat().st_mtime,
+                        references=self.references(key),
+                    )
+                )
+            except FileNotFoundError:
+                continue
+        return sorted(entries, key=lambda e: e.last_access)
+
+    def _remove(self, key: str) -> None:
+        self._data_path(key).unlink(missing_ok=True)
+        self._meta_path(key).unlink(missing_ok=True)
+        shutil.rmtree(self._refs_path(key), ignore_errors=True)
+
+    def evict(self, max_size_bytes: int | None = None) -> list[SharedEntry]:
+        """Evict unreferenced entries, least recently used first, until the registry fits.
+
+        Parameters
+        ----------
+        max_size_bytes : int | None
+            The size to fit in. Defaults to the registry's maximum size, and
+            nothing is evicted when neither is set. Pass 0 to evict every
+            unreferenced entry.
+        """
+        limit = max_size_bytes if max_size_bytes is not None else self.max_size_bytes
+        if limit is None:
+            return []
+        entries = self.entries()
+        total = sum(e.size_bytes for e in entries)
+        evicted = []
+        for entry in entries:
+            if total <= limit:
+                break
+            if entry.references:
+                continue
+            try:
+                with self._lock(entry.key, timeout=0):
+                    # an attachment may have landed since the entries were listed
+                    if self.references(entry.key):
+                        continue
+                    self._remove(entry.key)
+            except TimeoutError:
+                continue
+            total -= entry.size_bytes
+            evicted.append(entry)
+            self.logger.info(
+                f"Evicted {entry.path} ({entry.size_bytes / 1e6:.1f} MB) from the "
+                "shared registry."
+            )
+        return evicted
+
+
+def _release_attached() -> None:
+    with _attached_lock:
+        tables = list(_attached)
+    for table in tables:
+        table.release()
+
+
+atexit.register(_release_attached)
@@ -0,0 +1,105 @@
+"""Keep SAS special missing values (.A to .Z and ._) in compact companion columns.
+
+Without `user_missing`, pyreadstat decodes every special missing value as NaN
+and the reason it was missing is lost. With it, a numeric column holding a
+special missing becomes an object column mixing floats with the letters. Each
+chunk is split back into the float column, with the special missings as
+NaN, and a UInt8 companion column holding the ASCII code of the letter
+(`ord("A")` to `ord("Z")`, or `ord("_")`) where the value was a special
+missing, and null elsewhere. Columns pyreadstat converted to dates, datetimes
+or times keep their type.
+"""
+
+from __future__ import annotations
+import string
+from typing import Any
+import numpy as np
+import pandas as pd
+
+SPECIAL_MISSING_SUFFIX = "__missing"
+SPECIAL_MISSING_LETTERS = [*string.ascii_letters, "_"]
+# what `infer_dtype` reports for object columns holding only numbers and nulls
+_NUMERIC_KINDS = ("floating", "integer", "mixed-integer-float", "empty")
+
+
+def special_missing_column(column: str) -> str:
+    """Return the name of the companion column of `column`."""
+    return f"{column}{SPECIAL_MISSING_SUFFIX}"
+
+
+def split_special_missing(values: pd.Series) -> tuple[pd.Series, pd.Series]:
+    """Split a decoded column into its values and its special missing codes.
+
+    Numeric columns come back as float64. Columns pyreadstat converted to
+    dates, datetimes or times keep their values, with the special missings
+    set to missing.
+    """
+    if values.dtype == object:
+        special = values.isin(SPECIAL_MISSING_LETTERS).to_numpy()
+    else:
+        special = np.zeros(len(values), dtype=bool)
+    numbers = values.mask(special) if special.any() else values
+    if (
+        numbers.dtype == object
+        and pd.api.types.infer_dtype(numbers, skipna=True) in _NUMERIC_KINDS
+    ):
+        numbers = numbers.astype(np.float64)
+    raw = np.zeros(len(values), dtype=np.uint8)
+    if special.any():
+        # every special missing is a single ASCII letter or underscore
+        letters = "".join(values.to_numpy()[special].astype(str))
+        raw[special] = np.frombuffer(letters.encode("ascii"), dtype=np.uint8)
+    # the mask marks the rows without a special missing as null
+    codes = pd.Series(pd.arrays.IntegerArray(raw, ~special), index=values.index)
+    return numbers, codes
+
+
+class SasSpecialMissingSplitter:
+    """Split the special missing values of numeric columns into companion columns.
+
+    Every listed column gets a companion in every chunk, so chunks without
+    special missings have the same schema as chunks with them.
+
+    Parameters
+    ----------
+    columns : list[str]
+        The numeric columns to split.
+    """
+
+    def __init__(self, columns: list[str]) -> None:
+        self.columns = list(columns)
+
+    @classmethod
+    def from_metadata(
+        cls,
+        meta: Any,  # noqa: ANN401
+        columns: list[str] | None = None,
+    ) -> SasSpecialMissingSplitter:
+        """Plan the split of the numeric columns in pyreadstat metadata.
+
+        `columns` restricts the split to those columns.
+        """
+        types = getattr(meta, "readstat_variable_types", None) or {}
+        return cls(
+            [
+                column
+                for column, kind in types.items()
+                if kind != "string" and (columns is None or column in columns)
+            ]
+        )
+
+    def __call__(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Split a decoded chunk, adding the companion columns after the others."""
+        companions = {}
+        for column in self.columns:
+            if column not in df.columns:
+                continue
+            df[column], companions[special_missing_column(column)] = (
+                split_special_missing(df[column])
+            )
+        if not companions:
+            return df
+        return pd.concat([df, pd.DataFrame(companions, index=df.index)], axis=1)
+
+    def __repr__(self) -> str:
+        return f"SasSpecialMissingSplitter({self.columns!r})"
@@ -0,0 +1,123 @@
+"""Spill decoded chunks to Arrow IPC files once they pass a memory budget.
+
+`sas_reader` keeps every chunk until it concatenates them. With a spill
+budget, the oldest chunks held in memory are written to uncompressed IPC files
+once the chunks held pass the budget, and replaced by scans of those files.
+Polars memory-maps uncompressed IPC files, so the concatenated frame is backed
+partly by the page cache instead of the heap.
+"""
+
+from __future__ import annotations
+import atexit
+import logging
+import shutil
+import tempfile
+import weakref
+from pathlib import Path
+from typing import Any
+import polars as pl
+from read_sas.src._config import Config
+from read_sas.src._memory import GB, sample_memory
+
+
+class ChunkSpiller:
+    """Hold a read's chunks in order, spilling the oldest in-memory ones past a budget.
+
+    The spill files live until `close` is called, the spiller is garbage
+    collected, or the interpreter exits.
+
+    Parameters
+    ----------
+    budget_bytes : int
+        The bytes of chunks held in memory before the oldest are spilled.
+    spill_dir : str | Path | None
+        The folder the spill folder is made in. Defaults to the system temp
+        folder.
+    logger : logging.Logger | None
+        Where spills are logged.
+    """
+
+    def __init__(
+        self,
+        budget_bytes: int,
+        spill_dir: str | Path | None = None,
+        logger: logging.Logger | None = None,
+    ) -> None:
+        if budget_bytes < 0:
+            raise ValueError(
+                f"Spill budget must be a non-negative number. Got {budget_bytes}."
+            )
+        self.budget_bytes = budget_bytes
+        self.spill_dir = Path(spill_dir) if spill_dir is not None else None
+        self.logger = logger or logging.getLogger(__name__)
+        self.folder: Path | None = None
+        self.frames: list[pl.LazyFrame] = []
+        # positions in `frames` of the chunks still in memory, oldest first
+        self._in_memory: list[tuple[int, pl.DataFrame]] = []
+        self.in_memory_bytes = 0
+        self.spilled_chunks = 0
+        self.spilled_bytes = 0
+        self._remove_folder: weakref.finalize | None = None
+
+    @classmethod
+    def from_config(cls, config: Config) -> ChunkSpiller | None:
+        """Return a spiller if `config` sets a spill budget, otherwise None."""
+        if config.spill_budget_gb is None:
+            return None
+        return cls(int(config.spill_budget_gb * GB), config.spill_dir, config.logger)
+
+    def add(self, df: pl.DataFrame) -> None:
+        """Keep a chunk, spilling the oldest chunks in memory if it passes the budget."""
+        self._in_memory.append((len(self.frames), df))
+        self.frames.append(df.lazy())
+        self.in_memory_bytes += int(df.estimated_size())
+        while self._in_memory and self.in_memory_bytes > self.budget_bytes:
+            self._spill(*self._in_memory.pop(0))
+
+    def _spill(self, position: int, df: pl.DataFrame) -> None:
+        if self.folder is None:
+            if self.spill_dir is not None:
+                self.spill_dir.mkdir(parents=True, exist_ok=True)
+            self.folder = Path(tempfile.mkdtemp(prefix="spill_", dir=self.spill_dir))
+            # runs on close, when the spiller is collected, or at exit
+            self._remove_folder = weakref.finalize(
+                self, shutil.rmtree, self.folder, ignore_errors=True
+            )
+        path = self.folder / f"chunk_{position:06d}.arrow"
+        size = int(df.estimated_size())
+        # uncompressed so the scan can memory-map the file
+        df.write_ipc(path, compression="uncompressed")
+        self.frames[position] = pl.scan_ipc(path)
+        self.in_memory_bytes -= size
+        self.spilled_chunks += 1
+        self.spilled_bytes += size
+        self.logger.debug(f"Spilled chunk {position} ({size / 1e6:.1f} MB) to {path}.")
+        sample_memory("spill")
+
+    def stats(self) -> dict[str, Any]:
+        """Return how much was spilled and where."""
+        return {
+            "spilled_chunks": self.spilled_chunks,
+            "spilled_bytes": self.spilled_bytes,
+            "in_memory_bytes": self.in_memory_bytes,
+            "folder": str(self.folder) if self.folder is not None else None,
+        }
+
+    def keep_files_until_exit(self) -> None:
+        """Keep the spill files after the spiller is collected, until the interpreter exits.
+
+        For frames that scan the spill files but outlive the spiller.
+        """
+        if self._remove_folder is not None and self.folder is not None:
+            self._remove_folder.detach()
+            atexit.register(shutil.rmtree, self.folder, ignore_errors=True)
+        self._remove_folder = None
+
+    def close(self) -> None:
+        """Remove the spill files. Frames scanning them can no longer be collected."""
+        if self._remove_folder is not None:
+            self._remove_folder()
+        elif self.folder is not None:
+            shutil.rmtree(self.folder, ignore_errors=True)
+        self._remove_folder = None
+        self.folder = None
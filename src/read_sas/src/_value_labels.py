@@ -0,0 +1,119 @@
+"""Apply the value labels of a SAS format catalog as Enum columns.
+
+A `formats.sas7bcat` catalog maps the values of each user-defined format to
+labels, and the file's metadata names the format of each column. Labelled
+columns are mapped from codes to an Enum of the format's labels in one
+vectorized `replace_strict` per chunk, so each row holds a small integer code
+into the label dictionary instead of its own copy of the label string.
+"""
+
+from __future__ import annotations
+import re
+from pathlib import Path
+from typing import Any
+import polars as pl
+import pyreadstat
+from read_sas.src.__format_filepath import _format_filepath
+
+_WIDTH = re.compile(r"\d*\.\d*$")
+
+_catalog_cache: dict[tuple[str, int], dict[str, dict[Any, str]]] = {}
+
+
+def format_name(sas_format: str | None) -> str | None:
+    """Return the bare name of a SAS format such as `$SEXF1.`, or None."""
+    if not sas_format:
+        return None
+    name = _WIDTH.sub("", sas_format.strip().upper()).lstrip("$")
+    return name or None
+
+
+def read_format_catalog(catalog_path: str | Path) -> dict[str, dict[Any, str]]:
+    """Return the value labels of each format in a sas7bcat catalog.
+
+    The catalog is parsed once and reused until the file changes.
+    """
+    path = _format_filepath(catalog_path)
+    cache_key = (str(path.resolve()), path.stat().st_mtime_ns)
+    if cache_key not in _catalog_cache:
+        for stale in [k for k in _catalog_cache if k[0] == cache_key[0]]:
+            del _catalog_cache[stale]
+        _, meta = pyreadstat.read_sas7bcat(str(path))
+        _catalog_cache[cache_key] = {
+            format_name(name) or name: dict(labels)
+            for name, labels in (meta.value_labels or {}).items()
+        }
+    return _catalog_cache[cache_key]
+
+
+class SasValueLabeler:
+    """Replace the codes of labelled columns with an Enum of their labels.
+
+    Codes without a label become null. Instances are picklable, so the
+    labelling can run in formatter worker processes.
+
+    Parameters
+    ----------
+    columns : dict[str, dict[Any, str]]
+        The labels of each code, for each column to label.
+    """
+
+    def __init__(self, columns: dict[str, dict[Any, str]]) -> None:
+        self.columns = {column: dict(labels) for column, labels in columns.items()}
+
+    @classmethod
+    def from_metadata(
+        cls,
+        meta: Any,  # noqa: ANN401
+        catalog: dict[str, dict[Any, str]],
+    ) -> SasValueLabeler:
+        """Plan the labelling from pyreadstat metadata and a parsed catalog."""
+        formats = getattr(meta, "original_variable_types", None) or {}
+        columns = {}
+        for column, sas_format in formats.items():
+            labels = catalog.get(format_name(sas_format) or "")
+            if labels:
+                columns[column] = labels
+        return cls(columns)
+
+    def _expr(self, column: str, dtype: pl.DataType) -> pl.Expr | None:
+        labels = self.columns[column]
+        value = pl.col(column)
+        pairs: list[tuple[Any, str]]
+        if dtype == pl.String:
+            # SAS ignores trailing blanks when it looks a value up in a format
+            value = value.str.strip_chars_end(" ")
+            pairs = [(str(code).rstrip(" "), label) for code, label in labels.items()]
+        elif dtype.is_numeric():
+            value = value.cast(pl.Float64)
+            pairs = [
+                (float(code), label)
+                for code, label in labels.items()
+                if isinstance(code, (int, float))
+            ]
+        else:
+            return None
+        if not pairs:
+            return None
+        # every label of the format, so each chunk gets the same Enum
+        enum = pl.Enum(list(dict.fromkeys(labels.values())))
+        return value.replace_strict(
+            [code for code, _ in pairs],
+            [label for _, label in pairs],
+            default=None,
+            return_dtype=enum,
+        ).alias(column)
+
+    def __call__(self, lf: pl.LazyFrame) -> pl.LazyFrame:
+        """Label the chunk's columns that still hold codes."""
+        schema = lf.collect_schema()
+        exprs = [
+            self._expr(column, schema[column])
+            for column in self.columns
+            if column in schema
+        ]
+        exprs = [expr for expr in exprs if expr is not None]
+        return lf.with_columns(exprs) if exprs else lf
+
+    def __repr__(self) -> str:
+        return f"SasValueLabeler({list(self.columns)!r})"
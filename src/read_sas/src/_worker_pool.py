@@ -0,0 +1,209 @@
+"""A decode worker pool started once per process and reused for every chunk and file.
+
+pyreadstat's multiprocess reader starts a fresh pool for every call, and each
+of its workers imports pandas and pyreadstat again. This pool's workers import
+them once, when the pool starts, and then stay alive until the interpreter
+exits or `shutdown_worker_pool` is called.
+"""
+
+from __future__ import annotations
+import atexit
+import math
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import cpu_count, get_context
+from pathlib import Path
+from typing import Any, Callable
+import pandas as pd
+
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+
+
+def _cgroup_cpu_limit(root: Path = CGROUP_ROOT) -> float | None:
+    """Return the CPU quota of this container in CPUs, or None if it is unlimited."""
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        max_quota, max_period = (root / "cpu.max").read_text().split()
+        return None if max_quota == "max" else int(max_quota) / int(max_period)
+    except (OSError, ValueError):
+        pass
+    try:
+        quota = int((root / "cpu" / "cpu.cfs_quota_us").read_text())
+        period = int((root / "cpu" / "cpu.cfs_period_us").read_text())
+    except (OSError, ValueError):
+        return None
+    return quota / period if quota > 0 and period > 0 else None
+
+
+def available_cpus(cgroup_root: Path = CGROUP_ROOT) -> int:
+    """Return the CPUs this process may actually use.
+
+    `multiprocessing.cpu_count` counts every CPU on the host, ignoring the
+    process's CPU affinity and the container's cgroup CPU quota.
+    """
+    if hasattr(os, "sched_getaffinity"):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = cpu_count()
+    limit = _cgroup_cpu_limit(cgroup_root)
+    if limit is not None:
+        cpus = min(cpus, max(math.ceil(limit), 1))
+    return max(cpus, 1)
+
+
+def _warm_worker() -> None:
+    """Import the decoder once when a worker starts rather than for every chunk."""
+    import pyreadstat  # noqa: F401, PLC0415
+
+
+def _read_rows(
+    filepath: str, row_offset: int, row_limit: int, kwargs: dict[str, Any]
+) -> pd.DataFrame:
+    import pyreadstat  # noqa: PLC0415
+
+    df, _ = pyreadstat.read_sas7bdat(
+        filepath, row_offset=row_offset, row_limit=row_limit, **kwargs
+    )
+    return df
+
+
+class WorkerPool:
+    """Worker processes that decode row ranges of SAS files.
+
+    Parameters
+    ----------
+    processes : int
+        The number of worker processes.
+    """
+
+    def __init__(self, processes: int) -> None:
+        if processes <= 0:
+            raise ValueError(
+                f"Number of processes must be a positive number. Got {processes}."
+            )
+        self.processes = processes
+        self.pid = os.getpid()
+        self._executor = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=get_context("spawn"),
+            initializer=_warm_worker,
+        )
+
+    def submit(self, fn: Callable[..., Any], *args: Any) -> Future:  # noqa: ANN401
+        """Run `fn(*args)` in a worker process."""
+        return self._executor.submit(fn, *args)
+
+    def decode_rows(
+        self,
+        filepath: str,
+        row_offset: int,
+        row_limit: int,
+        processes: int | None = None,
+        **kwargs: Any,  # noqa: ANN401
+    ) -> pd.DataFrame:
+        """Decode a range of rows split evenly across `processes` workers.
+
+        Keyword arguments are passed on to `pyreadstat.read_sas7bdat`.
+        """
+        if row_limit <= 0:
+            raise ValueError(
+                f"Number of rows to decode must be a positive number. Got {row_limit}."
+            )
+        processes = min(processes or self.processes, row_limit)
+        step = math.ceil(row_limit / processes)
+        futures = [
+            self.submit(
+                _read_rows,
+                filepath,
+                start,
+                min(step, row_offset + row_limit - start),
+                kwargs,
+            )
+            for start in range(row_offset, row_offset + row_limit, step)
+        ]
+        frames = [future.result() for future in futures]
+        if len(frames) == 1:
+            return frames[0]
+        return pd.concat(frames, ignore_index=True)
+
+    def decode_columns(
+        self,
+        filepath: str,
+        row_offset: int,
+        row_limit: int,
+        column_groups: list[list[str]],
+        **kwargs: Any,  # noqa: ANN401
+    ) -> pd.DataFrame:
+        """Decode a range of rows with each group of columns in its own worker.
+
+        The groups are joined side by side once every group has decoded the
+        same number of rows. Keyword arguments other than `usecols` are
+        passed on to `pyreadstat.read_sas7bdat`.
+        """
+        if row_limit <= 0:
+            raise ValueError(
+                f"Number of rows to decode must be a positive number. Got {row_limit}."
+            )
+        futures = [
+            self.submit(
+                _read_rows,
+                filepath,
+                row_offset,
+                row_limit,
+                {**kwargs, "usecols": group},
+            )
+            for group in column_groups
+        ]
+        frames = [future.result() for future in futures]
+        lengths = [len(df) for df in frames]
+        if len(set(lengths)) > 1:
+            raise ValueError(
+                f"Column groups of rows {row_offset} to {row_offset + row_limit} "
+                f"of {filepath} decoded different row counts: {lengths}."
+            )
+        if len(frames) == 1:
+            return frames[0]
+        return pd.concat(frames, axis=1)
+
+    def shutdown(self) -> None:
+        """Stop the worker processes once their current work is done."""
+        self._executor.shutdown(wait=True)
+
+
+_pool: WorkerPool | None = None
+_pool_lock = threading.Lock()
+
+
+def worker_pool(processes: int) -> WorkerPool:
+    """Return the shared pool, starting it if no pool with enough workers is running."""
+    global _pool  # noqa: PLW0603
+    with _pool_lock:
+        if (
+            _pool is not None
+            and _pool.pid == os.getpid()
+            and _pool.processes >= processes
+            and not _is_broken(_pool)
+        ):
+            return _pool
+        if _pool is not None and _pool.pid == os.getpid():
+            _pool.shutdown()
+        _pool = WorkerPool(processes)
+        return _pool
+
+
+def _is_broken(pool: WorkerPool) -> bool:
+    # set by the executor when a worker dies abruptly, after which it accepts no work
+    return bool(getattr(pool._executor, "_broken", False))  # noqa: SLF001
+
+
+def shutdown_worker_pool() -> None:
+    """Stop the shared worker pool. The next multiprocess read starts a new one."""
+    global _pool  # noqa: PLW0603
+    with _pool_lock:
+        if _pool is not None and _pool.pid == os.getpid():
+            _pool.shutdown()
+        _pool = None
+
+
+atexit.register(shutdown_worker_pool)
@@ -0,0 +1,28 @@
+from __future__ import annotations
+from typing import Callable, Iterator, Optional, Tuple
+from unittest.mock import Mock
+import polars as pl
+import pytest
+from read_sas.src._config import Config
+
+DecodedChunks = Tuple[int, int, Iterator[Tuple[int, Optional[pl.DataFrame]]]]
+
+
+@pytest.fixture
+def config() -> Config:
+    """Fixture to create a config that logs to a mock."""
+    return Config(logger=Mock(), use_multiprocessing=False)
+
+
+@pytest.fixture
+def decoded_chunks() -> Callable[..., DecodedChunks]:
+    """Fixture to build what `decoded_chunks` returns for the given chunks.
+
+    A chunk given as None stands for a chunk that failed to decode.
+    """
+
+    def chunks(*frames: pl.DataFrame | None, chunk_size: int = 2) -> DecodedChunks:
+        n_rows = sum(len(frame) for frame in frames if frame is not None)
+        return n_rows, chunk_size, enumerate(frames)
+
+    return chunks
@@ -1,13 +1,13 @@
 from __future__ import annotations
 import pytest
 from unittest.mock import Mock, patch
-from multiprocessing import cpu_count
 from typing import Generator, Literal
 import pyreadstat  # type: ignore
 import pandas as pd
 from pandas.testing import assert_frame_equal
 import polars as pl
 from read_sas.src.__read_file import _read_file
+from read_sas.src._worker_pool import available_cpus
 
 
 # Mock Formatter Function
@@ -24,6 +24,14 @@ def mock_config():
     mock.disable_datetime_conversion = True
     mock.use_multiprocessing = True
     mock.num_processes = None  # Let it use the default CPU count
+    mock.decode_across_chunks = False
+    mock.encoding = None
+    mock.invalid_bytes = "error"
+    mock.reuse_worker_pool = False
+    mock.read_ahead = None
+    mock.track_memory = False
+    mock.memory_limit_gb = None
+    mock.special_missing = False
     return mock
 
 
@@ -100,10 +108,12 @@ def test__read_file(
         pyreadstat.read_sas7bdat,
         "dummy_path.sas7bdat",  # Replace this with the actual test filepath if necessary
         chunksize=chunk_size,
+        offset=0,
+        limit=0,
         usecols=column_list,
         disable_datetime_conversion=mock_config.disable_datetime_conversion,
         multiprocess=mock_config.use_multiprocessing,
-        num_processes=mock_config.num_processes or cpu_count(),
+        num_processes=mock_config.num_processes or available_cpus(),
     )
 
 
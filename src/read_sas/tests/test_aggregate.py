@@ -0,0 +1,188 @@
+from __future__ import annotations
+from pathlib import Path
+from unittest.mock import patch
+import numpy as np
+import polars as pl
+import pyreadstat
+import pytest
+from polars.testing import assert_frame_equal
+from read_sas import aggregate
+from read_sas.src._aggregate import Aggregation, StreamingAggregator
+
+TINYCOPY = Path(__file__).parents[3] / "tinycopy.sas7bdat"
+
+
+@pytest.fixture
+def frame() -> pl.DataFrame:
+    """Fixture to create a frame with null values and a null group."""
+    rng = np.random.default_rng(7)
+    n = 50_000
+    x = rng.normal(100, 15, n)
+    return pl.DataFrame(
+        {
+            "g": rng.choice(["a", "b", "c", None], n),
+            "x": pl.Series(x).scatter(rng.integers(0, n, 500), None),
+            "u": rng.integers(0, 20_000, n),
+        }
+    )
+
+
+EXACT = {
+    "s": ("x", "sum"),
+    "c": ("x", "count"),
+    "n": ("x", "len"),
+    "lo": ("x", "min"),
+    "hi": ("x", "max"),
+    "m": ("x", "mean"),
+    "v": ("x", "var"),
+    "sd": ("x", "std"),
+}
+
+
+def _aggregator(by: list[str], aggs: dict[str, tuple[str, str]]) -> StreamingAggregator:
+    return StreamingAggregator(
+        by, [Aggregation(name, column, func) for name, (column, func) in aggs.items()]
+    )
+
+
+def _expected(frame: pl.DataFrame, by: list[str]) -> pl.DataFrame:
+    x = pl.col("x")
+    exprs = [
+        x.sum().alias("s"),
+        x.count().alias("c"),
+        pl.len().alias("n"),
+        x.min().alias("lo"),
+        x.max().alias("hi"),
+        x.mean().alias("m"),
+        x.var().alias("v"),
+        x.std().alias("sd"),
+    ]
+    if not by:
+        return frame.select(exprs)
+    return frame.group_by(by, maintain_order=True).agg(exprs)
+
+
+@pytest.mark.parametrize("by", [["g"], []])
+def test_merged_partials_match_whole_table(frame, by):
+    """Test that merging chunk partials gives the aggregates of the whole table."""
+    aggregator = _aggregator(by, EXACT)
+    for chunk in frame.iter_slices(3_333):
+        aggregator.merge(aggregator.partial(chunk))
+    assert_frame_equal(
+        aggregator.result(), _expected(frame, by), check_dtypes=False, rel_tol=1e-9
+    )
+
+
+def test_groups_null_in_several_chunks_merge():
+    """Test that a group with only nulls in several chunks still merges its values."""
+    aggregator = _aggregator(["g"], EXACT)
+    chunks = [
+        pl.DataFrame({"g": ["a", "b"], "x": [None, 5.0]}),
+        pl.DataFrame({"g": ["a", "b"], "x": [None, 7.0]}),
+        pl.DataFrame({"g": ["a", "a"], "x": [1.0, 3.0]}),
+    ]
+    for chunk in chunks:
+        aggregator.merge(aggregator.partial(chunk))
+    assert_frame_equal(
+        aggregator.result(),
+        _expected(pl.concat(chunks), ["g"]),
+        check_dtypes=False,
+        rel_tol=1e-9,
+    )
+
+
+def test_partials_merge_in_any_order(frame):
+    """Test that merging is associative, so partials can finish out of order."""
+    aggregator = _aggregator(["g"], EXACT)
+    partials = [aggregator.partial(c) for c in frame.iter_slices(7_000)]
+    for partial in reversed(partials):
+        aggregator.merge(partial)
+    assert_frame_equal(
+        aggregator.result().sort("g"),
+        _expected(frame, ["g"]).sort("g"),
+        check_dtypes=False,
+        rel_tol=1e-9,
+    )
+
+
+def test_approx_n_unique(frame):
+    """Test that approximate distinct counts are within a few percent."""
+    aggregator = _aggregator(["g"], {"d": ("u", "approx_n_unique")})
+    for chunk in frame.iter_slices(5_000):
+        aggregator.merge(aggregator.partial(chunk))
+    result = aggregator.result().sort("g")
+    expected = frame.group_by("g").agg(pl.col("u").n_unique()).sort("g")
+    errors = (result["d"] / expected["u"] - 1).abs()
+    assert errors.max() < 0.05
+
+
+def test_approx_n_unique_small_and_null_groups():
+    """Test that small counts are exact and an all-null group counts zero."""
+    df = pl.DataFrame(
+        {"g": ["a"] * 10 + ["b"] * 3, "u": [str(i % 7) for i in range(10)] + [None] * 3}
+    )
+    aggregator = _aggregator(["g"], {"d": ("u", "approx_n_unique")})
+    aggregator.merge(aggregator.partial(df))
+    assert aggregator.result().to_dict(as_series=False) == {
+        "g": ["a", "b"],
+        "d": [7, 0],
+    }
+
+
+def test_result_without_chunks():
+    """Test that an empty file gives an empty frame with the output columns."""
+    assert _aggregator(["g"], {"s": ("x", "sum")}).result().columns == ["g", "s"]
+
+
+@pytest.mark.parametrize(
+    "aggs, precision, match",
+    [
+        ({"s": ("x", "median")}, 12, "must be one of"),
+        ({}, 12, "At least one"),
+        ({"s": ("x", "sum")}, 20, "Precision"),
+    ],
+)
+def test_invalid_aggregations(aggs, precision, match):
+    """Test that unknown functions, no aggregations and bad precisions are rejected."""
+    with pytest.raises(ValueError, match=match):
+        StreamingAggregator(
+            ["g"],
+            [Aggregation(name, column, func) for name, (column, func) in aggs.items()],
+            precision,
+        )
+
+
+def test_aggregate_reads_real_file(config):
+    """Test that a file is aggregated from its decoded chunks."""
+    result = aggregate(
+        TINYCOPY, None, {"n": ("i", "len"), "s": ("i", "sum")}, config=config
+    )
+    expected, _ = pyreadstat.read_sas7bdat(TINYCOPY)
+    assert result.to_dicts() == [{"n": len(expected), "s": expected["i"].sum()}]
+
+
+def test_aggregate_in_parallel(frame, config, decoded_chunks):
+    """Test that partials computed on several threads give the same result."""
+    slices = list(frame.iter_slices(4_000))
+    stats: dict = {}
+    with patch(
+        "read_sas.src._aggregate.decoded_chunks",
+        return_value=decoded_chunks(*slices, chunk_size=4_000),
+    ) as decoded:
+        result = aggregate(
+            "data.sas7bdat", "g", EXACT, config=config, workers=3, stats=stats
+        )
+    assert decoded.call_args.args[3] == ["g", "x"]
+    assert_frame_equal(
+        result, _expected(frame, ["g"]), check_dtypes=False, rel_tol=1e-9
+    )
+    assert stats["aggregate_pipeline"][1].items == len(slices)
+
+
+def test_aggregate_fails_on_unreadable_chunk(frame, config, decoded_chunks):
+    """Test that a chunk that failed to decode fails the aggregate instead of being skipped."""
+    with patch(
+        "read_sas.src._aggregate.decoded_chunks",
+        return_value=decoded_chunks(frame, None),
+    ), pytest.raises(ValueError, match="Chunk 1"):
+        aggregate("data.sas7bdat", "g", {"s": ("x", "sum")}, config=config)
@@ -0,0 +1,97 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Iterator
+from unittest.mock import Mock, patch
+import polars as pl
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyreadstat
+import pytest
+from read_sas import ReadSas
+from read_sas.src._arrow_stream import stream_arrow
+
+TINYCOPY = Path(__file__).parents[3] / "tinycopy.sas7bdat"
+
+
+def test_stream_arrow_reads_real_file(config):
+    """Test that the stream holds the same rows as pyreadstat."""
+    reader = stream_arrow(TINYCOPY, config=config)
+    assert isinstance(reader, pa.RecordBatchReader)
+    expected, _ = pyreadstat.read_sas7bdat(TINYCOPY)
+    assert reader.read_all().to_pandas().equals(expected)
+
+
+def test_stream_arrow_is_lazy(config):
+    """Test that chunks after the first are only decoded as batches are read."""
+    pulled: list[int] = []
+
+    def frames() -> Iterator[tuple[int, pl.DataFrame]]:
+        for i in range(3):
+            pulled.append(i)
+            yield i, pl.DataFrame({"a": [i, i]})
+
+    with patch(
+        "read_sas.src._arrow_stream.decoded_chunks", return_value=(6, 2, frames())
+    ):
+        reader = stream_arrow(TINYCOPY, config=config)
+        assert pulled == [0]
+        assert reader.read_next_batch().column(0).to_pylist() == [0, 0]
+        assert reader.read_next_batch().column(0).to_pylist() == [1, 1]
+        assert pulled == [0, 1]
+
+
+def test_stream_arrow_casts_chunks_to_first_schema(config, decoded_chunks):
+    """Test that later chunks are cast to the schema of the first and failed chunks skipped."""
+    chunks = decoded_chunks(
+        pl.DataFrame({"a": [1.5, 2.5]}), None, pl.DataFrame({"a": [3, 4]})
+    )
+    with patch("read_sas.src._arrow_stream.decoded_chunks", return_value=chunks):
+        reader = stream_arrow(TINYCOPY, config=config)
+        table = reader.read_all()
+    assert table.schema == pa.schema([("a", pa.float64())])
+    assert table.column("a").to_pylist() == [1.5, 2.5, 3.0, 4.0]
+
+
+def test_stream_arrow_uses_explicit_schema(config, decoded_chunks):
+    """Test that an explicit schema widens a first chunk of nulls."""
+    chunks = decoded_chunks(
+        pl.DataFrame({"a": [None, None]}), pl.DataFrame({"a": ["x", "y"]})
+    )
+    schema = pa.schema([("a", pa.large_string())])
+    with patch("read_sas.src._arrow_stream.decoded_chunks", return_value=chunks):
+        table = stream_arrow(TINYCOPY, config=config, schema=schema).read_all()
+    assert table.schema == schema
+    assert table.column("a").to_pylist() == [None, None, "x", "y"]
+
+
+def test_stream_arrow_rejects_changed_columns(config, decoded_chunks):
+    """Test that a chunk with different columns fails instead of changing the schema."""
+    chunks = decoded_chunks(pl.DataFrame({"a": [1]}), pl.DataFrame({"b": [1]}))
+    with patch("read_sas.src._arrow_stream.decoded_chunks", return_value=chunks):
+        reader = stream_arrow(TINYCOPY, config=config)
+        with pytest.raises(ValueError, match="has columns"):
+            reader.read_all()
+
+
+def test_stream_arrow_of_empty_file(config):
+    """Test that a file without rows streams no batches."""
+    with patch(
+        "read_sas.src._arrow_stream.decoded_chunks", return_value=(0, 1, iter([]))
+    ):
+        table = stream_arrow(TINYCOPY, config=config).read_all()
+    assert table.num_rows == 0
+
+
+def test_to_arrow_batches_feeds_dataset_writer(tmp_path):
+    """Test that the stream can be written by pyarrow without being collected first."""
+    reader = ReadSas(
+        TINYCOPY,
+        formatter=lambda lf: lf.with_columns(j=pl.col("i") * 2),
+        config_kwargs={"logger": Mock(), "use_multiprocessing": False},
+    )
+    ds.write_dataset(reader.to_arrow_batches(), tmp_path, format="parquet")
+    written = pl.read_parquet(tmp_path)
+    expected, _ = pyreadstat.read_sas7bdat(TINYCOPY)
+    assert written["i"].to_list() == expected["i"].tolist()
+    assert written["j"].to_list() == [v * 2 for v in expected["i"]]
+    assert not reader.output_folder.exists()
@@ -0,0 +1,166 @@
+from __future__ import annotations
+import json
+from pathlib import Path
+from typing import cast
+from unittest.mock import Mock, patch
+import pytest
+from read_sas._cli import main
+from read_sas.src._auto_tuner import (
+    FileShape,
+    TunedSettings,
+    TuningStore,
+    TuningTrial,
+    _candidates,
+    auto_tuned_plan,
+    file_shape,
+    tune,
+)
+from read_sas.src._config import Config
+from read_sas.src._read_planner import SERIAL, WITHIN_CHUNK
+
+TINYCOPY = Path(__file__).parents[3] / "tinycopy.sas7bdat"
+
+
+def _settings(**kwargs) -> TunedSettings:
+    values = {
+        "chunk_bytes": 8_000_000,
+        "processes": 2,
+        "rows_per_second": 1e6,
+        "peak_memory_bytes": 1_000,
+        "tuned_at": 0.0,
+        "source": "a.sas7bdat",
+    }
+    return TunedSettings(**{**values, **kwargs})
+
+
+def test_file_shape_key_groups_similar_files():
+    """Test that column counts and row lengths are bucketed to powers of two."""
+    assert FileShape(5, 40, None).key == "columns<=8|row_bytes<=64|uncompressed"
+    assert FileShape(7, 64, None).key == FileShape(5, 40, None).key
+    assert FileShape(900, 7200, "rle").key == "columns<=1024|row_bytes<=8192|rle"
+
+
+def test_file_shape_of_real_file():
+    """Test that the shape is read from the sas7bdat header."""
+    shape, row_length = file_shape(TINYCOPY, 1)
+    assert shape == FileShape(1, 8, None)
+    assert row_length == 8
+
+
+def test_candidates():
+    """Test that chunk sizes are fractions of the sample and processes span the CPUs."""
+    assert _candidates(1_600, 4) == [
+        (100, 1),
+        (100, 2),
+        (100, 4),
+        (400, 1),
+        (400, 2),
+        (400, 4),
+        (1_600, 1),
+        (1_600, 2),
+        (1_600, 4),
+    ]
+    assert _candidates(1, 1) == [(1, 1)]
+
+
+def test_tuning_store_round_trip(tmp_path):
+    """Test that settings are stored per shape without losing other entries."""
+    store = TuningStore(tmp_path / "tuning.json")
+    small, wide = FileShape(5, 40, None), FileShape(900, 7200, "rle")
+    assert store.get(small) is None
+    store.put(small, _settings())
+    store.put(wide, _settings(processes=1))
+    assert store.get(small) == _settings()
+    assert store.get(wide).processes == 1
+    assert set(json.loads(store.path.read_text())) == {small.key, wide.key}
+    assert not (tmp_path / "tuning.json.lock").exists()
+
+
+def test_tune_picks_the_fastest_trial_within_budget():
+    """Test that trials over the memory budget are skipped when others fit."""
+    config = Config(logger=Mock(), chunk_size_in_gb=1, num_processes=2)
+    trials: dict[tuple[int, int], TuningTrial] = {
+        (1, 1): TuningTrial(1, 1, 10.0, 100),
+        (1, 2): TuningTrial(1, 2, 50.0, 2_000_000_000),
+    }
+
+    def run_trial(*args: object) -> TuningTrial:
+        chunk_rows, processes = cast("tuple[int, int]", args[-2:])
+        return trials.get((chunk_rows, processes), TuningTrial(chunk_rows, 1, 1.0, 1))
+
+    with patch("read_sas.src._auto_tuner._run_trial", side_effect=run_trial):
+        settings = tune(TINYCOPY, config, 1)
+    assert settings.processes == 1
+    assert settings.rows_per_second == 10.0
+    assert settings.chunk_bytes == 8
+    assert settings.source == str(TINYCOPY)
+
+
+def test_tune_extrapolates_past_the_sample():
+    """Test that a whole-sample win grows to the budget, capped at the file's rows."""
+    config = Config(logger=Mock(), chunk_size_in_gb=1, num_processes=1)
+
+    def run_trial(*args: object) -> TuningTrial:
+        chunk_rows = cast(int, args[-2])
+        # 100 bytes a row, and larger chunks are faster
+        return TuningTrial(chunk_rows, 1, float(chunk_rows), chunk_rows * 100)
+
+    with patch("read_sas.src._auto_tuner._run_trial", side_effect=run_trial):
+        settings = tune(TINYCOPY, config, 100_000_000, sample_rows=1_000)
+        assert settings.chunk_bytes == 10_000_000 * 8
+        assert settings.peak_memory_bytes == 1_000_000_000
+        assert settings.rows_per_second == 1_000.0
+        settings = tune(TINYCOPY, config, 5_000_000, sample_rows=1_000)
+        assert settings.chunk_bytes == 5_000_000 * 8
+
+
+def test_tune_reads_real_file():
+    """Test that every trial reads the sample and measures memory."""
+    config = Config(logger=Mock(), num_processes=1)
+    settings = tune(TINYCOPY, config, 1)
+    assert settings.processes == 1
+    assert settings.rows_per_second > 0
+    assert settings.peak_memory_bytes > 0
+
+
+def test_tune_rejects_empty_files():
+    """Test that a file without rows cannot be tuned."""
+    with pytest.raises(ValueError, match="positive number"):
+        tune(TINYCOPY, Config(logger=Mock()), 0)
+
+
+def test_auto_tuned_plan_tunes_once_per_shape(tmp_path):
+    """Test that later reads of a similar file reuse the stored settings."""
+    config = Config(logger=Mock(), tuning_store=tmp_path / "tuning.json")
+    with patch(
+        "read_sas.src._auto_tuner.tune", return_value=_settings(chunk_bytes=80)
+    ) as tuner:
+        first = auto_tuned_plan(TINYCOPY, config, 100)
+        second = auto_tuned_plan(TINYCOPY, config, 100)
+    tuner.assert_called_once()
+    assert first == second
+    assert first.chunk_size == 10
+    assert first.processes == 2
+    assert first.parallelism == WITHIN_CHUNK
+    applied = first.apply(config)
+    assert applied.num_processes == 2
+    assert applied.use_multiprocessing
+
+
+def test_settings_to_plan_clamps_chunk_size():
+    """Test that the chunk size stays between one row and the whole file."""
+    shape = FileShape(1, 8, None)
+    assert _settings(processes=1).to_plan(10, 8.0, shape).chunk_size == 10
+    plan = _settings(chunk_bytes=1, processes=1).to_plan(10, 8.0, shape)
+    assert plan.chunk_size == 1
+    assert plan.parallelism == SERIAL
+
+
+def test_cli_tune(tmp_path, capsys):
+    """Test that the tune command benchmarks a file and stores the result."""
+    store = tmp_path / "tuning.json"
+    assert main(["tune", str(TINYCOPY), "--store", str(store)]) == 0
+    out = capsys.readouterr().out
+    output = json.loads(out[out.index("{") :])
+    assert output["shape"] == "columns<=1|row_bytes<=8|uncompressed"
+    assert output["shape"] in json.loads(store.read_text())
@@ -0,0 +1,181 @@
+from __future__ import annotations
+import json
+import os
+import time
+from pathlib import Path
+from unittest.mock import Mock, patch
+import polars as pl
+import pytest
+from read_sas import ReadSas
+from read_sas._cli import main
+from read_sas.src._cache import ACCESS_MARKER, CacheManager
+from read_sas.src._config import Config
+
+DAY = 86_400
+
+
+def _entry(root: Path, stem: str, size: int, days_ago: float) -> Path:
+    folder = root / f"temp__{stem}"
+    folder.mkdir(parents=True)
+    (folder / f"{stem}.parquet").write_bytes(b"\0" * size)
+    marker = folder / ACCESS_MARKER
+    marker.touch()
+    accessed = time.time() - days_ago * DAY
+    os.utime(marker, (accessed, accessed))
+    return folder
+
+
+@pytest.fixture
+def cache_root(tmp_path: Path) -> Path:
+    _entry(tmp_path, "old", 1_000, days_ago=30)
+    _entry(tmp_path, "warm", 2_000, days_ago=3)
+    _entry(tmp_path, "hot", 3_000, days_ago=0.1)
+    (tmp_path / "unrelated").mkdir()
+    return tmp_path
+
+
+def _names(entries) -> list[str]:
+    return [e.name for e in entries]
+
+
+def test_entries_are_listed_least_recently_used_first(cache_root):
+    entries = CacheManager(cache_root).entries()
+
+    assert _names(entries) == ["temp__old", "temp__warm", "temp__hot"]
+    assert [e.size_bytes for e in entries] == [1_000, 2_000, 3_000]
+
+
+def test_prune_without_limits_keeps_everything(cache_root):
+    assert CacheManager(cache_root).prune() == []
+    assert len(CacheManager(cache_root).entries()) == 3
+
+
+def test_prune_evicts_expired_entries(cache_root):
+    evicted = CacheManager(cache_root, ttl_in_days=7).prune()
+
+    assert _names(evicted) == ["temp__old"]
+    assert not (cache_root / "temp__old").exists()
+    assert (cache_root / "temp__warm").exists()
+
+
+def test_prune_evicts_least_recently_used_until_under_size(cache_root):
+    evicted = CacheManager(cache_root, max_size_in_gb=4_000 / 1e9).prune()
+
+    assert _names(evicted) == ["temp__old", "temp__warm"]
+    assert _names(CacheManager(cache_root).entries()) == ["temp__hot"]
+
+
+def test_prune_reserves_room_for_the_next_write(cache_root):
+    cache = CacheManager(cache_root, max_size_in_gb=6_000 / 1e9)
+
+    assert _names(cache.prune(reserve_bytes=1_500, dry_run=True)) == [
+        "temp__old",
+        "temp__warm",
+    ]
+    assert len(cache.entries()) == 3
+
+
+def test_prune_skips_pinned_and_excluded_entries(cache_root):
+    cache = CacheManager(cache_root, max_size_in_gb=0, ttl_in_days=1)
+    cache.pin("old")
+
+    evicted = cache.prune(exclude=cache_root / "temp__warm")
+
+    assert _names(evicted) == ["temp__hot"]
+    assert _names(cache.entries()) == ["temp__old", "temp__warm"]
+
+    cache.unpin("temp__old")
+    assert _names(cache.prune(exclude=cache_root / "temp__warm")) == ["temp__old"]
+
+
+def test_touch_marks_entry_as_recently_used(cache_root):
+    cache = CacheManager(cache_root)
+    cache.touch(cache_root / "temp__old")
+
+    assert _names(cache.entries())[-1] == "temp__old"
+
+
+def test_pin_unknown_entry_raises(cache_root):
+    with pytest.raises(ValueError, match="No cache entry"):
+        CacheManager(cache_root).pin("missing")
+
+
+def test_cache_manager_rejects_negative_limits(tmp_path):
+    with pytest.raises(ValueError, match="size"):
+        CacheManager(tmp_path, max_size_in_gb=-1)
+    with pytest.raises(ValueError, match="TTL"):
+        CacheManager(tmp_path, ttl_in_days=-1)
+
+
+def test_stats_summarize_cache(cache_root):
+    CacheManager(cache_root).pin("hot")
+    stats = CacheManager(cache_root, max_size_in_gb=1).stats()
+
+    assert stats["entries"] == 3
+    assert stats["pinned"] == 1
+    assert stats["total_bytes"] == 6_000
+    assert stats["max_size_bytes"] == 1_000_000_000
+    assert stats["oldest_access_age_seconds"] > 29 * DAY
+
+
+def test_read_sas_run_prunes_before_writing(cache_root):
+    frame = pl.DataFrame({"a": [1, 2, 3]})
+    with patch("read_sas._read_sas.sas_reader", return_value=frame.lazy()):
+        reader = ReadSas(
+            cache_root / "fresh.sas7bdat",
+            config_kwargs={
+                "temp_dir_parent": cache_root,
+                "cache_ttl_in_days": 7,
+                "logger": Mock(),
+            },
+        )
+        reader.run()
+
+    assert _names(CacheManager(cache_root).entries()) == [
+        "temp__warm",
+        "temp__hot",
+        "temp__fresh",
+    ]
+
+
+def test_cache_manager_from_config(tmp_path):
+    config = Config(temp_dir_parent=tmp_path, cache_max_size_in_gb=2, logger=Mock())
+    cache = CacheManager.from_config(config)
+
+    assert cache.root == tmp_path
+    assert cache.max_size_bytes == 2_000_000_000
+    assert cache.ttl_seconds is None
+
+
+def test_cli_cache_commands(cache_root, capsys):
+    root = ["cache", "--root", str(cache_root)]
+
+    assert main([*root, "ls"]) == 0
+    listed = capsys.readouterr().out.splitlines()
+    assert [line.split("\t")[0] for line in listed] == [
+        "temp__old",
+        "temp__warm",
+        "temp__hot",
+    ]
+
+    main([*root, "pin", "warm"])
+    capsys.readouterr()
+    main([*root, "ls"])
+    assert "pinned" in capsys.readouterr().out.splitlines()[1]
+
+    main(["cache", "--root", str(cache_root), "--ttl-days", "1", "prune", "--dry-run"])
+    assert capsys.readouterr().out.split() == ["would", "evict", "temp__old"]
+    assert (cache_root / "temp__old").exists()
+
+    main(["cache", "--root", str(cache_root), "--max-size-gb", "0", "prune"])
+    assert capsys.readouterr().out.split() == [
+        "evicted",
+        "temp__old",
+        "evicted",
+        "temp__hot",
+    ]
+
+    main([*root, "stats"])
+    stats = json.loads(capsys.readouterr().out)
+    assert stats["entries"] == 1
+    assert stats["pinned"] == 1
@@ -0,0 +1,94 @@
+from __future__ import annotations
+import pickle
+from datetime import date
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+import polars as pl
+from read_sas.src._chunk_transforms import (
+    ChunkTransforms,
+    build_chunk_transforms,
+    output_options,
+)
+from read_sas.src._config import Config
+from read_sas.src._sas_dates import DATE, SasDateConverter
+
+TINYCOPY = Path(__file__).parents[3] / "tinycopy.sas7bdat"
+
+
+def _double(lf: pl.LazyFrame) -> pl.LazyFrame:
+    return lf.with_columns(pl.col("n") * 2)
+
+
+def test_chunk_transforms_apply_steps_before_formatter():
+    """Test that the formatter sees the output of the built-in steps."""
+    transforms = ChunkTransforms([SasDateConverter({"d": DATE})], _double)
+    out = transforms(pl.LazyFrame({"d": [1.0], "n": [1]})).collect()
+    assert out.to_dict(as_series=False) == {"d": [date(1960, 1, 2)], "n": [2]}
+
+
+def test_chunk_transforms_are_picklable():
+    """Test that the composition can be sent to formatter worker processes."""
+    transforms = ChunkTransforms([SasDateConverter({"d": DATE})], _double)
+    restored = pickle.loads(pickle.dumps(transforms))  # noqa: S301
+    assert restored.steps[0].columns == {"d": DATE}
+    assert restored.formatter is _double
+
+
+def test_build_returns_formatter_when_disabled():
+    """Test that the metadata is not read when no transform is enabled."""
+    with patch("read_sas.src._chunk_transforms.sas7bdat_metadata") as metadata:
+        assert build_chunk_transforms("x.sas7bdat", Config(), None, _double) is _double
+    metadata.assert_not_called()
+
+
+def test_build_returns_formatter_without_temporal_columns():
+    """Test that a file without date formats keeps the formatter unchanged."""
+    config = Config(logger=Mock(), convert_dates=True)
+    assert build_chunk_transforms(TINYCOPY, config, None, _double) is _double
+
+
+def test_build_composes_date_conversion():
+    """Test that date columns found in the metadata are converted first."""
+    config = Config(logger=Mock(), convert_dates=True)
+    meta = SimpleNamespace(original_variable_types={"d": "DATE9.", "n": "BEST."})
+    with patch(
+        "read_sas.src._chunk_transforms.sas7bdat_metadata", return_value=meta
+    ) as metadata:
+        transforms = build_chunk_transforms("x.sas7bdat", config, "d", _double)
+    metadata.assert_called_once_with("x.sas7bdat", ["d"])
+    assert isinstance(transforms, ChunkTransforms)
+    assert transforms.formatter is _double
+    assert transforms.steps[0].columns == {"d": DATE}
+
+
+def test_build_composes_string_cleanup_after_dates():
+    """Test that character columns are cleaned when trimming is enabled."""
+    config = Config(logger=Mock(), convert_dates=True, trim_strings=True)
+    meta = SimpleNamespace(
+        original_variable_types={"d": "DATE9.", "s": "$20."},
+        readstat_variable_types={"d": "double", "s": "string"},
+    )
+    with patch("read_sas.src._chunk_transforms.sas7bdat_metadata", return_value=meta):
+        transforms = build_chunk_transforms("x.sas7bdat", config)
+    out = transforms(pl.LazyFrame({"d": [0.0], "s": ["a  "]})).collect()
+    assert out.to_dict(as_series=False) == {"d": [date(1960, 1, 1)], "s": ["a"]}
+
+
+def test_build_composes_value_labels(tmp_path):
+    """Test that columns with a catalog format are labelled, and the catalog is fingerprinted."""
+    catalog = tmp_path / "formats.sas7bcat"
+    catalog.write_bytes(b"catalog")
+    config = Config(logger=Mock(), format_catalog=catalog)
+    meta = SimpleNamespace(original_variable_types={"sex": "SEXF.", "n": "BEST."})
+    with patch(
+        "read_sas.src._chunk_transforms.sas7bdat_metadata", return_value=meta
+    ), patch(
+        "read_sas.src._chunk_transforms.read_format_catalog",
+        return_value={"SEXF": {1.0: "Male", 2.0: "Female"}},
+    ):
+        transforms = build_chunk_transforms("x.sas7bdat", config)
+    out = transforms(pl.LazyFrame({"sex": [2.0], "n": [2.0]})).collect()
+    assert out.to_dict(as_series=False) == {"sex": ["Female"], "n": [2.0]}
+    assert output_options(config)["format_catalog"][0] == str(catalog)
+    assert "format_catalog" not in output_options(Config())
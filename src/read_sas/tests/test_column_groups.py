@@ -0,0 +1,104 @@
+from __future__ import annotations
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+import pandas as pd
+import pyreadstat
+import pytest
+from read_sas.src._column_groups import split_columns, wide_column_groups
+from read_sas.src._config import Config
+from read_sas.src._worker_pool import shutdown_worker_pool, worker_pool
+from read_sas.src.__read_file import _read_chunks
+
+TINYCOPY = Path(__file__).parents[3] / "tinycopy.sas7bdat"
+
+
+@pytest.fixture
+def shared_pool():
+    """Stop the shared pool after the test so no worker outlives it."""
+    yield
+    shutdown_worker_pool()
+
+
+def _meta(n_columns: int, width: int = 8) -> SimpleNamespace:
+    columns = [f"c{i:04d}" for i in range(n_columns)]
+    return SimpleNamespace(
+        column_names=columns,
+        variable_storage_width=dict.fromkeys(columns, width),
+        number_rows=10,
+    )
+
+
+@pytest.mark.parametrize(
+    "widths, n_groups, expected",
+    [
+        ({"a": 8, "b": 8, "c": 8, "d": 8}, 2, [["a", "b"], ["c", "d"]]),
+        ({"a": 200, "b": 8, "c": 8, "d": 8}, 2, [["a"], ["b", "c", "d"]]),
+        ({"a": 8, "b": 8, "c": 8, "d": 200}, 3, [["a", "b"], ["c"], ["d"]]),
+        ({"a": 8, "b": 8}, 4, [["a"], ["b"]]),
+    ],
+)
+def test_split_columns_balances_width(widths, n_groups, expected):
+    """Test that groups keep file order, balance bytes and are never empty."""
+    assert split_columns(widths, n_groups) == expected
+
+
+def test_split_columns_covers_every_column():
+    """Test that many columns split into exactly the requested groups."""
+    widths = {f"c{i}": 8 + i % 7 for i in range(1_500)}
+    groups = split_columns(widths, 8)
+    assert len(groups) == 8
+    assert [c for group in groups for c in group] == list(widths)
+    sizes = [sum(widths[c] for c in group) for group in groups]
+    assert max(sizes) - min(sizes) <= 2 * max(widths.values())
+    with pytest.raises(ValueError, match="positive number"):
+        split_columns(widths, 0)
+
+
+def test_wide_column_groups_threshold():
+    """Test that only tables past the threshold, read by several processes, are split."""
+    config = Config(logger=Mock(), num_processes=4, wide_table_threshold=1_000_000)
+    with patch("pyreadstat.read_sas7bdat", return_value=(None, _meta(1_500))):
+        groups = wide_column_groups("wide.sas7bdat", None, config)
+        assert len(groups) == 4
+        # 200 columns of 1,600 bytes per row is under the threshold
+        selected = [f"c{i:04d}" for i in range(200)]
+        assert wide_column_groups("wide.sas7bdat", selected, config) is None
+        config.num_processes = 1
+        assert wide_column_groups("wide.sas7bdat", None, config) is None
+        config.num_processes, config.wide_table_threshold = 4, None
+        assert wide_column_groups("wide.sas7bdat", None, config) is None
+
+
+@pytest.mark.usefixtures("shared_pool")
+def test_decode_columns_joins_groups():
+    """Test that column groups are decoded separately and joined side by side."""
+    frames = {
+        ("a",): pd.DataFrame({"a": [1.0, 2.0]}),
+        ("b", "c"): pd.DataFrame({"b": [3.0, 4.0], "c": ["x", "y"]}),
+    }
+    pool = worker_pool(2)
+    with patch.object(
+        pool,
+        "submit",
+        side_effect=lambda *args: Mock(
+            result=Mock(return_value=frames[tuple(args[4]["usecols"])])
+        ),
+    ):
+        df = pool.decode_columns("x.sas7bdat", 0, 2, [["a"], ["b", "c"]], usecols=None)
+        assert df.to_dict("list") == {"a": [1.0, 2.0], "b": [3.0, 4.0], "c": ["x", "y"]}
+        frames[("a",)] = pd.DataFrame({"a": [1.0]})
+        with pytest.raises(ValueError, match="different row counts"):
+            pool.decode_columns("x.sas7bdat", 0, 2, [["a"], ["b", "c"]])
+
+
+@pytest.mark.usefixtures("shared_pool")
+def test_read_chunks_decodes_wide_table_by_column_group():
+    """Test that a wide table is read through column groups in the shared pool."""
+    config = Config(logger=Mock(), num_processes=2, wide_table_threshold=1)
+    expected, _ = pyreadstat.read_sas7bdat(TINYCOPY)
+    with patch(
+        "read_sas.src.__read_file.wide_column_groups", return_value=[["i"]]
+    ), patch.object(type(worker_pool(2)), "decode_rows", side_effect=AssertionError):
+        chunks = list(_read_chunks(str(TINYCOPY), 1, None, config))
+    pd.testing.assert_frame_equal(pd.concat(chunks), expected)
@@ -0,0 +1,196 @@
+from __future__ import annotations
+import json
+from datetime import date
+from pathlib import Path
+from unittest.mock import Mock, patch
+import numpy as np
+import polars as pl
+import pytest
+from read_sas import Config, ReadSas
+from read_sas.src._sas_reader import sas_reader
+from read_sas.src._column_profile import (
+    DataProfiler,
+    HyperLogLog,
+    TDigest,
+    _bit_length,
+    read_profile,
+    write_profile,
+)
+
+
+@pytest.fixture
+def frame() -> pl.DataFrame:
+    rng = np.random.default_rng(7)
+    n = 20_000
+    return pl.DataFrame(
+        {
+            "policy": [f"P{i % 5_000:05d}  " for i in range(n)],
+            "premium": rng.normal(100.0, 15.0, n),
+            "claims": rng.integers(0, 10, n),
+            "effective": [date(2020, 1, 1 + i % 28) for i in range(n)],
+        }
+    ).with_columns(
+        pl.when(pl.col("claims") == 0)
+        .then(None)
+        .otherwise(pl.col("premium"))
+        .alias("premium")
+    )
+
+
+def test_bit_length_is_exact_near_powers_of_two():
+    values = np.array([0, 1, 2, 3, 2**53 + 1, 2**63, 2**64 - 1], dtype=np.uint64)
+    assert _bit_length(values).tolist() == [0, 1, 2, 2, 54, 64, 64]
+
+
+@pytest.mark.parametrize("n_distinct", [10, 1_000, 50_000])
+def test_hyperloglog_estimate(n_distinct):
+    hll = HyperLogLog()
+    hll.update(pl.Series(np.arange(n_distinct).repeat(3)))
+    assert abs(hll.estimate() - n_distinct) <= max(2, 0.05 * n_distinct)
+
+
+def test_hyperloglog_merge_equals_single_pass():
+    values = pl.Series(np.arange(30_000))
+    whole = HyperLogLog()
+    whole.update(values)
+    left, right = HyperLogLog(), HyperLogLog()
+    left.update(values[:12_000])
+    right.update(values[10_000:])
+    assert left.merge(right).estimate() == whole.estimate()
+
+
+def test_hyperloglog_rejects_mismatched_precision():
+    with pytest.raises(ValueError):
+        HyperLogLog(10).merge(HyperLogLog(12))
+
+
+def test_tdigest_quantiles_close_to_exact():
+    values = np.random.default_rng(1).exponential(2.0, 200_000)
+    digest = TDigest()
+    for chunk in np.array_split(values, 20):
+        digest.update(chunk)
+    for q in (0.01, 0.5, 0.99):
+        exact = float(np.quantile(values, q))
+        assert digest.quantile(q) == pytest.approx(exact, rel=0.03)
+    assert digest.quantile(0.0) == values.min()
+    assert digest.quantile(1.0) == values.max()
+    assert digest.weights.size <= 200
+
+
+def test_tdigest_merge_matches_single_digest():
+    values = np.random.default_rng(2).normal(0, 1, 50_000)
+    left, right, whole = TDigest(), TDigest(), TDigest()
+    left.update(values[:25_000])
+    right.update(values[25_000:])
+    whole.update(values)
+    merged = left.merge(right)
+    assert merged.count == whole.count
+    assert merged.quantile(0.5) == pytest.approx(whole.quantile(0.5), abs=0.02)
+
+
+def test_tdigest_empty():
+    assert TDigest().quantile(0.5) is None
+
+
+def test_profile_matches_full_table(frame):
+    profiler = DataProfiler()
+    for chunk in frame.iter_slices(3_000):
+        profiler.update(chunk)
+    profile = profiler.to_dict()
+
+    assert profile["n_rows"] == frame.height
+    assert profile["n_chunks"] == 7
+    premium = profile["columns"]["premium"]
+    assert premium["null_count"] == frame["premium"].null_count()
+    assert premium["min"] == frame["premium"].min()
+    assert premium["max"] == frame["premium"].max()
+    assert premium["mean"] == pytest.approx(frame["premium"].mean())
+    assert premium["std"] == pytest.approx(frame["premium"].std())
+    assert premium["quantiles"]["0.5"] == pytest.approx(
+        frame["premium"].median(), abs=0.5
+    )
+
+    policy = profile["columns"]["policy"]
+    assert abs(policy["distinct_count"] - 5_000) < 250
+    assert policy["length"] == {"min": 8, "max": 8, "mean": 8.0}
+    assert profile["columns"]["effective"]["min"] == date(2020, 1, 1)
+    assert profile["columns"]["claims"]["distinct_count"] == 10
+
+
+def test_profiler_merge(frame):
+    left, right, whole = DataProfiler(), DataProfiler(), DataProfiler()
+    left.update(frame[:5_000])
+    right.update(frame[5_000:])
+    whole.update(frame)
+    merged = left.merge(right).to_dict()
+    expected = whole.to_dict()
+    for name in frame.columns:
+        for key in ("count", "null_count", "min", "max", "distinct_count"):
+            assert merged["columns"][name][key] == expected["columns"][name][key]
+
+
+def test_profile_sidecar_round_trip(frame, tmp_path: Path):
+    profiler = DataProfiler()
+    profiler.update(frame)
+    path = write_profile(profiler.to_dict(), tmp_path / "x.profile.json")
+    profile = read_profile(path)
+    assert profile["columns"]["effective"]["min"] == "2020-01-01"
+    assert json.loads(path.read_text()) == profile
+
+
+@patch("read_sas._read_sas.sas_reader", autospec=True)
+def test_read_sas_run_writes_profile_sidecar(
+    mock_sas_reader, frame: pl.DataFrame, tmp_path
+):
+    def fake_sas_reader(*args: object) -> pl.LazyFrame:
+        stats = args[-1]
+        assert isinstance(stats, dict)
+        profiler = DataProfiler()
+        profiler.update(frame)
+        stats["profile"] = profiler.to_dict()
+        return frame.lazy()
+
+    mock_sas_reader.side_effect = fake_sas_reader
+    reader = ReadSas(
+        "tinycopy.sas7bdat",
+        config_kwargs={
+            "temp_dir_parent": tmp_path,
+            "profile_columns": True,
+            "logger": Mock(),
+        },
+    )
+    reader.run()
+
+    assert reader.profile_path.exists()
+    assert read_profile(reader.profile_path)["n_rows"] == frame.height
+    assert reader.profile()["columns"]["claims"]["count"] == frame.height
+
+
+@patch("read_sas._read_sas.sas_reader", autospec=True)
+def test_read_sas_profile_without_sidecar(mock_sas_reader, frame, tmp_path):
+    mock_sas_reader.return_value = frame.lazy()
+    reader = ReadSas(
+        "tinycopy.sas7bdat",
+        config_kwargs={"temp_dir_parent": tmp_path, "logger": Mock()},
+    )
+    assert reader.profile()["n_rows"] == frame.height
+
+
+@patch("read_sas.src._sas_reader._read_file", autospec=True)
+@patch("read_sas.src._sas_reader.n_rows_in_sas7bdat", autospec=True)
+@patch("read_sas.src._sas_reader.n_gb_in_file", autospec=True)
+def test_sas_reader_profiles_chunks(mock_n_gb, mock_n_rows, mock_read_file, frame):
+    mock_n_rows.return_value = frame.height
+    mock_n_gb.return_value = 1.0
+    mock_read_file.return_value = [
+        (i, chunk.lazy()) for i, chunk in enumerate(frame.iter_slices(4_000))
+    ]
+    stats: dict = {}
+    sas_reader(
+        "tinycopy.sas7bdat",
+        Config(profile_columns=True, logger=Mock()),
+        None,
+        stats=stats,
+    )
+    assert stats["profile"]["n_chunks"] == 5
+    assert stats["profile"]["columns"]["claims"]["count"] == frame.height
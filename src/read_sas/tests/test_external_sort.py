@@ -0,0 +1,132 @@
+from __future__ import annotations
+from unittest.mock import Mock, patch
+import numpy as np
+import polars as pl
+import pyarrow.parquet as pq
+import pytest
+from polars.testing import assert_frame_equal
+from read_sas import ReadSas, sort_to_parquet
+from read_sas.src._external_sort import ExternalSorter
+
+
+@pytest.fixture
+def frame() -> pl.DataFrame:
+    """Fixture to create policies with repeated keys and null dates."""
+    rng = np.random.default_rng(11)
+    n = 20_000
+    return pl.DataFrame(
+        {
+            "policy": rng.choice([f"P{i:04d}" for i in range(300)], n),
+            "effective": pl.Series(rng.integers(0, 5_000, n)).scatter(
+                rng.integers(0, n, 200), None
+            ),
+            "row": np.arange(n),
+        }
+    )
+
+
+def _sorted(
+    sorter: ExternalSorter, frame: pl.DataFrame, path, chunk_rows: int = 1_500
+) -> pl.DataFrame:
+    for chunk in frame.iter_slices(chunk_rows):
+        sorter.add(chunk)
+    rows = sorter.write(path)
+    assert rows == frame.height
+    return pl.read_parquet(path)
+
+
+@pytest.mark.parametrize("descending", [False, True])
+def test_merged_runs_match_in_memory_sort(tmp_path, frame, descending):
+    """Test that merging many spilled runs gives a stable sort of the whole table."""
+    by = ["policy", "effective"]
+    with ExternalSorter(by, 100_000, descending, tmp_path / "runs") as sorter:
+        result = _sorted(sorter, frame, tmp_path / "sorted.parquet")
+        assert len(sorter.runs) > 5
+    expected = frame.sort(by, descending=descending, maintain_order=True)
+    assert_frame_equal(result.select(by), expected.select(by))
+    # rows sharing a key keep no particular order between runs
+    assert_frame_equal(result.sort([*by, "row"]), expected.sort([*by, "row"]))
+
+
+def test_runs_are_removed_on_close(tmp_path, frame):
+    """Test that closing the sorter removes its run folder."""
+    sorter = ExternalSorter(["policy"], 100_000, run_dir=tmp_path / "runs")
+    _sorted(sorter, frame, tmp_path / "sorted.parquet")
+    assert sorter.stats()["runs"] == len(sorter.runs) > 1
+    sorter.close()
+    assert list((tmp_path / "runs").iterdir()) == []
+
+
+def test_row_groups_cover_key_ranges(tmp_path, frame):
+    """Test that row groups hold whole slices of the key range for pruning."""
+    with ExternalSorter(["effective"], 100_000) as sorter:
+        for chunk in frame.drop_nulls().iter_slices(1_500):
+            sorter.add(chunk)
+        sorter.write(tmp_path / "sorted.parquet", row_group_size=2_000)
+    metadata = pq.read_metadata(tmp_path / "sorted.parquet")
+    groups = [metadata.row_group(i) for i in range(metadata.num_row_groups)]
+    assert [g.num_rows for g in groups[:-1]] == [2_000] * (len(groups) - 1)
+    column = metadata.schema.names.index("effective")
+    bounds = [
+        (g.column(column).statistics.min, g.column(column).statistics.max)
+        for g in groups
+    ]
+    assert all(hi <= lo for (_, hi), (lo, _) in zip(bounds, bounds[1:]))
+
+
+def test_small_input_is_sorted_in_memory(tmp_path, frame):
+    """Test that input under half the budget is written without runs."""
+    with ExternalSorter(["row"], 10**9, descending=True) as sorter:
+        result = _sorted(sorter, frame, tmp_path / "sorted.parquet")
+        assert sorter.runs == []
+    assert result["row"].to_list() == list(range(frame.height - 1, -1, -1))
+
+
+def test_invalid_sorter():
+    """Test that no sort columns and a non-positive budget are rejected."""
+    with pytest.raises(ValueError, match="At least one"):
+        ExternalSorter([], 1)
+    with pytest.raises(ValueError, match="budget"):
+        ExternalSorter(["a"], 0)
+
+
+def test_sort_to_parquet_fails_on_unreadable_chunk(
+    tmp_path, frame, config, decoded_chunks
+):
+    """Test that a chunk that failed to decode fails the sort instead of being dropped."""
+    with patch(
+        "read_sas.src._external_sort.decoded_chunks",
+        return_value=decoded_chunks(frame, None),
+    ), pytest.raises(ValueError, match="Chunk 1"):
+        sort_to_parquet(
+            "data.sas7bdat", tmp_path / "out.parquet", "policy", config=config
+        )
+
+
+def test_read_sas_run_sorts_output(tmp_path, frame, decoded_chunks):
+    """Test that `sort_by` publishes a sorted parquet file and changes the fingerprint."""
+    chunks = decoded_chunks(*frame.iter_slices(4_000), chunk_size=4_000)
+    reader = ReadSas(
+        "tinycopy.sas7bdat",
+        config_kwargs={
+            "temp_dir_parent": tmp_path,
+            "logger": Mock(),
+            "sort_by": ["policy", "effective"],
+            "sort_budget_gb": 0.0002,
+        },
+    )
+    with patch("read_sas.src._external_sort.decoded_chunks", return_value=chunks):
+        output = reader.run()
+    assert reader.stats["sort"]["runs"] > 1
+    assert reader.config.spill_dir == reader.output_folder / "tinycopy.spill"
+    published = pl.read_parquet(reader.parquet_path)
+    assert_frame_equal(
+        published.select("policy", "effective"),
+        frame.sort("policy", "effective").select("policy", "effective"),
+    )
+    assert len(output) == frame.height
+    assert reader.is_published()
+    # the unsorted conversion of the same file is not the one published
+    assert not ReadSas(
+        "tinycopy.sas7bdat", config_kwargs={"temp_dir_parent": tmp_path}
+    ).is_published()
@@ -0,0 +1,297 @@
+from __future__ import annotations
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from contextlib import suppress
+from pathlib import Path
+from unittest.mock import Mock, patch
+import polars as pl
+import pytest
+from read_sas import ReadSas
+from read_sas.src._cache import CacheManager
+from read_sas.src._file_lock import (
+    FileLock,
+    atomic_write,
+    is_lock_stale,
+    read_lock_owner,
+)
+
+TINYCOPY = Path(__file__).parents[3] / "tinycopy.sas7bdat"
+
+
+def _fake_lock(path: Path, host: str, pid: int, age: float = 0.0) -> None:
+    path.write_text(json.dumps({"host": host, "pid": pid, "token": "other"}))
+    stamp = time.time() - age
+    os.utime(path, (stamp, stamp))
+
+
+def _dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_file_lock_records_owner_and_releases(tmp_path):
+    path = tmp_path / "data.lock"
+    with FileLock(path) as lock:
+        owner = read_lock_owner(path)
+        assert lock.is_held
+        assert owner["pid"] == os.getpid()
+    assert not path.exists()
+    assert not lock.is_held
+
+
+def test_file_lock_times_out_while_held(tmp_path):
+    path = tmp_path / "data.lock"
+    with FileLock(path), pytest.raises(TimeoutError, match="Timed out"):
+        FileLock(path, timeout=0.2, poll_interval=0.05).acquire()
+
+
+def test_file_lock_waits_for_release(tmp_path):
+    path = tmp_path / "data.lock"
+    first = FileLock(path)
+    first.acquire()
+    threading.Timer(0.2, first.release).start()
+
+    started = time.monotonic()
+    with FileLock(path, timeout=5, poll_interval=0.02):
+        assert time.monotonic() - started >= 0.15
+
+
+def test_file_lock_breaks_lock_of_dead_process(tmp_path):
+    path = tmp_path / "data.lock"
+    _fake_lock(path, socket.gethostname(), _dead_pid())
+    assert is_lock_stale(path, stale_after=300) is not None
+
+    logger = Mock()
+    with FileLock(path, timeout=1, logger=logger):
+        assert read_lock_owner(path)["pid"] == os.getpid()
+    logger.warning.assert_called_once()
+
+
+def test_file_lock_breaks_lock_that_stopped_refreshing(tmp_path):
+    path = tmp_path / "data.lock"
+    _fake_lock(path, "another-host", 1, age=120)
+
+    with FileLock(path, timeout=1, stale_after=60):
+        assert read_lock_owner(path)["pid"] == os.getpid()
+
+
+def test_waiters_on_a_stale_lock_hold_it_one_at_a_time(tmp_path):
+    """Test that a waiter that judged a lock stale does not break the lock taken since."""
+    path = tmp_path / "data.lock"
+    _fake_lock(path, "another-host", 1, age=120)
+    judged = threading.Barrier(2)
+    holders: list[int] = []
+    overlaps: list[int] = []
+
+    def judge_together(lock_path: Path, stale_after: float) -> dict | None:
+        stale = is_lock_stale(lock_path, stale_after)
+        if stale is not None and lock_path == path and judged.n_waiting < 2:
+            # both waiters judge the dead owner's lock stale before either breaks it
+            with suppress(threading.BrokenBarrierError):
+                judged.wait(timeout=1)
+        return stale
+
+    def hold() -> None:
+        with FileLock(path, timeout=5, stale_after=60, poll_interval=0.02):
+            holders.append(threading.get_ident())
+            overlaps.append(len(holders))
+            time.sleep(0.2)
+            holders.remove(threading.get_ident())
+
+    with patch("read_sas.src._file_lock.is_lock_stale", side_effect=judge_together):
+        threads = [threading.Thread(target=hold) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert overlaps == [1, 1]
+    assert not path.exists()
+
+
+def test_file_lock_respects_live_lock_on_other_host(tmp_path):
+    path = tmp_path / "data.lock"
+    _fake_lock(path, "another-host", 1, age=1)
+
+    assert is_lock_stale(path, stale_after=60) is None
+    with pytest.raises(TimeoutError):
+        FileLock(path, timeout=0.1, stale_after=60, poll_interval=0.02).acquire()
+
+
+def test_file_lock_heartbeat_keeps_lock_fresh(tmp_path):
+    path = tmp_path / "data.lock"
+    with FileLock(path, stale_after=0.2):
+        time.sleep(0.5)
+        assert is_lock_stale(path, stale_after=0.2) is None
+
+
+def test_file_lock_rejects_bad_stale_age(tmp_path):
+    with pytest.raises(ValueError, match="Stale"):
+        FileLock(tmp_path / "data.lock", stale_after=0)
+
+
+def test_atomic_write_keeps_previous_file_on_failure(tmp_path):
+    path = tmp_path / "data.txt"
+    path.write_text("old")
+
+    with pytest.raises(RuntimeError), atomic_write(path) as tmp:
+        tmp.write_text("partial")
+        raise RuntimeError("write failed")
+
+    assert path.read_text() == "old"
+    assert list(tmp_path.iterdir()) == [path]
+
+    with atomic_write(path) as tmp:
+        tmp.write_text("new")
+    assert path.read_text() == "new"
+
+
+def test_cache_does_not_evict_locked_entries(tmp_path):
+    folder = tmp_path / "temp__busy"
+    folder.mkdir()
+    (folder / "busy.parquet").write_bytes(b"\0" * 100)
+
+    with FileLock(folder / "busy.lock"):
+        assert CacheManager(tmp_path, max_size_in_gb=0).prune() == []
+    assert [e.name for e in CacheManager(tmp_path, max_size_in_gb=0).prune()] == [
+        "temp__busy"
+    ]
+
+
+@pytest.fixture
+def source(tmp_path: Path) -> Path:
+    path = tmp_path / "policies.sas7bdat"
+    path.write_bytes(TINYCOPY.read_bytes())
+    return path
+
+
+def test_concurrent_runs_convert_once(source, tmp_path):
+    frame: pl.DataFrame = pl.DataFrame({"a": list(range(100))})
+    calls = []
+
+    def slow_sas_reader(*_: object) -> pl.LazyFrame:
+        calls.append(1)
+        time.sleep(0.3)
+        return frame.lazy()
+
+    results = []
+    with patch("read_sas._read_sas.sas_reader", side_effect=slow_sas_reader):
+
+        def convert() -> None:
+            reader = ReadSas(
+                source, config_kwargs={"temp_dir_parent": tmp_path, "logger": Mock()}
+            )
+            results.append(reader.run())
+
+        threads = [threading.Thread(target=convert) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert len(calls) == 1
+    assert len(results) == 5
+    assert all(result["a"].tolist() == list(range(100)) for result in results)
+
+
+def test_run_reconverts_when_source_changes(source, tmp_path):
+    config = {"temp_dir_parent": tmp_path, "logger": Mock()}
+    with patch(
+        "read_sas._read_sas.sas_reader", return_value=pl.LazyFrame({"a": [1]})
+    ) as mock_sas_reader:
+        reader = ReadSas(source, config_kwargs=config)
+        reader.run()
+        assert reader.is_published()
+
+        ReadSas(source, config_kwargs=config).run()
+        assert mock_sas_reader.call_count == 1
+
+        stamp = source.stat().st_mtime + 10
+        os.utime(source, (stamp, stamp))
+        assert not reader.is_published()
+        ReadSas(source, config_kwargs=config).run()
+        assert mock_sas_reader.call_count == 2
+
+        ReadSas(source, config_kwargs={**config, "reuse_published": False}).run()
+        assert mock_sas_reader.call_count == 3
+
+
+def test_run_reconverts_when_formatter_or_layout_changes(source, tmp_path):
+    config = {"temp_dir_parent": tmp_path, "logger": Mock()}
+    scale = 2
+    with patch(
+        "read_sas._read_sas.sas_reader", return_value=pl.LazyFrame({"a": [1]})
+    ) as mock_sas_reader:
+        ReadSas(source, lambda lf: lf, config_kwargs=config).run()
+        ReadSas(source, lambda lf: lf, config_kwargs=config).run()
+        assert mock_sas_reader.call_count == 1
+
+        ReadSas(source, lambda lf: lf.head(1), config_kwargs=config).run()
+        ReadSas(
+            source, lambda lf: lf.select(pl.col("a") * scale), config_kwargs=config
+        ).run()
+        assert mock_sas_reader.call_count == 3
+
+        scale = 3
+        ReadSas(
+            source, lambda lf: lf.select(pl.col("a") * scale), config_kwargs=config
+        ).run()
+        assert mock_sas_reader.call_count == 4
+
+        ReadSas(source, config_kwargs=config).run(["a"], cluster_by_index=True)
+        assert mock_sas_reader.call_count == 5
+        ReadSas(source, config_kwargs=config).run(["a"], cluster_by_index=True)
+        assert mock_sas_reader.call_count == 5
+
+        ReadSas(source, config_kwargs={**config, "parquet_row_group_size": 10}).run()
+        assert mock_sas_reader.call_count == 6
+
+
+def test_formatter_without_stable_digest_is_never_reused(source, tmp_path):
+    config = {"temp_dir_parent": tmp_path, "logger": Mock()}
+    unpicklable = threading.Lock()
+    with patch(
+        "read_sas._read_sas.sas_reader", return_value=pl.LazyFrame({"a": [1]})
+    ) as mock_sas_reader:
+        for _ in range(2):
+            reader = ReadSas(
+                source, lambda lf: unpicklable and lf, config_kwargs=config
+            )
+            reader.run()
+            assert not reader.is_published()
+        assert mock_sas_reader.call_count == 2
+
+
+def test_processes_share_one_conversion(source, tmp_path):
+    script = (
+        "import sys\n"
+        "from pathlib import Path\n"
+        "from read_sas import ReadSas\n"
+        "reader = ReadSas(sys.argv[1], config_kwargs={'temp_dir_parent': Path(sys.argv[2]), "
+        "'use_multiprocessing': False})\n"
+        "df = reader.run()\n"
+        "print('converted' if reader._reader is not None else 'reused', len(df))\n"
+    )
+    # each process runs the script above on this interpreter
+    processes = [
+        subprocess.Popen(  # noqa: S603
+            [sys.executable, "-c", script, str(source), str(tmp_path)],
+            stdout=subprocess.PIPE,
+            text=True,
+            cwd=tmp_path,
+        )
+        for _ in range(4)
+    ]
+    outputs = [
+        p.communicate(timeout=120)[0].splitlines()[-1].split() for p in processes
+    ]
+
+    assert all(p.returncode == 0 for p in processes)
+    assert sorted(o[0] for o in outputs) == ["converted", "reused", "reused", "reused"]
+    assert {o[1] for o in outputs} == {"1"}
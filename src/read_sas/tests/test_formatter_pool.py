@@ -0,0 +1,157 @@
+from __future__ import annotations
+import pytest
+from pathlib import Path
+from unittest.mock import Mock, patch
+import pandas as pd
+import polars as pl
+from polars.testing import assert_frame_equal
+from read_sas.src._formatter_pool import (
+    FormatterPool,
+    check_picklable,
+    _from_shared_memory,
+    _to_shared_memory,
+)
+from read_sas import Config, ReadSas
+from read_sas.src._sas_reader import _pooled_chunks, sas_reader
+
+
+def reverse_words(s: str) -> str:
+    return " ".join(word[::-1] for word in s.split("_"))
+
+
+def udf_formatter(lf: pl.LazyFrame) -> pl.LazyFrame:
+    """Format with a Python UDF, like the formatters users write."""
+    return lf.with_columns(
+        pl.col("name").map_elements(reverse_words, return_dtype=pl.String),
+        (pl.col("value") * 2).alias("double"),
+    )
+
+
+def failing_formatter(lf: pl.LazyFrame) -> pl.LazyFrame:
+    return lf.with_columns(pl.col("missing_column"))
+
+
+def make_chunk(i: int) -> pl.DataFrame:
+    return pl.DataFrame(
+        {
+            "name": [f"row{i}_{j}" for j in range(5)],
+            "value": [i * 10 + j for j in range(5)],
+        }
+    )
+
+
+@pytest.fixture(scope="module")
+def pool():
+    """Fixture to create a small formatter pool shared by this module's tests."""
+    with FormatterPool(udf_formatter, processes=2) as p:
+        yield p
+
+
+def test_shared_memory_round_trip():
+    """A frame written to shared memory comes back unchanged."""
+    df = make_chunk(3).with_columns(pl.lit(None, dtype=pl.Float64).alias("empty"))
+    assert_frame_equal(_from_shared_memory(*_to_shared_memory(df)), df)
+
+
+def test_pool_output_matches_serial(pool):
+    """Formatting in the pool gives exactly the serial result."""
+    df = make_chunk(1)
+    assert_frame_equal(pool.apply(df), udf_formatter(df.lazy()).collect())
+
+
+def test_pool_imap_preserves_order(pool):
+    """`imap` yields chunks and results in submission order, passing failed chunks through."""
+    chunks = [make_chunk(i) for i in range(8)]
+    results = list(pool.imap(enumerate([*chunks[:3], None, *chunks[3:]])))
+    assert [key for key, _, _ in results] == list(range(9))
+    assert results[3][1:] == (None, None)
+    del results[3]
+    assert [df for _, df, _ in results] == chunks
+    for _, df, future in results:
+        assert_frame_equal(future.result(), udf_formatter(df.lazy()).collect())
+
+
+def test_pool_surfaces_formatter_errors():
+    """An error raised in the worker is re-raised by the future."""
+    with FormatterPool(failing_formatter, processes=1) as p, pytest.raises(
+        pl.exceptions.ColumnNotFoundError
+    ):
+        p.apply(make_chunk(0))
+
+
+@pytest.mark.parametrize("formatter", [lambda lf: lf, udf_formatter])
+def test_check_picklable(formatter):
+    """Lambdas are rejected up front, module-level functions are accepted."""
+    if formatter is udf_formatter:
+        check_picklable(formatter)
+    else:
+        with pytest.raises(ValueError, match="picklable"):
+            check_picklable(formatter)
+
+
+@pytest.mark.parametrize("processes", [0, -2])
+def test_pool_requires_processes(processes):
+    with pytest.raises(ValueError):
+        FormatterPool(udf_formatter, processes=processes)
+
+
+def test_read_sas_rejects_unpicklable_formatter():
+    """`ReadSas` validates the formatter before any reading happens."""
+    with patch("read_sas._read_sas.sas_reader") as mock_sas_reader, pytest.raises(
+        ValueError, match="picklable"
+    ):
+        ReadSas(
+            "tinycopy.sas7bdat",
+            formatter=lambda lf: lf,
+            config_kwargs={"formatter_processes": 2},
+        )
+    mock_sas_reader.assert_not_called()
+
+
+@pytest.mark.parametrize("use_pipeline", [False, True])
+@patch("read_sas.src._sas_reader._read_chunks", autospec=True)
+@patch("read_sas.src.__read_file._read_chunks", autospec=True)
+@patch("read_sas.src._sas_reader.n_rows_in_sas7bdat", autospec=True)
+@patch("read_sas.src._sas_reader.n_gb_in_file", autospec=True)
+@patch("read_sas.src._sas_reader._calculate_chunk_size", autospec=True)
+def test_sas_reader_with_formatter_processes(
+    mock_calculate_chunk_size,
+    mock_n_gb_in_file,
+    mock_n_rows_in_sas7bdat,
+    mock_read_file_chunks,
+    mock_read_chunks,
+    use_pipeline,
+):
+    """`sas_reader` returns the serial result when the formatter runs in a pool."""
+    chunks = [make_chunk(i).to_pandas() for i in range(4)]
+    mock_n_rows_in_sas7bdat.return_value = 20
+    mock_n_gb_in_file.return_value = 1.0
+    mock_calculate_chunk_size.return_value = 5
+    mock_read_chunks.return_value = iter(chunks)
+    mock_read_file_chunks.return_value = iter(chunks)
+    config = Config(formatter_processes=2, use_pipeline=use_pipeline)
+
+    result = sas_reader("tinycopy.sas7bdat", config, udf_formatter).collect()
+
+    expected = udf_formatter(pl.from_pandas(pd.concat(chunks)).lazy()).collect()
+    assert_frame_equal(result, expected)
+
+
+@patch("read_sas.src._sas_reader._read_file", autospec=True)
+def test_pooled_chunks_keep_failed_chunks_in_place(mock_read_file):
+    """A chunk that fails to decode comes through as None at its own index."""
+    broken = pl.LazyFrame({"name": ["x"]}).select(pl.col("name").cast(pl.Int64))
+    mock_read_file.return_value = [
+        (0, make_chunk(0).lazy()),
+        (1, broken),
+        (2, make_chunk(2).lazy()),
+    ]
+    config = Config(logger=Mock())
+
+    chunks = list(
+        _pooled_chunks(Path("data.sas7bdat"), 5, None, config, udf_formatter, 2)
+    )
+
+    assert [i for i, _ in chunks] == [0, 1, 2]
+    assert chunks[1][1] is None
+    assert_frame_equal(chunks[2][1], udf_formatter(make_chunk(2).lazy()).collect())
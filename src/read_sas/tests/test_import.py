@@ -0,0 +1,76 @@
+"""Import-time budget for the package.
+
+Run in fresh interpreters so modules imported by other tests do not hide the
+cost. The budget can be raised on slow machines with READ_SAS_IMPORT_BUDGET.
+"""
+
+from __future__ import annotations
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any
+import pytest
+import read_sas
+
+HEAVY_MODULES = ("polars", "pandas", "pyarrow", "pyreadstat", "numpy")
+IMPORT_BUDGET_SECONDS = float(os.environ.get("READ_SAS_IMPORT_BUDGET", "0.25"))
+
+
+def _run(code: str, cwd: Path) -> dict[str, Any]:
+    script = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"{code}\n"
+        "elapsed = time.perf_counter() - start\n"
+        f"heavy = [m for m in {HEAVY_MODULES!r} if m in sys.modules]\n"
+        "print(json.dumps({'elapsed': elapsed, 'heavy': heavy}))\n"
+    )
+    # the interpreter running the tests and a script built above, no outside input
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", script],
+        capture_output=True,
+        text=True,
+        cwd=cwd,
+        check=True,
+    )
+    output: dict[str, Any] = json.loads(result.stdout.splitlines()[-1])
+    return output
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        "import read_sas",
+        "from read_sas import Config\nConfig()",
+        "import read_sas._cli",
+    ],
+)
+def test_import_skips_heavy_dependencies(code, tmp_path):
+    result = _run(code, tmp_path)
+
+    assert result["heavy"] == []
+    assert list(tmp_path.iterdir()) == [], "importing must not create files"
+
+
+def test_import_time_budget(tmp_path):
+    # best of three to keep interpreter and disk-cache noise out of the check
+    elapsed = min(_run("import read_sas", tmp_path)["elapsed"] for _ in range(3))
+
+    assert elapsed < IMPORT_BUDGET_SECONDS, (
+        f"`import read_sas` took {elapsed:.3f}s, over the "
+        f"{IMPORT_BUDGET_SECONDS}s budget."
+    )
+
+
+def test_heavy_attributes_load_on_first_use(tmp_path):
+    result = _run("import read_sas\nread_sas.ReadSas", tmp_path)
+
+    assert "polars" in result["heavy"]
+
+
+def test_unknown_attribute_raises():
+    with pytest.raises(AttributeError, match="no_such_name"):
+        read_sas.no_such_name  # noqa: B018
+    assert "ReadSas" in dir(read_sas)
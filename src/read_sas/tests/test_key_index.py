@@ -0,0 +1,130 @@
+from __future__ import annotations
+from pathlib import Path
+from unittest.mock import patch
+import polars as pl
+import pyarrow.parquet as pq
+import pytest
+from read_sas import ReadSas
+from read_sas.src._key_index import (
+    ROW_GROUP_COLUMN,
+    build_key_index,
+    index_path_for,
+    load_key_index,
+    lookup,
+    write_key_index,
+)
+
+
+@pytest.fixture
+def frame() -> pl.DataFrame:
+    n = 1_000
+    return pl.DataFrame(
+        {
+            "policy": [f"P{i % 250:04d}" for i in range(n)],
+            "term": [i // 250 for i in range(n)],
+            "premium": [float(i) for i in range(n)],
+        }
+    )
+
+
+def _write(df: pl.DataFrame, path: Path, keys: list[str] | str) -> Path:
+    df.write_parquet(path, row_group_size=100)
+    write_key_index(build_key_index(df, keys, path), path)
+    return path
+
+
+def test_index_path_for(tmp_path):
+    assert index_path_for(tmp_path / "data.parquet") == tmp_path / "data.index.parquet"
+
+
+def test_build_key_index_locates_row_groups(frame, tmp_path):
+    path = tmp_path / "data.parquet"
+    frame.write_parquet(path, row_group_size=100)
+    index = build_key_index(frame, "policy", path)
+
+    assert index.height == frame.height
+    assert index[ROW_GROUP_COLUMN].max() == pq.read_metadata(path).num_row_groups - 1
+    assert index["policy"].is_sorted()
+
+
+def test_build_key_index_rejects_mismatched_frame(frame, tmp_path):
+    path = tmp_path / "data.parquet"
+    frame.write_parquet(path)
+    with pytest.raises(ValueError, match="rows"):
+        build_key_index(frame.head(10), "policy", path)
+
+
+def test_lookup_single_key_matches_filter(frame, tmp_path):
+    path = _write(frame, tmp_path / "data.parquet", "policy")
+
+    result = lookup(path, ["P0007", "P0123"])
+    expected = frame.filter(pl.col("policy").is_in(["P0007", "P0123"]))
+
+    assert result.sort("premium").equals(expected.sort("premium"))
+
+
+def test_lookup_compound_key(frame, tmp_path):
+    path = _write(frame, tmp_path / "data.parquet", ["policy", "term"])
+
+    result = lookup(path, [("P0007", 2), ("P0200", 3)])
+    expected = frame.filter(
+        ((pl.col("policy") == "P0007") & (pl.col("term") == 2))
+        | ((pl.col("policy") == "P0200") & (pl.col("term") == 3))
+    )
+
+    assert result.sort("premium").equals(expected.sort("premium"))
+
+
+def test_lookup_reads_only_matching_row_groups(frame, tmp_path):
+    path = _write(frame, tmp_path / "data.parquet", ["policy", "term"])
+
+    with patch.object(
+        pq.ParquetFile,
+        "read_row_group",
+        autospec=True,
+        side_effect=pq.ParquetFile.read_row_group,
+    ) as spy:
+        result = lookup(path, ("P0007", 2))
+
+    assert result.height == 1
+    assert spy.call_count == 1
+    assert spy.call_args.args[1] == 5
+
+
+def test_lookup_without_matches_returns_empty_frame(frame, tmp_path):
+    path = _write(frame, tmp_path / "data.parquet", "policy")
+
+    result = lookup(path, "missing")
+
+    assert result.height == 0
+    assert result.schema == frame.schema
+
+
+def test_lookup_without_index_raises(frame, tmp_path):
+    path = tmp_path / "data.parquet"
+    frame.write_parquet(path)
+    with pytest.raises(ValueError, match="No key index"):
+        lookup(path, "P0007")
+
+
+def test_load_key_index_reloads_rewritten_index(frame, tmp_path):
+    path = _write(frame, tmp_path / "data.parquet", "policy")
+    first = load_key_index(path)
+    assert load_key_index(path) is first
+
+    smaller = frame.head(100)
+    _write(smaller, path, "policy")
+
+    assert load_key_index(path).height == 100
+
+
+def test_read_sas_run_builds_index_for_lookup(frame, tmp_path):
+    with patch("read_sas._read_sas.sas_reader", return_value=frame.lazy()):
+        reader = ReadSas(
+            tmp_path / "policies.sas7bdat",
+            config_kwargs={"temp_dir_parent": tmp_path, "parquet_row_group_size": 100},
+        )
+        reader.run(index_columns="policy", cluster_by_index=True)
+
+    assert index_path_for(reader.parquet_path).exists()
+    assert reader.lookup("P0042")["premium"].to_list() == [42.0, 292.0, 542.0, 792.0]
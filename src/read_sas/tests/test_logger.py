@@ -16,10 +16,21 @@ logger.addHandler(file_handler)
 """
 
 from __future__ import annotations
-from read_sas.src._logger import logger
+from read_sas.src._logger import (
+    _log_handlers,
+    events_enabled,
+    flush_logging,
+    install_event_stream,
+    install_file_handler,
+    log_event,
+    logger,
+    remove_handler,
+)
 import pytest
 from pathlib import Path
+import json
 import logging
+import time
 
 
 def test_logger_file_creation(tmp_path: Path):
@@ -89,3 +100,63 @@ def test_logger_multiple_handlers(tmp_path: Path):
     assert (
         "Test log message" in log_content2
     ), f"Expected to find 'Test log message' in [{log_content2}]"
+
+
+def test_install_file_handler_is_idempotent(tmp_path: Path):
+    """Installing a handler twice for the same file reuses the first one."""
+    log_file = tmp_path / "installed.log"
+    first = install_file_handler(log_file)
+    assert first is not None
+    try:
+        assert install_file_handler(log_file) is first
+        logger.info("Installed handler message")
+        flush_logging()
+        assert "Installed handler message" in log_file.read_text()
+    finally:
+        remove_handler(first)
+
+
+def test_install_file_handler_tolerates_unwritable_location(tmp_path: Path):
+    """A log file that cannot be opened is skipped rather than raising."""
+    assert install_file_handler(tmp_path / "missing" / "read_sas.log") is None
+
+
+def test_installed_handlers_do_not_block_the_caller(tmp_path: Path):
+    """A slow handler runs on the listener thread, not in the logging call."""
+
+    class SlowHandler(logging.FileHandler):
+        def emit(self, record: logging.LogRecord) -> None:
+            time.sleep(0.1)
+            super().emit(record)
+
+    handler = SlowHandler(tmp_path / "slow.log")
+    _log_handlers.add(handler)
+    try:
+        start = time.perf_counter()
+        for i in range(5):
+            logger.info(f"Slow message {i}")
+        assert time.perf_counter() - start < 0.1
+        flush_logging()
+        assert "Slow message 4" in (tmp_path / "slow.log").read_text()
+    finally:
+        remove_handler(handler)
+
+
+def test_event_stream_writes_json_lines(tmp_path: Path):
+    """Events are written as one JSON object per line, and only when installed."""
+    events_file = tmp_path / "events.jsonl"
+    assert not events_enabled()
+    handler = install_event_stream(events_file)
+    assert handler is not None
+    try:
+        assert events_enabled()
+        log_event("chunk", chunk=3, rows=100)
+        flush_logging()
+    finally:
+        remove_handler(handler)
+
+    event = json.loads(events_file.read_text().splitlines()[-1])
+    assert event["event"] == "chunk"
+    assert event["chunk"] == 3
+    assert event["rows"] == 100
+    assert not events_enabled()
@@ -0,0 +1,169 @@
+from __future__ import annotations
+from pathlib import Path
+from unittest.mock import Mock, patch
+import polars as pl
+import pytest
+from read_sas import ReadSas
+from read_sas.src._config import Config
+from read_sas.src._memory import (
+    MemoryLimitError,
+    MemoryMonitor,
+    active_monitor,
+    arrow_bytes,
+    fit_chunk_size,
+    monitor_memory,
+    rss_bytes,
+    sample_memory,
+)
+from read_sas.src._sas_reader import sas_reader
+
+TINYCOPY = Path(__file__).parents[3] / "tinycopy.sas7bdat"
+
+
+def test_memory_is_measured():
+    """Test that the resident set and the Arrow pool are measured."""
+    assert rss_bytes() > 0
+    assert arrow_bytes() >= 0
+
+
+def test_monitor_records_peaks_per_stage():
+    """Test that each stage keeps its own peak and sample count."""
+    monitor = MemoryMonitor()
+    monitor.sample("decode")
+    monitor.sample("decode")
+    monitor.sample("collect")
+    peaks = monitor.peaks()
+    assert set(peaks) == {"decode", "collect"}
+    assert peaks["decode"]["samples"] == 2
+    assert peaks["collect"]["peak_rss_bytes"] > 0
+    assert "decode: peak RSS" in monitor.report()
+
+
+def test_monitor_rejects_non_positive_limit():
+    """Test that a limit must be positive."""
+    with pytest.raises(ValueError, match="positive"):
+        MemoryMonitor(0)
+
+
+def test_monitor_raises_with_diagnostic():
+    """Test that passing the limit fails with the stage and the peaks so far."""
+    monitor = MemoryMonitor(limit_bytes=rss_bytes() * 4)
+    monitor.sample("decode")
+    with pytest.raises(MemoryLimitError, match="'to_pandas'") as e:
+        monitor.sample("to_pandas", upcoming_bytes=rss_bytes() * 4)
+    assert "about to allocate" in str(e.value)
+    assert "decode: peak RSS" in str(e.value)
+    assert isinstance(e.value, MemoryError)
+
+
+def test_from_config():
+    """Test that monitors are only made when memory is tracked or limited."""
+    assert MemoryMonitor.from_config(Config(logger=Mock())) is None
+    assert MemoryMonitor.from_config(Config(track_memory=True)).limit_bytes is None
+    monitor = MemoryMonitor.from_config(Config(memory_limit_gb=1.5))
+    assert monitor is not None
+    assert monitor.limit_bytes == 1_500_000_000
+
+
+def test_monitor_memory_installs_and_records_on_error():
+    """Test that the monitor is active inside the block and its peaks survive an error."""
+    monitor = MemoryMonitor(logger=Mock())
+    stats: dict = {}
+    sample_memory("ignored")
+    with pytest.raises(RuntimeError), monitor_memory(monitor, stats):
+        assert active_monitor() is monitor
+        sample_memory("decode")
+        raise RuntimeError
+    assert active_monitor() is None
+    assert list(stats["memory"]) == ["decode"]
+
+
+def test_monitor_memory_keeps_active_monitor():
+    """Test that a nested read without its own monitor samples the outer one."""
+    outer = MemoryMonitor(logger=Mock())
+    with monitor_memory(outer), monitor_memory(None) as inner:
+        assert inner is outer
+
+
+def test_fit_chunk_size():
+    """Test that chunks shrink to fit the memory left and are kept when they fit."""
+    monitor = MemoryMonitor(limit_bytes=rss_bytes() + 3_000_000, logger=Mock())
+    assert fit_chunk_size(100, 1_000.0, monitor) == 100
+    shrunk = fit_chunk_size(1_000_000, 1_000.0, monitor)
+    assert 1 <= shrunk <= 1_000
+    monitor.logger.warning.assert_called_once()
+    assert fit_chunk_size(1_000_000, 1_000.0, MemoryMonitor()) == 1_000_000
+
+
+def test_fit_chunk_size_fails_when_over_limit():
+    """Test that a read already over the limit stops before decoding."""
+    with pytest.raises(MemoryLimitError, match="'plan'"):
+        fit_chunk_size(100, 10.0, MemoryMonitor(limit_bytes=1))
+
+
+def test_sas_reader_records_stage_peaks():
+    """Test that reading a file records the decode, conversion and collect stages."""
+    stats: dict = {}
+    config = Config(logger=Mock(), use_multiprocessing=False, track_memory=True)
+    sas_reader(TINYCOPY, config, None, stats=stats)
+    assert {"decode", "from_pandas", "collect", "accumulate"} <= set(stats["memory"])
+
+
+def test_sas_reader_shrinks_chunks_under_limit():
+    """Test that the chunk size is fitted to the memory limit."""
+    config = Config(
+        logger=Mock(), use_multiprocessing=False, memory_limit_gb=rss_bytes() / 1e9 * 2
+    )
+    with patch(
+        "read_sas.src._sas_reader.fit_chunk_size",
+        side_effect=lambda chunk_size, *_: chunk_size,
+    ) as fit:
+        sas_reader(TINYCOPY, config, None)
+    fit.assert_called_once()
+
+
+@patch("read_sas._read_sas.sas_reader", autospec=True)
+def test_run_records_stages(mock_sas_reader, tmp_path):
+    """Test that `run` records the collect, write and pandas stages."""
+    mock_sas_reader.return_value = pl.LazyFrame({"a": [1, 2, 3]})
+    reader = ReadSas(
+        "tinycopy.sas7bdat",
+        config_kwargs={
+            "temp_dir_parent": tmp_path,
+            "logger": Mock(),
+            "track_memory": True,
+        },
+    )
+    reader.run()
+    assert {"collect_output", "write_parquet", "to_pandas"} <= set(
+        reader.stats["memory"]
+    )
+
+
+@patch("read_sas._read_sas.sas_reader", autospec=True)
+def test_run_fails_fast_before_pandas_copy(mock_sas_reader, tmp_path):
+    """Test that a pandas copy that cannot fit fails instead of being attempted."""
+    mock_sas_reader.return_value = pl.LazyFrame({"a": [1, 2, 3]})
+    reader = ReadSas(
+        "tinycopy.sas7bdat",
+        config_kwargs={
+            "temp_dir_parent": tmp_path,
+            "logger": Mock(),
+            "memory_limit_gb": rss_bytes() / 1e9 * 4,
+        },
+    )
+    with patch(
+        "polars.DataFrame.estimated_size", return_value=rss_bytes() * 4
+    ), pytest.raises(MemoryLimitError, match="'to_pandas'"):
+        reader.run()
+    assert "to_pandas" in reader.stats["memory"]
+
+
+def test_pipelined_read_samples_in_stage_threads():
+    """Test that the pipeline threads sample the monitor of the read that started them."""
+    stats: dict = {}
+    config = Config(
+        logger=Mock(), use_multiprocessing=False, use_pipeline=True, track_memory=True
+    )
+    sas_reader(TINYCOPY, config, None, stats=stats)
+    assert {"decode", "collect", "accumulate"} <= set(stats["memory"])
@@ -0,0 +1,111 @@
+from __future__ import annotations
+import pytest
+import threading
+import time
+from typing import Iterator
+from read_sas.src._pipeline import Pipeline, Stage, StageStats
+
+
+def slow_square(x: int) -> int:
+    time.sleep(0.001 * (x % 3))
+    return x * x
+
+
+@pytest.mark.parametrize("workers", [1, 2, 4])
+def test_pipeline_preserves_source_order(workers):
+    """Results come back in source order even when a stage has several workers."""
+    pipeline = Pipeline(
+        range(20),
+        [Stage("square", slow_square, workers), Stage("negate", lambda x: -x)],
+        queue_size=2,
+    )
+    assert list(pipeline) == [-(x * x) for x in range(20)]
+
+
+def test_pipeline_empty_source():
+    """An empty source yields nothing and still records stats."""
+    pipeline = Pipeline([], [Stage("identity", lambda x: x)])
+    assert list(pipeline) == []
+    assert [s.name for s in pipeline.stats] == ["decode", "identity"]
+
+
+def test_pipeline_bounded_queue_applies_backpressure():
+    """The source cannot run more than a few items ahead of a stalled consumer."""
+    produced: list[int] = []
+
+    def source() -> Iterator[int]:
+        for i in range(100):
+            produced.append(i)
+            yield i
+
+    iterator = iter(Pipeline(source(), [Stage("identity", lambda x: x)], queue_size=1))
+    assert next(iterator) == 0
+    time.sleep(0.2)
+    # one item in each queue, one held by each thread, one yielded
+    assert len(produced) <= 6, f"Expected backpressure, got {len(produced)} produced"
+    iterator.close()
+
+
+def test_pipeline_propagates_stage_errors():
+    """An exception in a stage is re-raised in the consuming thread."""
+
+    def fail_on_three(x: int) -> int:
+        if x == 3:
+            raise RuntimeError("bad chunk")
+        return x
+
+    with pytest.raises(RuntimeError, match="bad chunk"):
+        list(Pipeline(range(10), [Stage("check", fail_on_three, 2)]))
+
+
+def test_pipeline_propagates_source_errors():
+    """An exception raised by the source is re-raised in the consuming thread."""
+
+    def source() -> Iterator[int]:
+        yield 1
+        raise ValueError("decode failed")
+
+    with pytest.raises(ValueError, match="decode failed"):
+        list(Pipeline(source(), [Stage("identity", lambda x: x)]))
+
+
+def test_pipeline_early_close_stops_threads():
+    """Closing the iterator early shuts the background threads down."""
+    before = threading.active_count()
+    iterator = iter(Pipeline(range(1000), [Stage("identity", lambda x: x, 3)]))
+    next(iterator)
+    iterator.close()
+    assert threading.active_count() == before
+
+
+def test_pipeline_stats_report_utilization():
+    """Per-stage stats count items and report utilization between 0 and 1."""
+    pipeline = Pipeline(
+        range(5), [Stage("sleep", lambda x: time.sleep(0.01) or x)], queue_size=2
+    )
+    list(pipeline)
+    stats = {s.name: s for s in pipeline.stats}
+    assert stats["decode"].items == 5
+    assert stats["sleep"].items == 5
+    assert 0.0 <= stats["decode"].utilization <= 1.0
+    assert stats["sleep"].utilization > stats["decode"].utilization
+    assert pipeline.bottleneck() == "sleep"
+    assert "utilization=" in pipeline.report()
+
+
+def test_stage_stats_utilization_without_wall_time():
+    """A stage that never ran reports zero utilization."""
+    assert StageStats("idle", 2).utilization == 0.0
+
+
+@pytest.mark.parametrize("workers", [0, -1])
+def test_stage_requires_a_worker(workers):
+    """Stages need at least one worker."""
+    with pytest.raises(ValueError):
+        Stage("bad", lambda x: x, workers)
+
+
+def test_pipeline_requires_positive_queue_size():
+    """Queues must hold at least one item."""
+    with pytest.raises(ValueError):
+        Pipeline([], [], queue_size=0)
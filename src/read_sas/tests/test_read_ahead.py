@@ -0,0 +1,175 @@
+from __future__ import annotations
+import os
+import threading
+import time
+from concurrent.futures import wait
+from pathlib import Path
+from unittest.mock import Mock
+import pandas as pd
+import pyreadstat
+import pytest
+from read_sas.src._config import Config
+from read_sas.src._read_ahead import (
+    FileBlockSource,
+    Prefetcher,
+    ReadAhead,
+    StagedCopy,
+    _blocks,
+    check_read_ahead_mode,
+)
+from read_sas.src.__read_file import _read_chunks
+
+TINYCOPY = Path(__file__).parents[3] / "tinycopy.sas7bdat"
+
+
+class ThrottledSource:
+    """Wrap a block source so every read waits like a request to network storage."""
+
+    def __init__(self, inner: FileBlockSource, latency: float) -> None:
+        self.inner = inner
+        self.size = inner.size
+        self.latency = latency
+        self.reads: list[int] = []
+        self.advised: list[tuple[int, int]] = []
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def read_block(self, offset: int, size: int) -> bytes:
+        """Read a block after waiting `latency` seconds."""
+        with self._lock:
+            self.reads.append(offset)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.latency)
+        with self._lock:
+            self.in_flight -= 1
+        return self.inner.read_block(offset, size)
+
+    def advise(self, offset: int, size: int) -> None:
+        """Record the hint."""
+        self.advised.append((offset, size))
+
+    def close(self) -> None:
+        """Close the wrapped source."""
+        self.inner.close()
+
+
+@pytest.fixture
+def data_file(tmp_path: Path) -> Path:
+    path = tmp_path / "data.bin"
+    path.write_bytes(os.urandom(10_000))
+    return path
+
+
+def test_check_read_ahead_mode():
+    """Test that only the known modes are accepted."""
+    check_read_ahead_mode(None)
+    check_read_ahead_mode("stage")
+    with pytest.raises(ValueError, match="Read-ahead mode"):
+        check_read_ahead_mode("mmap")
+
+
+def test_blocks_are_aligned():
+    """Test that reads start on block boundaries and cover the whole range."""
+    assert list(_blocks(150, 420, 100)) == [
+        (100, 100),
+        (200, 100),
+        (300, 100),
+        (400, 100),
+    ]
+    assert list(_blocks(0, 0, 100)) == []
+
+
+def test_staged_copy_reads_blocks_in_parallel(data_file, tmp_path):
+    """Test that a throttled file is copied exactly, with several reads in flight."""
+    source = ThrottledSource(FileBlockSource(data_file), latency=0.05)
+    started = time.perf_counter()
+    staged = StagedCopy(source, "copy.bin", tmp_path, block_size=1_000, threads=5)
+    path = staged.wait(timeout=10)
+    elapsed = time.perf_counter() - started
+    assert path.read_bytes() == data_file.read_bytes()
+    assert sorted(source.reads) == list(range(0, 10_000, 1_000))
+    assert source.max_in_flight > 1
+    # ten reads of 50ms each, five at a time
+    assert elapsed < 10 * 0.05
+    staged.cleanup()
+    assert not staged.folder.exists()
+    source.close()
+
+
+def test_staged_copy_records_errors(tmp_path):
+    """Test that a failed copy is reported instead of read."""
+    source = Mock(size=10)
+    source.read_block.side_effect = OSError("Stale file handle")
+    staged = StagedCopy(source, "copy.bin", tmp_path, block_size=4, threads=2)
+    with pytest.raises(OSError, match="Stale file handle"):
+        staged.wait(timeout=10)
+    assert not staged.is_ready
+    staged.cleanup()
+
+
+def test_prefetcher_reads_each_block_once(data_file):
+    """Test that overlapping ranges only read the blocks not yet requested."""
+    source = ThrottledSource(FileBlockSource(data_file), latency=0)
+    prefetcher = Prefetcher(source, block_size=1_000, threads=2)
+    prefetcher.prefetch(500, 2_500)
+    prefetcher.prefetch(2_000, 3_200)
+    prefetcher.prefetch(9_500, 20_000)
+    wait(prefetcher.futures)
+    prefetcher.close()
+    assert sorted(source.reads) == [0, 1_000, 2_000, 3_000, 9_000]
+    assert source.advised == [(500, 2_000), (2_000, 1_200), (9_500, 500)]
+    source.close()
+
+
+def test_read_ahead_prefetches_the_next_chunks(data_file):
+    """Test that each chunk triggers reads of the chunks after it."""
+    source = ThrottledSource(FileBlockSource(data_file), latency=0)
+    ranges = [(0, 25), (25, 50), (50, 75), (75, 100)]
+    with ReadAhead(
+        data_file,
+        "prefetch",
+        n_rows=100,
+        header_length=0,
+        chunks_ahead=1,
+        block_size=1_000,
+        source=source,
+    ) as read_ahead:
+        assert read_ahead.byte_range(25, 50) == (2_500, 5_000)
+        paths = read_ahead.paths(ranges)
+        assert next(paths) == str(data_file)
+        wait(read_ahead.prefetcher.futures)
+        assert sorted(source.reads) == [0, 1_000, 2_000, 3_000, 4_000]
+
+
+def test_read_ahead_switches_to_the_staged_copy(data_file, tmp_path):
+    """Test that chunks come from the source until the copy is done, then from the copy."""
+    source = ThrottledSource(FileBlockSource(data_file), latency=0)
+    logger = Mock()
+    read_ahead = ReadAhead(
+        data_file,
+        "stage",
+        n_rows=100,
+        block_size=1_000,
+        staging_dir=tmp_path,
+        logger=logger,
+        source=source,
+    )
+    read_ahead.staged.wait(timeout=10)
+    assert read_ahead.path() == str(read_ahead.staged.path)
+    logger.info.assert_called_once()
+    read_ahead.close()
+    assert not read_ahead.staged.folder.exists()
+
+
+@pytest.mark.parametrize("mode", ["prefetch", "stage"])
+def test_read_chunks_with_read_ahead_reads_real_file(mode, tmp_path):
+    """Test that reading ahead does not change the decoded rows and leaves no copy."""
+    config = Config(
+        logger=Mock(), use_multiprocessing=False, read_ahead=mode, staging_dir=tmp_path
+    )
+    chunks = list(_read_chunks(str(TINYCOPY), 1, None, config))
+    expected, _ = pyreadstat.read_sas7bdat(TINYCOPY)
+    pd.testing.assert_frame_equal(pd.concat(chunks), expected)
+    assert list(tmp_path.iterdir()) == []
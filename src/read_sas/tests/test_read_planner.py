@@ -0,0 +1,147 @@
+from __future__ import annotations
+from pathlib import Path
+from unittest.mock import Mock, patch
+import pandas as pd
+import pyreadstat
+import pytest
+from read_sas.src._config import Config
+from read_sas.src._read_planner import (
+    ACROSS_CHUNKS,
+    SERIAL,
+    WITHIN_CHUNK,
+    ReadPlan,
+    plan_read,
+)
+from read_sas.src._sas7bdat_header import Sas7bdatHeader
+from read_sas.src.__read_file import _read_chunks
+
+TINYCOPY = Path(__file__).parents[3] / "tinycopy.sas7bdat"
+
+
+def _header(compression: str | None, row_length: int = 800) -> Sas7bdatHeader:
+    return Sas7bdatHeader(
+        header_length=65536,
+        page_size=65536,
+        page_count=1_000,
+        row_length=row_length,
+        row_count=10_000_000,
+        column_count=100,
+        compression=compression,
+        is_64bit=True,
+        little_endian=True,
+    )
+
+
+def _plan(
+    header: Sas7bdatHeader, n_rows: int = 10_000_000, **kwargs
+) -> tuple[ReadPlan, Config]:
+    config = Config(logger=Mock(), chunk_size_in_gb=1, num_processes=4, **kwargs)
+    with patch("read_sas.src._read_planner.sas7bdat_header", return_value=header):
+        return plan_read(TINYCOPY, config, n_rows), config
+
+
+def test_plan_read_splits_uncompressed_chunks_across_processes():
+    plan, config = _plan(_header(None))
+
+    assert plan.parallelism == WITHIN_CHUNK
+    assert plan.processes == 4
+    assert plan.chunk_size == 1_000_000_000 // 800
+    assert config.logger.info.call_count == len(plan.reasons)
+
+
+@pytest.mark.parametrize("compression", ["rle", "rdc"])
+def test_plan_read_decodes_compressed_chunks_per_process(compression):
+    plan, _ = _plan(_header(compression))
+
+    assert plan.parallelism == ACROSS_CHUNKS
+    assert plan.processes == 4
+    # the budget is shared by the chunks decoded at once
+    assert plan.chunk_size == 1_000_000_000 // (800 * 4)
+    assert plan.compression == compression
+    assert any("compressed" in reason for reason in plan.reasons)
+
+
+def test_plan_read_sizes_chunks_from_decoded_rows():
+    # a tiny file on disk that decodes to many GB still gets bounded chunks
+    plan, _ = _plan(_header("rdc", row_length=10_000), n_rows=1_000_000)
+
+    assert plan.chunk_size * 10_000 <= 1_000_000_000
+
+
+def test_plan_read_reads_small_files_serially():
+    plan, _ = _plan(_header(None, row_length=8), n_rows=1_000)
+
+    assert plan.parallelism == SERIAL
+    assert plan.processes == 1
+    assert plan.chunk_size == 1_000
+
+
+def test_plan_read_scales_row_length_to_selected_columns():
+    config = Config(logger=Mock(), chunk_size_in_gb=1, num_processes=4)
+    with patch(
+        "read_sas.src._read_planner.sas7bdat_header", return_value=_header(None)
+    ):
+        plan = plan_read(TINYCOPY, config, 100_000_000, column_list=["a", "b"])
+
+    assert plan.chunk_size == 1_000_000_000 // 16
+
+
+def test_plan_read_apply_configures_decoding():
+    plan, config = _plan(_header("rle"))
+    planned = plan.apply(config)
+
+    assert planned.decode_across_chunks
+    assert not planned.use_multiprocessing
+    assert planned.num_processes == 4
+    assert not config.decode_across_chunks
+
+
+def test_plan_read_rejects_empty_files():
+    with pytest.raises(ValueError, match="positive"):
+        plan_read(TINYCOPY, Config(logger=Mock()), 0)
+
+
+def test_read_chunks_across_processes_keeps_order():
+    frames = {
+        start: pd.DataFrame({"i": range(start, min(start + 3, 10))})
+        for start in range(0, 10, 3)
+    }
+
+    class InlineExecutor:
+        def __init__(self, **_):
+            pass
+
+        def submit(self, *args: object) -> Mock:
+            _, _, start, limit = args[:4]
+            future = Mock()
+            future.result.return_value = frames[start].head(limit)
+            return future
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *_):
+            pass
+
+    meta = Mock(number_rows=10)
+    config = Config(
+        logger=Mock(),
+        num_processes=2,
+        decode_across_chunks=True,
+        reuse_worker_pool=False,
+    )
+    with patch("pyreadstat.read_sas7bdat", return_value=(None, meta)), patch(
+        "read_sas.src.__read_file.ProcessPoolExecutor", InlineExecutor
+    ):
+        chunks = list(_read_chunks("data.sas7bdat", 3, None, config))
+
+    assert [len(df) for df in chunks] == [3, 3, 3, 1]
+    assert pd.concat(chunks)["i"].tolist() == list(range(10))
+
+
+def test_read_chunks_across_processes_reads_real_file():
+    config = Config(logger=Mock(), num_processes=2, decode_across_chunks=True)
+    chunks = list(_read_chunks(str(TINYCOPY), 1, None, config))
+    expected, _ = pyreadstat.read_sas7bdat(str(TINYCOPY))
+
+    assert pd.concat(chunks)["i"].tolist() == expected["i"].tolist()
@@ -0,0 +1,154 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, Callable
+from unittest.mock import Mock, patch
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+from read_sas import ReadSas
+from read_sas.src._config import Config
+from read_sas.src._row_diff import (
+    RowDiffer,
+    diff_to_parquet,
+    hash_index_of_parquet,
+    hash_index_path_for,
+    read_hash_index,
+    write_hash_index,
+)
+
+
+@pytest.fixture
+def diff(
+    tmp_path: Path, config: Config, decoded_chunks: Callable[..., Any]
+) -> Callable[..., object]:
+    """Fixture to diff a week, decoded two rows at a time, into `tmp_path`."""
+
+    def run(df: pl.DataFrame, key_columns: str | None = "id") -> object:
+        chunks = decoded_chunks(*df.iter_slices(2))
+        with patch("read_sas.src._row_diff.decoded_chunks", return_value=chunks):
+            return diff_to_parquet(
+                "week.sas7bdat",
+                tmp_path / "week.parquet",
+                tmp_path / "diff",
+                config,
+                key_columns=key_columns,
+            )
+
+    return run
+
+
+WEEK_1 = pl.DataFrame({"id": [1, 2, 3, 4], "amount": [10.0, 20.0, 30.0, None]})
+WEEK_2 = pl.DataFrame({"id": [1, 2, 4, 5], "amount": [10.0, 25.0, None, 50.0]})
+
+
+def test_keyed_diff_between_weeks(tmp_path, diff):
+    """Test that rows are inserted, updated and deleted by key, and the new week is published."""
+    first = diff(WEEK_1)
+    assert (first.inserted_rows, first.updated_rows, first.deleted_rows) == (4, 0, 0)
+    assert_frame_equal(pl.read_parquet(first.inserted_path), WEEK_1)
+
+    second = diff(WEEK_2)
+    assert second.inserted_rows == 1
+    assert second.updated_rows == 1
+    assert second.deleted_rows == 1
+    assert second.unchanged_rows == 2
+    assert pl.read_parquet(second.inserted_path)["id"].to_list() == [5]
+    assert pl.read_parquet(second.updated_path).to_dicts() == [
+        {"id": 2, "amount": 25.0}
+    ]
+    assert pl.read_parquet(second.deleted_path).to_dicts() == [
+        {"id": 3, "amount": 30.0}
+    ]
+    assert_frame_equal(pl.read_parquet(tmp_path / "week.parquet"), WEEK_2)
+
+
+def test_unchanged_week_reuses_stored_index(diff):
+    """Test that the stored hash index is read rather than rebuilt, and nothing changed."""
+    diff(WEEK_1)
+    with patch("read_sas.src._row_diff.hash_index_of_parquet") as rebuild:
+        again = diff(WEEK_1)
+    rebuild.assert_not_called()
+    assert (again.inserted_rows, again.updated_rows, again.deleted_rows) == (0, 0, 0)
+    assert again.unchanged_rows == 4
+    assert pl.read_parquet(again.inserted_path).columns == ["id", "amount"]
+
+
+def test_unkeyed_diff_counts_repeated_rows(diff):
+    """Test that without keys rows match by content, counting repeats."""
+    old = pl.DataFrame({"x": ["a", "a", "b"]})
+    new = pl.DataFrame({"x": ["a", "b", "b", "c"]})
+    diff(old, key_columns=None)
+    result = diff(new, key_columns=None)
+    assert sorted(pl.read_parquet(result.inserted_path)["x"]) == ["b", "c"]
+    assert pl.read_parquet(result.deleted_path)["x"].to_list() == ["a"]
+    assert result.updated_rows == 0
+
+
+def test_stale_index_is_rebuilt(tmp_path):
+    """Test that an index built by another Polars version or other keys is not used."""
+    parquet = tmp_path / "week.parquet"
+    WEEK_1.write_parquet(parquet)
+    index = hash_index_of_parquet(parquet, ["id"])
+    path = hash_index_path_for(parquet)
+    assert path.name == "week.row_hashes.parquet"
+    write_hash_index(index, path, ["id"])
+    assert_frame_equal(read_hash_index(path, ["id"]), index)
+    assert read_hash_index(path, None) is None
+    with patch("read_sas.src._row_diff.pl.__version__", "0.0.1"):
+        assert read_hash_index(path, ["id"]) is None
+    assert read_hash_index(tmp_path / "missing.parquet") is None
+
+
+def test_hashes_match_between_chunks_and_parquet(tmp_path):
+    """Test that a chunk and its parquet round trip hash the same."""
+    WEEK_1.write_parquet(tmp_path / "week.parquet")
+    differ = RowDiffer(None, ["id"])
+    differ.add(WEEK_1)
+    assert_frame_equal(
+        differ.index(), hash_index_of_parquet(tmp_path / "week.parquet", ["id"])
+    )
+
+
+def test_repeated_keys_are_rejected():
+    """Test that keys must identify a single row."""
+    differ = RowDiffer(None, ["id"])
+    differ.add(pl.DataFrame({"id": [1, 1], "amount": [1.0, 2.0]}))
+    with pytest.raises(ValueError, match="repeated keys"):
+        differ.index()
+
+
+def test_failed_chunk_keeps_previous_conversion(tmp_path, config, diff, decoded_chunks):
+    """Test that a diff that fails part way leaves the previous week in place."""
+    diff(WEEK_1)
+    chunks = decoded_chunks(WEEK_2, None)
+    with patch(
+        "read_sas.src._row_diff.decoded_chunks", return_value=chunks
+    ), pytest.raises(ValueError, match="Chunk 1"):
+        diff_to_parquet(
+            "week.sas7bdat",
+            tmp_path / "week.parquet",
+            tmp_path / "diff",
+            config,
+            key_columns="id",
+        )
+    assert_frame_equal(pl.read_parquet(tmp_path / "week.parquet"), WEEK_1)
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "diff",
+        "week.parquet",
+        "week.row_hashes.parquet",
+    ]
+
+
+def test_read_sas_diff_publishes_conversion(tmp_path, decoded_chunks):
+    """Test that `ReadSas.diff` writes the diff folder and marks the conversion as current."""
+    reader = ReadSas(
+        "tinycopy.sas7bdat",
+        config_kwargs={"temp_dir_parent": tmp_path, "logger": Mock()},
+    )
+    chunks = decoded_chunks(*WEEK_1.iter_slices(2))
+    with patch("read_sas.src._row_diff.decoded_chunks", return_value=chunks):
+        result = reader.diff("id")
+    assert result.inserted_path.parent == reader.diff_folder
+    assert reader.stats["diff"]["inserted_rows"] == 4
+    assert reader.source_path.exists()
+    assert reader.is_published()
@@ -0,0 +1,43 @@
+from __future__ import annotations
+from pathlib import Path
+import pytest
+from read_sas.src._sas7bdat_header import sas7bdat_header
+
+TINYCOPY = Path(__file__).parents[3] / "tinycopy.sas7bdat"
+
+
+def test_sas7bdat_header_reads_layout():
+    header = sas7bdat_header(TINYCOPY)
+
+    assert header.header_length == 65536
+    assert header.page_size == 65536
+    assert header.page_count == 1
+    assert header.row_length == 8
+    assert header.row_count == 1
+    assert header.column_count == 1
+    assert header.is_64bit
+    assert header.little_endian
+    assert not header.is_compressed
+    assert header.decoded_bytes == 8
+
+
+@pytest.mark.parametrize(
+    "signature, compression", [(b"SASYZCRL", "rle"), (b"SASYZCR2", "rdc")]
+)
+def test_sas7bdat_header_detects_compression(tmp_path, signature, compression):
+    data = bytearray(TINYCOPY.read_bytes())
+    data[65536 + 1024 : 65536 + 1024 + len(signature)] = signature
+    path = tmp_path / "compressed.sas7bdat"
+    path.write_bytes(bytes(data))
+
+    header = sas7bdat_header(path)
+
+    assert header.compression == compression
+    assert header.is_compressed
+
+
+def test_sas7bdat_header_rejects_other_files(tmp_path):
+    path = tmp_path / "not_sas.sas7bdat"
+    path.write_bytes(b"\x00" * 1024)
+    with pytest.raises(ValueError, match="not a sas7bdat file"):
+        sas7bdat_header(path)
@@ -0,0 +1,134 @@
+from __future__ import annotations
+import math
+import pickle
+from datetime import date, datetime, time, timedelta
+from types import SimpleNamespace
+import polars as pl
+import pytest
+from read_sas.src._sas_dates import (
+    DATE,
+    DATETIME,
+    DATETIME_AS_DATE,
+    TIME,
+    SasDateConverter,
+    sas_format_kind,
+    sas_temporal_columns,
+    sas_temporal_expr,
+)
+
+SAS_EPOCH = datetime(1960, 1, 1)
+
+
+@pytest.mark.parametrize(
+    "sas_format, kind",
+    [
+        ("DATE9.", DATE),
+        ("DATE", DATE),
+        ("yymmdd10.", DATE),
+        ("MMDDYY10", DATE),
+        ("E8601DA10.", DATE),
+        ("DATETIME20.", DATETIME),
+        ("DATETIME22.3", DATETIME),
+        ("IS8601DT", DATETIME),
+        ("DTDATE9.", DATETIME_AS_DATE),
+        ("TIME8.", TIME),
+        ("HHMM5.", TIME),
+        ("BEST12.", None),
+        ("$CHAR20.", None),
+        ("NUMERIC", None),
+        ("", None),
+        (None, None),
+    ],
+)
+def test_sas_format_kind(sas_format, kind):
+    """Test that the width and decimals are ignored when classifying a format."""
+    assert sas_format_kind(sas_format) == kind
+
+
+def test_sas_temporal_columns_reads_original_variable_types():
+    """Test that only temporal columns are taken from the metadata."""
+    meta = SimpleNamespace(
+        original_variable_types={"d": "DATE9.", "n": "BEST12.", "t": "TIME8."}
+    )
+    assert sas_temporal_columns(meta) == {"d": DATE, "t": TIME}
+
+
+def test_dates_match_python_arithmetic():
+    """Test that SAS days convert to the same dates as datetime arithmetic."""
+    days = [-3653.0, -1.0, 0.0, 0.5, 21915.0, 23000.0]
+    out = pl.DataFrame({"d": days}).select(sas_temporal_expr("d", DATE))
+    assert out["d"].dtype == pl.Date
+    expected = [(SAS_EPOCH + timedelta(days=math.floor(d))).date() for d in days]
+    assert out["d"].to_list() == expected
+
+
+def test_datetimes_match_python_arithmetic():
+    """Test that SAS seconds convert to the same datetimes, keeping fractions."""
+    seconds = [0.0, 1.5, -86400.25, 1_893_456_000.123456]
+    out = pl.DataFrame({"dt": seconds}).select(sas_temporal_expr("dt", DATETIME))
+    assert out["dt"].dtype == pl.Datetime("us")
+    expected = [SAS_EPOCH + timedelta(seconds=s) for s in seconds]
+    assert out["dt"].to_list() == expected
+
+
+def test_datetime_as_date():
+    """Test that datetimes shown with a date format become dates."""
+    out = pl.DataFrame({"dt": [86_399.0, 86_400.0, -1.0]}).select(
+        sas_temporal_expr("dt", DATETIME_AS_DATE)
+    )
+    assert out["dt"].to_list() == [
+        date(1960, 1, 1),
+        date(1960, 1, 2),
+        date(1959, 12, 31),
+    ]
+
+
+def test_times():
+    """Test that seconds since midnight become times, and out-of-day values null."""
+    out = pl.DataFrame({"t": [0.0, 3661.5, 86_399.0, 86_400.0, -1.0]}).select(
+        sas_temporal_expr("t", TIME)
+    )
+    assert out["t"].dtype == pl.Time
+    assert out["t"].to_list() == [
+        time(0, 0),
+        time(1, 1, 1, 500_000),
+        time(23, 59, 59),
+        None,
+        None,
+    ]
+
+
+@pytest.mark.parametrize("kind", [DATE, DATETIME, DATETIME_AS_DATE, TIME])
+def test_missing_values_become_null(kind):
+    """Test that nulls, NaN (special missing values) and infinities become null."""
+    out = pl.DataFrame(
+        {"x": [None, float("nan"), float("inf"), float("-inf"), 1e300]}
+    ).select(sas_temporal_expr("x", kind))
+    assert out["x"].null_count() == 5
+
+
+def test_unknown_kind_raises():
+    """Test that an unknown kind raises a ValueError."""
+    with pytest.raises(ValueError, match="Unknown SAS temporal kind"):
+        sas_temporal_expr("x", "duration")
+
+
+def test_converter_skips_missing_and_converted_columns():
+    """Test that only numeric columns present in the chunk are converted."""
+    converter = SasDateConverter({"d": DATE, "already": DATE, "absent": TIME})
+    lf = pl.LazyFrame({"d": [0.0], "already": [date(2020, 1, 1)], "n": [1.0]})
+    out = converter(lf).collect()
+    assert out.to_dict(as_series=False) == {
+        "d": [date(1960, 1, 1)],
+        "already": [date(2020, 1, 1)],
+        "n": [1.0],
+    }
+
+
+def test_converter_is_picklable():
+    """Test that the converter can be sent to formatter worker processes."""
+    converter = SasDateConverter.from_metadata(
+        SimpleNamespace(original_variable_types={"d": "DATE9."})
+    )
+    restored = pickle.loads(pickle.dumps(converter))  # noqa: S301
+    assert restored.columns == {"d": DATE}
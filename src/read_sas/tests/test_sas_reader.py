@@ -1,8 +1,11 @@
+import json
+import logging
 import pytest
 from unittest.mock import Mock, patch
 from pathlib import Path
 import polars as pl
 from read_sas.src._sas_reader import sas_reader
+from read_sas.src._logger import flush_logging, install_event_stream, remove_handler
 import pandas as pd
 import numpy as np
 
@@ -16,6 +19,25 @@ def mock_config():
     mock.use_multiprocessing = True
     mock.num_processes = None
     mock.chunk_size_in_gb = 1.0
+    mock.use_pipeline = False
+    mock.pipeline_queue_size = 2
+    mock.pipeline_workers = {}
+    mock.formatter_processes = None
+    mock.profile_columns = False
+    mock.plan_reads = False
+    mock.auto_tune = False
+    mock.decode_across_chunks = False
+    mock.encoding = None
+    mock.invalid_bytes = "error"
+    mock.reuse_worker_pool = False
+    mock.read_ahead = None
+    mock.track_memory = False
+    mock.memory_limit_gb = None
+    mock.spill_budget_gb = None
+    mock.format_catalog = None
+    mock.convert_dates = False
+    mock.trim_strings = False
+    mock.empty_strings_as_null = False
     return mock
 
 
@@ -106,3 +128,105 @@ def test_sas_reader(
         assert (
             mock_config.logger.debug.call_count >= num_chunks
         ), f"Expected {num_chunks} debug calls, got {mock_config.logger.debug.call_count}"
+
+
+@patch("read_sas.src._sas_reader._read_chunks", autospec=True)
+@patch("read_sas.src._sas_reader.n_rows_in_sas7bdat", autospec=True)
+@patch("read_sas.src._sas_reader.n_gb_in_file", autospec=True)
+@patch("read_sas.src._sas_reader._calculate_chunk_size", autospec=True)
+def test_sas_reader_pipeline(
+    mock_calculate_chunk_size,
+    mock_n_gb_in_file,
+    mock_n_rows_in_sas7bdat,
+    mock_read_chunks,
+    mock_formatter,
+    mock_config,
+):
+    """The pipelined path returns the same rows, in order, and records stage stats."""
+    mock_n_rows_in_sas7bdat.return_value = 9
+    mock_n_gb_in_file.return_value = 1.0
+    mock_calculate_chunk_size.return_value = 3
+    mock_read_chunks.return_value = iter(
+        [pd.DataFrame({"col1": [3 * i, 3 * i + 1, 3 * i + 2]}) for i in range(3)]
+    )
+    mock_config.use_pipeline = True
+    mock_config.pipeline_workers = {"convert": 2, "validate": 2}
+    stats: dict = {}
+
+    result = sas_reader(
+        filepath="tinycopy.sas7bdat",
+        config=mock_config,
+        formatter=mock_formatter,
+        column_list=None,
+        stats=stats,
+    )
+
+    assert result.collect()["col1"].to_list() == list(range(9))
+    assert mock_formatter.call_count == 3
+    assert [s.name for s in stats["pipeline"]] == ["decode", "convert", "validate"]
+
+
+@patch("read_sas.src._sas_reader._read_file", autospec=True)
+@patch("read_sas.src._sas_reader.n_rows_in_sas7bdat", autospec=True)
+@patch("read_sas.src._sas_reader.n_gb_in_file", autospec=True)
+@patch("read_sas.src._sas_reader._calculate_chunk_size", autospec=True)
+def test_sas_reader_skips_disabled_diagnostics(
+    mock_calculate_chunk_size,
+    mock_n_gb_in_file,
+    mock_n_rows_in_sas7bdat,
+    mock_read_file,
+    mock_config,
+):
+    """Debug messages and the output preview are not built when DEBUG is off."""
+    mock_n_rows_in_sas7bdat.return_value = 6
+    mock_n_gb_in_file.return_value = 1.0
+    mock_calculate_chunk_size.return_value = 3
+    mock_read_file.return_value = [
+        (i, pl.LazyFrame({"col1": [i, i, i]})) for i in range(2)
+    ]
+    mock_config.logger.isEnabledFor.side_effect = lambda level: level > logging.DEBUG
+
+    with patch.object(pl.LazyFrame, "head", autospec=True) as mock_head:
+        sas_reader("tinycopy.sas7bdat", mock_config, None)
+
+    mock_head.assert_not_called()
+    assert not any(
+        "Able to process chunk" in str(call)
+        for call in mock_config.logger.debug.call_args_list
+    )
+
+
+@patch("read_sas.src._sas_reader._read_file", autospec=True)
+@patch("read_sas.src._sas_reader.n_rows_in_sas7bdat", autospec=True)
+@patch("read_sas.src._sas_reader.n_gb_in_file", autospec=True)
+@patch("read_sas.src._sas_reader._calculate_chunk_size", autospec=True)
+def test_sas_reader_emits_chunk_events(
+    mock_calculate_chunk_size,
+    mock_n_gb_in_file,
+    mock_n_rows_in_sas7bdat,
+    mock_read_file,
+    mock_config,
+    tmp_path,
+):
+    """Every chunk is reported on the JSON event stream."""
+    mock_n_rows_in_sas7bdat.return_value = 6
+    mock_n_gb_in_file.return_value = 1.0
+    mock_calculate_chunk_size.return_value = 3
+    mock_read_file.return_value = [
+        (i, pl.LazyFrame({"col1": [i, i, i]})) for i in range(2)
+    ]
+    handler = install_event_stream(tmp_path / "events.jsonl")
+    try:
+        sas_reader("tinycopy.sas7bdat", mock_config, None)
+        flush_logging()
+    finally:
+        remove_handler(handler)
+
+    events = [
+        json.loads(line)
+        for line in (tmp_path / "events.jsonl").read_text().splitlines()
+    ]
+    assert [e["event"] for e in events] == ["read_start", "chunk", "chunk", "read_end"]
+    assert [e.get("chunk") for e in events[1:3]] == [0, 1]
+    assert all(e["rows"] == 3 and e["columns"] == 1 for e in events[1:3])
+    assert events[-1]["chunks"] == 2
@@ -0,0 +1,196 @@
+from __future__ import annotations
+import pickle
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable
+from unittest.mock import Mock, patch
+import pandas as pd
+import polars as pl
+import pyreadstat
+import pytest
+from read_sas.src._config import Config
+from read_sas.src._sas_strings import (
+    BYTE_TRANSPARENT_ENCODING,
+    SasStringCleaner,
+    check_invalid_bytes_policy,
+    is_encoding_error,
+    normalize_encoding,
+    quarantine_frame,
+    repair_invalid_bytes,
+    sas7bdat_encoding,
+)
+from read_sas.src.__read_file import _decode_rows, _read_chunks
+
+TINYCOPY = Path(__file__).parents[3] / "tinycopy.sas7bdat"
+ENCODING_ERROR = pyreadstat.ReadstatError(
+    "Unable to convert string to the requested encoding (invalid byte sequence)"
+)
+
+
+def _as_read(*values: bytes | None) -> list[str | None]:
+    """Return byte strings the way readstat returns them when decoding as Latin-1."""
+    return [
+        v.decode(BYTE_TRANSPARENT_ENCODING) if v is not None else None for v in values
+    ]
+
+
+@pytest.mark.parametrize(
+    "encoding, expected",
+    [
+        ("wlatin1", "WINDOWS-1252"),
+        ("LATIN1", "ISO-8859-1"),
+        ("utf-8", "UTF-8"),
+        ("cp1252", "cp1252"),
+    ],
+)
+def test_normalize_encoding(encoding, expected):
+    """Test that SAS encoding names map to the iconv names readstat expects."""
+    assert normalize_encoding(encoding) == expected
+
+
+def test_normalize_encoding_rejects_unknown_names():
+    """Test that an unknown encoding raises a ValueError."""
+    with pytest.raises(ValueError, match="Unknown encoding"):
+        normalize_encoding("not-an-encoding")
+
+
+def test_check_invalid_bytes_policy():
+    """Test that only the known policies are accepted."""
+    check_invalid_bytes_policy("replace")
+    with pytest.raises(ValueError, match="Invalid bytes policy"):
+        check_invalid_bytes_policy("drop")
+
+
+def test_is_encoding_error():
+    """Test that decode failures are told apart from other readstat errors."""
+    assert is_encoding_error(ENCODING_ERROR)
+    assert not is_encoding_error(pyreadstat.ReadstatError("Invalid file"))
+
+
+def test_sas7bdat_encoding_reads_the_header():
+    """Test that the encoding is read from the file's metadata."""
+    assert sas7bdat_encoding(TINYCOPY) == "UTF-8"
+
+
+def test_repair_invalid_bytes():
+    """Test that invalid bytes are replaced and their rows flagged."""
+    df = pd.DataFrame(
+        {
+            "s": _as_read(b"abc", "café".encode(), b"bad\xff", None),
+            "n": [1.0, 2.0, 3.0, 4.0],
+        }
+    )
+    repaired, invalid = repair_invalid_bytes(df, "UTF-8")
+    assert repaired["s"].tolist()[:3] == ["abc", "café", "bad�"]
+    assert repaired["s"].isna().tolist() == [False, False, False, True]
+    assert repaired["n"].tolist() == [1.0, 2.0, 3.0, 4.0]
+    assert invalid.tolist() == [False, False, True, False]
+
+
+def test_quarantine_frame_keeps_the_original_bytes():
+    """Test that quarantined rows hold their raw bytes and their file row number."""
+    df = pd.DataFrame({"s": _as_read(b"ok", b"bad\xff"), "n": [1.0, 2.0]})
+    out = quarantine_frame(df, pd.Series([False, True]), first_row=100)
+    assert out.to_dict(as_series=False) == {
+        "row_number": [101],
+        "s": [b"bad\xff"],
+        "n": [2.0],
+    }
+
+
+def _patched_read(first_error: Exception) -> Callable[..., tuple[pd.DataFrame, None]]:
+    """Return a fake `read_sas7bdat` that fails unless decoding as Latin-1."""
+    frame = pd.DataFrame({"s": _as_read(b"ok", b"bad\xff", b"fine")})
+
+    def read(
+        *_: object,
+        encoding: str | None = None,
+        **__: object,  # noqa: ARG001
+    ) -> tuple[pd.DataFrame, None]:
+        if encoding != BYTE_TRANSPARENT_ENCODING:
+            raise first_error
+        return frame, None
+
+    return read
+
+
+def test_decode_rows_replaces_invalid_bytes():
+    """Test that an undecodable chunk is decoded again instead of failing."""
+    config = Config(logger=Mock(), invalid_bytes="replace", encoding="UTF-8")
+    with patch("pyreadstat.read_sas7bdat", side_effect=_patched_read(ENCODING_ERROR)):
+        df = _decode_rows("x.sas7bdat", 0, 3, None, config)
+    assert df["s"].tolist() == ["ok", "bad�", "fine"]
+    config.logger.warning.assert_called()
+
+
+def test_decode_rows_quarantines_invalid_rows(tmp_path):
+    """Test that rows with invalid bytes are written aside and dropped."""
+    config = Config(
+        logger=Mock(),
+        invalid_bytes="quarantine",
+        encoding="UTF-8",
+        quarantine_dir=tmp_path,
+    )
+    with patch("pyreadstat.read_sas7bdat", side_effect=_patched_read(ENCODING_ERROR)):
+        df = _decode_rows("x.sas7bdat", 10, 3, None, config)
+    assert df["s"].tolist() == ["ok", "fine"]
+    quarantined = pl.read_parquet(tmp_path / "rows_000000000010.parquet")
+    assert quarantined.to_dict(as_series=False) == {
+        "row_number": [11],
+        "s": [b"bad\xff"],
+    }
+
+
+@pytest.mark.parametrize("policy", ["error", "replace"])
+def test_decode_rows_reraises_other_errors(policy):
+    """Test that errors other than decode failures are never swallowed."""
+    config = Config(logger=Mock(), invalid_bytes=policy)
+    error = pyreadstat.ReadstatError("Invalid file, or file has unsupported features")
+    with patch("pyreadstat.read_sas7bdat", side_effect=_patched_read(error)):  # noqa: SIM117
+        with pytest.raises(pyreadstat.ReadstatError):
+            _decode_rows("x.sas7bdat", 0, 3, None, config)
+
+
+def test_read_chunks_requires_a_quarantine_dir():
+    """Test that quarantining without a folder is rejected up front."""
+    config = Config(logger=Mock(), invalid_bytes="quarantine")
+    with pytest.raises(ValueError, match="quarantine_dir"):
+        next(_read_chunks(str(TINYCOPY), 1, None, config))
+
+
+def test_read_chunks_with_replace_policy_reads_real_file():
+    """Test that decoding chunk by chunk gives the same rows as the default reader."""
+    config = Config(logger=Mock(), use_multiprocessing=False, invalid_bytes="replace")
+    chunks = list(_read_chunks(str(TINYCOPY), 1, None, config))
+    expected, _ = pyreadstat.read_sas7bdat(TINYCOPY)
+    pd.testing.assert_frame_equal(pd.concat(chunks), expected)
+
+
+def test_string_cleaner_trims_and_nulls():
+    """Test that trailing blanks are trimmed and empty strings become null."""
+    cleaner = SasStringCleaner(["s", "absent"])
+    lf = pl.LazyFrame({"s": ["  a  ", "   ", "", None, "b"], "n": [1, 2, 3, 4, 5]})
+    out = cleaner(lf).collect()
+    assert out["s"].to_list() == ["  a", None, None, None, "b"]
+    assert out["n"].to_list() == [1, 2, 3, 4, 5]
+
+
+@pytest.mark.parametrize(
+    "trim, empty_as_null, expected",
+    [(True, False, ["a", ""]), (False, True, ["a ", " "]), (False, False, ["a ", " "])],
+)
+def test_string_cleaner_options(trim, empty_as_null, expected):
+    """Test that trimming and nulling can be enabled separately."""
+    cleaner = SasStringCleaner(["s"], trim=trim, empty_as_null=empty_as_null)
+    out = cleaner(pl.LazyFrame({"s": ["a ", " "]})).collect()
+    assert out["s"].to_list() == expected
+
+
+def test_string_cleaner_from_metadata_is_picklable():
+    """Test that only character columns are cleaned and the step can be pickled."""
+    meta = SimpleNamespace(readstat_variable_types={"s": "string", "n": "double"})
+    cleaner = SasStringCleaner.from_metadata(meta, empty_as_null=False)
+    restored = pickle.loads(pickle.dumps(cleaner))  # noqa: S301
+    assert restored.columns == ["s"]
+    assert restored.trim
+    assert not restored.empty_as_null
@@ -0,0 +1,198 @@
+from __future__ import annotations
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest.mock import Mock, patch
+import pandas as pd
+import polars as pl
+import pytest
+from read_sas.src._config import Config
+from read_sas.src._shards import (
+    load_formatter,
+    merge_shards,
+    plan_shards,
+    run_shard,
+    run_worker,
+)
+
+N_ROWS = 103
+SOURCE = pd.DataFrame({"id": range(N_ROWS), "name": [f"n{i}" for i in range(N_ROWS)]})
+
+
+def fake_read_file_in_chunks(*_, **kwargs):
+    """Stand-in for pyreadstat that slices an in-memory frame."""
+    chunksize, offset, limit = kwargs["chunksize"], kwargs["offset"], kwargs["limit"]
+    end = N_ROWS if limit == 0 else min(offset + limit, N_ROWS)
+    for start in range(offset, end, chunksize):
+        yield (
+            SOURCE.iloc[start : min(start + chunksize, end)].reset_index(drop=True),
+            None,
+        )
+
+
+@pytest.fixture
+def source(tmp_path: Path) -> Path:
+    path = tmp_path / "big.sas7bdat"
+    path.write_bytes(b"not really sas")
+    return path
+
+
+@pytest.fixture
+def config() -> Config:
+    return Config(logger=Mock(), use_multiprocessing=False, chunk_size_in_gb=1)
+
+
+@pytest.fixture(autouse=True)
+def fake_sas():
+    with patch(
+        "read_sas.src._shards.sas7bdat_metadata", return_value=Mock(number_rows=N_ROWS)
+    ), patch("read_sas.src._shards.n_gb_in_file", return_value=1.0), patch(
+        "pyreadstat.read_file_in_chunks", side_effect=fake_read_file_in_chunks
+    ):
+        yield
+
+
+def double_id(lf: pl.LazyFrame) -> pl.LazyFrame:
+    return lf.with_columns((pl.col("id") * 2).alias("double"))
+
+
+@pytest.mark.parametrize(
+    "n_shards, rows_per_shard, expected_limits",
+    [
+        (4, None, [26, 26, 26, 25]),
+        (None, 50, [50, 50, 3]),
+        (1, None, [103]),
+        (200, None, [1] * 103),
+    ],
+)
+def test_plan_shards_covers_every_row(
+    source, tmp_path, config, n_shards, rows_per_shard, expected_limits
+):
+    manifest_path = plan_shards(
+        source, tmp_path / "out", n_shards, rows_per_shard, config=config
+    )
+    manifest = json.loads(manifest_path.read_text())
+    assert [s["row_limit"] for s in manifest["shards"]] == expected_limits
+    assert [s["row_offset"] for s in manifest["shards"]] == [
+        sum(expected_limits[:i]) for i in range(len(expected_limits))
+    ]
+    assert manifest["n_rows"] == N_ROWS
+
+
+@pytest.mark.parametrize("n_shards, rows_per_shard", [(0, None), (None, -5)])
+def test_plan_shards_rejects_bad_sizes(
+    source, tmp_path, config, n_shards, rows_per_shard
+):
+    with pytest.raises(ValueError):
+        plan_shards(source, tmp_path / "out", n_shards, rows_per_shard, config=config)
+
+
+def test_workers_convert_every_shard_once(source, tmp_path, config):
+    """Several concurrent workers split the shards between them without overlap."""
+    manifest = plan_shards(
+        source,
+        tmp_path / "out",
+        n_shards=9,
+        formatter="test_shards:double_id",
+        config=config,
+    )
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        results = list(pool.map(lambda _: run_worker(manifest, config), range(3)))
+
+    converted = sorted(shard for result in results for shard in result)
+    assert converted == list(range(9))
+
+    dataset = merge_shards(manifest, config=config)
+    assert (dataset / "_SUCCESS").exists()
+    df = pl.read_parquet(dataset / "*.parquet").sort("id")
+    assert df["id"].to_list() == list(range(N_ROWS))
+    assert df["double"].to_list() == [2 * i for i in range(N_ROWS)]
+
+
+def test_merge_requires_every_shard(source, tmp_path, config):
+    manifest = plan_shards(source, tmp_path / "out", n_shards=3, config=config)
+    run_shard(manifest, 0, config)
+    with pytest.raises(ValueError, match="not converted"):
+        merge_shards(manifest, config=config)
+
+
+def test_merge_detects_corrupt_part(source, tmp_path, config):
+    manifest = plan_shards(source, tmp_path / "out", n_shards=2, config=config)
+    run_worker(manifest, config)
+    part = tmp_path / "out" / "parts" / "part-00001.parquet"
+    pl.DataFrame({"id": [1], "name": ["x"]}).write_parquet(part)
+    with pytest.raises(ValueError, match="Checksum"):
+        merge_shards(manifest, config=config)
+
+
+def test_merge_refuses_to_overwrite(source, tmp_path, config):
+    manifest = plan_shards(source, tmp_path / "out", n_shards=2, config=config)
+    run_worker(manifest, config)
+    merge_shards(manifest, config=config)
+    with pytest.raises(ValueError, match="already exists"):
+        merge_shards(manifest, config=config)
+    assert (merge_shards(manifest, overwrite=True, config=config) / "_SUCCESS").exists()
+
+
+def test_worker_rejects_changed_source(source, tmp_path, config):
+    manifest = plan_shards(source, tmp_path / "out", n_shards=2, config=config)
+    source.write_bytes(b"a different file now")
+    with pytest.raises(ValueError, match="changed"):
+        run_worker(manifest, config)
+    # the failed shard's claim is released for another worker
+    assert not (tmp_path / "out" / "claims" / "part-00000").exists()
+
+
+def test_worker_retries_claims_of_dead_workers(source, tmp_path, config):
+    manifest = plan_shards(source, tmp_path / "out", n_shards=3, config=config)
+    claims = tmp_path / "out" / "claims"
+    # a worker killed on this host, and one on a host that stopped refreshing
+    (claims / "part-00000").write_text(
+        json.dumps({"host": socket.gethostname(), "pid": 2**22 + 1, "token": "a"})
+    )
+    (claims / "part-00001").write_text(
+        json.dumps({"host": "gone", "pid": 1, "token": "b"})
+    )
+    stamp = time.time() - 2 * config.lock_stale_seconds
+    os.utime(claims / "part-00001", (stamp, stamp))
+    # a live worker's claim is left alone
+    (claims / "part-00002").write_text(
+        json.dumps({"host": socket.gethostname(), "pid": os.getpid(), "token": "c"})
+    )
+    assert run_worker(manifest, config) == [0, 1]
+    assert sorted(p.name for p in claims.iterdir()) == ["part-00002"]
+
+
+@pytest.mark.parametrize("spec", ["no_colon", ":missing_module", "json:"])
+def test_load_formatter_rejects_bad_specs(spec):
+    with pytest.raises(ValueError):
+        load_formatter(spec)
+
+
+def test_cli_with_processes_as_nodes(tmp_path):
+    """Plan, run two worker processes and merge through the command line."""
+    source = Path(__file__).parents[3] / "tinycopy.sas7bdat"
+    out = tmp_path / "out"
+
+    def cli(*args: str) -> subprocess.Popen:
+        # runs this interpreter on the package under test
+        return subprocess.Popen(  # noqa: S603
+            [sys.executable, "-m", "read_sas", *args],
+            cwd=tmp_path,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+
+    assert cli("plan", str(source), str(out), "--shards", "1").wait() == 0
+    workers = [cli("worker", str(out / "manifest.json")) for _ in range(2)]
+    assert [w.wait() for w in workers] == [0, 0]
+    assert cli("merge", str(out / "manifest.json")).wait() == 0
+
+    df = pl.read_parquet(out / "dataset" / "*.parquet")
+    assert df.shape == (1, 1)
@@ -0,0 +1,118 @@
+from __future__ import annotations
+import os
+from pathlib import Path
+from unittest.mock import Mock, patch
+import polars as pl
+import pyreadstat
+import pytest
+from polars.testing import assert_frame_equal
+from read_sas import ReadSas
+from read_sas.src._shared_registry import (
+    SharedRegistry,
+    default_registry_dir,
+    fingerprint_key,
+)
+
+TINYCOPY = Path(__file__).parents[3] / "tinycopy.sas7bdat"
+DEAD_PID = 2**22 + 1
+
+
+@pytest.fixture
+def registry(tmp_path) -> SharedRegistry:
+    """Fixture to create a registry in a temporary folder."""
+    return SharedRegistry(tmp_path / "registry", logger=Mock())
+
+
+@pytest.fixture
+def frame() -> pl.DataFrame:
+    """Fixture to create a small table with strings and nulls."""
+    return pl.DataFrame({"id": [1, 2, 3], "name": ["a", None, "c"]})
+
+
+def test_attach_builds_once(registry, frame):
+    """Test that the first attachment builds the table and later ones map it."""
+    build = Mock(return_value=frame)
+    first = registry.attach({"source": "a"}, build)
+    second = registry.attach({"source": "a"}, build)
+    build.assert_called_once()
+    assert_frame_equal(first.frame, frame)
+    assert_frame_equal(second.frame, frame)
+    assert registry.references(first.key) == 2
+    second.release()
+    assert registry.references(first.key) == 1
+    assert not second.is_attached
+
+
+def test_fingerprints_key_separate_entries(registry, frame):
+    """Test that a changed fingerprint builds its own entry."""
+    first = registry.attach({"source": "a", "mtime_ns": 1}, lambda: frame)
+    second = registry.attach({"source": "a", "mtime_ns": 2}, lambda: frame.head(1))
+    assert first.key != second.key
+    assert second.frame.height == 1
+    assert fingerprint_key({"b": 1, "a": 2}) == fingerprint_key({"a": 2, "b": 1})
+
+
+def test_references_of_dead_processes_are_dropped(registry, frame):
+    """Test that a reference left by a process that exited does not pin the entry."""
+    with registry.attach({"source": "a"}, lambda: frame) as shared:
+        refs = shared.reference.parent
+        (refs / f"{DEAD_PID}.deadbeef").touch()
+        (refs / f"{os.getppid()}.cafef00d").touch()
+        assert registry.references(shared.key) == 2
+        assert not (refs / f"{DEAD_PID}.deadbeef").exists()
+
+
+def test_evict_skips_referenced_entries(registry, frame):
+    """Test that eviction removes unreferenced entries, least recently used first."""
+    held = registry.attach({"source": "held"}, lambda: frame)
+    registry.attach({"source": "old"}, lambda: frame).release()
+    registry.attach({"source": "new"}, lambda: frame).release()
+    entries = registry.entries()
+    size = entries[0].size_bytes
+    evicted = registry.evict(max_size_bytes=2 * size)
+    assert [e.key for e in evicted] == [fingerprint_key({"source": "old"})]
+    assert {e.key for e in registry.evict(max_size_bytes=0)} == {
+        fingerprint_key({"source": "new"})
+    }
+    assert [e.key for e in registry.entries()] == [held.key]
+    # frames of evicted entries stay readable in the processes holding them
+    assert_frame_equal(held.frame, frame)
+
+
+def test_registry_size_limit_is_applied_on_build(tmp_path, frame):
+    """Test that building an entry evicts unreferenced ones past the limit."""
+    registry = SharedRegistry(tmp_path, max_size_in_gb=0, logger=Mock())
+    registry.attach({"source": "a"}, lambda: frame).release()
+    shared = registry.attach({"source": "b"}, lambda: frame)
+    assert [e.key for e in registry.entries()] == [shared.key]
+    with pytest.raises(ValueError, match="negative"):
+        SharedRegistry(tmp_path, max_size_in_gb=-1)
+
+
+def test_default_registry_dir_prefers_shared_memory(tmp_path):
+    """Test that the registry lives in /dev/shm when the host has it."""
+    with patch("read_sas.src._shared_registry.SHM_DIR", tmp_path):
+        assert default_registry_dir() == tmp_path / "read_sas"
+    with patch("read_sas.src._shared_registry.SHM_DIR", tmp_path / "missing"):
+        assert default_registry_dir().parent != tmp_path / "missing"
+
+
+def test_read_sas_attach_shares_one_copy(tmp_path):
+    """Test that `ReadSas.attach` converts the file once and later readers map it."""
+    config_kwargs = {
+        "temp_dir_parent": tmp_path,
+        "logger": Mock(),
+        "shared_registry_dir": tmp_path / "registry",
+        "use_multiprocessing": False,
+    }
+    expected, _ = pyreadstat.read_sas7bdat(TINYCOPY)
+    with ReadSas(TINYCOPY, config_kwargs=config_kwargs) as first:
+        shared = first.attach()
+        assert shared.frame["i"].to_list() == expected["i"].tolist()
+        with patch.object(
+            ReadSas, "_published_frame", side_effect=AssertionError
+        ), ReadSas(TINYCOPY, config_kwargs=config_kwargs) as second:
+            assert second.attach().key == shared.key
+            registry = SharedRegistry(tmp_path / "registry")
+            assert registry.references(shared.key) == 2
+    assert registry.references(shared.key) == 0
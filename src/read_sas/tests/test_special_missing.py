@@ -0,0 +1,89 @@
+from __future__ import annotations
+import datetime as dt
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+import numpy as np
+import pandas as pd
+import polars as pl
+import pyreadstat
+from read_sas.src._config import Config
+from read_sas.src._special_missing import (
+    SasSpecialMissingSplitter,
+    special_missing_column,
+    split_special_missing,
+)
+from read_sas.src.__read_file import _format_chunk, _read_chunks
+
+TINYCOPY = Path(__file__).parents[3] / "tinycopy.sas7bdat"
+
+
+def test_split_special_missing_codes():
+    """Test that letters become their ASCII codes and the values become NaN."""
+    values = pd.Series([1.5, "A", np.nan, "_", "Z", 2.0], dtype=object)
+    numbers, codes = split_special_missing(values)
+    assert numbers.dtype == np.float64
+    assert numbers.isna().tolist() == [False, True, True, True, True, False]
+    assert codes.dtype == "UInt8"
+    assert codes.tolist() == [pd.NA, ord("A"), pd.NA, ord("_"), ord("Z"), pd.NA]
+
+
+def test_split_float_column_has_no_codes():
+    """Test that a chunk without special missings gets an all-null companion."""
+    numbers, codes = split_special_missing(pd.Series([1.0, np.nan]))
+    assert numbers.tolist()[0] == 1.0
+    assert codes.isna().all()
+    assert codes.dtype == "UInt8"
+
+
+def test_splitter_plans_numeric_columns():
+    """Test that only numeric columns, optionally restricted, are split."""
+    meta = SimpleNamespace(
+        readstat_variable_types={"x": "double", "s": "string", "y": "double"}
+    )
+    assert SasSpecialMissingSplitter.from_metadata(meta).columns == ["x", "y"]
+    assert SasSpecialMissingSplitter.from_metadata(meta, ["y", "s"]).columns == ["y"]
+
+
+def test_splitter_converts_to_compact_polars():
+    """Test that a split chunk converts to a float column and a UInt8 companion."""
+    df = pd.DataFrame(
+        {"x": pd.Series([1.0, "R", "N"], dtype=object), "s": ["a", "b", "c"]}
+    )
+    out = _format_chunk(SasSpecialMissingSplitter(["x"])(df), None).collect()
+    assert out.schema == pl.Schema(
+        {"x": pl.Float64, "s": pl.String, special_missing_column("x"): pl.UInt8}
+    )
+    assert out["x__missing"].to_list() == [None, ord("R"), ord("N")]
+
+
+def test_splitter_keeps_converted_dates():
+    """Test that date, datetime and time columns are split without becoming floats."""
+    df = pd.DataFrame(
+        {
+            "d": pd.Series([dt.date(2020, 1, 1), "A", np.nan], dtype=object),
+            "ts": pd.to_datetime(["2020-01-01", None, "2021-01-01"]),
+            "t": pd.Series([dt.time(1, 2), "_", None], dtype=object),
+        }
+    )
+    out = _format_chunk(SasSpecialMissingSplitter(["d", "ts", "t"])(df), None).collect()
+    assert out.schema["d"] == pl.Date
+    assert isinstance(out.schema["ts"], pl.Datetime)
+    assert out.schema["t"] == pl.Time
+    assert out["d"].to_list() == [dt.date(2020, 1, 1), None, None]
+    assert out["d__missing"].to_list() == [None, ord("A"), None]
+    assert out["ts__missing"].to_list() == [None, None, None]
+    assert out["t__missing"].to_list() == [None, ord("_"), None]
+
+
+def test_read_chunks_keeps_special_missings():
+    """Test that pyreadstat is asked for user missings and each chunk is split."""
+    config = Config(logger=Mock(), use_multiprocessing=False, special_missing=True)
+    expected, _ = pyreadstat.read_sas7bdat(TINYCOPY)
+    with patch(
+        "pyreadstat.read_file_in_chunks", wraps=pyreadstat.read_file_in_chunks
+    ) as read:
+        chunks = list(_read_chunks(str(TINYCOPY), 1, None, config))
+    assert read.call_args.kwargs["user_missing"] is True
+    assert chunks[0]["i"].tolist() == expected["i"].tolist()
+    assert chunks[0]["i__missing"].isna().all()
@@ -0,0 +1,177 @@
+from __future__ import annotations
+import gc
+import weakref
+from pathlib import Path
+from typing import Any, cast
+from unittest.mock import Mock, patch
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+from read_sas import ReadSas
+from read_sas.src._config import Config
+from read_sas.src._sas_reader import sas_reader
+from read_sas.src._spill import ChunkSpiller
+
+
+def _chunk(i: int) -> pl.DataFrame:
+    return pl.DataFrame({"i": [i] * 1_000, "x": [float(i)] * 1_000})
+
+
+def test_spiller_keeps_chunks_under_budget_in_memory(tmp_path):
+    """Test that nothing is written while the chunks fit the budget."""
+    spiller = ChunkSpiller(10 * _chunk(0).estimated_size(), tmp_path)
+    for i in range(3):
+        spiller.add(_chunk(i))
+    assert spiller.folder is None
+    assert spiller.stats()["spilled_chunks"] == 0
+    spiller.close()
+
+
+def test_spiller_spills_oldest_chunks(tmp_path):
+    """Test that the oldest chunks are spilled and read back in order."""
+    size = _chunk(0).estimated_size()
+    spiller = ChunkSpiller(2 * size, tmp_path)
+    for i in range(5):
+        spiller.add(_chunk(i))
+    assert spiller.spilled_chunks == 3
+    assert spiller.in_memory_bytes == 2 * size
+    assert spiller.folder is not None
+    assert sorted(p.name for p in spiller.folder.iterdir()) == [
+        "chunk_000000.arrow",
+        "chunk_000001.arrow",
+        "chunk_000002.arrow",
+    ]
+    output = pl.concat(spiller.frames).collect()
+    assert_frame_equal(output, pl.concat([_chunk(i) for i in range(5)]))
+    folder = spiller.folder
+    spiller.close()
+    assert not folder.exists()
+
+
+def test_spiller_with_zero_budget_spills_every_chunk(tmp_path):
+    """Test that a zero budget keeps no chunk in memory."""
+    spiller = ChunkSpiller(0, tmp_path)
+    spiller.add(_chunk(0))
+    assert spiller.spilled_chunks == 1
+    assert spiller.in_memory_bytes == 0
+    spiller.close()
+
+
+def test_spiller_rejects_negative_budget():
+    """Test that the budget cannot be negative."""
+    with pytest.raises(ValueError, match="non-negative"):
+        ChunkSpiller(-1)
+
+
+def test_unreferenced_spiller_frees_its_chunks_and_files(tmp_path):
+    """Test that a spiller nobody closed is collected, and its files removed."""
+    spiller = ChunkSpiller(0, tmp_path)
+    spiller.add(_chunk(0))
+    folder = spiller.folder
+    ref = weakref.ref(spiller)
+    del spiller
+    gc.collect()
+    assert ref() is None
+    assert folder is not None
+    assert not folder.exists()
+
+
+def test_spiller_can_keep_its_files_until_exit(tmp_path):
+    """Test that the files outlive the spiller when asked to."""
+    spiller = ChunkSpiller(0, tmp_path)
+    spiller.add(_chunk(0))
+    frames = spiller.frames
+    with patch("read_sas.src._spill.atexit.register") as register:
+        spiller.keep_files_until_exit()
+    del spiller
+    gc.collect()
+    assert_frame_equal(pl.concat(frames).collect(), _chunk(0))
+    func, folder = register.call_args.args
+    func(folder, **register.call_args.kwargs)
+    assert not folder.exists()
+
+
+def test_from_config(tmp_path):
+    """Test that spilling is off unless a budget is set."""
+    assert ChunkSpiller.from_config(Config(logger=Mock())) is None
+    spiller = ChunkSpiller.from_config(
+        Config(logger=Mock(), spill_budget_gb=0.5, spill_dir=tmp_path)
+    )
+    assert spiller is not None
+    assert spiller.budget_bytes == 500_000_000
+    assert spiller.spill_dir == tmp_path
+    spiller.close()
+
+
+@patch("read_sas.src._sas_reader._read_file", autospec=True)
+@patch("read_sas.src._sas_reader.n_rows_in_sas7bdat", autospec=True)
+@patch("read_sas.src._sas_reader.n_gb_in_file", autospec=True)
+def test_sas_reader_spills_past_budget(
+    mock_n_gb, mock_n_rows, mock_read_file, tmp_path
+):
+    """Test that the reader's output is backed by spill files past the budget."""
+    chunks = [_chunk(i) for i in range(4)]
+    mock_n_rows.return_value = 4_000
+    mock_n_gb.return_value = 1.0
+    mock_read_file.return_value = [(i, c.lazy()) for i, c in enumerate(chunks)]
+    config = Config(
+        logger=Mock(),
+        spill_budget_gb=chunks[0].estimated_size() / 1e9,
+        spill_dir=tmp_path,
+    )
+    stats: dict = {}
+    output = sas_reader("tinycopy.sas7bdat", config, None, stats=stats)
+    spiller = stats["spiller"]
+    assert spiller.spilled_chunks == 3
+    assert_frame_equal(output.collect(), pl.concat(chunks))
+    spiller.close()
+
+
+@patch("read_sas.src._spill.atexit.register", autospec=True)
+@patch("read_sas.src._sas_reader._read_file", autospec=True)
+@patch("read_sas.src._sas_reader.n_rows_in_sas7bdat", autospec=True)
+@patch("read_sas.src._sas_reader.n_gb_in_file", autospec=True)
+def test_sas_reader_without_stats_keeps_spill_files(
+    mock_n_gb, mock_n_rows, mock_read_file, mock_register, tmp_path
+):
+    """Test that the output stays readable when nothing holds on to the spiller."""
+    chunks = [_chunk(i) for i in range(4)]
+    mock_n_rows.return_value = 4_000
+    mock_n_gb.return_value = 1.0
+    mock_read_file.return_value = [(i, c.lazy()) for i, c in enumerate(chunks)]
+    config = Config(logger=Mock(), spill_budget_gb=0.0, spill_dir=tmp_path)
+    output = sas_reader("tinycopy.sas7bdat", config, None)
+    gc.collect()
+    assert_frame_equal(output.collect(), pl.concat(chunks))
+    mock_register.assert_called_once()
+    func, folder = mock_register.call_args.args
+    func(folder, **mock_register.call_args.kwargs)
+
+
+@patch("read_sas._read_sas.sas_reader", autospec=True)
+def test_read_sas_close_removes_spill_files(mock_sas_reader, tmp_path):
+    """Test that closing the reader removes its spill files and forgets the reader."""
+
+    def fake_sas_reader(*args: object) -> pl.LazyFrame:
+        config, stats = cast(Config, args[1]), cast("dict[str, Any]", args[4])
+        spiller = ChunkSpiller(0, config.spill_dir)
+        spiller.add(_chunk(0))
+        stats["spiller"] = spiller
+        return pl.concat(spiller.frames)
+
+    mock_sas_reader.side_effect = fake_sas_reader
+    with ReadSas(
+        "tinycopy.sas7bdat",
+        config_kwargs={
+            "temp_dir_parent": tmp_path,
+            "logger": Mock(),
+            "spill_budget_gb": 0.0,
+        },
+    ) as reader:
+        assert reader.config.spill_dir == reader.output_folder / "tinycopy.spill"
+        assert reader.reader.collect().height == 1_000
+        folder = reader.stats["spiller"].folder
+        assert Path(folder).parent == reader.config.spill_dir
+    assert not folder.exists()
+    assert "spiller" not in reader.stats
+    assert reader._reader is None  # noqa: SLF001
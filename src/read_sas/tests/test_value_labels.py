@@ -0,0 +1,103 @@
+from __future__ import annotations
+import os
+import pickle
+from types import SimpleNamespace
+from unittest.mock import patch
+import polars as pl
+import pytest
+from read_sas.src._value_labels import SasValueLabeler, format_name, read_format_catalog
+
+CATALOG = {
+    "SEXF": {1.0: "Male", 2.0: "Female"},
+    "$STATEF": {"NY": "New York", "NJ": "New Jersey"},
+    "YESNO": {0.0: "No", 1.0: "Yes", 9.0: "No"},
+}
+
+
+@pytest.fixture
+def catalog_path(tmp_path):
+    """Fixture to create a catalog file parsed by a patched pyreadstat."""
+    path = tmp_path / "formats.sas7bcat"
+    path.write_bytes(b"catalog")
+    with patch(
+        "pyreadstat.read_sas7bcat",
+        return_value=(None, SimpleNamespace(value_labels=CATALOG)),
+    ) as read:
+        yield path, read
+
+
+@pytest.mark.parametrize(
+    "sas_format, expected",
+    [
+        ("SEXF.", "SEXF"),
+        ("$STATEF2.", "STATEF"),
+        ("yesno1.0", "YESNO"),
+        ("SEXF", "SEXF"),
+        ("", None),
+        (None, None),
+    ],
+)
+def test_format_name(sas_format, expected):
+    """Test that widths, decimals and the character prefix are dropped."""
+    assert format_name(sas_format) == expected
+
+
+def test_catalog_is_parsed_once(catalog_path):
+    """Test that the catalog is cached until the file changes."""
+    path, read = catalog_path
+    catalog = read_format_catalog(path)
+    assert set(catalog) == {"SEXF", "STATEF", "YESNO"}
+    assert read_format_catalog(path) is catalog
+    assert read.call_count == 1
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    read_format_catalog(path)
+    assert read.call_count == 2
+
+
+def test_labeler_maps_codes_to_enum(catalog_path):
+    """Test that numeric and character codes become Enums of every format label."""
+    path, _ = catalog_path
+    meta = SimpleNamespace(
+        original_variable_types={
+            "sex": "SEXF.",
+            "state": "$STATEF2.",
+            "ok": "YESNO.",
+            "n": "BEST12.",
+        }
+    )
+    labeler = SasValueLabeler.from_metadata(meta, read_format_catalog(path))
+    assert list(labeler.columns) == ["sex", "state", "ok"]
+    chunk = pl.LazyFrame(
+        {
+            "sex": [1.0, 2.0, None, 3.0],
+            "state": ["NY", "NJ ", None, "CT"],
+            "ok": [0, 1, 9, 1],
+            "n": [1.0, 2.0, 3.0, 4.0],
+        }
+    )
+    out = labeler(chunk).collect()
+    assert out.schema["sex"] == pl.Enum(["Male", "Female"])
+    assert out.schema["ok"] == pl.Enum(["No", "Yes"])
+    assert out.to_dict(as_series=False) == {
+        "sex": ["Male", "Female", None, None],
+        "state": ["New York", "New Jersey", None, None],
+        "ok": ["No", "Yes", "No", "Yes"],
+        "n": [1.0, 2.0, 3.0, 4.0],
+    }
+
+
+def test_labeler_chunks_concatenate(catalog_path):
+    """Test that every chunk gets the same Enum, even when a label is unused."""
+    path, _ = catalog_path
+    meta = SimpleNamespace(original_variable_types={"sex": "SEXF."})
+    labeler = SasValueLabeler.from_metadata(meta, read_format_catalog(path))
+    chunks = [labeler(pl.LazyFrame({"sex": [code]})) for code in (1.0, 2.0)]
+    assert pl.concat(chunks).collect()["sex"].to_list() == ["Male", "Female"]
+
+
+def test_labeler_is_picklable():
+    """Test that the labeler can be sent to formatter worker processes."""
+    labeler = SasValueLabeler({"sex": CATALOG["SEXF"]})
+    restored = pickle.loads(pickle.dumps(labeler))  # noqa: S301
+    assert restored.columns == labeler.columns
@@ -0,0 +1,110 @@
+from __future__ import annotations
+import os
+from pathlib import Path
+from unittest.mock import Mock, patch
+import pandas as pd
+import pyreadstat
+import pytest
+from read_sas.src._config import Config
+from read_sas.src._worker_pool import (
+    WorkerPool,
+    _cgroup_cpu_limit,
+    available_cpus,
+    shutdown_worker_pool,
+    worker_pool,
+)
+from read_sas.src.__read_file import _read_chunks
+
+TINYCOPY = Path(__file__).parents[3] / "tinycopy.sas7bdat"
+
+
+@pytest.fixture
+def shared_pool():
+    """Stop the shared pool after the test so no worker outlives it."""
+    yield
+    shutdown_worker_pool()
+
+
+def test_cgroup_v2_quota(tmp_path):
+    """Test that a cgroup v2 quota is read as a number of CPUs."""
+    (tmp_path / "cpu.max").write_text("150000 100000\n")
+    assert _cgroup_cpu_limit(tmp_path) == 1.5
+    (tmp_path / "cpu.max").write_text("max 100000\n")
+    assert _cgroup_cpu_limit(tmp_path) is None
+
+
+def test_cgroup_v1_quota(tmp_path):
+    """Test that a cgroup v1 quota is read, and -1 means unlimited."""
+    (tmp_path / "cpu").mkdir()
+    (tmp_path / "cpu" / "cpu.cfs_period_us").write_text("100000\n")
+    (tmp_path / "cpu" / "cpu.cfs_quota_us").write_text("200000\n")
+    assert _cgroup_cpu_limit(tmp_path) == 2.0
+    (tmp_path / "cpu" / "cpu.cfs_quota_us").write_text("-1\n")
+    assert _cgroup_cpu_limit(tmp_path) is None
+
+
+def test_available_cpus_respects_quota_and_affinity(tmp_path):
+    """Test that the quota caps the CPUs in the affinity mask, rounding up."""
+    (tmp_path / "cpu.max").write_text("50000 100000\n")
+    with patch("os.sched_getaffinity", return_value={0, 1, 2, 3}, create=True):
+        assert available_cpus(tmp_path) == 1
+        (tmp_path / "cpu.max").write_text("250000 100000\n")
+        assert available_cpus(tmp_path) == 3
+        assert available_cpus(tmp_path / "missing") == 4
+
+
+def test_worker_pool_rejects_bad_sizes():
+    """Test that pools and row ranges must not be empty."""
+    with pytest.raises(ValueError, match="positive number"):
+        WorkerPool(0)
+
+
+@pytest.mark.usefixtures("shared_pool")
+def test_worker_pool_is_reused():
+    """Test that the shared pool starts once and serves smaller requests."""
+    pool = worker_pool(2)
+    assert worker_pool(1) is pool
+    assert worker_pool(2) is pool
+    bigger = worker_pool(3)
+    assert bigger is not pool
+    assert bigger.processes == 3
+    shutdown_worker_pool()
+    assert worker_pool(1) is not bigger
+
+
+@pytest.mark.usefixtures("shared_pool")
+def test_worker_pool_decodes_rows_in_order():
+    """Test that a row range split across workers is reassembled in order."""
+    frames = {
+        0: pd.DataFrame({"i": [0.0, 1.0]}),
+        2: pd.DataFrame({"i": [2.0, 3.0]}),
+        4: pd.DataFrame({"i": [4.0]}),
+    }
+    pool = worker_pool(3)
+    with patch.object(
+        pool,
+        "submit",
+        side_effect=lambda *args: Mock(result=Mock(return_value=frames[args[2]])),
+    ) as submit:
+        df = pool.decode_rows("x.sas7bdat", 0, 5, usecols=None)
+    assert df["i"].tolist() == [0.0, 1.0, 2.0, 3.0, 4.0]
+    assert [call.args[2:4] for call in submit.call_args_list] == [
+        (0, 2),
+        (2, 2),
+        (4, 1),
+    ]
+    with pytest.raises(ValueError, match="positive number"):
+        pool.decode_rows("x.sas7bdat", 0, 0)
+
+
+@pytest.mark.usefixtures("shared_pool")
+def test_read_chunks_uses_shared_pool_for_real_file():
+    """Test that multiprocess reads decode through the shared pool, across files."""
+    config = Config(logger=Mock(), num_processes=2)
+    expected, _ = pyreadstat.read_sas7bdat(TINYCOPY)
+    with patch("pyreadstat.read_file_multiprocessing") as per_call_pool:
+        for _ in range(2):
+            chunks = list(_read_chunks(str(TINYCOPY), 1, None, config))
+            pd.testing.assert_frame_equal(pd.concat(chunks), expected)
+    per_call_pool.assert_not_called()
+    assert worker_pool(2).pid == os.getpid()